@@ -0,0 +1,49 @@
+"""create outbox_messages table for reliable outbound delivery
+
+Revision ID: 5c1e9a7d2f40
+Revises: 49e3788203da
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e9a7d2f40"
+down_revision: Union[str, Sequence[str], None] = "49e3788203da"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create outbox_messages table drained by the outbox dispatcher."""
+    op.create_table(
+        "outbox_messages",
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("instance_name", sa.String(), nullable=False),
+        sa.Column("channel_type", sa.String(), nullable=False, server_default="whatsapp"),
+        sa.Column("recipient", sa.String(), nullable=False),
+        sa.Column("trace_id", sa.String(), nullable=True),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("delivered_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_outbox_messages_instance_name", "outbox_messages", ["instance_name"])
+    op.create_index("ix_outbox_messages_trace_id", "outbox_messages", ["trace_id"])
+    op.create_index("ix_outbox_messages_status_next_attempt", "outbox_messages", ["status", "next_attempt_at"])
+
+
+def downgrade() -> None:
+    """Drop outbox_messages table."""
+    op.drop_index("ix_outbox_messages_status_next_attempt", table_name="outbox_messages")
+    op.drop_index("ix_outbox_messages_trace_id", table_name="outbox_messages")
+    op.drop_index("ix_outbox_messages_instance_name", table_name="outbox_messages")
+    op.drop_table("outbox_messages")
@@ -0,0 +1,133 @@
+"""store trace payloads as binary with codec and dictionary version
+
+Revision ID: 7d3b2f81c6a9
+Revises: 5c1e9a7d2f40
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+import base64
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7d3b2f81c6a9"
+down_revision: Union[str, Sequence[str], None] = "5c1e9a7d2f40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+BATCH_SIZE = 1000
+
+PAYLOAD_COLUMNS = (
+    ("payload_data", sa.LargeBinary()),
+    ("payload_codec", sa.String()),
+    ("payload_dict_id", sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    """Add binary payload columns, the dictionary table, and move legacy base64 payloads to bytes."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table("trace_compression_dicts"):
+        op.create_table(
+            "trace_compression_dicts",
+            sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+            sa.Column("scope", sa.String(), nullable=False),
+            sa.Column("dict_data", sa.LargeBinary(), nullable=False),
+            sa.Column("dict_size", sa.Integer(), nullable=True),
+            sa.Column("sample_count", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_trace_compression_dicts_scope", "trace_compression_dicts", ["scope"])
+
+    # trace_payloads is created by create_all() on startup; fresh databases get the new columns there
+    if not inspector.has_table("trace_payloads"):
+        return
+
+    existing = {column["name"] for column in inspector.get_columns("trace_payloads")}
+    with op.batch_alter_table("trace_payloads") as batch_op:
+        for name, column_type in PAYLOAD_COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, column_type, nullable=True))
+
+    _convert_legacy_payloads(bind)
+
+
+def _convert_legacy_payloads(bind) -> None:
+    """Decode base64 zlib payloads into payload_data (codec zlib) in batches."""
+    select_batch = sa.text(
+        "SELECT id, payload_compressed FROM trace_payloads "
+        "WHERE payload_compressed IS NOT NULL AND payload_data IS NULL AND id > :last_id "
+        "ORDER BY id LIMIT :limit"
+    )
+    update_row = sa.text(
+        "UPDATE trace_payloads SET payload_data = :data, payload_codec = 'zlib', payload_compressed = NULL "
+        "WHERE id = :id"
+    ).bindparams(sa.bindparam("data", type_=sa.LargeBinary()))
+
+    last_id = 0
+    rows_converted = 0
+    bytes_before = 0
+    bytes_after = 0
+    while True:
+        rows = bind.execute(select_batch, {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, encoded in rows:
+            last_id = row_id
+            try:
+                data = base64.b64decode(encoded.encode("ascii"))
+            except (ValueError, UnicodeEncodeError):
+                # Leave undecodable rows on the legacy column; get_payload still reports them
+                continue
+            updates.append({"id": row_id, "data": data})
+            bytes_before += len(encoded)
+            bytes_after += len(data)
+        if updates:
+            bind.execute(update_row, updates)
+            rows_converted += len(updates)
+
+    if rows_converted:
+        logger.info(
+            f"Converted {rows_converted} trace payloads to binary: "
+            f"{bytes_before} -> {bytes_after} bytes ({bytes_before - bytes_after} saved)"
+        )
+
+
+def downgrade() -> None:
+    """Re-encode binary zlib payloads as base64 and drop the binary columns and dictionary table.
+
+    zstd payloads cannot be represented in the legacy column; run
+    recompress_payloads() with zstd disabled before downgrading if they must be kept.
+    """
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if inspector.has_table("trace_payloads"):
+        existing = {column["name"] for column in inspector.get_columns("trace_payloads")}
+        if "payload_data" in existing:
+            rows = bind.execute(
+                sa.text("SELECT id, payload_data FROM trace_payloads WHERE payload_codec = 'zlib'")
+            ).fetchall()
+            for row_id, data in rows:
+                bind.execute(
+                    sa.text("UPDATE trace_payloads SET payload_compressed = :encoded WHERE id = :id"),
+                    {"id": row_id, "encoded": base64.b64encode(data).decode("ascii")},
+                )
+        with op.batch_alter_table("trace_payloads") as batch_op:
+            for name, _ in reversed(PAYLOAD_COLUMNS):
+                if name in existing:
+                    batch_op.drop_column(name)
+
+    if inspector.has_table("trace_compression_dicts"):
+        op.drop_index("ix_trace_compression_dicts_scope", table_name="trace_compression_dicts")
+        op.drop_table("trace_compression_dicts")
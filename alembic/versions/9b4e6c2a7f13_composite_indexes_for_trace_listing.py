@@ -0,0 +1,72 @@
+"""composite indexes for keyset trace listing
+
+Revision ID: 9b4e6c2a7f13
+Revises: 7d3b2f81c6a9
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9b4e6c2a7f13"
+down_revision: Union[str, Sequence[str], None] = "7d3b2f81c6a9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COMPOSITE_INDEXES = (
+    ("ix_message_traces_received_at_trace_id", ["received_at", "trace_id"]),
+    ("ix_message_traces_instance_received_at", ["instance_name", "received_at", "trace_id"]),
+    ("ix_message_traces_sender_phone_received_at", ["sender_phone", "received_at", "trace_id"]),
+    ("ix_message_traces_status_received_at", ["status", "received_at", "trace_id"]),
+    ("ix_message_traces_session_received_at", ["session_name", "received_at", "trace_id"]),
+)
+
+# Single-column indexes made redundant by the composites (each is their leading column)
+SINGLE_COLUMN_INDEXES = (
+    ("ix_message_traces_received_at", ["received_at"]),
+    ("ix_message_traces_instance_name", ["instance_name"]),
+    ("ix_message_traces_sender_phone", ["sender_phone"]),
+    ("ix_message_traces_status", ["status"]),
+    ("ix_message_traces_session_name", ["session_name"]),
+)
+
+
+def _swap_indexes(create, drop) -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # message_traces is created by create_all() on startup; fresh databases get the indexes there
+    if not inspector.has_table("message_traces"):
+        return
+
+    existing = {index["name"] for index in inspector.get_indexes("message_traces")}
+    postgres = bind.dialect.name == "postgresql"
+
+    def run():
+        for name, columns in create:
+            if name not in existing:
+                op.create_index(name, "message_traces", columns, postgresql_concurrently=postgres)
+        for name, _ in drop:
+            if name in existing:
+                op.drop_index(name, table_name="message_traces", postgresql_concurrently=postgres)
+
+    if postgres:
+        # Build without blocking trace writes on large tables (CONCURRENTLY cannot run in a transaction)
+        with op.get_context().autocommit_block():
+            run()
+    else:
+        run()
+
+
+def upgrade() -> None:
+    """Add (filter, received_at, trace_id) indexes and drop the single-column indexes they cover."""
+    _swap_indexes(COMPOSITE_INDEXES, SINGLE_COLUMN_INDEXES)
+
+
+def downgrade() -> None:
+    """Restore the single-column indexes and drop the composite ones."""
+    _swap_indexes(SINGLE_COLUMN_INDEXES, COMPOSITE_INDEXES)
@@ -0,0 +1,65 @@
+"""make users unique per instance and phone number
+
+Revision ID: a8c2e4f6b9d1
+Revises: f4d6b8c0e2a3
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a8c2e4f6b9d1"
+down_revision: Union[str, Sequence[str], None] = "f4d6b8c0e2a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONSTRAINT = "uq_users_instance_phone"
+
+
+def upgrade() -> None:
+    """Merge duplicate users per (instance_name, phone_number), reconcile WhatsApp links and add the unique constraint."""
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("users"):
+        return
+
+    # The oldest row survives; later duplicates hand over their links and message counts
+    rows = bind.execute(
+        sa.text("SELECT id, instance_name, phone_number, message_count FROM users ORDER BY created_at, id")
+    ).fetchall()
+    survivors = {}
+    for user_id, instance_name, phone_number, message_count in rows:
+        key = (instance_name, phone_number)
+        if key not in survivors:
+            survivors[key] = user_id
+            continue
+        params = {"survivor": survivors[key], "duplicate": user_id, "count": message_count or 0}
+        bind.execute(sa.text("UPDATE user_external_ids SET user_id = :survivor WHERE user_id = :duplicate"), params)
+        bind.execute(
+            sa.text("UPDATE users SET message_count = COALESCE(message_count, 0) + :count WHERE id = :survivor"),
+            params,
+        )
+        bind.execute(sa.text("DELETE FROM users WHERE id = :duplicate"), params)
+
+    # The inbound upsert keys WhatsApp links by instance: move legacy links (no or another instance) to
+    # their user's instance so it updates them instead of adding a second link for the same JID
+    if sa.inspect(bind).has_table("user_external_ids"):
+        from src.services.user_service import reconcile_whatsapp_links
+
+        reconcile_whatsapp_links(bind)
+
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.create_unique_constraint(CONSTRAINT, ["instance_name", "phone_number"])
+
+
+def downgrade() -> None:
+    """Drop the (instance_name, phone_number) unique constraint."""
+    if not sa.inspect(op.get_bind()).has_table("users"):
+        return
+
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_constraint(CONSTRAINT, type_="unique")
@@ -0,0 +1,37 @@
+"""partition marker for the trace tables (converted by the traces partition command)
+
+Revision ID: c4f1a8d3e5b2
+Revises: 9b4e6c2a7f13
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4f1a8d3e5b2"
+down_revision: Union[str, Sequence[str], None] = "9b4e6c2a7f13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Schema marker only.
+
+    Partitioning is an operational choice made with ``automagik-omni traces partition``
+    (see ``src/services/trace_partitions.py``), so every database at this revision has
+    the same schema whatever the environment was when it was migrated.
+    """
+
+
+def downgrade() -> None:
+    """Convert partitioned trace tables back to plain tables (the schema before this revision)."""
+    from src.services.trace_partitions import unpartition_tables
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        unpartition_tables(bind)
@@ -0,0 +1,31 @@
+"""add trace sampling overrides to instance config
+
+Revision ID: d2b7e9f4a1c6
+Revises: c4f1a8d3e5b2
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d2b7e9f4a1c6"
+down_revision: Union[str, Sequence[str], None] = "c4f1a8d3e5b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add per-instance trace sampling columns (NULL = global tracing settings)."""
+    op.add_column("instance_configs", sa.Column("trace_sample_rate", sa.Float(), nullable=True))
+    op.add_column("instance_configs", sa.Column("trace_payload_mode", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Remove per-instance trace sampling columns."""
+    op.drop_column("instance_configs", "trace_payload_mode")
+    op.drop_column("instance_configs", "trace_sample_rate")
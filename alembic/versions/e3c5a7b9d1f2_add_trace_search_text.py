@@ -0,0 +1,58 @@
+"""add full-text search over trace message text
+
+Revision ID: e3c5a7b9d1f2
+Revises: d2b7e9f4a1c6
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e3c5a7b9d1f2"
+down_revision: Union[str, Sequence[str], None] = "d2b7e9f4a1c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_INDEX = "ix_message_traces_search_text"
+
+
+def upgrade() -> None:
+    """Add message_traces.search_text with a GIN tsvector index (PostgreSQL) or FTS5 table (SQLite)."""
+    from src.services.trace_search import create_fts_table
+
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # message_traces is created by create_all() on startup; fresh databases get the column and index there
+    if not inspector.has_table("message_traces"):
+        return
+
+    if "search_text" not in {column["name"] for column in inspector.get_columns("message_traces")}:
+        op.add_column("message_traces", sa.Column("search_text", sa.Text(), nullable=True))
+
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON message_traces "
+            "USING gin (to_tsvector('simple', search_text))"
+        )
+    else:
+        create_fts_table(bind)
+
+
+def downgrade() -> None:
+    """Drop the search index and column."""
+    from src.services.trace_search import drop_fts_table
+
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("message_traces"):
+        return
+
+    if bind.dialect.name == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {SEARCH_INDEX}")
+    else:
+        drop_fts_table(bind)
+    op.drop_column("message_traces", "search_text")
@@ -0,0 +1,62 @@
+"""create messages table for the unified message store
+
+Revision ID: f4d6b8c0e2a3
+Revises: e3c5a7b9d1f2
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f4d6b8c0e2a3"
+down_revision: Union[str, Sequence[str], None] = "e3c5a7b9d1f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create messages table written by ingestion and send paths."""
+    if sa.inspect(op.get_bind()).has_table("messages"):
+        return
+
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.String(), primary_key=True, nullable=False),
+        sa.Column("instance_name", sa.String(), nullable=False),
+        sa.Column("channel", sa.String(), nullable=False),
+        sa.Column("channel_message_id", sa.String(), nullable=True),
+        sa.Column("conversation_id", sa.String(), nullable=False),
+        sa.Column("direction", sa.String(), nullable=False),
+        sa.Column("sender_id", sa.String(), nullable=True),
+        sa.Column("sender_name", sa.String(), nullable=True),
+        sa.Column("message_type", sa.String(), nullable=True),
+        sa.Column("text_content", sa.Text(), nullable=True),
+        sa.Column("media_mime_type", sa.String(), nullable=True),
+        sa.Column("quoted_message_id", sa.String(), nullable=True),
+        sa.Column("reaction_to_message_id", sa.String(), nullable=True),
+        sa.Column("trace_id", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_messages_conversation_timeline", "messages", ["instance_name", "conversation_id", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_messages_channel_message_id",
+        "messages",
+        ["instance_name", "channel", "channel_message_id"],
+        unique=True,
+    )
+    op.create_index("ix_messages_trace_id", "messages", ["trace_id"])
+
+
+def downgrade() -> None:
+    """Drop messages table."""
+    op.drop_index("ix_messages_trace_id", table_name="messages")
+    op.drop_index("ix_messages_channel_message_id", table_name="messages")
+    op.drop_index("ix_messages_conversation_timeline", table_name="messages")
+    op.drop_table("messages")
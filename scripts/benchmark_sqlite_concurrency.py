@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent SQLite writes with and without the connection pragmas.
+
+Writer threads insert rows shaped like trace records, committing one small
+batch at a time, while reader threads run the kind of status aggregate the
+trace list and analytics endpoints issue. The same workload runs twice against
+a fresh temporary database file:
+
+* ``default``  - plain ``create_engine`` (rollback journal, ``synchronous=FULL``)
+* ``tuned``    - ``create_database_engine`` (WAL, ``synchronous=NORMAL``, busy
+  timeout, mmap and cache sizes from the configuration)
+
+Reports write and read throughput, p99 read latency and how many operations
+failed with ``database is locked``.
+
+Usage:
+    python scripts/benchmark_sqlite_concurrency.py --writers 4 --readers 4 --seconds 10
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, func, insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from src.db.database import create_database_engine  # noqa: E402
+from src.utils.datetime_utils import utcnow  # noqa: E402
+from src.utils.uuid_utils import uuid7  # noqa: E402
+
+metadata = MetaData()
+bench_table = Table(
+    "concurrency_bench",
+    metadata,
+    Column("id", String, primary_key=True),
+    Column("instance_name", String),
+    Column("status", String),
+    Column("duration_ms", Integer),
+    Column("received_at", DateTime, index=True),
+)
+
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.reads = 0
+        self.locked = 0
+        self.read_latencies = []
+
+    def add(self, **values):
+        with self.lock:
+            for name, value in values.items():
+                if name == "read_latency":
+                    self.read_latencies.append(value)
+                else:
+                    setattr(self, name, getattr(self, name) + value)
+
+
+def writer(engine, stop: threading.Event, counters: Counters, batch_size: int) -> None:
+    while not stop.is_set():
+        now = utcnow().replace(tzinfo=None)
+        batch = [
+            {"id": str(uuid7()), "instance_name": "bench", "status": "completed", "duration_ms": 42, "received_at": now}
+            for _ in range(batch_size)
+        ]
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(bench_table), batch)
+            counters.add(writes=batch_size)
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            counters.add(locked=1)
+
+
+def reader(engine, stop: threading.Event, counters: Counters) -> None:
+    query = select(func.count(), func.avg(bench_table.c.duration_ms)).where(
+        bench_table.c.instance_name == "bench", bench_table.c.status == "completed"
+    )
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(query).one()
+            counters.add(reads=1, read_latency=time.perf_counter() - started)
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            counters.add(locked=1)
+
+
+def run(name: str, make_engine, args) -> None:
+    fd, db_file = tempfile.mkstemp(suffix=".db", prefix="sqlite-concurrency-bench-")
+    os.close(fd)
+    url = f"sqlite:///{db_file}"
+    engine = make_engine(url)
+    try:
+        metadata.create_all(engine)
+        stop = threading.Event()
+        counters = Counters()
+        threads = [
+            threading.Thread(target=writer, args=(engine, stop, counters, args.batch_size)) for _ in range(args.writers)
+        ] + [threading.Thread(target=reader, args=(engine, stop, counters)) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies = sorted(counters.read_latencies)
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+        print(
+            f"  {name:<8} writes {counters.writes / args.seconds:>9,.0f} rows/s  "
+            f"reads {counters.reads / args.seconds:>7,.0f} q/s  p99 read {p99:>7.1f} ms  "
+            f"locked errors {counters.locked}"
+        )
+    finally:
+        engine.dispose()
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(db_file + suffix):
+                os.unlink(db_file + suffix)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark concurrent SQLite access with and without WAL pragmas")
+    parser.add_argument("--writers", type=int, default=4, help="Writer threads")
+    parser.add_argument("--readers", type=int, default=4, help="Reader threads")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+    parser.add_argument("--batch-size", type=int, default=20, help="Rows per committed batch")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per run, batches of {args.batch_size}")
+    run("default", lambda url: create_engine(url, connect_args={"check_same_thread": False}), args)
+    run("tuned", create_database_engine, args)
+
+
+if __name__ == "__main__":
+    main()
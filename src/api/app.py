@@ -195,6 +195,26 @@ async def lifespan(app: FastAPI):
             logger.error(f"❌ Failed to create database tables: {e}")
             # Let the app continue - tables might already exist
 
+        # Keep partitions ahead of incoming traces on partitioned PostgreSQL trace tables
+        if config.tracing.enabled and config.tracing.partitioning != "none":
+            try:
+                from src.services.trace_partitions import ensure_partitions, ensure_trace_id_guard, is_partitioned
+
+                with SessionLocal() as db:
+                    connection = db.connection()
+                    if is_partitioned(connection, "message_traces"):
+                        ensure_partitions(connection, config.tracing.partitioning, config.tracing.partitions_ahead)
+                        if ensure_trace_id_guard(connection):
+                            logger.info("Added the trace_id uniqueness guard to the partitioned message_traces table")
+                        db.commit()
+                    else:
+                        logger.warning(
+                            "⚠️ AUTOMAGIK_OMNI_TRACE_PARTITIONING is set but the trace tables are not partitioned "
+                            "(requires PostgreSQL); run 'automagik-omni traces partition' to convert them"
+                        )
+            except Exception as e:
+                logger.error(f"❌ Failed to maintain trace partitions: {e}")
+
         # Load access control rules into cache
         try:
             from src.services.access_control import access_control_service
@@ -205,6 +225,56 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"❌ Failed to load access control rules: {e}")
             # Continue without access control cache - will be loaded on first use
+
+        # Load trained trace payload compression dictionaries
+        if config.tracing.enabled:
+            try:
+                from src.services.trace_compression import payload_codec
+
+                with SessionLocal() as db:
+                    loaded = payload_codec.load(db)
+                logger.info(f"✅ Trace compression dictionaries loaded ({loaded})")
+            except Exception as e:
+                logger.error(f"❌ Failed to load trace compression dictionaries: {e}")
+
+        # Backfill trace rollups for traces stored before rollups were enabled
+        if config.tracing.enabled and config.tracing.rollups_enabled:
+            try:
+                from src.services.trace_rollups import start_backfill
+
+                start_backfill(SessionLocal)
+            except Exception as e:
+                logger.error(f"❌ Failed to start trace rollup backfill: {e}")
+
+        # Start the batched trace writer so tracing never commits on the request path
+        if config.tracing.enabled and config.tracing.async_writer:
+            try:
+                from src.services.trace_writer import trace_writer
+
+                trace_writer.start()
+                logger.info("✅ Trace writer started")
+            except Exception as e:
+                logger.error(f"❌ Failed to start trace writer: {e}")
+
+        # Enforce trace retention in bounded background batches
+        if config.tracing.enabled and config.tracing.retention_enabled:
+            try:
+                from src.services.trace_retention import trace_retention
+
+                trace_retention.start()
+                logger.info("✅ Trace retention worker started")
+            except Exception as e:
+                logger.error(f"❌ Failed to start trace retention worker: {e}")
+
+        # Start the outbox dispatcher (resumes deliveries left pending by a previous run)
+        if config.outbox.enabled:
+            try:
+                from src.services.outbox_service import outbox_dispatcher
+
+                outbox_dispatcher.start()
+                logger.info("✅ Outbox dispatcher started")
+            except Exception as e:
+                logger.error(f"❌ Failed to start outbox dispatcher: {e}")
     else:
         logger.info("Skipping database setup in test environment")
 
@@ -253,6 +323,30 @@ async def lifespan(app: FastAPI):
     # Shutdown (cleanup if needed)
     logger.info("Shutting down application...")
 
+    from src.services.outbox_service import outbox_dispatcher
+
+    if outbox_dispatcher.is_running:
+        outbox_dispatcher.stop()
+
+    from src.services.trace_retention import trace_retention
+
+    if trace_retention.is_running:
+        trace_retention.stop()
+
+    from src.ipc_client import ipc_client_pool
+
+    await ipc_client_pool.close()
+
+    from src.db.database import dispose_async_engine
+
+    await dispose_async_engine()
+
+    # Stop last so events from the components above are still written
+    from src.services.trace_writer import trace_writer
+
+    if trace_writer.is_running:
+        trace_writer.stop()
+
 
 # Create FastAPI app with authentication configuration
 app = FastAPI(
@@ -323,6 +417,11 @@ app.include_router(messages_router, prefix="/api/v1/instance", tags=["messages"]
 # Include access control management routes
 app.include_router(access_router, prefix="/api/v1", tags=["access"])
 
+# Include conversation history routes
+from src.api.routes.conversations import router as conversations_router
+
+app.include_router(conversations_router, prefix="/api/v1", tags=["messages"])
+
 # Add request logging middleware
 app.add_middleware(RequestLoggingMiddleware)
 
@@ -474,6 +573,32 @@ async def health_check():
     except Exception as e:
         health_status["services"]["discord"] = {"status": "error", "error": str(e)}
 
+    from src.services.trace_writer import trace_writer
+
+    if trace_writer.is_running:
+        health_status["services"]["trace_writer"] = {"status": "up", **trace_writer.get_stats()}
+
+    from src.services.trace_retention import trace_retention
+
+    if trace_retention.is_running:
+        health_status["services"]["trace_retention"] = {"status": "up", **trace_retention.get_stats()}
+
+    if config.tracing.enabled:
+        from src.services.trace_sampling import trace_sampler
+
+        health_status["services"]["trace_sampling"] = {"status": "up", **trace_sampler.get_stats()}
+
+        from src.services.trace_events import trace_events
+
+        health_status["services"]["trace_stream"] = {"status": "up", **trace_events.get_stats()}
+
+    # Round-trip latency of pooled IPC sockets used to reach channel bots
+    from src.ipc_client import ipc_client_pool
+
+    ipc_metrics = ipc_client_pool.get_metrics()
+    if ipc_metrics:
+        health_status["services"]["ipc"] = {"status": "up", "sockets": ipc_metrics}
+
     return health_status
 
 
@@ -485,6 +610,7 @@ async def _handle_evolution_webhook(instance_config, request: Request, db: Sessi
         instance_config: InstanceConfig object with per-instance configuration
         request: FastAPI request object
     """
+    from src.services.message_store import MessageStore
     from src.services.trace_service import get_trace_context
 
     start_time = time.time()
@@ -507,6 +633,8 @@ async def _handle_evolution_webhook(instance_config, request: Request, db: Sessi
 
         # Start message tracing
         with get_trace_context(data, instance_config.name, db) as trace:
+            MessageStore.record_whatsapp_webhook(db, instance_config.name, data, trace.trace_id if trace else None)
+
             # Update the Evolution API sender with the webhook data
             # This sets the runtime configuration from the webhook payload
             evolution_api_sender.update_from_webhook(data)
@@ -4,12 +4,14 @@ FastAPI dependency injection for database and services.
 
 import logging
 import os
-from typing import Generator, Optional
+from typing import AsyncGenerator, Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import APIKeyHeader
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from src.db.database import get_db
+from src.db.database import get_async_db, get_db
 from src.db.models import InstanceConfig
 from src.config import config
 
@@ -34,6 +36,16 @@ if get_database is None:
     get_database = _shared_get_database
     globals()["_shared_get_database"] = get_database
 
+get_async_database = globals().get("_shared_get_async_database")
+if get_async_database is None:
+
+    async def _shared_get_async_database() -> AsyncGenerator[AsyncSession, None]:
+        async for db in get_async_db():
+            yield db
+
+    get_async_database = _shared_get_async_database
+    globals()["_shared_get_async_database"] = get_async_database
+
 
 def get_instance_by_name(instance_name: str, db: Session = Depends(get_database)) -> InstanceConfig:
     """
@@ -58,6 +70,31 @@ def get_instance_by_name(instance_name: str, db: Session = Depends(get_database)
     return instance
 
 
+async def get_async_instance_by_name(
+    instance_name: str, db: AsyncSession = Depends(get_async_database)
+) -> InstanceConfig:
+    """
+    Get instance configuration by name without blocking the event loop.
+
+    Args:
+        instance_name: Name of the instance
+        db: Async database session
+
+    Returns:
+        InstanceConfig for the instance
+
+    Raises:
+        HTTPException: If instance not found
+    """
+    instance = await db.scalar(select(InstanceConfig).filter_by(name=instance_name))
+    if not instance:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Instance '{instance_name}' not found",
+        )
+    return instance
+
+
 def _create_verify_api_key():
     def _verify(api_key: Optional[str] = Depends(api_key_header)):
         """
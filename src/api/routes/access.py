@@ -11,9 +11,10 @@ from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from pydantic import BaseModel, Field, ConfigDict
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.api.deps import get_database, verify_api_key
+from src.api.deps import get_async_database, verify_api_key
 from src.db.models import AccessRule, AccessRuleType
 from src.services.access_control import access_control_service
 
@@ -44,36 +45,39 @@ class AccessRuleOut(BaseModel):
 
 
 @router.get("/rules", response_model=List[AccessRuleOut], summary="List access rules")
-def list_access_rules(
+async def list_access_rules(
     instance_name: Optional[str] = Query(None, description="Filter by instance scope"),
     rule_type: Optional[AccessRuleType] = Query(None, description="Filter by rule type"),
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Return all access rules, optionally filtered by scope and type."""
-    query = db.query(AccessRule)
+    query = select(AccessRule)
     if instance_name is not None:
         query = query.filter(AccessRule.instance_name == instance_name)
     if rule_type is not None:
         query = query.filter(AccessRule.rule_type == rule_type.value)
-    rules = query.order_by(AccessRule.id.desc()).all()
+    rules = (await db.scalars(query.order_by(AccessRule.id.desc()))).all()
     logger.info("Listing %d access rules (scope=%s, type=%s)", len(rules), instance_name or "any", rule_type or "any")
     return rules
 
 
 @router.post("/rules", response_model=AccessRuleOut, status_code=status.HTTP_201_CREATED, summary="Create access rule")
-def create_access_rule(
+async def create_access_rule(
     payload: AccessRuleCreate,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Create a new allow/block rule and update cache."""
     try:
-        rule = access_control_service.add_rule(
-            phone_number=payload.phone_number,
-            rule_type=payload.rule_type,
-            instance_name=payload.instance_name,
-            db=db,
+        # The service updates its cache with sync session code; run_sync drives it over the async connection
+        rule = await db.run_sync(
+            lambda session: access_control_service.add_rule(
+                phone_number=payload.phone_number,
+                rule_type=payload.rule_type,
+                instance_name=payload.instance_name,
+                db=session,
+            )
         )
         logger.info(
             "Created access rule id=%s scope=%s phone=%s type=%s",
@@ -89,13 +93,13 @@ def create_access_rule(
 
 
 @router.delete("/rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete access rule")
-def delete_access_rule(
+async def delete_access_rule(
     rule_id: int,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Delete a rule and update cache."""
-    removed = access_control_service.remove_rule(rule_id, db)
+    removed = await db.run_sync(lambda session: access_control_service.remove_rule(rule_id, session))
     if not removed:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
     logger.info("Deleted access rule id=%s", rule_id)
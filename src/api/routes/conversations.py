@@ -0,0 +1,76 @@
+"""
+Conversation history API endpoints.
+Serves conversation timelines from the unified message store.
+"""
+
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.api.deps import get_async_database, verify_api_key
+from src.services.message_store import MessageStore
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+class ConversationMessage(BaseModel):
+    """A stored message of a conversation."""
+
+    id: str
+    instance_name: str
+    channel: str
+    channel_message_id: Optional[str]
+    conversation_id: str
+    direction: str
+    sender_id: Optional[str]
+    sender_name: Optional[str]
+    message_type: Optional[str]
+    text_content: Optional[str]
+    media_mime_type: Optional[str]
+    quoted_message_id: Optional[str]
+    reaction_to_message_id: Optional[str]
+    trace_id: Optional[str]
+    created_at: Optional[str]
+
+
+@router.get("/conversations/{conversation_id}/messages", response_model=List[ConversationMessage])
+async def list_conversation_messages(
+    conversation_id: str,
+    response: Response,
+    instance_name: str = Query(..., description="Instance the conversation belongs to"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of messages to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_database),
+    api_key: str = Depends(verify_api_key),
+):
+    """
+    Messages of a conversation (WhatsApp remote JID or Discord channel id), newest first.
+
+    When older messages exist, the ``X-Next-Cursor`` response header holds the cursor for the next page.
+    """
+
+    position = None
+    if cursor:
+        try:
+            position = MessageStore.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    try:
+        messages, next_cursor = await db.run_sync(
+            MessageStore.conversation_page, instance_name, conversation_id, limit, position
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return [ConversationMessage(**message.to_dict()) for message in messages]
+
+    except Exception as e:
+        logger.error(f"Error listing messages of conversation {conversation_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list conversation messages: {str(e)}",
+        )
@@ -7,14 +7,16 @@ import os
 from typing import List, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field, ConfigDict
 
-from src.api.deps import get_database, verify_api_key
+from src.api.deps import get_async_database, get_async_instance_by_name, verify_api_key
 from src.db.models import InstanceConfig
 from src.channels.base import ChannelHandlerFactory, QRCodeResponse, ConnectionStatus
 from src.channels.whatsapp.channel_handler import ValidationError
 from src.ip_utils import ensure_ipv4_in_config
+from src.services.trace_sampling import trace_sampler
 from src.utils.instance_utils import normalize_instance_name
 
 logger = logging.getLogger(__name__)
@@ -98,6 +100,14 @@ class InstanceConfigCreate(BaseModel):
         description="Enable automatic message splitting on \\n\\n (WhatsApp: full control, Discord: preference only)",
     )
 
+    # Trace payload sampling (defaults to the global tracing settings)
+    trace_sample_rate: Optional[float] = Field(
+        default=None, ge=0, le=1, description="Fraction of traces whose stage payloads are stored"
+    )
+    trace_payload_mode: Optional[str] = Field(
+        default=None, pattern="^(full|metadata)$", description="full, or metadata to store trace rows only"
+    )
+
 
 class InstanceConfigUpdate(BaseModel):
     """Schema for updating instance configuration."""
@@ -134,6 +144,10 @@ class InstanceConfigUpdate(BaseModel):
     # Message splitting control
     enable_auto_split: Optional[bool] = None
 
+    # Trace payload sampling
+    trace_sample_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    trace_payload_mode: Optional[str] = Field(default=None, pattern="^(full|metadata)$")
+
 
 class EvolutionStatusInfo(BaseModel):
     """Schema for Evolution API status information."""
@@ -193,6 +207,10 @@ class InstanceConfigResponse(BaseModel):
     # Message splitting control
     enable_auto_split: Optional[bool] = None
 
+    # Trace payload sampling
+    trace_sample_rate: Optional[float] = None
+    trace_payload_mode: Optional[str] = None
+
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -203,7 +221,7 @@ class InstanceConfigResponse(BaseModel):
 )
 async def create_instance(
     instance_data: InstanceConfigCreate,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Create a new instance configuration with channel-specific setup."""
@@ -278,7 +296,7 @@ async def create_instance(
             )
 
     # Check if normalized instance name already exists
-    existing = db.query(InstanceConfig).filter_by(name=normalized_name).first()
+    existing = await db.scalar(select(InstanceConfig).filter_by(name=normalized_name))
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -293,7 +311,7 @@ async def create_instance(
 
     # If setting as default, unset other defaults
     if instance_data.is_default:
-        db.query(InstanceConfig).filter_by(is_default=True).update({"is_default": False})
+        await db.execute(update(InstanceConfig).filter_by(is_default=True).values(is_default=False))
 
     # Create database instance first (without creation parameters)
     db_instance_data = instance_data.model_dump(exclude={"phone_number", "auto_qr", "integration"}, exclude_unset=False)
@@ -310,8 +328,8 @@ async def create_instance(
 
     db_instance = InstanceConfig(**db_instance_data)
     db.add(db_instance)
-    db.commit()
-    db.refresh(db_instance)
+    await db.commit()
+    await db.refresh(db_instance)
 
     # Create instance in external service if needed
     try:
@@ -329,8 +347,8 @@ async def create_instance(
 
             # Mark instance as active after successful creation
             db_instance.is_active = True
-            db.commit()
-            db.refresh(db_instance)
+            await db.commit()
+            await db.refresh(db_instance)
 
             # Log whether we used existing or created new
             if creation_result.get("existing_instance"):
@@ -340,16 +358,16 @@ async def create_instance(
 
     except ValidationError as e:
         # Rollback database if validation fails
-        db.delete(db_instance)
-        db.commit()
+        await db.delete(db_instance)
+        await db.commit()
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"Invalid configuration: {str(e)}",
         )
     except Exception as e:
         # Rollback database if external service creation fails
-        db.delete(db_instance)
-        db.commit()
+        await db.delete(db_instance)
+        await db.commit()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create {instance_data.channel_type} instance: {str(e)}",
@@ -363,11 +381,11 @@ async def list_instances(
     skip: int = 0,
     limit: int = 100,
     include_status: bool = True,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """List all instance configurations with optional Evolution API status."""
-    instances = db.query(InstanceConfig).offset(skip).limit(limit).all()
+    instances = (await db.scalars(select(InstanceConfig).offset(skip).limit(limit))).all()
 
     environment = os.getenv("ENVIRONMENT", "").lower()
     skip_status_checks = environment == "test" or os.getenv("SKIP_EVOLUTION_STATUS", "").lower() in {"true", "1", "yes"}
@@ -468,16 +486,11 @@ async def list_instances(
 async def get_instance(
     instance_name: str,
     include_status: bool = True,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Get a specific instance configuration with optional Evolution API status."""
-    instance = db.query(InstanceConfig).filter_by(name=instance_name).first()
-    if not instance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Instance '{instance_name}' not found",
-        )
+    instance = await get_async_instance_by_name(instance_name, db)
 
     # Convert to dict first - SECURITY FIX: Use has_discord_bot_token
     instance_dict = {
@@ -571,16 +584,11 @@ async def get_instance(
 async def update_instance(
     instance_name: str,
     update_data: InstanceConfigUpdate,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Update an instance configuration."""
-    instance = db.query(InstanceConfig).filter_by(name=instance_name).first()
-    if not instance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Instance '{instance_name}' not found",
-        )
+    instance = await get_async_instance_by_name(instance_name, db)
 
     # Get only provided fields (exclude None values from update)
     update_dict = update_data.model_dump(exclude_unset=True, exclude_none=True)
@@ -591,16 +599,20 @@ async def update_instance(
 
     # If setting as default, unset other defaults
     if update_dict.get("is_default"):
-        db.query(InstanceConfig).filter(InstanceConfig.id != instance.id).filter_by(is_default=True).update(
-            {"is_default": False}
+        await db.execute(
+            update(InstanceConfig)
+            .where(InstanceConfig.id != instance.id)
+            .filter_by(is_default=True)
+            .values(is_default=False)
         )
 
     # Update instance
     for field, value in update_dict.items():
         setattr(instance, field, value)
 
-    db.commit()
-    db.refresh(instance)
+    await db.commit()
+    await db.refresh(instance)
+    trace_sampler.invalidate(instance_name)
 
     return instance
 
@@ -608,16 +620,11 @@ async def update_instance(
 @router.delete("/instances/{instance_name}")
 async def delete_instance(
     instance_name: str,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Delete an instance configuration and associated external resources."""
-    instance = db.query(InstanceConfig).filter_by(name=instance_name).first()
-    if not instance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Instance '{instance_name}' not found",
-        )
+    instance = await get_async_instance_by_name(instance_name, db)
 
     # Delete from external service if applicable
     try:
@@ -630,8 +637,8 @@ async def delete_instance(
         # Continue with database deletion even if external deletion fails
 
     # Delete from database
-    db.delete(instance)
-    db.commit()
+    await db.delete(instance)
+    await db.commit()
 
     return {"message": f"Instance '{instance_name}' deleted successfully"}
 
@@ -639,16 +646,11 @@ async def delete_instance(
 @router.get("/instances/{instance_name}/qr")
 async def get_qr_code(
     instance_name: str,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ) -> QRCodeResponse:
     """Get QR code for instance connection."""
-    instance = db.query(InstanceConfig).filter_by(name=instance_name).first()
-    if not instance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Instance '{instance_name}' not found",
-        )
+    instance = await get_async_instance_by_name(instance_name, db)
 
     # Get appropriate channel handler
     try:
@@ -667,16 +669,11 @@ async def get_qr_code(
 @router.get("/instances/{instance_name}/status")
 async def get_connection_status(
     instance_name: str,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ) -> ConnectionStatus:
     """Get connection status for instance."""
-    instance = db.query(InstanceConfig).filter_by(name=instance_name).first()
-    if not instance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Instance '{instance_name}' not found",
-        )
+    instance = await get_async_instance_by_name(instance_name, db)
 
     # Get appropriate channel handler
     try:
@@ -695,16 +692,11 @@ async def get_connection_status(
 @router.post("/instances/{instance_name}/connect")
 async def connect_instance(
     instance_name: str,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Connect/reconnect an instance."""
-    instance = db.query(InstanceConfig).filter_by(name=instance_name).first()
-    if not instance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Instance '{instance_name}' not found",
-        )
+    instance = await get_async_instance_by_name(instance_name, db)
 
     # Get appropriate channel handler
     try:
@@ -713,7 +705,7 @@ async def connect_instance(
 
         # Update instance as active
         instance.is_active = True
-        db.commit()
+        await db.commit()
 
         return {"message": f"Instance '{instance_name}' connected successfully"}
     except ValueError as e:
@@ -728,16 +720,11 @@ async def connect_instance(
 @router.post("/instances/{instance_name}/disconnect")
 async def disconnect_instance(
     instance_name: str,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Disconnect an instance."""
-    instance = db.query(InstanceConfig).filter_by(name=instance_name).first()
-    if not instance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Instance '{instance_name}' not found",
-        )
+    instance = await get_async_instance_by_name(instance_name, db)
 
     # Get appropriate channel handler
     try:
@@ -746,7 +733,7 @@ async def disconnect_instance(
 
         # Update instance as inactive
         instance.is_active = False
-        db.commit()
+        await db.commit()
 
         return {"message": f"Instance '{instance_name}' disconnected successfully"}
     except ValueError as e:
@@ -761,16 +748,11 @@ async def disconnect_instance(
 @router.post("/instances/{instance_name}/restart")
 async def restart_instance(
     instance_name: str,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Restart an instance connection."""
-    instance = db.query(InstanceConfig).filter_by(name=instance_name).first()
-    if not instance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Instance '{instance_name}' not found",
-        )
+    instance = await get_async_instance_by_name(instance_name, db)
 
     # Get appropriate channel handler
     try:
@@ -779,7 +761,7 @@ async def restart_instance(
 
         # Update instance as active after successful restart
         instance.is_active = True
-        db.commit()
+        await db.commit()
 
         return {
             "message": f"Instance '{instance_name}' restarted successfully",
@@ -797,16 +779,11 @@ async def restart_instance(
 @router.post("/instances/{instance_name}/logout")
 async def logout_instance(
     instance_name: str,
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Logout an instance (disconnect and clear session data)."""
-    instance = db.query(InstanceConfig).filter_by(name=instance_name).first()
-    if not instance:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Instance '{instance_name}' not found",
-        )
+    instance = await get_async_instance_by_name(instance_name, db)
 
     # Get appropriate channel handler
     try:
@@ -815,7 +792,7 @@ async def logout_instance(
 
         # Update instance as inactive after logout
         instance.is_active = False
-        db.commit()
+        await db.commit()
 
         return {
             "message": f"Instance '{instance_name}' logged out successfully",
@@ -832,7 +809,7 @@ async def logout_instance(
 
 @router.post("/instances/discover")
 async def discover_instances(
-    db: Session = Depends(get_database),
+    db: AsyncSession = Depends(get_async_database),
     api_key: str = Depends(verify_api_key),
 ):
     """Discover available instances from external services."""
@@ -840,7 +817,7 @@ async def discover_instances(
 
     try:
         # Get all configured instances to check their external status
-        instances = db.query(InstanceConfig).all()
+        instances = (await db.scalars(select(InstanceConfig))).all()
 
         for instance in instances:
             try:
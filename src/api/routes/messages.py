@@ -12,6 +12,9 @@ from pydantic import BaseModel, Field
 from src.api.deps import get_database, verify_api_key, get_instance_by_name
 from src.channels.whatsapp.mention_parser import WhatsAppMentionParser
 from src.channels.message_sender import OmniChannelMessageSender
+from src.config import config
+from src.db.models import User
+from src.services.bulk_send_service import BulkRecipient, bulk_send_service
 from src.services.user_service import user_service
 
 # Import Discord utilities if available
@@ -135,6 +138,53 @@ class UpdateProfilePictureRequest(BaseModel):
     picture_url: str = Field(description="URL to new profile picture")
 
 
+class BulkRecipientInput(BaseModel):
+    """Single recipient of a bulk send."""
+
+    user_id: Union[str, None] = Field(None, description="User ID (UUID string, if known)")
+    phone_number: Optional[str] = Field(None, description="Phone number with country code or Discord channel ID")
+    variables: Dict[str, Any] = Field(default_factory=dict, description="Values for the template placeholders")
+
+
+class SendBulkRequest(BaseModel):
+    """Schema for bulk broadcast sends."""
+
+    recipients: List[BulkRecipientInput] = Field(min_length=1, description="Recipients of the broadcast")
+    template: str = Field(description="Message template, placeholders use {name} syntax")
+    max_concurrency: Optional[int] = Field(
+        None, ge=1, le=50, description="Maximum in-flight sends (defaults to server configuration)"
+    )
+    auto_parse_mentions: bool = Field(default=False, description="Automatically convert @phone mentions in text")
+    split_message: Optional[bool] = Field(
+        default=None, description="Optional override for message splitting behavior (None uses instance config)"
+    )
+
+
+class BulkSendError(BaseModel):
+    """A failed bulk send recipient."""
+
+    recipient: str
+    error: str
+
+
+class BulkSendJobResponse(BaseModel):
+    """Progress of a bulk send job."""
+
+    job_id: str
+    instance_name: str
+    status: str
+    total: int
+    sent: int
+    failed: int
+    pending: int
+    max_concurrency: int
+    throughput_per_second: float
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    errors: List[BulkSendError] = Field(default_factory=list)
+
+
 class MessageResponse(BaseModel):
     """Schema for message sending response."""
 
@@ -314,6 +364,117 @@ async def send_text_message(
         return MessageResponse(success=False, status="error", error=str(e))
 
 
+def _resolve_bulk_recipients(
+    recipients: List[BulkRecipientInput],
+    db: Session,
+    channel_type: str,
+) -> tuple[List[BulkRecipient], List[Dict[str, str]]]:
+    """
+    Resolve bulk recipients to channel identifiers.
+
+    User IDs are looked up with a single query instead of one lookup per recipient;
+    the agent API fallback used by single sends is skipped for bulk sends.
+
+    Returns:
+        Tuple of (resolved recipients, errors for unresolvable recipients)
+    """
+    user_ids = {item.user_id for item in recipients if item.user_id}
+    users_by_id: Dict[str, User] = {}
+    if user_ids:
+        users = db.query(User).filter(User.id.in_(user_ids)).all()
+        users_by_id = {user.id: user for user in users}
+        missing = user_ids - users_by_id.keys()
+        if missing:
+            for user in db.query(User).filter(User.last_agent_user_id.in_(missing)).all():
+                users_by_id.setdefault(user.last_agent_user_id, user)
+
+    resolved: List[BulkRecipient] = []
+    errors: List[Dict[str, str]] = []
+    for item in recipients:
+        identifier = item.user_id or item.phone_number or ""
+        try:
+            if item.user_id:
+                user = users_by_id.get(item.user_id)
+                if not user:
+                    errors.append({"recipient": identifier, "error": f"User with ID {item.user_id} not found"})
+                    continue
+                recipient = user_service.resolve_user_to_jid(user)
+            else:
+                recipient = _resolve_recipient(None, item.phone_number, db, channel_type)
+            resolved.append(BulkRecipient(recipient=recipient, variables=item.variables))
+        except HTTPException as e:
+            errors.append({"recipient": identifier, "error": str(e.detail)})
+
+    return resolved, errors
+
+
+@router.post(
+    "/{instance_name}/send-bulk",
+    response_model=BulkSendJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Send Bulk Broadcast",
+    description="Queue a templated text broadcast to many recipients as a background job",
+)
+async def send_bulk_message(
+    instance_name: str,
+    request: SendBulkRequest,
+    db: Session = Depends(get_database),
+    api_key: str = Depends(verify_api_key),
+):
+    """
+    Queue a broadcast to many recipients.
+
+    The job runs in the background with bounded concurrency and the instance rate limit;
+    poll the status endpoint for sent, failed and pending counts.
+    """
+
+    if len(request.recipients) > config.bulk_send.max_recipients:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many recipients: {len(request.recipients)} (max {config.bulk_send.max_recipients})",
+        )
+
+    instance_config = get_instance_by_name(instance_name, db)
+
+    recipients, errors = _resolve_bulk_recipients(request.recipients, db, instance_config.channel_type)
+
+    send_kwargs: Dict[str, Any] = {"auto_parse_mentions": request.auto_parse_mentions}
+    if request.split_message is not None:
+        send_kwargs["split_message"] = request.split_message
+
+    job = bulk_send_service.start_job(
+        instance_config,
+        recipients,
+        request.template,
+        max_concurrency=request.max_concurrency,
+        send_kwargs=send_kwargs,
+        initial_errors=errors,
+    )
+    return BulkSendJobResponse(**job.to_dict())
+
+
+@router.get(
+    "/{instance_name}/send-bulk/{job_id}",
+    response_model=BulkSendJobResponse,
+    summary="Bulk Broadcast Status",
+    description="Get sent, failed and pending counts and throughput for a bulk send job",
+)
+async def get_bulk_send_status(
+    instance_name: str,
+    job_id: str,
+    api_key: str = Depends(verify_api_key),
+):
+    """Get the progress of a bulk send job."""
+
+    job = bulk_send_service.get_job(job_id)
+    if not job or job.instance_name != instance_name:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Bulk send job '{job_id}' not found for instance '{instance_name}'",
+        )
+    return BulkSendJobResponse(**job.to_dict())
+
+
 @router.post(
     "/{instance_name}/send-media",
     response_model=MessageResponse,
@@ -3,17 +3,24 @@ Message Trace API endpoints.
 Provides endpoints for querying message traces and analytics.
 """
 
+import csv
+import io
+import json
 import logging
 from datetime import datetime, timedelta
 from src.utils.datetime_utils import utcnow
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import AsyncIterator, FrozenSet, Iterator, List, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
 from pydantic import BaseModel, ConfigDict
 
-from src.api.deps import get_database, verify_api_key
-from src.db.trace_models import MessageTrace
+from src.api.deps import get_async_database, get_database, verify_api_key
+from src.db.trace_models import MessageTrace, TracePayload
+from src.services.trace_blob_store import trace_blob_store
+from src.services.trace_events import trace_events
+from src.services.trace_search import search_traces as search_trace_text
 from src.services.trace_service import TraceService
 
 logger = logging.getLogger(__name__)
@@ -67,6 +74,16 @@ class TracePayloadResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class LatencyPercentiles(BaseModel):
+    """Latency distribution of one processing stage, in milliseconds (within 2% of the exact values)."""
+
+    count: int
+    p50: Optional[float]
+    p90: Optional[float]
+    p99: Optional[float]
+    max: Optional[float]
+
+
 class TraceAnalytics(BaseModel):
     """Analytics response model."""
 
@@ -79,6 +96,20 @@ class TraceAnalytics(BaseModel):
     message_types: Dict[str, int]
     error_stages: Dict[str, int]
     instances: Dict[str, int]
+    # Per stage: queue (received -> agent called), agent, send (agent response -> sent), total
+    latency_percentiles: Dict[str, LatencyPercentiles] = {}
+
+
+class TraceSearchResult(BaseModel):
+    """A trace whose message text matches a search, with its relevance score (higher is better)."""
+
+    trace_id: str
+    score: float
+    instance_name: Optional[str]
+    sender_phone: Optional[str]
+    status: Optional[str]
+    received_at: Optional[str]
+    text: Optional[str]
 
 
 class TraceQuery(BaseModel):
@@ -94,53 +125,60 @@ class TraceQuery(BaseModel):
     offset: int = 0
 
 
-@router.get("/traces", response_model=List[TraceResponse])
-async def list_traces(
-    phone: Optional[str] = Query(None, description="Filter by sender phone number"),
-    instance_name: Optional[str] = Query(None, description="Filter by instance name"),
-    trace_status: Optional[str] = Query(None, description="Filter by status (received, processing, completed, failed)"),
-    message_type: Optional[str] = Query(None, description="Filter by message type"),
-    session_name: Optional[str] = Query(None, description="Filter by session name"),
-    agent_session_id: Optional[str] = Query(None, description="Filter by agent session ID"),
-    sender_phone: Optional[str] = Query(None, description="Filter by sender phone (alias for phone)"),
-    has_media: Optional[bool] = Query(None, description="Filter by media presence"),
-    start_date: Optional[datetime] = Query(None, description="Start date filter (ISO format)"),
-    end_date: Optional[datetime] = Query(None, description="End date filter (ISO format)"),
-    all_time: bool = Query(
-        False,
-        description="If true, fetch all data without date filters (overrides start_date/end_date)",
-    ),
-    limit: int = Query(50, ge=1, le=1000, description="Maximum number of traces to return"),
-    offset: int = Query(0, ge=0, description="Number of traces to skip"),
-    db: Session = Depends(get_database),
-    api_key: str = Depends(verify_api_key),
-):
-    """List message traces with optional filtering."""
-
-    try:
-        query = db.query(MessageTrace)
-
-        # Apply filters
+class TraceFilters:
+    """Trace filter query parameters shared by listing and export."""
+
+    def __init__(
+        self,
+        phone: Optional[str] = Query(None, description="Filter by sender phone number"),
+        instance_name: Optional[str] = Query(None, description="Filter by instance name"),
+        trace_status: Optional[str] = Query(
+            None, description="Filter by status (received, processing, completed, failed)"
+        ),
+        message_type: Optional[str] = Query(None, description="Filter by message type"),
+        session_name: Optional[str] = Query(None, description="Filter by session name"),
+        agent_session_id: Optional[str] = Query(None, description="Filter by agent session ID"),
+        sender_phone: Optional[str] = Query(None, description="Filter by sender phone (alias for phone)"),
+        has_media: Optional[bool] = Query(None, description="Filter by media presence"),
+        start_date: Optional[datetime] = Query(None, description="Start date filter (ISO format)"),
+        end_date: Optional[datetime] = Query(None, description="End date filter (ISO format)"),
+        all_time: bool = Query(
+            False,
+            description="If true, fetch all data without date filters (overrides start_date/end_date)",
+        ),
+    ):
         # Handle phone filtering (accept either parameter name)
-        phone_filter = phone or sender_phone
-        if phone_filter:
-            query = query.filter(MessageTrace.sender_phone == phone_filter)
-        if instance_name:
-            query = query.filter(MessageTrace.instance_name == instance_name)
-        if trace_status:
-            query = query.filter(MessageTrace.status == trace_status)
-        if message_type:
-            query = query.filter(MessageTrace.message_type == message_type)
-        if session_name:
-            query = query.filter(MessageTrace.session_name == session_name)
-        if agent_session_id:
-            query = query.filter(MessageTrace.agent_session_id == agent_session_id)
-        if has_media is not None:
-            query = query.filter(MessageTrace.has_media == has_media)
+        self.phone = phone or sender_phone
+        self.instance_name = instance_name
+        self.trace_status = trace_status
+        self.message_type = message_type
+        self.session_name = session_name
+        self.agent_session_id = agent_session_id
+        self.has_media = has_media
+        self.start_date = start_date
+        self.end_date = end_date
+        self.all_time = all_time
+
+    def apply(self, query):
+        """Apply the filters to a ``MessageTrace`` query."""
+        if self.phone:
+            query = query.filter(MessageTrace.sender_phone == self.phone)
+        if self.instance_name:
+            query = query.filter(MessageTrace.instance_name == self.instance_name)
+        if self.trace_status:
+            query = query.filter(MessageTrace.status == self.trace_status)
+        if self.message_type:
+            query = query.filter(MessageTrace.message_type == self.message_type)
+        if self.session_name:
+            query = query.filter(MessageTrace.session_name == self.session_name)
+        if self.agent_session_id:
+            query = query.filter(MessageTrace.agent_session_id == self.agent_session_id)
+        if self.has_media is not None:
+            query = query.filter(MessageTrace.has_media == self.has_media)
 
         # Handle date filtering with all_time parameter
-        if not all_time:
-            # Apply date filters only if all_time is false
+        if not self.all_time:
+            start_date, end_date = self.start_date, self.end_date
             if start_date is None and end_date is None:
                 # Default to last 24 hours if no dates provided
                 start_date = utcnow() - timedelta(hours=24)
@@ -150,12 +188,48 @@ async def list_traces(
                 query = query.filter(MessageTrace.received_at >= start_date)
             if end_date:
                 query = query.filter(MessageTrace.received_at <= end_date)
+        return query
+
+
+def _decode_cursor_param(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        return TraceService.decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-        # Order by most recent first
-        query = query.order_by(desc(MessageTrace.received_at))
 
-        # Apply pagination
-        traces = query.offset(offset).limit(limit).all()
+@router.get("/traces", response_model=List[TraceResponse])
+async def list_traces(
+    response: Response,
+    filters: TraceFilters = Depends(),
+    limit: int = Query(50, ge=1, le=1000, description="Maximum number of traces to return"),
+    offset: int = Query(0, ge=0, description="Number of traces to skip (prefer cursor for deep pages)"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Cursor from the X-Next-Cursor header of the previous page (overrides offset)",
+    ),
+    db: AsyncSession = Depends(get_async_database),
+    api_key: str = Depends(verify_api_key),
+):
+    """
+    List message traces with optional filtering, newest first.
+
+    When more traces match, the ``X-Next-Cursor`` response header holds the cursor for the next page.
+    """
+
+    position = _decode_cursor_param(cursor)
+
+    try:
+        # Most recent first, paginated by cursor (or offset); run_sync drives the sync query over the async driver
+        traces, next_cursor = await db.run_sync(
+            lambda session: TraceService.paginate_traces(
+                filters.apply(session.query(MessageTrace)), limit, offset=offset, cursor=position
+            )
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
 
         return [TraceResponse(**trace.to_dict()) for trace in traces]
 
@@ -167,6 +241,189 @@ async def list_traces(
         )
 
 
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_CSV_COLUMNS = [*TraceResponse.model_fields, "payloads", "cursor"]
+
+
+def _export_records(
+    bind, filters: TraceFilters, position, include_payloads: bool, batch_size: int
+) -> Iterator[List[Dict[str, Any]]]:
+    """Export records batch by batch from a dedicated session (the request session closes before streaming)."""
+    export_db = Session(bind=bind)
+    try:
+        query = filters.apply(export_db.query(MessageTrace))
+        for traces in TraceService.iter_trace_batches(query, batch_size, after=position):
+            payloads: Dict[str, List[TracePayload]] = {}
+            if include_payloads:
+                for payload in (
+                    export_db.query(TracePayload)
+                    .filter(TracePayload.trace_id.in_([trace.trace_id for trace in traces]))
+                    .order_by(TracePayload.trace_id, TracePayload.timestamp, TracePayload.id)
+                ):
+                    payloads.setdefault(payload.trace_id, []).append(payload)
+
+            records = []
+            for trace in traces:
+                record = trace.to_dict()
+                if include_payloads:
+                    # Old payloads live in the cold archive rather than the table
+                    merged = TraceService.merge_archived_payloads(trace.trace_id, payloads.get(trace.trace_id, []))
+                    record["payloads"] = [payload.to_dict(include_payload=True) for payload in merged]
+                # Resume an interrupted export from any row by passing its cursor back
+                record["cursor"] = TraceService.encode_cursor(trace)
+                records.append(record)
+            yield records
+            # Drop the batch from the identity map so memory stays constant
+            export_db.expunge_all()
+    finally:
+        export_db.close()
+
+
+def _ndjson_chunks(batches: Iterator[List[Dict[str, Any]]]) -> Iterator[str]:
+    for records in batches:
+        yield "".join(json.dumps(record, default=str) + "\n" for record in records)
+
+
+def _csv_chunks(batches: Iterator[List[Dict[str, Any]]], include_payloads: bool) -> Iterator[str]:
+    columns = EXPORT_CSV_COLUMNS if include_payloads else [c for c in EXPORT_CSV_COLUMNS if c != "payloads"]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for records in batches:
+        for record in records:
+            if include_payloads:
+                record["payloads"] = json.dumps(record["payloads"], default=str)
+            writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@router.get("/traces/export")
+async def export_traces(
+    filters: TraceFilters = Depends(),
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    include_payloads: bool = Query(False, description="Include decompressed stage payloads with every trace"),
+    cursor: Optional[str] = Query(None, description="Resume after the trace whose exported cursor is given"),
+    batch_size: int = Query(500, ge=1, le=5000, description="Traces fetched per database round trip"),
+    db: Session = Depends(get_database),
+    api_key: str = Depends(verify_api_key),
+):
+    """
+    Stream every matching trace, oldest first, as NDJSON or CSV.
+
+    Filters match ``GET /traces``. Traces are read in keyset batches and written as they
+    are fetched, so memory use does not depend on the size of the range. Every row carries
+    a ``cursor``; pass the last one received to resume an interrupted export.
+    """
+
+    position = _decode_cursor_param(cursor)
+    batches = _export_records(db.get_bind(), filters, position, include_payloads, batch_size)
+    if export_format == "csv":
+        chunks = _csv_chunks(batches, include_payloads)
+    else:
+        chunks = _ndjson_chunks(batches)
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename=traces.{export_format}"},
+    )
+
+
+@router.get("/traces/search", response_model=List[TraceSearchResult])
+async def search_traces(
+    q: str = Query(..., min_length=1, max_length=500, description="Words that must appear in the message text"),
+    instance_name: Optional[str] = Query(None, description="Filter by instance name"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum traces to return"),
+    db: Session = Depends(get_database),
+    api_key: str = Depends(verify_api_key),
+):
+    """Find traces by message text, most relevant first (full-text index, no payload decompression)."""
+
+    try:
+        return [TraceSearchResult(**result) for result in search_trace_text(db, q, limit, instance_name)]
+    except Exception as e:
+        logger.error(f"Error searching traces for {q!r}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search traces: {str(e)}",
+        )
+
+
+# Comment line sent when no events arrived, so proxies keep idle streams open
+STREAM_HEARTBEAT_SECONDS = 15.0
+STREAM_FULL_DETAIL = "Too many trace stream subscribers"
+
+
+async def _sse_events(
+    instance_name: Optional[str] = None, phone: Optional[str] = None, statuses: Optional[FrozenSet[str]] = None
+) -> AsyncIterator[str]:
+    # Subscribed on the first chunk, not in the route: a client gone before the body starts never takes a slot
+    subscription = trace_events.subscribe(instance_name=instance_name, phone=phone, statuses=statuses)
+    if subscription is None:
+        yield f"event: error\ndata: {json.dumps({'detail': STREAM_FULL_DETAIL})}\n\n"
+        return
+    try:
+        yield ": connected\n\n"
+        while True:
+            events = await subscription.next_batch(STREAM_HEARTBEAT_SECONDS)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            yield "".join(f"event: {event['event']}\ndata: {json.dumps(event)}\n\n" for event in events)
+    finally:
+        trace_events.unsubscribe(subscription)
+
+
+@router.get("/traces/stream")
+async def stream_traces(
+    instance_name: Optional[str] = Query(None, description="Only traces of this instance"),
+    phone: Optional[str] = Query(None, description="Only traces of this sender phone"),
+    trace_status: Optional[str] = Query(
+        None, description="Only events leaving a trace in one of these statuses (comma-separated)"
+    ),
+    api_key: str = Depends(verify_api_key),
+):
+    """
+    Live tail of trace lifecycle events as Server-Sent Events.
+
+    Sends a ``created`` event when a trace is stored and a ``status`` event when its
+    status changes, each with the trace summary as JSON data. Events are pushed as
+    their transaction commits (no database polling). Clients that read too slowly
+    lose the oldest events and receive a ``dropped`` event with the count.
+    """
+
+    statuses = frozenset(s.strip() for s in trace_status.split(",") if s.strip()) if trace_status else None
+    if trace_events.full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=STREAM_FULL_DETAIL,
+        )
+    return StreamingResponse(
+        _sse_events(instance_name, phone, statuses or None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/traces/blobs/{blob_hash}")
+async def get_trace_blob(
+    blob_hash: str,
+    api_key: str = Depends(verify_api_key),
+):
+    """Get media referenced from a trace payload as ``blob:<sha256>``."""
+    data = trace_blob_store.get(blob_hash)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Blob '{blob_hash}' not found (it may have expired)",
+        )
+    return Response(content=data, media_type="text/plain")
+
+
 @router.get("/traces/{trace_id}", response_model=TraceResponse)
 async def get_trace(
     trace_id: str,
@@ -250,7 +507,7 @@ async def get_trace_analytics(
         # Handle all_time parameter
         if all_time:
             # When all_time is true, don't apply any date filters
-            query = db.query(MessageTrace)
+            start_date = end_date = None
         else:
             # Default to last 24 hours if no dates provided and all_time is false
             if not start_date:
@@ -258,67 +515,8 @@ async def get_trace_analytics(
             if not end_date:
                 end_date = utcnow()
 
-            query = db.query(MessageTrace).filter(
-                and_(
-                    MessageTrace.received_at >= start_date,
-                    MessageTrace.received_at <= end_date,
-                )
-            )
-
-        if instance_name:
-            query = query.filter(MessageTrace.instance_name == instance_name)
-
-        # Get all traces for the period
-        traces = query.all()
-
-        # Calculate basic metrics
-        total_messages = len(traces)
-        successful_messages = len([t for t in traces if t.status == "completed"])
-        failed_messages = len([t for t in traces if t.status == "failed"])
-        success_rate = (successful_messages / total_messages * 100) if total_messages > 0 else 0
-
-        # Calculate average processing times
-        completed_traces = [t for t in traces if t.total_processing_time_ms is not None]
-        avg_processing_time = (
-            sum(t.total_processing_time_ms for t in completed_traces) / len(completed_traces)
-            if completed_traces
-            else None
-        )
-
-        agent_traces = [t for t in traces if t.agent_processing_time_ms is not None]
-        avg_agent_time = (
-            sum(t.agent_processing_time_ms for t in agent_traces) / len(agent_traces) if agent_traces else None
-        )
-
-        # Group by message types
-        message_types = {}
-        for trace in traces:
-            msg_type = trace.message_type or "unknown"
-            message_types[msg_type] = message_types.get(msg_type, 0) + 1
-
-        # Group by error stages
-        error_stages = {}
-        for trace in traces:
-            if trace.error_stage:
-                error_stages[trace.error_stage] = error_stages.get(trace.error_stage, 0) + 1
-
-        # Group by instances
-        instances = {}
-        for trace in traces:
-            inst_name = trace.instance_name or "unknown"
-            instances[inst_name] = instances.get(inst_name, 0) + 1
-
-        return TraceAnalytics(
-            total_messages=total_messages,
-            successful_messages=successful_messages,
-            failed_messages=failed_messages,
-            success_rate=round(success_rate, 2),
-            avg_processing_time_ms=(round(avg_processing_time, 2) if avg_processing_time else None),
-            avg_agent_time_ms=round(avg_agent_time, 2) if avg_agent_time else None,
-            message_types=message_types,
-            error_stages=error_stages,
-            instances=instances,
-        )
+        analytics = TraceService.get_trace_analytics(db, start_date, end_date, instance_name)
+        return TraceAnalytics(**analytics)
 
     except Exception as e:
         logger.error(f"Error getting trace analytics: {e}")
@@ -375,10 +573,14 @@ async def cleanup_old_traces(
         else:
             # Actually delete traces
             deleted_count = TraceService.cleanup_old_traces(db, days_old)
+            # Blobs have their own retention period
+            blob_result = trace_blob_store.cleanup()
 
             return {
                 "status": "completed",
                 "traces_deleted": deleted_count,
+                "blobs_deleted": blob_result["blobs_deleted"],
+                "blob_bytes_freed": blob_result["bytes_freed"],
                 "message": f"Deleted {deleted_count} traces older than {days_old} days",
             }
 
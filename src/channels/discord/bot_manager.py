@@ -8,7 +8,7 @@ event management, message routing, and health monitoring.
 import asyncio
 import logging
 import random
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
 import json
@@ -22,9 +22,12 @@ from discord.ext import commands
 
 from src.services.message_router import MessageRouter
 from ...core.exceptions import AutomagikError
+from src.config import config
 from src.db.models import InstanceConfig
 from src.channels.message_utils import extract_response_text
 from .voice_manager import DiscordVoiceManager
+from .outbound_dispatcher import DiscordOutboundDispatcher
+from src.ipc_client import MEDIA_DOWNLOAD_TIMEOUT_SECONDS
 from ...utils.rate_limiter import RateLimiter
 from ...utils.health_monitor import HealthMonitor
 from src import __version__
@@ -192,7 +195,7 @@ class AutomagikBot(commands.Bot):
                 logger.error(f"Channel {channel_id} not found")
                 return False
 
-            await channel.send(content)
+            await self.manager.get_outbound_dispatcher(self.instance_name).send(channel, content)
             logger.info(f"Sent message to channel {channel_id}")
             return True
 
@@ -217,9 +220,17 @@ class DiscordBotManager:
         self.voice_manager = DiscordVoiceManager()  # Voice management
         self._shutdown_event = asyncio.Event()
         self.circuit_breakers: Dict[str, CircuitBreakerState] = {}  # Circuit breaker tracking
+        self.outbound_dispatchers: Dict[str, DiscordOutboundDispatcher] = {}  # Per-bot rate-limited send queues
 
         logger.info("Discord Bot Manager initialized")
 
+    def get_outbound_dispatcher(self, instance_name: str) -> DiscordOutboundDispatcher:
+        """Return the outbound dispatcher for a bot, creating it on first use."""
+        dispatcher = self.outbound_dispatchers.get(instance_name)
+        if dispatcher is None:
+            dispatcher = self.outbound_dispatchers[instance_name] = DiscordOutboundDispatcher(instance_name)
+        return dispatcher
+
     async def start_bot(self, instance_config: InstanceConfig) -> bool:
         """
         Start a Discord bot with the given configuration.
@@ -331,7 +342,7 @@ class DiscordBotManager:
         content: str,
         embed: Optional[discord.Embed] = None,
         attachments: Optional[List] = None,
-    ) -> bool:
+    ) -> Optional[discord.Message]:
         """
         Send a message through a Discord bot.
 
@@ -343,11 +354,11 @@ class DiscordBotManager:
             attachments: Optional file attachments
 
         Returns:
-            bool: True if message sent successfully
+            The sent message, or None if it could not be sent
         """
         if instance_name not in self.bots:
             logger.error(f"Bot '{instance_name}' is not running")
-            return False
+            return None
 
         bot = self.bots[instance_name]
 
@@ -355,37 +366,39 @@ class DiscordBotManager:
         rate_limiter = self.rate_limiters.get(instance_name)
         if rate_limiter and not await rate_limiter.check_rate_limit():
             logger.warning(f"Rate limit exceeded for bot '{instance_name}'")
-            return False
+            return None
 
         try:
             channel = bot.get_channel(channel_id)
             if not channel:
                 logger.error(f"Channel {channel_id} not found for bot '{instance_name}'")
-                return False
+                return None
 
             # Prepare message parameters
             kwargs = {}
-            if content:
-                kwargs["content"] = content[:2000]  # Discord message limit
             if embed:
                 kwargs["embed"] = embed
             if attachments:
                 kwargs["files"] = attachments
 
-            # Send message
-            await channel.send(**kwargs)
+            # Send message through the bot's per-channel queue
+            sent = await self.get_outbound_dispatcher(instance_name).send(
+                channel,
+                content[:2000] if content else None,  # Discord message limit
+                **kwargs,
+            )
             logger.debug(f"Message sent to channel {channel_id} by bot '{instance_name}'")
-            return True
+            return sent
 
         except discord.errors.Forbidden:
             logger.error(f"No permission to send message to channel {channel_id}")
-            return False
+            return None
         except discord.errors.HTTPException as e:
             logger.error(f"HTTP error sending message: {e}")
-            return False
+            return None
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
-            return False
+            return None
 
     def get_bot_status(self, instance_name: str) -> Optional[BotStatus]:
         """
@@ -777,10 +790,10 @@ class DiscordBotManager:
                 if agent_response:
                     # Use unified response extraction
                     response_text = extract_response_text(agent_response)
-                    await message.channel.send(response_text)
+                    await self.get_outbound_dispatcher(instance_name).send(message.channel, response_text)
                 else:
-                    await message.channel.send(
-                        "I'm sorry, I couldn't process your message right now. Please try again later."
+                    await self.get_outbound_dispatcher(instance_name).send(
+                        message.channel, "I'm sorry, I couldn't process your message right now. Please try again later."
                     )
 
             except TypeError as te:
@@ -802,16 +815,18 @@ class DiscordBotManager:
                 if agent_response:
                     # Use unified response extraction
                     response_text = extract_response_text(agent_response)
-                    await message.channel.send(response_text)
+                    await self.get_outbound_dispatcher(instance_name).send(message.channel, response_text)
                 else:
-                    await message.channel.send(
-                        "I'm sorry, I couldn't process your message right now. Please try again later."
+                    await self.get_outbound_dispatcher(instance_name).send(
+                        message.channel, "I'm sorry, I couldn't process your message right now. Please try again later."
                     )
 
         except Exception as e:
             logger.error(f"Error handling incoming message from '{instance_name}': {e}")
             try:
-                await message.channel.send("I encountered an error processing your message. Please try again later.")
+                await self.get_outbound_dispatcher(instance_name).send(
+                    message.channel, "I encountered an error processing your message. Please try again later."
+                )
             except Exception as send_error:
                 logger.error(f"Failed to send error message to Discord: {send_error}")
 
@@ -1004,6 +1019,11 @@ class DiscordBotManager:
         # Cleanup circuit breaker state
         self.circuit_breakers.pop(instance_name, None)
 
+        # Cancel queued outbound messages
+        dispatcher = self.outbound_dispatchers.pop(instance_name, None)
+        if dispatcher:
+            await dispatcher.close()
+
         # Cleanup rate limiter
         rate_limiter = self.rate_limiters.pop(instance_name, None)
         if rate_limiter:
@@ -1036,7 +1056,8 @@ class DiscordBotManager:
             IPCConfig.cleanup_stale_socket(socket_path)
 
             # Create HTTP application for IPC
-            app = web.Application()
+            # Media arrives base64-encoded, well above aiohttp's 1 MiB default body limit
+            app = web.Application(client_max_size=config.ipc.max_request_size)
 
             # Add routes for IPC communication
             app.router.add_post("/send", self._handle_ipc_send_message)
@@ -1061,6 +1082,65 @@ class DiscordBotManager:
         except Exception as e:
             logger.error(f"Failed to start Unix socket server for '{instance_name}': {e}")
 
+    async def _ipc_send_one(self, instance_name: str, data: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Validate and send one IPC message; returns (HTTP status, result)."""
+        channel_id = data.get("channel_id")
+        text = data.get("text")
+        has_media = bool(data.get("media_url") or data.get("media_base64"))
+
+        if not channel_id or not (text or has_media):
+            return 400, {"success": False, "error": "Missing channel_id or text"}
+
+        # Convert channel_id to int if it's a string
+        try:
+            channel_id = int(channel_id)
+        except (ValueError, TypeError):
+            return 400, {"success": False, "error": "Invalid channel_id"}
+
+        attachments = None
+        if has_media:
+            attachment = await self._load_ipc_attachment(data)
+            if attachment is None:
+                return 400, {"success": False, "error": "Failed to load media", "channel_id": channel_id}
+            attachments = [attachment]
+
+        # Send message through the bot
+        sent = await self.send_message(
+            instance_name=instance_name, channel_id=channel_id, content=text or "", attachments=attachments
+        )
+        # Snowflakes exceed JSON's safe integer range, so the id travels as a string
+        return 200, {
+            "success": sent is not None,
+            "instance": instance_name,
+            "channel_id": channel_id,
+            "message_id": str(sent.id) if sent is not None else None,
+        }
+
+    async def _load_ipc_attachment(self, data: Dict[str, Any]) -> Optional[discord.File]:
+        """Build a Discord file from the media URL or base64 data of an IPC request."""
+        import base64
+        import io
+
+        import aiohttp
+
+        filename = data.get("filename") or "media"
+        try:
+            if data.get("media_url"):
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(
+                        data["media_url"], timeout=aiohttp.ClientTimeout(total=MEDIA_DOWNLOAD_TIMEOUT_SECONDS)
+                    ) as response:
+                        if response.status != 200:
+                            logger.error(f"Failed to download IPC media: HTTP {response.status}")
+                            return None
+                        media_data = await response.read()
+            else:
+                media_data = base64.b64decode(data["media_base64"])
+        except Exception as e:
+            logger.error(f"Failed to load IPC media: {e}")
+            return None
+        return discord.File(io.BytesIO(media_data), filename=filename)
+
     async def _handle_ipc_send_message(self, request: web.Request) -> web.Response:
         """Handle IPC message send request via Unix socket."""
         try:
@@ -1069,31 +1149,8 @@ class DiscordBotManager:
 
             # Parse JSON request
             data = await request.json()
-            channel_id = data.get("channel_id")
-            text = data.get("text")
-
-            if not channel_id or not text:
-                return web.json_response(
-                    {"success": False, "error": "Missing channel_id or text"},
-                    status=400,
-                )
-
-            # Convert channel_id to int if it's a string
-            try:
-                channel_id = int(channel_id)
-            except (ValueError, TypeError):
-                return web.json_response({"success": False, "error": "Invalid channel_id"}, status=400)
-
-            # Send message through the bot
-            success = await manager.send_message(instance_name=instance_name, channel_id=channel_id, content=text)
-
-            return web.json_response(
-                {
-                    "success": success,
-                    "instance": instance_name,
-                    "channel_id": channel_id,
-                }
-            )
+            status, result = await manager._ipc_send_one(instance_name, data)
+            return web.json_response(result, status=status)
 
         except json.JSONDecodeError:
             return web.json_response({"success": False, "error": "Invalid JSON"}, status=400)
@@ -11,6 +11,7 @@ from src.channels.base import ChannelHandler, QRCodeResponse, ConnectionStatus
 from src.db.models import InstanceConfig
 from src.utils.dependency_guard import requires_feature, LazyImport, DependencyError
 from src.services.message_router import message_router
+from src.services.message_store import MessageStore
 from src.services.trace_service import TraceService
 from src.db.database import SessionLocal
 from src.utils.datetime_utils import utcnow
@@ -19,6 +20,7 @@ from src.utils.datetime_utils import utcnow
 discord = LazyImport("discord", "discord")
 logger = logging.getLogger(__name__)
 from src.channels.message_utils import extract_response_text
+from src.channels.discord.outbound_dispatcher import DiscordOutboundDispatcher
 
 
 @dataclass
@@ -47,6 +49,12 @@ class DiscordChannelHandler(ChannelHandler):
         # Cache agent user_id returned by downstream routers keyed by instance+discord user
         self._agent_user_cache: Dict[str, Dict[str, str]] = {}
 
+    def _get_dispatcher(self, instance_name: Optional[str]) -> DiscordOutboundDispatcher:
+        """Return the bot manager's outbound dispatcher for a bot (owned and closed by the manager)."""
+        from src.services.discord_service import discord_service
+
+        return discord_service.bot_manager.get_outbound_dispatcher(instance_name or "default")
+
     def _chunk_message(self, message: str, max_length: int = 2000, prefer_double_newline: bool = True) -> list[str]:
         """
         Split message into chunks that respect Discord's character limit.
@@ -216,19 +224,22 @@ class DiscordChannelHandler(ChannelHandler):
 
         success = True
         error_details = None
+        sent_message_id = None
+        dispatcher = self._get_dispatcher(instance.name if instance else metadata.get("instance_name"))
 
         try:
-            for chunk in chunks:
-                await channel.send(chunk)
-                if len(chunks) > 1:
-                    await asyncio.sleep(0.5)
+            # Paced per channel by the dispatcher according to Discord's rate-limit bucket
+            sent = await dispatcher.send_chunks(channel, chunks)
+            # A reply split into several messages is stored under the id of its first one
+            if sent and getattr(sent[0], "id", None) is not None:
+                sent_message_id = str(sent[0].id)
 
         except Exception as e:
             success = False
             error_details = str(e)
             logger.error(f"Failed to send Discord response: {e}")
             try:
-                await channel.send("Sorry, I encountered an error while processing your message.")
+                await dispatcher.send(channel, "Sorry, I encountered an error while processing your message.")
             except Exception:
                 logger.warning("Discord fallback error message could not be delivered", exc_info=True)
 
@@ -257,6 +268,16 @@ class DiscordChannelHandler(ChannelHandler):
             except Exception:
                 logger.warning("Failed to persist Discord outbound trace", exc_info=True)
 
+            if success:
+                MessageStore.record_outbound(
+                    trace_instance_name,
+                    "discord",
+                    str(getattr(channel, "id", "")),
+                    response,
+                    channel_message_id=sent_message_id,
+                    trace_id=getattr(trace_context, "trace_id", None),
+                )
+
     async def _handle_message(self, message, instance: InstanceConfig, client) -> None:
         """Handle incoming Discord message with @mention detection."""
         try:
@@ -285,7 +306,9 @@ class DiscordChannelHandler(ChannelHandler):
             content = content.strip()
 
             if not content:
-                await message.channel.send("Hi! How can I help you? Please include your message after mentioning me.")
+                await self._get_dispatcher(instance.name).send(
+                    message.channel, "Hi! How can I help you? Please include your message after mentioning me."
+                )
                 return
 
             # Create user dictionary similar to WhatsApp handler
@@ -350,6 +373,9 @@ class DiscordChannelHandler(ChannelHandler):
                         serialized_event.get("id"),
                         instance.name,
                     )
+                MessageStore.record_discord_message(
+                    db_session, instance.name, serialized_event, trace_context.trace_id if trace_context else None
+                )
             except Exception:
                 logger.warning("Unable to initialize Discord trace context", exc_info=True)
                 if db_session:
@@ -410,8 +436,9 @@ class DiscordChannelHandler(ChannelHandler):
                             agent_response=agent_response,
                         )
                     else:
-                        await message.channel.send(
-                            "I'm sorry, I couldn't process your message right now. Please try again later."
+                        await self._get_dispatcher(instance.name).send(
+                            message.channel,
+                            "I'm sorry, I couldn't process your message right now. Please try again later.",
                         )
 
                     if isinstance(agent_response, dict) and agent_response.get("user_id"):
@@ -423,8 +450,8 @@ class DiscordChannelHandler(ChannelHandler):
 
                 except Exception as e:
                     logger.error(f"Error processing Discord message: {e}", exc_info=True)
-                    await message.channel.send(
-                        "I encountered an error while processing your message. Please try again later."
+                    await self._get_dispatcher(instance.name).send(
+                        message.channel, "I encountered an error while processing your message. Please try again later."
                     )
 
                 else:
@@ -446,8 +473,9 @@ class DiscordChannelHandler(ChannelHandler):
                             agent_response=agent_response,
                         )
                     else:
-                        await message.channel.send(
-                            "I'm sorry, I couldn't process your message right now. Please try again later."
+                        await self._get_dispatcher(instance.name).send(
+                            message.channel,
+                            "I'm sorry, I couldn't process your message right now. Please try again later.",
                         )
 
                     # Cache agent user id when provided
@@ -464,6 +492,7 @@ class DiscordChannelHandler(ChannelHandler):
         finally:
             if trace_context:
                 try:
+                    trace_context.flush()
                     trace_context.db_session.close()
                 except Exception:
                     logger.debug("Trace context session already closed", exc_info=True)
@@ -0,0 +1,274 @@
+"""
+Outbound message dispatcher for Discord bots.
+
+Each bot owns one dispatcher. Messages are queued per channel and sent by a worker
+task for that channel, so a rate-limited channel only delays its own queue instead of
+the bot's message handling. Each channel keeps a local copy of its Discord rate-limit
+bucket (5 messages per 5 seconds by default). The copy is refreshed from the
+``X-RateLimit-*`` headers / ``retry_after`` of 429 responses, and sends are paced
+before Discord has to reject them. Small adjacent plain-text messages waiting in the
+same queue are coalesced into one message of up to 2000 characters.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from src.utils.dependency_guard import LazyImport
+
+discord = LazyImport("discord", "discord")
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 2000  # Discord hard limit per message
+
+# Discord's documented per-channel message bucket; refined from response headers
+DEFAULT_BUCKET_LIMIT = 5
+DEFAULT_BUCKET_PERIOD = 5.0
+
+MAX_RATE_LIMIT_RETRIES = 3
+WORKER_IDLE_TIMEOUT = 30.0
+
+
+@dataclass
+class RateLimitBucket:
+    """Local view of a Discord rate-limit bucket."""
+
+    limit: int = DEFAULT_BUCKET_LIMIT
+    period: float = DEFAULT_BUCKET_PERIOD
+    remaining: int = DEFAULT_BUCKET_LIMIT
+    reset_at: float = 0.0
+    bucket_id: Optional[str] = None
+
+    def acquire(self, now: float) -> float:
+        """Take a slot; returns 0 when one was taken, otherwise the seconds to wait."""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.period
+        if self.remaining > 0:
+            self.remaining -= 1
+            return 0.0
+        return self.reset_at - now
+
+    def block_for(self, retry_after: float, now: float) -> None:
+        """Mark the bucket exhausted for ``retry_after`` seconds (after a 429)."""
+        self.remaining = 0
+        self.reset_at = max(self.reset_at, now + retry_after)
+
+    def update_from_headers(self, headers: Any, now: float) -> None:
+        """Refresh the bucket from ``X-RateLimit-*`` response headers."""
+        if not headers:
+            return
+        try:
+            if headers.get("X-RateLimit-Limit") is not None:
+                self.limit = int(headers["X-RateLimit-Limit"])
+            if headers.get("X-RateLimit-Remaining") is not None:
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+            if headers.get("X-RateLimit-Reset-After") is not None:
+                self.reset_at = now + float(headers["X-RateLimit-Reset-After"])
+            self.bucket_id = headers.get("X-RateLimit-Bucket", self.bucket_id)
+        except (TypeError, ValueError):
+            logger.debug("Ignoring malformed Discord rate-limit headers", exc_info=True)
+
+
+@dataclass
+class _OutboundItem:
+    content: Optional[str]
+    future: asyncio.Future
+    group: int
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def is_plain_text(self) -> bool:
+        return not self.kwargs and bool(self.content)
+
+
+@dataclass
+class _ChannelQueue:
+    channel: Any
+    items: Deque[_OutboundItem] = field(default_factory=deque)
+    bucket: RateLimitBucket = field(default_factory=RateLimitBucket)
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+
+
+def _rate_limit_retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait if ``error`` is a Discord rate limit, otherwise None."""
+    if isinstance(error, discord.RateLimited):
+        return float(error.retry_after)
+    if isinstance(error, discord.HTTPException) and error.status == 429:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            return float(headers.get("Retry-After") or headers.get("X-RateLimit-Reset-After") or 1.0)
+        except (TypeError, ValueError):
+            return 1.0
+    return None
+
+
+class DiscordOutboundDispatcher:
+    """Per-bot dispatcher with one rate-limited send queue per channel."""
+
+    def __init__(self, name: str = "discord"):
+        self.name = name
+        self._channels: Dict[Any, _ChannelQueue] = {}
+        self._group_counter = 0
+        self.messages_sent = 0
+        self.chunks_coalesced = 0
+        self.rate_limited = 0
+
+    def _queue_for(self, channel) -> _ChannelQueue:
+        key = getattr(channel, "id", None) or id(channel)
+        queue = self._channels.get(key)
+        if queue is None:
+            queue = self._channels[key] = _ChannelQueue(channel=channel)
+        else:
+            queue.channel = channel
+        if queue.task is None or queue.task.done():
+            queue.task = asyncio.get_running_loop().create_task(self._run_channel(key, queue))
+        return queue
+
+    def _enqueue(self, channel, items: List[tuple]) -> List[asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        self._group_counter += 1
+        queue = self._queue_for(channel)
+        futures = []
+        for content, kwargs in items:
+            future = loop.create_future()
+            queue.items.append(_OutboundItem(content=content, future=future, group=self._group_counter, kwargs=kwargs))
+            futures.append(future)
+        queue.wakeup.set()
+        return futures
+
+    async def send(self, channel, content: Optional[str] = None, **kwargs) -> Any:
+        """
+        Queue one message and wait until it is sent.
+
+        Args:
+            channel: Discord channel (anything with an async ``send``)
+            content: Message text
+            **kwargs: Extra ``channel.send`` arguments (files, embed, ...)
+
+        Returns:
+            The value returned by ``channel.send`` (the merged message if it was coalesced into a previous one)
+
+        Raises:
+            Exception: Whatever ``channel.send`` raised for this message
+        """
+        (future,) = self._enqueue(channel, [(content, kwargs)])
+        return await future
+
+    async def send_chunks(self, channel, chunks: List[str]) -> List[Any]:
+        """Queue the chunks of one reply (in order), wait until all are sent and return the sent message of each."""
+        chunks = [chunk for chunk in chunks if chunk]
+        if not chunks:
+            return []
+        futures = self._enqueue(channel, [(chunk, {}) for chunk in chunks])
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def _take_batch(self, queue: _ChannelQueue) -> List[_OutboundItem]:
+        """Pop the next message, merging following small plain-text items while they fit."""
+        batch = [queue.items.popleft()]
+        if not batch[0].is_plain_text:
+            return batch
+
+        length = len(batch[0].content)
+        while queue.items and queue.items[0].is_plain_text:
+            following = queue.items[0]
+            separator = "" if following.group == batch[-1].group else "\n"
+            if length + len(separator) + len(following.content) > MAX_MESSAGE_LENGTH:
+                break
+            length += len(separator) + len(following.content)
+            batch.append(queue.items.popleft())
+        return batch
+
+    @staticmethod
+    def _merge(batch: List[_OutboundItem]) -> str:
+        text = batch[0].content
+        for previous, item in zip(batch, batch[1:]):
+            # Chunks of one reply were split from a single string; separate replies get a newline
+            text += ("" if item.group == previous.group else "\n") + item.content
+        return text
+
+    async def _run_channel(self, key: Any, queue: _ChannelQueue) -> None:
+        while True:
+            if not queue.items:
+                queue.wakeup.clear()
+                try:
+                    await asyncio.wait_for(queue.wakeup.wait(), timeout=WORKER_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    if not queue.items:
+                        self._channels.pop(key, None)
+                        return
+                continue
+
+            delay = queue.bucket.acquire(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            batch = self._take_batch(queue)
+            await self._send_batch(queue, batch)
+
+    async def _send_batch(self, queue: _ChannelQueue, batch: List[_OutboundItem]) -> None:
+        if len(batch) > 1:
+            self.chunks_coalesced += len(batch) - 1
+            args, kwargs = (self._merge(batch),), {}
+        else:
+            args = (batch[0].content,) if batch[0].content is not None else ()
+            kwargs = batch[0].kwargs
+
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            try:
+                result = await queue.channel.send(*args, **kwargs)
+            except Exception as e:
+                retry_after = _rate_limit_retry_after(e)
+                if retry_after is None or attempt == MAX_RATE_LIMIT_RETRIES:
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    return
+
+                self.rate_limited += 1
+                now = time.monotonic()
+                queue.bucket.block_for(retry_after, now)
+                queue.bucket.update_from_headers(getattr(getattr(e, "response", None), "headers", None), now)
+                logger.warning(
+                    f"Discord rate limit on channel {getattr(queue.channel, 'id', '?')} "
+                    f"for bot '{self.name}', retrying in {retry_after:.2f}s"
+                )
+                await asyncio.sleep(retry_after)
+                continue
+
+            self.messages_sent += 1
+            # Coalesced items were delivered as part of the same message
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_result(result)
+            return
+
+    def get_stats(self) -> Dict[str, int]:
+        """Counters for monitoring."""
+        return {
+            "active_channels": len(self._channels),
+            "queued": sum(len(queue.items) for queue in self._channels.values()),
+            "messages_sent": self.messages_sent,
+            "chunks_coalesced": self.chunks_coalesced,
+            "rate_limited": self.rate_limited,
+        }
+
+    async def close(self) -> None:
+        """Cancel channel workers; messages still queued fail with ``CancelledError``."""
+        for queue in list(self._channels.values()):
+            if queue.task and not queue.task.done():
+                queue.task.cancel()
+            while queue.items:
+                item = queue.items.popleft()
+                if not item.future.done():
+                    item.future.cancel()
+        self._channels.clear()
@@ -6,7 +6,9 @@ import asyncio
 import logging
 from typing import Optional, Dict, Any
 from src.db.models import InstanceConfig
+from src.ipc_client import IPCUnavailableError, ipc_client_pool, send_timeout
 from src.channels.whatsapp.evolution_api_sender import EvolutionApiSender
+from src.services.message_store import MessageStore
 from src.services.trace_service import TraceService
 
 logger = logging.getLogger(__name__)
@@ -51,6 +53,15 @@ class OmniChannelMessageSender:
 
                 try:
                     result = await self._send_discord_text(recipient, text, **send_kwargs)
+                    if result.get("success"):
+                        MessageStore.record_outbound(
+                            self.instance_config.name,
+                            "discord",
+                            str(result.get("channel_id", recipient)),
+                            text,
+                            channel_message_id=result.get("message_id"),
+                            trace_id=getattr(trace_context, "trace_id", None),
+                        )
                     return result
                 except Exception as exc:
                     error_details = str(exc)
@@ -99,7 +110,10 @@ class OmniChannelMessageSender:
         """Send text message via WhatsApp."""
         try:
             sender = EvolutionApiSender(config_override=self.instance_config)
-            success = sender.send_text_message(
+            # The Evolution sender uses blocking HTTP; run it off the event loop so
+            # concurrent sends (e.g. bulk broadcasts) don't serialize on the loop.
+            success = await asyncio.to_thread(
+                sender.send_text_message,
                 recipient=recipient,
                 text=text,
                 quoted_message=kwargs.get("quoted_message"),
@@ -113,93 +127,76 @@ class OmniChannelMessageSender:
             logger.error(f"WhatsApp send failed: {e}")
             return {"success": False, "error": str(e), "channel": "whatsapp"}
 
+    def _resolve_discord_channel_id(self, recipient: str) -> Optional[int]:
+        """Parse a Discord channel ID, falling back to the instance's default channel."""
+        try:
+            return int(recipient)
+        except (TypeError, ValueError):
+            default_channel = self.instance_config.discord_default_channel_id
+            return int(default_channel) if default_channel else None
+
+    async def _discord_ipc_send(self, path: str, payload: Dict[str, Any]) -> tuple:
+        """
+        Post to the Discord bot's IPC server over the pooled Unix socket connection.
+
+        Returns:
+            (status, body) on success, or (None, error_result) if the bot could not be reached
+        """
+        import aiohttp
+
+        try:
+            status, body = await ipc_client_pool.request(
+                "discord", self.instance_config.name, "POST", path, payload, timeout=send_timeout(payload)
+            )
+            return status, body
+        except IPCUnavailableError as e:
+            logger.error(f"Discord bot not running for instance '{self.instance_config.name}' ({e})")
+            return None, {"success": False, "error": "Discord bot not running", "channel": "discord"}
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout connecting to Discord bot '{self.instance_config.name}' via Unix socket")
+            return None, {"success": False, "error": "Bot not responding (timeout)", "channel": "discord"}
+        except aiohttp.ClientError as e:
+            logger.error(f"Connection error to Discord bot Unix socket: {e}")
+            return None, {"success": False, "error": f"Connection error: {e}", "channel": "discord"}
+
     async def _send_discord_text(self, recipient: str, text: str, **kwargs) -> Dict[str, Any]:
         """Send text message via Discord using Unix domain socket IPC."""
         logger.info(f"_send_discord_text called: recipient={recipient}, text_length={len(text)}")
-        import aiohttp
-        import os
-        from src.ipc_config import IPCConfig
 
         try:
             # Parse Discord mentions in the text
             # Convert @username or @userid to <@userid> format
             text = self._parse_discord_mentions(text)
-            # Parse the channel ID
-            try:
-                channel_id = int(recipient)
-            except ValueError:
-                # Try to use default channel from instance config
-                default_channel = self.instance_config.discord_default_channel_id
-                if default_channel:
-                    channel_id = int(default_channel)
-                else:
-                    return {
-                        "success": False,
-                        "error": "Invalid Discord channel ID",
-                        "channel": "discord",
-                    }
-
-            # Get socket path using centralized configuration
-            socket_path = IPCConfig.get_socket_path("discord", self.instance_config.name)
-
-            # Check if socket exists (bot is running)
-            if not os.path.exists(socket_path):
-                logger.error(
-                    f"Discord bot not running for instance '{self.instance_config.name}' (socket not found: {socket_path})"
-                )
+            channel_id = self._resolve_discord_channel_id(recipient)
+            if channel_id is None:
                 return {
                     "success": False,
-                    "error": "Discord bot not running",
+                    "error": "Invalid Discord channel ID",
                     "channel": "discord",
                 }
 
-            # Connect via Unix domain socket
-            connector = aiohttp.UnixConnector(path=socket_path)
-            timeout = aiohttp.ClientTimeout(total=5)  # 5 second timeout
+            status, result = await self._discord_ipc_send("/send", {"channel_id": str(channel_id), "text": text})
+            if status is None:
+                return result
+            logger.info(f"Discord IPC response: status={status}, result={result}")
 
-            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-                try:
-                    # Send request to bot's Unix socket server
-                    async with session.post(
-                        "http://localhost/send",  # URL path (domain ignored for Unix sockets)
-                        json={"channel_id": str(channel_id), "text": text},
-                    ) as response:
-                        result = await response.json()
-                        logger.info(f"Discord IPC response: status={response.status}, result={result}")
-
-                        if response.status == 200:
-                            logger.info(
-                                f"Message sent via Discord bot '{self.instance_config.name}' to channel {channel_id}"
-                            )
-                            return {
-                                "success": result.get("success", False),
-                                "channel": "discord",
-                                "instance": self.instance_config.name,
-                                "channel_id": channel_id,
-                            }
-                        else:
-                            error_msg = result.get("error", "Unknown error")
-                            logger.error(f"Discord IPC error: {error_msg}")
-                            return {
-                                "success": False,
-                                "error": error_msg,
-                                "channel": "discord",
-                            }
-
-                except asyncio.TimeoutError:
-                    logger.error(f"Timeout connecting to Discord bot '{self.instance_config.name}' via Unix socket")
-                    return {
-                        "success": False,
-                        "error": "Bot not responding (timeout)",
-                        "channel": "discord",
-                    }
-                except aiohttp.ClientError as e:
-                    logger.error(f"Connection error to Discord bot Unix socket: {e}")
-                    return {
-                        "success": False,
-                        "error": f"Connection error: {e}",
-                        "channel": "discord",
-                    }
+            if status == 200:
+                logger.info(f"Message sent via Discord bot '{self.instance_config.name}' to channel {channel_id}")
+                return {
+                    "success": result.get("success", False),
+                    "channel": "discord",
+                    "instance": self.instance_config.name,
+                    "channel_id": channel_id,
+                    "message_id": result.get("message_id"),
+                }
+
+            error_msg = result.get("error", "Unknown error")
+            logger.error(f"Discord IPC error: {error_msg}")
+            return {
+                "success": False,
+                "error": error_msg,
+                "channel": "discord",
+            }
 
         except Exception as e:
             logger.error(f"Discord send failed: {e}")
@@ -322,71 +319,36 @@ class OmniChannelMessageSender:
         media_type: str,
         **kwargs,
     ) -> Dict[str, Any]:
-        """Send media message via Discord (as attachment with optional text)."""
+        """Send media message via Discord (as attachment with optional text) using Unix domain socket IPC."""
         try:
-            from src.channels.discord.bot_manager import BotManager
-            import aiohttp
-            import io
-            import base64
-
-            bot_manager = BotManager()
-
-            # Ensure bot is connected
-            if not await bot_manager.is_connected(self.instance_config.name):
-                success = await bot_manager.start_bot(self.instance_config)
-                if not success:
-                    return {
-                        "success": False,
-                        "error": "Failed to start Discord bot",
-                        "channel": "discord",
-                    }
-
-            # Parse channel ID
-            try:
-                channel_id = int(recipient)
-            except ValueError:
-                if self.instance_config.discord_default_channel_id:
-                    channel_id = int(self.instance_config.discord_default_channel_id)
-                else:
-                    return {
-                        "success": False,
-                        "error": "Invalid Discord channel ID",
-                        "channel": "discord",
-                    }
-
-            # Prepare attachment
-            attachments = []
+            channel_id = self._resolve_discord_channel_id(recipient)
+            if channel_id is None:
+                return {
+                    "success": False,
+                    "error": "Invalid Discord channel ID",
+                    "channel": "discord",
+                }
+
+            # The bot downloads/decodes the attachment itself, so only references cross the socket
+            payload = {"channel_id": str(channel_id), "text": caption or ""}
             if media_url:
-                # Download media from URL
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(media_url) as response:
-                        if response.status == 200:
-                            media_data = await response.read()
-                            filename = media_url.split("/")[-1] or f"media.{media_type}"
-                            attachments.append((filename, io.BytesIO(media_data)))
+                payload["media_url"] = media_url
+                payload["filename"] = media_url.split("/")[-1].split("?")[0] or f"media.{media_type}"
             elif media_base64:
-                # Decode base64 media
-                media_data = base64.b64decode(media_base64)
-                filename = f"media.{media_type}"
-                attachments.append((filename, io.BytesIO(media_data)))
-
-            # Send message with attachment
-            success = await bot_manager.send_message(
-                instance_name=self.instance_config.name,
-                channel_id=channel_id,
-                content=caption or "",
-                attachments=attachments,
-            )
+                payload["media_base64"] = media_base64
+                payload["filename"] = f"media.{media_type}"
 
-            return {"success": success, "channel": "discord"}
+            status, result = await self._discord_ipc_send("/send", payload)
+            if status is None:
+                return result
+            if status == 200:
+                return {
+                    "success": result.get("success", False),
+                    "channel": "discord",
+                    "message_id": result.get("message_id"),
+                }
+            return {"success": False, "error": result.get("error", "Unknown error"), "channel": "discord"}
 
-        except ImportError as e:
-            logger.error(f"Discord dependencies not installed: {e}")
-            return {
-                "success": False,
-                "error": "Discord dependencies not installed",
-                "channel": "discord",
-            }
         except Exception as e:
             logger.error(f"Discord media send failed: {e}")
             return {"success": False, "error": str(e), "channel": "discord"}
@@ -12,6 +12,7 @@ import tempfile
 import os
 
 from src.channels.whatsapp.whatsapp_media_decrypt import whatsapp_media_decryptor
+from src.utils.media_cache import media_cache
 
 # Configure logging
 logger = logging.getLogger("src.channels.whatsapp.audio_transcriber")
@@ -303,12 +304,9 @@ class AudioTranscriptionService:
                 f"\033[94mAttempting to download audio from URL: {self._truncate_url_for_logging(audio_url)}\033[0m"
             )
             try:
-                # Make request to download the file with a reasonable timeout
-                response = requests.get(audio_url, timeout=30)
-                response.raise_for_status()
-
-                # Process the response
-                return self._process_download_response(response)
+                # Download through the shared cache; the decryptor may already have fetched this URL
+                audio_data = media_cache.get_bytes(audio_url, timeout=30)
+                return self._encode_audio_data(audio_data)
             except Exception as e:
                 logger.warning(f"\033[93mFailed to download from URL: {str(e)}\033[0m")
                 return None
@@ -320,29 +318,24 @@ class AudioTranscriptionService:
             logger.error(f"\033[91mFailed to process audio file: {str(e)}\033[0m")
             return None
 
-    def _process_download_response(self, response):
-        """Helper method to process download response and create base64 encoding"""
+    def _encode_audio_data(self, audio_data: bytes) -> Optional[str]:
+        """Helper method to validate downloaded audio and create base64 encoding"""
         try:
-            # Check content type to ensure it's audio
-            content_type = response.headers.get("Content-Type", "")
-            logger.info(f"\033[94mDownloaded file with Content-Type: {content_type}\033[0m")
-
             # Log file size for debugging
-            file_size = len(response.content)
+            file_size = len(audio_data)
             logger.info(f"\033[94mDownloaded audio file size: {file_size} bytes\033[0m")
 
             if file_size == 0:
                 logger.error("\033[91mDownloaded file is empty (0 bytes)\033[0m")
                 return None
 
-            # Get the content and encode it as base64
-            audio_data = response.content
+            # Encode the content as base64
             base64_data = base64.b64encode(audio_data).decode("utf-8")
 
             logger.info(f"\033[92mSuccessfully downloaded and encoded audio file ({len(audio_data)} bytes)\033[0m")
             return base64_data
         except Exception as e:
-            logger.error(f"\033[91mError processing download response: {str(e)}\033[0m")
+            logger.error(f"\033[91mError encoding downloaded audio: {str(e)}\033[0m")
             return None
 
     def transcribe_with_fallback(self, audio_url: str, language: Optional[str] = None) -> Optional[str]:
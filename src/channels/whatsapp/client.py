@@ -22,6 +22,7 @@ from src.channels.whatsapp.evolution_api_client import (
 )
 from src.config import config
 from src.ip_utils import replace_localhost_with_ipv4
+from src.utils.media_cache import media_cache
 
 # Configure logging
 logger = logging.getLogger("src.channels.whatsapp.client")
@@ -544,13 +545,9 @@ class WhatsAppClient:
         if not base64_encode:
             return media_url
 
-        # For base64 encoding, download the media and encode it
+        # For base64 encoding, download the media (through the shared cache) and encode it
         try:
-            response = requests.get(media_url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            # Read the content and encode it to base64
-            content = response.content
+            content = media_cache.get_bytes(media_url, timeout=30)
             encoded_content = base64.b64encode(content).decode("utf-8")
             return encoded_content
 
@@ -606,22 +603,8 @@ class WhatsAppClient:
             return None
 
         try:
-            # For WhatsApp URLs, use requests to download the content
-            if media_url.startswith("https://mmg.whatsapp.net") or media_url.startswith("https://web.whatsapp.net"):
-                response = requests.get(media_url, stream=True, timeout=30)
-                response.raise_for_status()
-
-                # Read the content and encode it to base64
-                content = response.content
-                encoded_content = base64.b64encode(content).decode("utf-8")
-                return encoded_content
-
-            # For other URLs, just download normally
-            response = requests.get(media_url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            # Read the content and encode it to base64
-            content = response.content
+            # WhatsApp and other URLs are downloaded the same way, through the shared cache
+            content = media_cache.get_bytes(media_url, timeout=30)
             encoded_content = base64.b64encode(content).decode("utf-8")
             return encoded_content
 
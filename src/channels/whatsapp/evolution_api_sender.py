@@ -335,12 +335,33 @@ class EvolutionApiSender:
             response.raise_for_status()
 
             logger.info(f"Message sent to {formatted_recipient}")
+            self._store_sent_message(recipient, text, response)
             return True
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to send message: {str(e)}")
             return False
 
+    def _store_sent_message(self, recipient: str, text: str, response: requests.Response) -> None:
+        """Record a sent text in the message store, keyed by the WhatsApp id Evolution assigned to it."""
+        from src.services.message_store import MessageStore
+
+        try:
+            body = response.json()
+        except Exception:
+            body = None
+        key = body.get("key") if isinstance(body, dict) and isinstance(body.get("key"), dict) else {}
+        conversation_id = key.get("remoteJid") if isinstance(key.get("remoteJid"), str) else recipient
+        if "@" not in conversation_id:
+            conversation_id = f"{self._prepare_recipient(conversation_id)}@s.whatsapp.net"
+        MessageStore.record_outbound(
+            self.config.name if self.config else self.instance_name,
+            "whatsapp",
+            conversation_id,
+            text,
+            channel_message_id=key.get("id") if isinstance(key.get("id"), str) else None,
+        )
+
     def _format_quoted_message(self, quoted_message: Dict[str, Any]) -> Dict[str, Any]:
         """
         Format a message for quoting according to Evolution API format.
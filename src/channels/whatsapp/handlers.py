@@ -594,7 +594,9 @@ class WhatsAppMessageHandler:
                     logger.info(f"Agent API returned current user_id: {current_user_id} for session {session_name}")
 
                     # Update our local user with the agent's user_id for future lookups
-                    if local_user:
+                    if local_user and local_user.last_agent_user_id == current_user_id:
+                        logger.debug(f"Local user {local_user.id} already linked to agent user_id {current_user_id}")
+                    elif local_user:
                         try:
                             from src.db.database import SessionLocal
 
@@ -667,6 +669,7 @@ class WhatsAppMessageHandler:
                                     text=chunk,
                                     quoted_message=message if i == 0 else None,
                                     trace_context=trace_context,
+                                    instance_config=instance_config,
                                 )
                                 # Small delay between chunks for natural flow
                                 if i < len(streaming_chunks) - 1:
@@ -678,6 +681,7 @@ class WhatsAppMessageHandler:
                                 text=response_to_send,
                                 quoted_message=message,
                                 trace_context=trace_context,
+                                instance_config=instance_config,
                             )
                     else:
                         # Send the response immediately while the typing indicator is still active
@@ -687,6 +691,7 @@ class WhatsAppMessageHandler:
                             text=response_to_send,
                             quoted_message=message,
                             trace_context=trace_context,
+                            instance_config=instance_config,
                         )
 
                     # Mark message as sent but let the typing indicator continue for a short time
@@ -714,8 +719,18 @@ class WhatsAppMessageHandler:
         text: str,
         quoted_message: Optional[Dict[str, Any]] = None,
         trace_context=None,
+        instance_config=None,
     ):
-        """Send a response back via WhatsApp with optional message quoting."""
+        """Send a response back via WhatsApp with optional message quoting.
+
+        When the outbox dispatcher is running the reply is persisted to the outbox
+        (together with the trace update) and delivered in the background instead.
+        """
+        if instance_config is not None and self._enqueue_outbox_response(
+            recipient, text, quoted_message, trace_context, instance_config
+        ):
+            return None
+
         response_payload = None
         success = False
 
@@ -754,6 +769,47 @@ class WhatsAppMessageHandler:
 
         return response_payload
 
+    def _enqueue_outbox_response(
+        self,
+        recipient: str,
+        text: str,
+        quoted_message: Optional[Dict[str, Any]],
+        trace_context,
+        instance_config,
+    ) -> bool:
+        """Persist a reply to the outbox. Returns False when the caller should send directly."""
+        from src.config import config
+        from src.services.outbox_service import OutboxService, outbox_dispatcher
+
+        if not config.outbox.enabled or not outbox_dispatcher.is_running:
+            return False
+
+        db_session = trace_context.db_session if trace_context else None
+        owns_session = db_session is None
+        try:
+            if owns_session:
+                from src.db.database import SessionLocal
+
+                db_session = SessionLocal()
+
+            outbox_message = OutboxService.enqueue_whatsapp_text(
+                db_session,
+                instance_name=instance_config.name,
+                recipient=recipient,
+                text=text,
+                quoted_message=quoted_message,
+                trace_context=trace_context,
+            )
+            clean_recipient = recipient.split("@")[0] if "@" in recipient else recipient
+            logger.info(f"➤ Queued response to {clean_recipient} (outbox id {outbox_message.id})")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to queue response in outbox, sending directly: {e}", exc_info=True)
+            return False
+        finally:
+            if owns_session and db_session is not None:
+                db_session.close()
+
     def _extract_media_url_from_payload(self, data: dict) -> Optional[str]:
         """Extract media URL from WhatsApp message payload with retry logic for file availability."""
         try:
@@ -29,9 +29,10 @@ except ImportError:
         AES = None
         unpad = None
         CRYPTO_AVAILABLE = False
-import requests
 import tempfile
 
+from src.utils.media_cache import media_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -124,16 +125,11 @@ class WhatsAppMediaDecryptor:
             return None
 
     def _download_encrypted_file(self, url: str) -> Optional[bytes]:
-        """Download the encrypted file from WhatsApp servers."""
+        """Download the encrypted file from WhatsApp servers (through the shared media cache)."""
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-
-            content_type = response.headers.get("content-type", "")
-            file_size = len(response.content)
-
-            logger.info(f"Downloaded encrypted file: {file_size} bytes, content-type: {content_type}")
-            return response.content
+            content = media_cache.get_bytes(url, timeout=30)
+            logger.info(f"Downloaded encrypted file: {len(content)} bytes")
+            return content
 
         except Exception as e:
             logger.error(f"Failed to download encrypted file: {e}")
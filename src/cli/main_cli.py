@@ -8,6 +8,7 @@ from src.core.telemetry import track_command, telemetry_client
 from src.cli.instance_cli import app as instance_app
 from src.cli.telemetry_cli import app as telemetry_app
 from src.cli.discord_cli import app as discord_app
+from src.cli.traces_cli import app as traces_app
 from src.api.app import prepare_runtime
 
 # Create main app
@@ -16,6 +17,7 @@ app = typer.Typer(help="Automagik Omni: Multi-tenant omnichannel messaging hub")
 app.add_typer(instance_app, name="instance", help="Instance management commands")
 app.add_typer(telemetry_app, name="telemetry", help="Telemetry management commands")
 app.add_typer(discord_app, name="discord", help="Discord bot management commands")
+app.add_typer(traces_app, name="traces", help="Message trace storage commands")
 
 
 @app.callback()
@@ -0,0 +1,220 @@
+"""
+CLI commands for message trace storage maintenance in Automagik Omni.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from src.config import config
+from src.db.database import SessionLocal
+from src.services.trace_blob_store import trace_blob_store
+from src.services.trace_compression import (
+    DEFAULT_DICT_SIZE,
+    DEFAULT_TRAINING_SAMPLES,
+    payload_codec,
+    recompress_payloads,
+    storage_report,
+    train_stage_dictionaries,
+)
+from src.services.trace_partitions import (
+    PARTITIONED_TABLES,
+    is_partitioned,
+    list_partitions,
+    partition_tables,
+    unpartition_tables,
+)
+from src.services.trace_retention import trace_retention
+from src.services.trace_rollups import rebuild_rollups
+from src.services.trace_search import backfill_search_text, rebuild_fts
+
+app = typer.Typer(help="Manage message trace storage")
+console = Console()
+
+
+def _print_storage(db) -> None:
+    table = Table(title="Trace payload storage")
+    table.add_column("Codec")
+    table.add_column("Rows", justify="right")
+    table.add_column("Original bytes", justify="right")
+    table.add_column("Stored bytes", justify="right")
+    for codec, stats in sorted(storage_report(db).items()):
+        table.add_row(codec, str(stats["rows"]), str(stats["bytes_original"]), str(stats["bytes_stored"]))
+    console.print(table)
+
+
+@app.command("storage")
+def show_storage():
+    """Show stored payload bytes per codec."""
+    with SessionLocal() as db:
+        _print_storage(db)
+
+
+@app.command("train-dicts")
+def train_dicts(
+    stage: Optional[List[str]] = typer.Option(None, "--stage", help="Stage to train (repeatable, default: all)"),
+    samples: int = typer.Option(DEFAULT_TRAINING_SAMPLES, help="Maximum payloads sampled per stage"),
+    dict_size: int = typer.Option(DEFAULT_DICT_SIZE, help="Dictionary size in bytes"),
+    recompress: bool = typer.Option(False, "--recompress", help="Recompress stored payloads afterwards"),
+    batch_size: int = typer.Option(500, help="Rows per recompression batch"),
+):
+    """Train a new zstd dictionary version per stage from stored payloads."""
+    with SessionLocal() as db:
+        payload_codec.load(db)
+        trained = train_stage_dictionaries(db, stages=stage or None, samples_per_stage=samples, dict_size=dict_size)
+        if not trained:
+            console.print("⚠️  No stage had enough payloads to train a dictionary", style="yellow")
+        for name, info in trained.items():
+            console.print(
+                f"✅ {name}: dictionary v{info['dict_id']} ({info['dict_size']} bytes, {info['samples']} samples)"
+            )
+        if recompress and trained:
+            _recompress(db, batch_size, list(trained.keys()))
+
+
+@app.command("recompress")
+def recompress(
+    stage: Optional[List[str]] = typer.Option(None, "--stage", help="Stage to recompress (repeatable, default: all)"),
+    batch_size: int = typer.Option(500, help="Rows per batch"),
+):
+    """Rewrite stored payloads with the active codec and dictionary of their stage."""
+    with SessionLocal() as db:
+        payload_codec.load(db)
+        _recompress(db, batch_size, stage or None)
+
+
+def _recompress(db, batch_size: int, stages: Optional[List[str]]) -> None:
+    report = recompress_payloads(db, batch_size=batch_size, stages=stages)
+    console.print(
+        f"✅ Recompressed {report['rows']} payloads: {report['bytes_before']} -> {report['bytes_after']} bytes "
+        f"({report['bytes_saved']} saved, {report['saved_percent']}%)",
+        style="green",
+    )
+    _print_storage(db)
+
+
+@app.command("cleanup-blobs")
+def cleanup_blobs(
+    retention_days: Optional[int] = typer.Option(None, help="Override AUTOMAGIK_OMNI_TRACE_BLOB_RETENTION_DAYS"),
+):
+    """Delete trace media blobs not referenced within the retention period."""
+    result = trace_blob_store.cleanup(retention_days)
+    console.print(
+        f"✅ Deleted {result['blobs_deleted']} blobs ({result['bytes_freed']} bytes freed)",
+        style="green",
+    )
+
+
+@app.command("rebuild-rollups")
+def rebuild(
+    start: Optional[datetime] = typer.Option(None, help="Rebuild from this UTC time (default: oldest trace)"),
+    end: Optional[datetime] = typer.Option(None, help="Rebuild up to this UTC time (default: newest trace)"),
+):
+    """Recompute the minute/hour analytics rollups from stored traces."""
+    with SessionLocal() as db:
+        total = rebuild_rollups(db, start=start, end=end)
+    console.print(f"✅ Rolled up {total} terminal traces", style="green")
+
+
+@app.command("reindex-search")
+def reindex_search(
+    batch_size: int = typer.Option(500, help="Traces per batch"),
+):
+    """Index the message text of traces created before full-text search, and rebuild the SQLite index."""
+    with SessionLocal() as db:
+        indexed = backfill_search_text(db, batch_size=batch_size)
+        rebuild_fts(db.connection())
+        db.commit()
+    console.print(f"✅ Indexed message text of {indexed} traces", style="green")
+
+
+@app.command("retention")
+def run_retention(
+    days: Optional[int] = typer.Option(None, help="Override AUTOMAGIK_OMNI_TRACE_RETENTION_DAYS"),
+    batch_size: Optional[int] = typer.Option(None, help="Override AUTOMAGIK_OMNI_TRACE_RETENTION_BATCH_SIZE"),
+    pause: Optional[float] = typer.Option(None, help="Override AUTOMAGIK_OMNI_TRACE_RETENTION_BATCH_PAUSE"),
+):
+    """Delete expired traces now, in batches (same pass as the background worker)."""
+    result = trace_retention.run_once(retention_days=days, batch_size=batch_size, pause=pause)
+    if result["status"] == "disabled":
+        console.print("⚠️  Retention is disabled (retention days <= 0)", style="yellow")
+        return
+    console.print(
+        f"✅ Deleted {result['traces_deleted']} traces, {result['payloads_deleted']} payloads and "
+        f"{result['orphans_deleted']} orphaned payloads in {result['batches']} batches "
+        f"({result['duration_seconds']}s)",
+        style="green",
+    )
+    for name in result["partitions_dropped"]:
+        console.print(f"✅ Dropped partition {name}", style="green")
+
+
+@app.command("archive")
+def run_archive(
+    days: Optional[int] = typer.Option(None, help="Override AUTOMAGIK_OMNI_TRACE_ARCHIVE_AFTER_DAYS"),
+    batch_size: Optional[int] = typer.Option(None, help="Override AUTOMAGIK_OMNI_TRACE_RETENTION_BATCH_SIZE"),
+):
+    """Move old trace payloads into a new cold archive segment now."""
+    result = trace_retention.archive_payloads(archive_after_days=days, batch_size=batch_size, pause=0)
+    if not result:
+        console.print("⚠️  Archiving is disabled (archive days <= 0)", style="yellow")
+        return
+    console.print(
+        f"✅ Archived {result['payloads_archived']} payloads of {result['traces_archived']} traces "
+        f"to {config.tracing.archive_directory}",
+        style="green",
+    )
+
+
+@app.command("partition")
+def partition(
+    interval: Optional[str] = typer.Option(None, help="daily or monthly (default: AUTOMAGIK_OMNI_TRACE_PARTITIONING)"),
+    ahead: Optional[int] = typer.Option(None, help="Future partitions to create (default: ..._PARTITIONS_AHEAD)"),
+    undo: bool = typer.Option(False, "--undo", help="Convert partitioned trace tables back to plain tables"),
+):
+    """Convert the trace tables to time-partitioned tables (PostgreSQL only; copies every row)."""
+    with SessionLocal() as db:
+        connection = db.connection()
+        try:
+            if undo:
+                converted = unpartition_tables(connection)
+            else:
+                converted = partition_tables(
+                    connection,
+                    interval or config.tracing.partitioning,
+                    config.tracing.partitions_ahead if ahead is None else ahead,
+                )
+        except ValueError as e:
+            console.print(f"❌ {e}", style="red")
+            raise typer.Exit(1)
+        db.commit()
+    if not converted:
+        console.print("Nothing to convert", style="yellow")
+    for table in converted:
+        console.print(f"✅ {'Unpartitioned' if undo else 'Partitioned'} {table}", style="green")
+
+
+@app.command("partitions")
+def show_partitions():
+    """List the partitions of the trace tables."""
+    with SessionLocal() as db:
+        connection = db.connection()
+        for name in PARTITIONED_TABLES:
+            if not is_partitioned(connection, name):
+                console.print(f"{name} is not partitioned", style="yellow")
+                continue
+            table = Table(title=f"{name} partitions")
+            table.add_column("Partition")
+            table.add_column("From")
+            table.add_column("To")
+            for partition_name, bounds in list_partitions(connection, name):
+                lower, upper = (b.isoformat(sep=" ") for b in bounds) if bounds else ("DEFAULT", "")
+                table.add_row(partition_name, lower, upper)
+            console.print(table)
+
+
+if __name__ == "__main__":
+    app()
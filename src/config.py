@@ -6,8 +6,8 @@ Loads configuration from environment variables.
 import os
 import logging
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
-from typing import Any
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Literal
 import pytz
 from datetime import datetime
 
@@ -51,6 +51,37 @@ class DatabaseConfig(BaseModel):
         default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_SQLITE_DATABASE_PATH", "./data/automagik-omni.db")
     )
     url: str = Field(default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_DATABASE_URL", ""))
+    # Connection pool (PostgreSQL and other server databases)
+    pool_size: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_DB_POOL_SIZE", "10")))
+    max_overflow: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_DB_MAX_OVERFLOW", "20")))
+    pool_timeout: float = Field(default_factory=lambda: float(os.getenv("AUTOMAGIK_OMNI_DB_POOL_TIMEOUT", "30")))
+    pool_recycle: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_DB_POOL_RECYCLE", "1800")))
+    pool_pre_ping: bool = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_DB_POOL_PRE_PING", "true").lower() == "true"
+    )
+    # SQLite pragmas applied to every new connection
+    # (interpolated into PRAGMA statements, so only the values SQLite knows are accepted)
+    sqlite_journal_mode: Literal["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"] = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_SQLITE_JOURNAL_MODE", "WAL"), validate_default=True
+    )
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_SQLITE_SYNCHRONOUS", "NORMAL"), validate_default=True
+    )
+    sqlite_busy_timeout: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_SQLITE_BUSY_TIMEOUT", "5000"))
+    )  # ms
+    sqlite_mmap_size: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_SQLITE_MMAP_SIZE", "268435456"))
+    )  # 256MB
+    sqlite_cache_size: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_SQLITE_CACHE_SIZE", "65536"))
+    )  # KiB per connection
+
+    @field_validator("sqlite_journal_mode", "sqlite_synchronous", mode="before")
+    @classmethod
+    def _upper_case_pragma(cls, value: Any) -> Any:
+        """Accept pragma values in any case (``wal``, ``normal``)."""
+        return value.strip().upper() if isinstance(value, str) else value
 
     @property
     def database_url(self) -> str:
@@ -72,6 +103,142 @@ class TracingConfig(BaseModel):
     include_sensitive_data: bool = Field(
         default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_INCLUDE_SENSITIVE", "false").lower() == "true"
     )
+    # Payload sampling (see src/services/trace_sampling.py); instances can override rate and mode
+    sample_rate: float = Field(default_factory=lambda: float(os.getenv("AUTOMAGIK_OMNI_TRACE_SAMPLE_RATE", "1.0")))
+    payload_mode: str = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_PAYLOAD_MODE", "full").lower()
+    )  # full, metadata
+    keep_failed: bool = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_KEEP_FAILED", "true").lower() == "true"
+    )
+    slow_threshold_ms: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_SLOW_THRESHOLD_MS", "10000"))
+    )
+    # Background batched writer for trace payloads and status updates
+    async_writer: bool = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_ASYNC_WRITER", "true").lower() == "true"
+    )
+    writer_queue_size: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_WRITER_QUEUE_SIZE", "10000"))
+    )
+    writer_batch_size: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_WRITER_BATCH_SIZE", "200"))
+    )
+    writer_flush_interval: float = Field(
+        default_factory=lambda: float(os.getenv("AUTOMAGIK_OMNI_TRACE_WRITER_FLUSH_INTERVAL", "0.5"))
+    )
+    # Trace status/field changes are held per message and written in one update at completion;
+    # pending changes older than this (seconds) are written earlier (0 writes every update)
+    state_flush_interval: float = Field(
+        default_factory=lambda: float(os.getenv("AUTOMAGIK_OMNI_TRACE_STATE_FLUSH_INTERVAL", "5.0"))
+    )
+    # zstd level for stored payloads (dictionaries are trained per stage)
+    zstd_level: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_ZSTD_LEVEL", "3")))
+    # Inline media (base64, jpegThumbnail, media_contents[].data) is stored out of line
+    blob_store_enabled: bool = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_BLOB_STORE", "true").lower() == "true"
+    )
+    blob_directory: str = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_BLOB_DIR", "./data/trace_blobs")
+    )
+    blob_retention_days: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_BLOB_RETENTION_DAYS", "7"))
+    )
+    # Cold archive: payloads older than this many days move to segment files (0 disables)
+    archive_after_days: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_ARCHIVE_AFTER_DAYS", "0"))
+    )
+    archive_directory: str = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_ARCHIVE_DIR", "./data/trace_archive")
+    )
+    # Live trace stream (GET /traces/stream): events buffered per subscriber before the oldest are dropped
+    stream_buffer_size: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_STREAM_BUFFER_SIZE", "1000"))
+    )
+    stream_max_subscribers: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_STREAM_MAX_SUBSCRIBERS", "20"))
+    )
+    # Per-minute/per-hour rollups maintained on trace completion and read by analytics
+    rollups_enabled: bool = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_ROLLUPS", "true").lower() == "true"
+    )
+    # Background retention: batched deletes of traces older than retention_days
+    retention_enabled: bool = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_RETENTION_ENABLED", "true").lower() == "true"
+    )
+    retention_interval: float = Field(
+        default_factory=lambda: float(os.getenv("AUTOMAGIK_OMNI_TRACE_RETENTION_INTERVAL", "3600"))
+    )
+    retention_batch_size: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_RETENTION_BATCH_SIZE", "1000"))
+    )
+    retention_batch_pause: float = Field(
+        default_factory=lambda: float(os.getenv("AUTOMAGIK_OMNI_TRACE_RETENTION_BATCH_PAUSE", "0.5"))
+    )
+    # PostgreSQL range partitioning of the trace tables: "none", "daily" or "monthly"
+    partitioning: str = Field(default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_TRACE_PARTITIONING", "none").lower())
+    partitions_ahead: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_TRACE_PARTITIONS_AHEAD", "3")))
+    # Defaults to on when partitioning is enabled
+    retention_drop_partitions: bool = Field(
+        default_factory=lambda: (
+            os.getenv(
+                "AUTOMAGIK_OMNI_TRACE_RETENTION_DROP_PARTITIONS",
+                "false" if os.getenv("AUTOMAGIK_OMNI_TRACE_PARTITIONING", "none").lower() == "none" else "true",
+            ).lower()
+            == "true"
+        )
+    )
+
+
+class BulkSendConfig(BaseModel):
+    """Bulk broadcast send configuration."""
+
+    max_concurrency: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_BULK_MAX_CONCURRENCY", "5")))
+    rate_limit_per_minute: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_BULK_RATE_LIMIT_PER_MINUTE", "60"))
+    )  # Per instance, shared by all jobs of that instance
+    max_recipients: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_BULK_MAX_RECIPIENTS", "20000")))
+    job_history_size: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_BULK_JOB_HISTORY", "100")))
+
+
+class OutboxConfig(BaseModel):
+    """Transactional outbox configuration for outbound replies."""
+
+    enabled: bool = Field(default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_OUTBOX_ENABLED", "true").lower() == "true")
+    batch_size: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_OUTBOX_BATCH_SIZE", "50")))
+    poll_interval: float = Field(default_factory=lambda: float(os.getenv("AUTOMAGIK_OMNI_OUTBOX_POLL_INTERVAL", "2")))
+    max_attempts: int = Field(default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_OUTBOX_MAX_ATTEMPTS", "8")))
+    backoff_base: float = Field(default_factory=lambda: float(os.getenv("AUTOMAGIK_OMNI_OUTBOX_BACKOFF_BASE", "2")))
+    backoff_max: float = Field(default_factory=lambda: float(os.getenv("AUTOMAGIK_OMNI_OUTBOX_BACKOFF_MAX", "300")))
+
+
+class MessageStoreConfig(BaseModel):
+    """Unified message store (``messages`` table) written by ingestion and send paths."""
+
+    enabled: bool = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_MESSAGE_STORE_ENABLED", "true").lower() == "true"
+    )
+
+
+class MediaCacheConfig(BaseModel):
+    """Shared on-disk cache for downloaded media."""
+
+    enabled: bool = Field(
+        default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_MEDIA_CACHE_ENABLED", "true").lower() == "true"
+    )
+    directory: str = Field(default_factory=lambda: os.getenv("AUTOMAGIK_OMNI_MEDIA_CACHE_DIR", "./data/media_cache"))
+    max_bytes: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_MEDIA_CACHE_MAX_BYTES", "536870912"))
+    )  # 512MB
+
+
+class IpcConfig(BaseModel):
+    """Unix socket IPC between the API and channel bots (Discord)."""
+
+    # Media travels base64-encoded in the JSON body: Discord's 10 MiB upload limit is ~13.4 MiB encoded
+    max_request_size: int = Field(
+        default_factory=lambda: int(os.getenv("AUTOMAGIK_OMNI_IPC_MAX_REQUEST_SIZE", "14680064"))
+    )  # 14MB
 
 
 class ApiConfig(BaseModel):
@@ -154,6 +321,11 @@ class Config(BaseModel):
     api: ApiConfig = ApiConfig()
     database: DatabaseConfig = DatabaseConfig()
     tracing: TracingConfig = TracingConfig()
+    bulk_send: BulkSendConfig = BulkSendConfig()
+    outbox: OutboxConfig = OutboxConfig()
+    messages: MessageStoreConfig = MessageStoreConfig()
+    media_cache: MediaCacheConfig = MediaCacheConfig()
+    ipc: IpcConfig = IpcConfig()
     timezone: TimezoneConfig = TimezoneConfig()
     cors: CorsConfig = CorsConfig()
 
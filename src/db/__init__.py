@@ -4,7 +4,9 @@ Database module for multi-tenant instance configuration.
 
 from .database import get_engine, get_session_factory, get_db, SessionLocal, Base
 from .models import InstanceConfig, User
-from .trace_models import MessageTrace, TracePayload
+from .trace_models import MessageTrace, TracePayload, TraceCompressionDict
+from .outbox_models import OutboxMessage
+from .message_models import Message
 from .bootstrap import ensure_default_instance
 
 __all__ = [
@@ -17,5 +19,8 @@ __all__ = [
     "User",
     "MessageTrace",
     "TracePayload",
+    "TraceCompressionDict",
+    "OutboxMessage",
+    "Message",
     "ensure_default_instance",
 ]
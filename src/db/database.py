@@ -4,12 +4,14 @@ Database configuration and session management.
 
 import logging
 import os
+from datetime import datetime, timezone
 from pathlib import Path
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import AsyncGenerator, Generator
 from .init_database import initialize_database
 
 logger = logging.getLogger(__name__)
@@ -38,9 +40,138 @@ def ensure_sqlite_directory(database_url: str) -> None:
         logger.info(f"SQLite database file: {sqlite_path}")
 
 
+def _is_sqlite_memory(database_url: str) -> bool:
+    return database_url in ("sqlite://", "sqlite:///") or ":memory:" in database_url
+
+
+def apply_sqlite_pragmas(dbapi_connection, database_url: str) -> None:
+    """Apply the configured journal mode, sync level, busy timeout and cache sizes to a new SQLite connection."""
+    from src.config import config
+
+    settings = config.database
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL lets readers proceed while a writer commits; in-memory databases cannot use it
+        if not _is_sqlite_memory(database_url):
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size)}")
+    finally:
+        cursor.close()
+
+
+def create_database_engine(database_url: str) -> Engine:
+    """
+    Create the engine for ``database_url`` with the configured pool (server databases)
+    or connection pragmas (SQLite).
+    """
+    from src.config import config
+
+    if database_url.startswith("sqlite"):
+        engine = create_engine(
+            database_url,
+            connect_args={"check_same_thread": False},  # Needed for SQLite
+        )
+        event.listen(
+            engine, "connect", lambda dbapi_connection, _: apply_sqlite_pragmas(dbapi_connection, database_url)
+        )
+        return engine
+
+    settings = config.database
+    return create_engine(
+        database_url,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+    )
+
+
+# Async drivers used by the API layer for each sync backend
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Rewrite ``database_url`` to use the async driver of its backend (asyncpg or aiosqlite)."""
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return database_url
+    url = url.set(drivername=driver)
+    # asyncpg spells libpq's sslmode as ssl
+    if "sslmode" in url.query:
+        url = url.update_query_dict({"ssl": url.query["sslmode"]}).difference_update_query(["sslmode"])
+    return url.render_as_string(hide_password=False)
+
+
+def _naive_utc(value):
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _naive_utc_parameters(conn, cursor, statement, parameters, context, executemany):
+    """
+    Bind aware datetimes as naive UTC.
+
+    Timestamp columns are ``TIMESTAMP WITHOUT TIME ZONE`` holding UTC. psycopg2 casts the
+    aware values of ``utcnow()`` to them, but asyncpg rejects them.
+    """
+
+    def convert(row):
+        if isinstance(row, dict):
+            return {key: _naive_utc(value) for key, value in row.items()}
+        return tuple(_naive_utc(value) for value in row)
+
+    if executemany:
+        return statement, [convert(row) for row in parameters]
+    return statement, convert(parameters)
+
+
+def create_async_database_engine(database_url: str, **engine_options) -> AsyncEngine:
+    """
+    Create the async engine for ``database_url`` with the same pool settings or
+    SQLite pragmas as ``create_database_engine``.
+
+    A ``poolclass`` in ``engine_options`` replaces the configured pool sizing.
+    """
+    from src.config import config
+
+    async_url = get_async_database_url(database_url)
+    if database_url.startswith("sqlite"):
+        engine = create_async_engine(async_url, **engine_options)
+        event.listen(
+            engine.sync_engine,
+            "connect",
+            lambda dbapi_connection, _: apply_sqlite_pragmas(dbapi_connection, database_url),
+        )
+        return engine
+
+    if "poolclass" not in engine_options:
+        settings = config.database
+        engine_options = {
+            "pool_size": settings.pool_size,
+            "max_overflow": settings.max_overflow,
+            "pool_timeout": settings.pool_timeout,
+            "pool_recycle": settings.pool_recycle,
+            "pool_pre_ping": settings.pool_pre_ping,
+            **engine_options,
+        }
+    engine = create_async_engine(async_url, **engine_options)
+    if engine.dialect.driver == "asyncpg":
+        event.listen(engine.sync_engine, "before_cursor_execute", _naive_utc_parameters, retval=True)
+    return engine
+
+
 _DATABASE_URL: str | None = None
 _engine: Engine | None = None
 _SessionLocal: sessionmaker | None = None
+_async_engine: AsyncEngine | None = None
+_AsyncSessionLocal: async_sessionmaker | None = None
 
 # Base class for models
 Base = declarative_base()
@@ -63,13 +194,7 @@ def _initialize_engine() -> None:
         logger.error("Failed to initialize database. Please check your database configuration and permissions.")
         # Continue anyway - let SQLAlchemy fail with a more specific error if needed
 
-    if database_url.startswith("sqlite"):
-        _engine = create_engine(
-            database_url,
-            connect_args={"check_same_thread": False},  # Needed for SQLite
-        )
-    else:
-        _engine = create_engine(database_url)
+    _engine = create_database_engine(database_url)
 
     _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
 
@@ -103,6 +228,48 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def get_async_engine() -> AsyncEngine:
+    """Return the lazily initialized async engine used by the API routes."""
+
+    global _async_engine, _AsyncSessionLocal
+
+    if _async_engine is None:
+        _initialize_engine()
+        _async_engine = create_async_database_engine(_DATABASE_URL)
+        # Objects stay readable after commit; lazy loads would need a round trip outside the loop
+        _AsyncSessionLocal = async_sessionmaker(bind=_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    """Return the lazily initialized async session factory."""
+
+    get_async_engine()
+    assert _AsyncSessionLocal is not None
+    return _AsyncSessionLocal
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency function to get an async database session.
+    Queries await the asyncpg/aiosqlite driver instead of blocking the event loop;
+    worker threads and the CLI keep using the sync engine.
+    """
+    async with get_async_session_factory()() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    """Close the pooled connections of the async engine, if it was created."""
+
+    global _async_engine, _AsyncSessionLocal
+
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
+
 def SessionLocal(*args, **kwargs):
     """Backwards-compatible callable returning a new database session."""
 
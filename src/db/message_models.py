@@ -0,0 +1,72 @@
+"""
+SQLAlchemy model for the unified message store.
+Every message received or sent on any channel, normalized to one row per message.
+"""
+
+from sqlalchemy import Column, DateTime, Index, String, Text
+from .database import Base
+from src.utils.datetime_utils import datetime_utcnow
+from src.utils.uuid_utils import uuid7
+
+
+class Message(Base):
+    """
+    One message of a conversation, inbound or outbound.
+
+    Keyed by UUIDv7 so ids grow with time and break ties between messages of the
+    same timestamp in conversation timelines.
+    """
+
+    __tablename__ = "messages"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid7()))
+
+    # Where the message lives
+    instance_name = Column(String, nullable=False)
+    channel = Column(String, nullable=False, default="whatsapp")  # whatsapp, discord
+    channel_message_id = Column(String)  # WhatsApp key.id / Discord message id
+    conversation_id = Column(String, nullable=False)  # WhatsApp remote JID / Discord channel id
+    direction = Column(String, nullable=False)  # inbound, outbound
+
+    # Content
+    sender_id = Column(String)
+    sender_name = Column(String)
+    message_type = Column(String, default="text")
+    text_content = Column(Text)
+    media_mime_type = Column(String)
+    quoted_message_id = Column(String)
+    reaction_to_message_id = Column(String)
+
+    trace_id = Column(String, index=True)  # Trace of the processing, if traced
+
+    created_at = Column(DateTime, nullable=False, default=datetime_utcnow)
+
+    __table_args__ = (
+        # Conversation timelines: newest first, keyset on (created_at, id)
+        Index("ix_messages_conversation_timeline", "instance_name", "conversation_id", "created_at", "id"),
+        # Webhook redeliveries and echoes of our own sends are stored once
+        Index("ix_messages_channel_message_id", "instance_name", "channel", "channel_message_id", unique=True),
+    )
+
+    def __repr__(self):
+        return f"<Message(id='{self.id}', conversation='{self.conversation_id}', direction='{self.direction}')>"
+
+    def to_dict(self):
+        """Convert to dictionary for API responses."""
+        return {
+            "id": self.id,
+            "instance_name": self.instance_name,
+            "channel": self.channel,
+            "channel_message_id": self.channel_message_id,
+            "conversation_id": self.conversation_id,
+            "direction": self.direction,
+            "sender_id": self.sender_id,
+            "sender_name": self.sender_name,
+            "message_type": self.message_type,
+            "text_content": self.text_content,
+            "media_mime_type": self.media_mime_type,
+            "quoted_message_id": self.quoted_message_id,
+            "reaction_to_message_id": self.reaction_to_message_id,
+            "trace_id": self.trace_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
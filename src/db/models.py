@@ -2,7 +2,6 @@
 SQLAlchemy models for multi-tenant instance configuration and user management.
 """
 
-import uuid
 from enum import Enum
 from sqlalchemy import (
     Column,
@@ -10,6 +9,7 @@ from sqlalchemy import (
     String,
     Boolean,
     DateTime,
+    Float,
     ForeignKey,
     UniqueConstraint,
     CheckConstraint,
@@ -17,6 +17,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import relationship
 from .database import Base
 from src.utils.datetime_utils import datetime_utcnow
+from src.utils.uuid_utils import uuid7
 
 
 class InstanceConfig(Base):
@@ -89,6 +90,10 @@ class InstanceConfig(Base):
     # Message splitting control
     enable_auto_split = Column(Boolean, default=True, nullable=False)  # Auto-split messages on \n\n
 
+    # Trace payload sampling overrides (None = AUTOMAGIK_OMNI_TRACE_SAMPLE_RATE / _PAYLOAD_MODE)
+    trace_sample_rate = Column(Float, nullable=True)  # Fraction of traces whose payloads are stored
+    trace_payload_mode = Column(String, nullable=True)  # "full" or "metadata" (trace rows only)
+
     # Timestamps
     created_at = Column(DateTime, default=datetime_utcnow)
     updated_at = Column(DateTime, default=datetime_utcnow, onupdate=datetime_utcnow)
@@ -159,9 +164,11 @@ class User(Base):
     """
 
     __tablename__ = "users"
+    # One user per phone number and instance; the inbound upsert conflicts on it
+    __table_args__ = (UniqueConstraint("instance_name", "phone_number", name="uq_users_instance_phone"),)
 
     # Stable primary identifier (never changes)
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    id = Column(String, primary_key=True, default=lambda: str(uuid7()), index=True)
 
     # User identification (most stable identifier from WhatsApp)
     phone_number = Column(String, nullable=False, index=True)
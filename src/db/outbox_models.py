@@ -0,0 +1,54 @@
+"""
+SQLAlchemy models for the transactional outbox.
+Outbound replies are persisted here before delivery so they survive channel errors and restarts.
+"""
+
+import json
+from typing import Any, Dict, Optional
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from .database import Base
+from src.utils.datetime_utils import datetime_utcnow
+
+
+class OutboxMessage(Base):
+    """
+    Outbound message waiting for (or done with) delivery by the outbox dispatcher.
+    """
+
+    __tablename__ = "outbox_messages"
+
+    id = Column(Integer, primary_key=True)
+
+    # Routing
+    instance_name = Column(String, nullable=False, index=True)
+    channel_type = Column(String, nullable=False, default="whatsapp")
+    recipient = Column(String, nullable=False)
+    trace_id = Column(String, index=True)  # Trace updated in the same transaction, if any
+
+    # JSON encoded send arguments (text, quoted message, ...)
+    payload = Column(Text, nullable=False)
+
+    # Delivery state
+    status = Column(String, nullable=False, default="pending")  # pending, delivered, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime_utcnow)
+    last_error = Column(Text)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime_utcnow)
+    delivered_at = Column(DateTime)
+
+    __table_args__ = (Index("ix_outbox_messages_status_next_attempt", "status", "next_attempt_at"),)
+
+    def __repr__(self):
+        return f"<OutboxMessage(id={self.id}, instance='{self.instance_name}', status='{self.status}')>"
+
+    def set_payload(self, payload: Dict[str, Any]) -> None:
+        """Serialize send arguments."""
+        self.payload = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def get_payload(self) -> Optional[Dict[str, Any]]:
+        """Deserialize send arguments."""
+        if not self.payload:
+            return None
+        return json.loads(self.payload)
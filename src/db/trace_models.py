@@ -3,15 +3,36 @@ SQLAlchemy models for message tracing system.
 Tracks the complete lifecycle of messages through the Omni-Hub system.
 """
 
-import uuid
 import json
-import zlib
-import base64
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    String,
+    Text,
+    DateTime,
+    ForeignKey,
+    Boolean,
+    Index,
+    LargeBinary,
+    UniqueConstraint,
+)
+import sqlalchemy.dialects.postgresql  # noqa: F401 - registers the typed to_tsvector() function
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import declared_attr, relationship, object_session
 from typing import Dict, Any, Optional
 from .database import Base
+from src.config import config
 from src.utils.datetime_utils import datetime_utcnow
+from src.utils.uuid_utils import uuid7
+
+# Text search configuration of the search_text index (no stemming, see src/services/trace_search.py)
+TS_CONFIG = "simple"
+
+
+def tsvector(expression: Any) -> Any:
+    """``to_tsvector`` expression matching the PostgreSQL GIN index."""
+    return func.to_tsvector(literal_column(f"'{TS_CONFIG}'"), expression)
 
 
 class MessageTrace(Base):
@@ -23,14 +44,14 @@ class MessageTrace(Base):
     __tablename__ = "message_traces"
 
     # Unique trace ID for the entire message lifecycle
-    trace_id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    trace_id = Column(String, primary_key=True, index=True, default=lambda: str(uuid7()))
 
     # Instance and message identification
-    instance_name = Column(String, ForeignKey("instance_configs.name"), index=True)
+    instance_name = Column(String, ForeignKey("instance_configs.name"))
     whatsapp_message_id = Column(String, index=True)  # Evolution message ID
 
     # Sender information
-    sender_phone = Column(String, index=True)
+    sender_phone = Column(String)
     sender_name = Column(String)
     sender_jid = Column(String)  # Full WhatsApp JID
 
@@ -39,13 +60,15 @@ class MessageTrace(Base):
     has_media = Column(Boolean, default=False)
     has_quoted_message = Column(Boolean, default=False)
     message_length = Column(Integer)
+    # Message text extracted at creation for full-text search (see src/services/trace_search.py)
+    search_text = Column(Text)
 
     # Session tracking
-    session_name = Column(String, index=True)
+    session_name = Column(String)
     agent_session_id = Column(String)  # Agent's session UUID from response
 
     # Timestamps for each major stage
-    received_at = Column(DateTime, default=datetime_utcnow, index=True)
+    received_at = Column(DateTime, default=datetime_utcnow)
     processing_started_at = Column(DateTime)
     agent_request_at = Column(DateTime)
     agent_response_at = Column(DateTime)
@@ -53,7 +76,7 @@ class MessageTrace(Base):
     completed_at = Column(DateTime)
 
     # Status tracking
-    status = Column(String, default="received", index=True)  # received, processing, agent_called, completed, failed
+    status = Column(String, default="received")  # received, processing, agent_called, completed, failed
     error_message = Column(Text)
     error_stage = Column(String)  # Stage where error occurred
 
@@ -75,6 +98,21 @@ class MessageTrace(Base):
     # Relationships
     payloads = relationship("TracePayload", back_populates="trace", cascade="all, delete-orphan")
 
+    # Listing is ordered by (received_at, trace_id) descending and paginated by keyset on that pair;
+    # each common filter gets a composite index with the sort key so filtered pages are index range scans.
+    # The leading columns also serve equality lookups, so no separate single-column indexes are kept.
+    __table_args__ = (
+        Index("ix_message_traces_received_at_trace_id", "received_at", "trace_id"),
+        Index("ix_message_traces_instance_received_at", "instance_name", "received_at", "trace_id"),
+        Index("ix_message_traces_sender_phone_received_at", "sender_phone", "received_at", "trace_id"),
+        Index("ix_message_traces_status_received_at", "status", "received_at", "trace_id"),
+        Index("ix_message_traces_session_received_at", "session_name", "received_at", "trace_id"),
+        # SQLite uses the FTS5 table created by src/services/trace_hooks.py instead
+        Index("ix_message_traces_search_text", tsvector(search_text), postgresql_using="gin").ddl_if(
+            dialect="postgresql"
+        ),
+    )
+
     def __repr__(self):
         return f"<MessageTrace(trace_id='{self.trace_id}', status='{self.status}', sender='{self.sender_phone}')>"
 
@@ -106,7 +144,7 @@ class MessageTrace(Base):
 class TracePayload(Base):
     """
     Stores actual request/response payloads for each stage of message processing.
-    Payloads are compressed to save space.
+    Payloads are compressed to save space (see src/services/trace_compression.py).
     """
 
     __tablename__ = "trace_payloads"
@@ -119,7 +157,10 @@ class TracePayload(Base):
     payload_type = Column(String)  # request, response, webhook
 
     # Compressed payload data
-    payload_compressed = Column(Text)  # Base64 encoded compressed JSON
+    payload_data = Column(LargeBinary)  # Compressed JSON bytes
+    payload_codec = Column(String)  # zlib, zstd
+    payload_dict_id = Column(Integer, nullable=True)  # trace_compression_dicts.id used by zstd
+    payload_compressed = Column(Text)  # Legacy: base64 encoded zlib JSON
     payload_size_original = Column(Integer)
     payload_size_compressed = Column(Integer)
 
@@ -142,28 +183,63 @@ class TracePayload(Base):
         Args:
             payload: Dictionary to store
         """
-        try:
-            # Convert to JSON string
-            json_str = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
-            self.payload_size_original = len(json_str)
+        from src.services.trace_blob_store import cap_payload_json, trace_blob_store
 
-            # Compress using zlib
-            compressed_data = zlib.compress(json_str.encode("utf-8"))
-            self.payload_size_compressed = len(compressed_data)
+        try:
+            # Move inline media out of the trace tables
+            blob_count = 0
+            if config.tracing.blob_store_enabled:
+                payload, blob_count = trace_blob_store.externalize(payload)
 
-            # Encode as base64 for storage
-            self.payload_compressed = base64.b64encode(compressed_data).decode("ascii")
+            # Convert to JSON string, capped at the configured size
+            json_str = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            original_size = len(json_str)
+            json_str = cap_payload_json(json_str, config.tracing.max_payload_size)
+            self.set_payload_bytes(json_str.encode("utf-8"))
+            self.payload_size_original = original_size
 
             # Check content flags
             json_lower = json_str.lower()
-            self.contains_base64 = "base64" in json_lower
+            self.contains_base64 = blob_count > 0 or "base64" in json_lower
             self.contains_media = any(media in json_lower for media in ["image", "video", "audio", "document", "media"])
 
         except Exception as e:
             # If compression fails, store error
             self.error_details = f"Payload compression failed: {str(e)}"
+            self.payload_data = None
             self.payload_compressed = None
 
+    def set_payload_bytes(self, raw: bytes) -> None:
+        """Compress serialized JSON bytes with the active codec/dictionary for this stage."""
+        from src.services.trace_compression import payload_codec
+
+        data, codec, dict_id = payload_codec.compress(raw, self.stage)
+        self.payload_data = data
+        self.payload_codec = codec
+        self.payload_dict_id = dict_id
+        self.payload_compressed = None
+        self.payload_size_original = len(raw)
+        self.payload_size_compressed = len(data)
+
+    def get_payload_bytes(self) -> Optional[bytes]:
+        """Decompressed JSON bytes, or None if no payload is stored."""
+        from src.services.trace_compression import decode_legacy_payload, payload_codec
+
+        if self.payload_data is not None:
+            return payload_codec.decompress(
+                self.payload_data, self.payload_codec, self.payload_dict_id, db_session=object_session(self)
+            )
+        if self.payload_compressed:
+            return decode_legacy_payload(self.payload_compressed)
+        return None
+
+    @property
+    def stored_size(self) -> int:
+        """Bytes the payload occupies in the database."""
+        if self.payload_data is not None:
+            return len(self.payload_data)
+        return len(self.payload_compressed or "")
+
     def get_payload(self) -> Optional[Dict[str, Any]]:
         """
         Retrieve and decompress payload.
@@ -171,18 +247,13 @@ class TracePayload(Base):
         Returns:
             Original payload dictionary or None if decompression fails
         """
-        if not self.payload_compressed:
-            return None
-
         try:
-            # Decode from base64
-            compressed_data = base64.b64decode(self.payload_compressed.encode("ascii"))
-
-            # Decompress
-            json_str = zlib.decompress(compressed_data).decode("utf-8")
+            raw = self.get_payload_bytes()
+            if raw is None:
+                return None
 
             # Parse JSON
-            return json.loads(json_str)
+            return json.loads(raw.decode("utf-8"))
 
         except Exception as e:
             # Log error but don't raise - this is for debugging
@@ -216,3 +287,124 @@ class TracePayload(Base):
             result["payload"] = self.get_payload()
 
         return result
+
+
+class TraceCompressionDict(Base):
+    """
+    Versioned zstd dictionaries for trace payload compression.
+
+    A new row is added every time a dictionary is trained; the newest row per
+    scope is used for new payloads, older rows stay to decompress existing ones.
+    """
+
+    __tablename__ = "trace_compression_dicts"
+
+    id = Column(Integer, primary_key=True)  # Dictionary version, referenced by trace_payloads.payload_dict_id
+    scope = Column(String, index=True, nullable=False)  # e.g. "stage:webhook_received"
+    dict_data = Column(LargeBinary, nullable=False)
+    dict_size = Column(Integer)
+    sample_count = Column(Integer)
+    created_at = Column(DateTime, default=datetime_utcnow)
+
+    def __repr__(self):
+        return f"<TraceCompressionDict(id={self.id}, scope='{self.scope}', size={self.dict_size})>"
+
+
+# Upper bounds (ms) of the latency histogram buckets kept in rollups; the last bucket holds everything slower
+ROLLUP_LATENCY_BOUNDS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class _TraceRollupColumns:
+    """
+    Pre-aggregated metrics of terminal (completed/failed) traces per time bucket.
+
+    Rows are keyed by bucket start (of ``received_at``), instance, message type,
+    status and error stage, and are updated incrementally whenever a trace reaches
+    a terminal status (see src/services/trace_rollups.py).
+    """
+
+    id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    instance_name = Column(String, nullable=False)
+    message_type = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    error_stage = Column(String, nullable=False, default="")  # "" when the trace has no error stage
+
+    trace_count = Column(Integer, nullable=False, default=0)
+    processing_time_sum = Column(BigInteger, nullable=False, default=0)
+    processing_time_count = Column(Integer, nullable=False, default=0)
+    agent_time_sum = Column(BigInteger, nullable=False, default=0)
+    agent_time_count = Column(Integer, nullable=False, default=0)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            UniqueConstraint(
+                "bucket_start",
+                "instance_name",
+                "message_type",
+                "status",
+                "error_stage",
+                name=f"uq_{cls.__tablename__}_key",
+            ),
+        )
+
+
+# Total processing time histogram: latency_bucket_<i> counts traces up to ROLLUP_LATENCY_BOUNDS_MS[i]
+ROLLUP_LATENCY_COLUMNS = [f"latency_bucket_{i}" for i in range(len(ROLLUP_LATENCY_BOUNDS_MS) + 1)]
+for _column_name in ROLLUP_LATENCY_COLUMNS:
+    setattr(_TraceRollupColumns, _column_name, Column(Integer, nullable=False, default=0))
+
+
+class TraceRollupMinute(_TraceRollupColumns, Base):
+    """Per-minute trace rollups."""
+
+    __tablename__ = "trace_rollups_minute"
+
+
+class TraceRollupHour(_TraceRollupColumns, Base):
+    """Per-hour trace rollups."""
+
+    __tablename__ = "trace_rollups_hour"
+
+
+class _TraceLatencyColumns:
+    """
+    Sparse per-stage latency histograms of terminal traces per time bucket.
+
+    One row per (bucket start, instance, stage, histogram bucket) holds how many
+    traces fell into that logarithmic latency bucket (see
+    src/services/trace_histograms.py); summing counts per histogram bucket merges
+    instances and time buckets.
+    """
+
+    id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    instance_name = Column(String, nullable=False)
+    stage = Column(String, nullable=False)  # queue, agent, send, total
+    bucket = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            UniqueConstraint(
+                "bucket_start",
+                "instance_name",
+                "stage",
+                "bucket",
+                name=f"uq_{cls.__tablename__}_key",
+            ),
+        )
+
+
+class TraceLatencyMinute(_TraceLatencyColumns, Base):
+    """Per-minute latency histograms."""
+
+    __tablename__ = "trace_latency_minute"
+
+
+class TraceLatencyHour(_TraceLatencyColumns, Base):
+    """Per-hour latency histograms."""
+
+    __tablename__ = "trace_latency_hour"
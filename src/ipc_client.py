@@ -0,0 +1,198 @@
+"""
+Pooled HTTP client for Unix domain socket IPC.
+
+The API talks to channel bots (Discord) over per-instance Unix sockets. Instead of
+creating a connector and session for every message, one long-lived session with a
+keep-alive connection pool is kept per socket and reused by all sends. Round-trip
+latency is recorded per socket and exposed through ``get_metrics()``.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import aiohttp
+
+from src.ipc_config import IPCConfig
+
+logger = logging.getLogger(__name__)
+
+# Pooled connections per socket; bots serve requests concurrently so a few are enough
+DEFAULT_POOL_LIMIT = 10
+DEFAULT_TIMEOUT_SECONDS = 5.0
+# The bot downloads IPC media itself, allowing this long, before it sends
+MEDIA_DOWNLOAD_TIMEOUT_SECONDS = 30.0
+_LATENCY_WINDOW = 256
+
+
+def send_timeout(payload: Dict[str, Any]) -> Optional[float]:
+    """
+    Total client timeout for a ``/send`` request.
+
+    The pooled default covers a text message (None is returned for those). Media gets the
+    bot's download time on top, so the client does not give up while the bot is still
+    sending (a caller retry would then duplicate the message).
+    """
+    if not (payload.get("media_url") or payload.get("media_base64")):
+        return None
+    return DEFAULT_TIMEOUT_SECONDS + MEDIA_DOWNLOAD_TIMEOUT_SECONDS
+
+
+class IPCUnavailableError(Exception):
+    """Raised when the target socket does not exist (the bot is not running)."""
+
+
+@dataclass
+class SocketLatencyStats:
+    """Round-trip latency for one IPC socket."""
+
+    requests: int = 0
+    errors: int = 0
+    connections_opened: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_ms: float = 0.0
+    recent_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_WINDOW))
+
+    def record(self, elapsed_ms: float, error: bool = False) -> None:
+        self.requests += 1
+        if error:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.last_ms = elapsed_ms
+        self.recent_ms.append(elapsed_ms)
+
+    def _percentile(self, fraction: float) -> Optional[float]:
+        if not self.recent_ms:
+            return None
+        ordered = sorted(self.recent_ms)
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return round(ordered[index], 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_opened": self.connections_opened,
+            "avg_ms": round(self.total_ms / self.requests, 2) if self.requests else None,
+            "p50_ms": self._percentile(0.5),
+            "p95_ms": self._percentile(0.95),
+            "max_ms": round(self.max_ms, 2),
+            "last_ms": round(self.last_ms, 2),
+        }
+
+
+@dataclass
+class _PooledSession:
+    session: aiohttp.ClientSession
+    loop: asyncio.AbstractEventLoop
+    socket_inode: int
+
+
+class IPCClientPool:
+    """Keeps one keep-alive ``aiohttp`` session per IPC socket."""
+
+    def __init__(self, pool_limit: int = DEFAULT_POOL_LIMIT, timeout: float = DEFAULT_TIMEOUT_SECONDS):
+        self._pool_limit = pool_limit
+        self._timeout = timeout
+        self._sessions: Dict[str, _PooledSession] = {}
+        self._stats: Dict[str, SocketLatencyStats] = {}
+
+    def _stats_for(self, key: str) -> SocketLatencyStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = SocketLatencyStats()
+        return stats
+
+    async def _get_session(self, key: str, socket_path: str) -> aiohttp.ClientSession:
+        try:
+            socket_inode = os.stat(socket_path).st_ino
+        except FileNotFoundError:
+            raise IPCUnavailableError(f"socket not found: {socket_path}")
+
+        loop = asyncio.get_running_loop()
+        pooled = self._sessions.get(key)
+        if pooled is not None:
+            # Sessions are bound to their loop, and a restarted bot creates a new socket file
+            # whose old pooled connections are dead
+            if pooled.loop is loop and pooled.socket_inode == socket_inode and not pooled.session.closed:
+                return pooled.session
+            if pooled.loop is loop:
+                await pooled.session.close()
+            self._sessions.pop(key, None)
+
+        connector = aiohttp.UnixConnector(path=socket_path, limit=self._pool_limit, keepalive_timeout=60)
+        session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self._timeout))
+        self._sessions[key] = _PooledSession(session=session, loop=loop, socket_inode=socket_inode)
+        self._stats_for(key).connections_opened += 1
+        logger.debug(f"Opened IPC connection pool for {key} at {socket_path}")
+        return session
+
+    async def request(
+        self,
+        channel_type: str,
+        instance_name: str,
+        method: str,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[int, Dict[str, Any]]:
+        """
+        Send a JSON request to a bot's IPC server over the pooled connection.
+
+        Args:
+            channel_type: Channel of the bot (e.g. "discord")
+            instance_name: Instance served by the bot
+            method: HTTP method
+            path: Route on the IPC server (e.g. "/send")
+            payload: Optional JSON body
+            timeout: Total timeout in seconds for this request (the pool default if None)
+
+        Returns:
+            Tuple[int, Dict[str, Any]]: HTTP status and decoded JSON body
+
+        Raises:
+            IPCUnavailableError: If the bot's socket does not exist
+            asyncio.TimeoutError / aiohttp.ClientError: On transport failures
+        """
+        key = f"{channel_type}-{instance_name}"
+        socket_path = IPCConfig.get_socket_path(channel_type, instance_name)
+        session = await self._get_session(key, socket_path)
+
+        request_options = {}
+        if timeout is not None:
+            request_options["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        started = time.perf_counter()
+        try:
+            # Host is ignored for Unix sockets
+            async with session.request(method, f"http://localhost{path}", json=payload, **request_options) as response:
+                body = await response.json()
+                status = response.status
+        except Exception:
+            self._stats_for(key).record((time.perf_counter() - started) * 1000, error=True)
+            raise
+
+        self._stats_for(key).record((time.perf_counter() - started) * 1000, error=status >= 500)
+        return status, body
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Latency and connection metrics per socket."""
+        return {key: stats.to_dict() for key, stats in self._stats.items()}
+
+    async def close(self) -> None:
+        """Close all pooled sessions owned by the running loop."""
+        loop = asyncio.get_running_loop()
+        for key, pooled in list(self._sessions.items()):
+            if pooled.loop is loop:
+                await pooled.session.close()
+            self._sessions.pop(key, None)
+
+
+# Global IPC client pool
+ipc_client_pool = IPCClientPool()
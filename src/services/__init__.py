@@ -3,3 +3,6 @@ Service layer for the Omnichannel Agent.
 
 This package contains services that coordinate between different components of the system.
 """
+
+# Hooks of the trace tables (search index DDL, rollups, live events)
+from src.services import trace_hooks  # noqa: F401
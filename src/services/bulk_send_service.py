@@ -0,0 +1,267 @@
+"""
+Bulk broadcast send service.
+
+Runs broadcast campaigns as background jobs with bounded concurrency and a
+per-instance rate limit, and keeps progress counters for status polling.
+"""
+
+import asyncio
+import logging
+import string
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from src.channels.message_sender import OmniChannelMessageSender
+from src.config import config
+from src.utils.datetime_utils import utcnow
+from src.utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Keep only the most recent errors per job so a failing campaign cannot grow unbounded
+MAX_RECORDED_ERRORS = 50
+
+
+class _TemplateVariables(dict):
+    """Format mapping that leaves unknown placeholders untouched."""
+
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+def render_template(template: str, variables: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Render a broadcast template with per-recipient variables.
+
+    Placeholders use ``str.format`` syntax (e.g. ``"Hi {name}"``). Placeholders
+    without a matching variable are left as-is instead of raising.
+    """
+    if not variables:
+        return template
+    return string.Formatter().vformat(template, (), _TemplateVariables(variables))
+
+
+@dataclass
+class BulkRecipient:
+    """A resolved broadcast recipient."""
+
+    recipient: str
+    variables: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BulkSendJob:
+    """Progress tracking for a single bulk send job."""
+
+    job_id: str
+    instance_name: str
+    total: int
+    max_concurrency: int
+    status: str = "queued"  # queued, running, completed, cancelled, failed
+    sent: int = 0
+    failed: int = 0
+    created_at: Any = field(default_factory=utcnow)
+    started_at: Optional[Any] = None
+    finished_at: Optional[Any] = None
+    errors: List[Dict[str, str]] = field(default_factory=list)
+    _started_monotonic: Optional[float] = None
+    _finished_monotonic: Optional[float] = None
+
+    @property
+    def pending(self) -> int:
+        return max(self.total - self.sent - self.failed, 0)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "cancelled", "failed")
+
+    @property
+    def throughput_per_second(self) -> float:
+        """Messages processed (sent or failed) per second since the job started."""
+        if self._started_monotonic is None:
+            return 0.0
+        end = self._finished_monotonic or time.monotonic()
+        elapsed = end - self._started_monotonic
+        if elapsed <= 0:
+            return 0.0
+        return round((self.sent + self.failed) / elapsed, 2)
+
+    def record_error(self, recipient: str, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_RECORDED_ERRORS:
+            self.errors.append({"recipient": recipient, "error": error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job progress to dictionary for API responses."""
+        return {
+            "job_id": self.job_id,
+            "instance_name": self.instance_name,
+            "status": self.status,
+            "total": self.total,
+            "sent": self.sent,
+            "failed": self.failed,
+            "pending": self.pending,
+            "max_concurrency": self.max_concurrency,
+            "throughput_per_second": self.throughput_per_second,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "errors": list(self.errors),
+        }
+
+
+class BulkSendService:
+    """Schedules bulk send jobs and tracks their progress in memory."""
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, BulkSendJob]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._rate_limiters: Dict[str, RateLimiter] = {}
+
+    def start_job(
+        self,
+        instance_config,
+        recipients: List[BulkRecipient],
+        template: str,
+        max_concurrency: Optional[int] = None,
+        send_kwargs: Optional[Dict[str, Any]] = None,
+        initial_errors: Optional[List[Dict[str, str]]] = None,
+    ) -> BulkSendJob:
+        """
+        Create a bulk send job and schedule it on the running event loop.
+
+        Args:
+            instance_config: Instance configuration used for every send
+            recipients: Resolved recipients with their template variables
+            template: Message template rendered per recipient
+            max_concurrency: Maximum in-flight sends (defaults to config)
+            send_kwargs: Extra keyword arguments forwarded to send_text_message
+            initial_errors: Recipients that failed resolution before scheduling
+
+        Returns:
+            BulkSendJob: The newly created job
+        """
+        concurrency = max(1, max_concurrency or config.bulk_send.max_concurrency)
+        initial_errors = initial_errors or []
+
+        job = BulkSendJob(
+            job_id=str(uuid.uuid4()),
+            instance_name=instance_config.name,
+            total=len(recipients) + len(initial_errors),
+            max_concurrency=concurrency,
+        )
+        for error in initial_errors:
+            job.record_error(error.get("recipient", ""), error.get("error", "unresolved recipient"))
+
+        self._remember(job)
+        task = asyncio.create_task(
+            self._run_job(job, instance_config, recipients, template, dict(send_kwargs or {})),
+            name=f"bulk-send-{job.job_id}",
+        )
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+
+        logger.info(
+            f"Scheduled bulk send job {job.job_id} for instance '{job.instance_name}' "
+            f"({job.total} recipients, concurrency={concurrency})"
+        )
+        return job
+
+    def get_job(self, job_id: str) -> Optional[BulkSendJob]:
+        """Get a job by ID."""
+        return self._jobs.get(job_id)
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a running job. Returns True if a running task was cancelled."""
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def _remember(self, job: BulkSendJob) -> None:
+        """Store a job, evicting the oldest finished jobs beyond the history size."""
+        self._jobs[job.job_id] = job
+        history_size = max(config.bulk_send.job_history_size, 1)
+        if len(self._jobs) <= history_size:
+            return
+        for job_id in [jid for jid, existing in self._jobs.items() if existing.is_finished]:
+            if len(self._jobs) <= history_size:
+                break
+            del self._jobs[job_id]
+
+    def _get_rate_limiter(self, instance_name: str) -> RateLimiter:
+        """Rate limiter shared by every job targeting the same instance."""
+        limiter = self._rate_limiters.get(instance_name)
+        if limiter is None:
+            limiter = RateLimiter(max_requests=max(config.bulk_send.rate_limit_per_minute, 1), time_window=60)
+            self._rate_limiters[instance_name] = limiter
+        return limiter
+
+    async def _acquire_rate_slot(self, instance_name: str) -> None:
+        """Wait until the instance rate limiter admits another send."""
+        limiter = self._get_rate_limiter(instance_name)
+        while not limiter.is_allowed(instance_name):
+            await asyncio.sleep(max(limiter.get_remaining_time(instance_name), 0.05))
+
+    async def _run_job(
+        self,
+        job: BulkSendJob,
+        instance_config,
+        recipients: List[BulkRecipient],
+        template: str,
+        send_kwargs: Dict[str, Any],
+    ) -> None:
+        job.status = "running"
+        job.started_at = utcnow()
+        job._started_monotonic = time.monotonic()
+
+        sender = OmniChannelMessageSender(instance_config)
+        semaphore = asyncio.Semaphore(job.max_concurrency)
+
+        async def send_one(item: BulkRecipient) -> None:
+            async with semaphore:
+                await self._acquire_rate_slot(job.instance_name)
+                try:
+                    text = render_template(template, item.variables)
+                    result = await sender.send_text_message(recipient=item.recipient, text=text, **send_kwargs)
+                    if result.get("success"):
+                        job.sent += 1
+                    else:
+                        job.record_error(item.recipient, str(result.get("error") or "send failed"))
+                except Exception as e:
+                    job.record_error(item.recipient, str(e))
+
+        # Feed recipients through a bounded window of tasks so large campaigns
+        # do not create one pending task per recipient up front.
+        window = job.max_concurrency * 2
+        in_flight: set = set()
+        try:
+            for item in recipients:
+                in_flight.add(asyncio.create_task(send_one(item)))
+                if len(in_flight) >= window:
+                    _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            if in_flight:
+                await asyncio.wait(in_flight)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            for task in in_flight:
+                task.cancel()
+            job.status = "cancelled"
+        except Exception as e:
+            logger.error(f"Bulk send job {job.job_id} aborted: {e}", exc_info=True)
+            job.status = "failed"
+        finally:
+            job.finished_at = utcnow()
+            job._finished_monotonic = time.monotonic()
+            logger.info(
+                f"Bulk send job {job.job_id} {job.status}: sent={job.sent}, failed={job.failed}, "
+                f"pending={job.pending}, throughput={job.throughput_per_second}/s"
+            )
+
+
+# Global bulk send service instance
+bulk_send_service = BulkSendService()
@@ -0,0 +1,276 @@
+"""
+Unified message store.
+
+Messages received by the WhatsApp webhook and the Discord bot, and messages
+sent through the Evolution API or Discord, are written once to the
+``messages`` table. Conversation timelines are read newest first from the
+``(instance_name, conversation_id, created_at, id)`` index with keyset
+pagination, so history never needs Evolution API queries or trace
+reconstruction.
+
+Recording is best effort: failures are logged and never interrupt message
+processing or delivery.
+"""
+
+import base64
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.config import config
+from src.db.message_models import Message
+from src.utils.datetime_utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+# WhatsApp message keys and the stored message type, in detection order
+WHATSAPP_MESSAGE_TYPES = (
+    ("reactionMessage", "reaction"),
+    ("imageMessage", "image"),
+    ("videoMessage", "video"),
+    ("audioMessage", "audio"),
+    ("documentMessage", "document"),
+    ("documentWithCaptionMessage", "document"),
+    ("stickerMessage", "sticker"),
+    ("contactMessage", "contact"),
+    ("locationMessage", "location"),
+)
+
+
+def _whatsapp_media(message_obj: Dict[str, Any]) -> Dict[str, Any]:
+    for key, _ in WHATSAPP_MESSAGE_TYPES[1:]:
+        media = message_obj.get(key)
+        if isinstance(media, dict):
+            if key == "documentWithCaptionMessage":
+                media = (media.get("message") or {}).get("documentMessage") or {}
+            return media
+    return {}
+
+
+def _from_epoch(timestamp: Any) -> Optional[datetime]:
+    try:
+        return datetime.fromtimestamp(int(timestamp), tz=timezone.utc) if timestamp else None
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class MessageStore:
+    """Writes messages to the ``messages`` table and reads conversation timelines."""
+
+    @staticmethod
+    def _store(db_session: Session, message: Message) -> Optional[Message]:
+        """Insert ``message`` unless its channel message id is already stored."""
+        if message.channel_message_id:
+            exists = (
+                db_session.query(Message.id)
+                .filter(
+                    Message.instance_name == message.instance_name,
+                    Message.channel == message.channel,
+                    Message.channel_message_id == message.channel_message_id,
+                )
+                .first()
+            )
+            if exists:
+                return None
+        try:
+            db_session.add(message)
+            db_session.commit()
+            return message
+        except IntegrityError:
+            # A concurrent delivery of the same message won the insert
+            db_session.rollback()
+            return None
+
+    @staticmethod
+    def record_whatsapp_webhook(
+        db_session: Session, instance_name: str, webhook: Dict[str, Any], trace_id: Optional[str] = None
+    ) -> Optional[Message]:
+        """
+        Store the message carried by an Evolution API webhook.
+
+        Messages sent from the connected number (``key.fromMe``) are stored as outbound;
+        events without a message (connection updates, receipts) are ignored.
+
+        Returns:
+            The stored message, or None when ignored, already stored or on failure
+        """
+        if not config.messages.enabled:
+            return None
+
+        try:
+            data = webhook.get("data") if isinstance(webhook, dict) else None
+            if not isinstance(data, dict):
+                return None
+            key = data.get("key") or {}
+            message_obj = data.get("message")
+            remote_jid = key.get("remoteJid")
+            if not isinstance(message_obj, dict) or not remote_jid or remote_jid == "status@broadcast":
+                return None
+
+            from_me = bool(key.get("fromMe"))
+            message_type = next((kind for name, kind in WHATSAPP_MESSAGE_TYPES if name in message_obj), "text")
+            media = _whatsapp_media(message_obj)
+            reaction = message_obj.get("reactionMessage") or {}
+            extended = message_obj.get("extendedTextMessage") or {}
+            context_info = extended.get("contextInfo") or media.get("contextInfo") or data.get("contextInfo") or {}
+            text = (
+                message_obj.get("conversation") or extended.get("text") or media.get("caption") or reaction.get("text")
+            )
+
+            message = Message(
+                instance_name=instance_name,
+                channel="whatsapp",
+                channel_message_id=key.get("id"),
+                conversation_id=remote_jid,
+                direction="outbound" if from_me else "inbound",
+                sender_id=key.get("participant") or (webhook.get("sender") if from_me else remote_jid),
+                sender_name=None if from_me else data.get("pushName"),
+                message_type=message_type,
+                text_content=text,
+                media_mime_type=media.get("mimetype"),
+                quoted_message_id=context_info.get("stanzaId"),
+                reaction_to_message_id=(reaction.get("key") or {}).get("id"),
+                trace_id=trace_id,
+                created_at=_from_epoch(data.get("messageTimestamp")) or utcnow(),
+            )
+            return MessageStore._store(db_session, message)
+
+        except Exception as e:
+            logger.error(f"Failed to store WhatsApp message for instance {instance_name}: {e}")
+            db_session.rollback()
+            return None
+
+    @staticmethod
+    def record_discord_message(
+        db_session: Session, instance_name: str, event: Dict[str, Any], trace_id: Optional[str] = None
+    ) -> Optional[Message]:
+        """Store a received Discord message, given the event serialized for its trace."""
+        if not config.messages.enabled:
+            return None
+
+        try:
+            channel = event.get("channel") or {}
+            if channel.get("id") is None:
+                return None
+            author = event.get("author") or {}
+            attachments = event.get("attachments") or []
+            message = Message(
+                instance_name=instance_name,
+                channel="discord",
+                channel_message_id=str(event["id"]) if event.get("id") is not None else None,
+                conversation_id=str(channel.get("id")),
+                direction="inbound",
+                sender_id=str(author.get("id")) if author.get("id") is not None else None,
+                sender_name=author.get("display_name") or author.get("username"),
+                message_type="media" if attachments else "text",
+                text_content=event.get("content"),
+                media_mime_type=attachments[0].get("content_type") if attachments else None,
+                trace_id=trace_id,
+            )
+            return MessageStore._store(db_session, message)
+
+        except Exception as e:
+            logger.error(f"Failed to store Discord message for instance {instance_name}: {e}")
+            db_session.rollback()
+            return None
+
+    @staticmethod
+    def record_outbound(
+        instance_name: str,
+        channel: str,
+        conversation_id: str,
+        text: Optional[str],
+        *,
+        message_type: str = "text",
+        channel_message_id: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        db_session: Optional[Session] = None,
+    ) -> Optional[Message]:
+        """
+        Store a message we sent.
+
+        Uses ``db_session`` when given, otherwise a short-lived session of its own
+        (senders run outside request scope).
+        """
+        if not config.messages.enabled or not conversation_id:
+            return None
+
+        managed_session = db_session is None
+        if managed_session:
+            from src.db.database import SessionLocal
+
+            db_session = SessionLocal()
+        try:
+            message = Message(
+                instance_name=instance_name,
+                channel=channel,
+                channel_message_id=channel_message_id,
+                conversation_id=str(conversation_id),
+                direction="outbound",
+                message_type=message_type,
+                text_content=text,
+                trace_id=trace_id,
+            )
+            return MessageStore._store(db_session, message)
+
+        except Exception as e:
+            logger.error(f"Failed to store outbound {channel} message for instance {instance_name}: {e}")
+            db_session.rollback()
+            return None
+
+        finally:
+            if managed_session:
+                db_session.close()
+
+    @staticmethod
+    def encode_cursor(message: Message) -> str:
+        """Opaque keyset cursor pointing just after ``message`` in (created_at, id) descending order."""
+        position = json.dumps([message.created_at.isoformat(), message.id])
+        return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        """
+        Decode a cursor produced by ``encode_cursor``.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            created_at, message_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            return datetime.fromisoformat(created_at), str(message_id)
+        except Exception as e:
+            raise ValueError(f"Invalid message cursor: {cursor!r}") from e
+
+    @staticmethod
+    def conversation_page(
+        db_session: Session,
+        instance_name: str,
+        conversation_id: str,
+        limit: int,
+        cursor: Optional[Tuple[datetime, str]] = None,
+    ) -> Tuple[List[Message], Optional[str]]:
+        """
+        One page of a conversation, newest first.
+
+        Returns:
+            The page of messages and the cursor for the next (older) page, None on the last page
+        """
+        query = db_session.query(Message).filter(
+            Message.instance_name == instance_name, Message.conversation_id == conversation_id
+        )
+        if cursor is not None:
+            query = query.filter(tuple_(Message.created_at, Message.id) < tuple_(*cursor))
+
+        # One extra row tells whether another page exists
+        messages = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+        if len(messages) <= limit:
+            return messages, None
+        messages = messages[:limit]
+        return messages, MessageStore.encode_cursor(messages[-1])
@@ -0,0 +1,350 @@
+"""
+Transactional outbox for outbound replies.
+
+Replies are written to ``outbox_messages`` in the same transaction as the trace
+update, then delivered by a background dispatcher that retries with jittered
+exponential backoff. Processing workers never wait on delivery retries, and
+pending rows survive restarts (delivery is at-least-once). Rows for the same
+recipient are delivered in the order they were enqueued.
+"""
+
+import logging
+import random
+import threading
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session, aliased
+
+from src.config import config
+from src.db.models import InstanceConfig
+from src.db.outbox_models import OutboxMessage
+from src.db.trace_models import MessageTrace
+from src.services.trace_writer import apply_status_update
+from src.utils.datetime_utils import utcnow
+
+if TYPE_CHECKING:
+    from src.services.trace_service import TraceContext
+
+logger = logging.getLogger(__name__)
+
+# Keys carrying inline media that are never needed to send a reply
+_HEAVY_KEYS = {"base64", "jpegThumbnail", "media_contents"}
+
+
+def _strip_heavy_fields(value: Any) -> Any:
+    """Drop inline media from a quoted message before persisting it."""
+    if isinstance(value, dict):
+        return {k: _strip_heavy_fields(v) for k, v in value.items() if k not in _HEAVY_KEYS}
+    if isinstance(value, list):
+        return [_strip_heavy_fields(item) for item in value]
+    return value
+
+
+def compute_backoff(attempts: int) -> float:
+    """
+    Delay in seconds before the next delivery attempt.
+
+    Uses "full jitter": a uniform draw between zero and the capped exponential delay,
+    so retries from many rows that failed together do not hit the channel in lockstep.
+    """
+    ceiling = min(config.outbox.backoff_max, config.outbox.backoff_base ** max(attempts, 1))
+    return random.uniform(0, ceiling)
+
+
+class OutboxService:
+    """Writes outbound messages to the outbox."""
+
+    @staticmethod
+    def enqueue_whatsapp_text(
+        db_session: Session,
+        instance_name: str,
+        recipient: str,
+        text: str,
+        quoted_message: Optional[Dict[str, Any]] = None,
+        trace_id: Optional[str] = None,
+        trace_context: Optional["TraceContext"] = None,
+    ) -> OutboxMessage:
+        """
+        Persist a WhatsApp text reply for delivery.
+
+        When a trace ID is given, the trace status update is committed in the same
+        transaction as the outbox row, so either both are stored or neither is. A
+        trace context also hands over its pending changes (agent timings, session
+        name) and the payloads an unsampled trace holds for the tail decision: the
+        dispatcher finishes the trace with its own context, so they would
+        otherwise never be written.
+
+        Args:
+            db_session: Database session used for the transaction
+            instance_name: Instance that sends the reply
+            recipient: WhatsApp JID of the recipient
+            text: Reply text
+            quoted_message: Optional message being replied to
+            trace_id: Optional trace to mark as sending
+            trace_context: Optional context of the trace (takes precedence over ``trace_id``)
+
+        Returns:
+            OutboxMessage: The persisted outbox row
+        """
+        pending = deferred = None
+        if trace_context is not None:
+            trace_id = trace_context.trace_id
+            pending = trace_context.take_pending()
+            deferred = trace_context.take_deferred_payloads()
+
+        message = OutboxMessage(
+            instance_name=instance_name,
+            channel_type="whatsapp",
+            recipient=recipient,
+            trace_id=trace_id,
+            status="pending",
+            attempts=0,
+            next_attempt_at=utcnow(),
+        )
+        payload = {
+            "text": text,
+            "quoted_message": _strip_heavy_fields(quoted_message) if quoted_message else None,
+        }
+        if deferred:
+            payload["trace"] = deferred
+        message.set_payload(payload)
+
+        try:
+            db_session.add(message)
+            if trace_id:
+                trace = db_session.query(MessageTrace).filter(MessageTrace.trace_id == trace_id).first()
+                if trace:
+                    if pending:
+                        apply_status_update(
+                            trace, pending.status, pending.error_message, pending.error_stage, pending.fields
+                        )
+                    trace.status = "sending"
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            # The caller falls back to sending directly and still owns the trace
+            if pending:
+                trace_context.restore_pending(pending)
+            if deferred:
+                trace_context.adopt_deferred_payloads(deferred)
+            raise
+
+        outbox_dispatcher.notify()
+        return message
+
+
+class OutboxDispatcher:
+    """Background thread that drains the outbox."""
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self._session_factory = session_factory
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self.is_running = False
+
+    def _new_session(self) -> Session:
+        if self._session_factory is None:
+            from src.db.database import SessionLocal
+
+            return SessionLocal()
+        return self._session_factory()
+
+    def start(self) -> None:
+        """Start the dispatcher thread; pending rows from a previous run are picked up immediately."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run_loop, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+        logger.info("Outbox dispatcher started")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the dispatcher thread."""
+        self.is_running = False
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        logger.info("Outbox dispatcher stopped")
+
+    def notify(self) -> None:
+        """Wake the dispatcher so freshly enqueued rows are sent without waiting for the poll interval."""
+        self._wake_event.set()
+
+    def _run_loop(self) -> None:
+        while not self._stop_event.is_set():
+            processed = 0
+            try:
+                processed = self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}", exc_info=True)
+
+            # Keep draining while full batches come back, otherwise sleep until woken
+            if processed < config.outbox.batch_size:
+                self._wake_event.wait(timeout=config.outbox.poll_interval)
+                self._wake_event.clear()
+
+    def dispatch_once(self) -> int:
+        """
+        Deliver one batch of due outbox rows.
+
+        Returns:
+            int: Number of rows processed
+        """
+        db_session = self._new_session()
+        try:
+            now = utcnow()
+            # Oldest rows first, whichever recipient they are for. A recipient's rows go out in id
+            # order: while an earlier row waits for its retry, later rows (e.g. the next chunks of
+            # the same reply) are held back
+            earlier = aliased(OutboxMessage)
+            waiting_for_retry = (
+                exists()
+                .where(
+                    earlier.status == "pending",
+                    earlier.instance_name == OutboxMessage.instance_name,
+                    earlier.recipient == OutboxMessage.recipient,
+                    earlier.id < OutboxMessage.id,
+                    earlier.next_attempt_at > now,
+                )
+                .correlate(OutboxMessage)
+            )
+            due: List[OutboxMessage] = (
+                db_session.query(OutboxMessage)
+                .filter(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now, ~waiting_for_retry)
+                .order_by(OutboxMessage.id.asc())
+                .limit(config.outbox.batch_size)
+                .all()
+            )
+            if not due:
+                return 0
+
+            instance_names = {row.instance_name for row in due}
+            instances = {
+                instance.name: instance
+                for instance in db_session.query(InstanceConfig).filter(InstanceConfig.name.in_(instance_names)).all()
+            }
+
+            held_back = set()
+            for row in due:
+                if self._stop_event.is_set():
+                    break
+                conversation = (row.instance_name, row.recipient)
+                if conversation in held_back:
+                    continue
+                self._deliver(db_session, row, instances.get(row.instance_name))
+                # Commit per row so a crash never re-sends rows already marked delivered
+                db_session.commit()
+                if row.status == "pending":
+                    held_back.add(conversation)
+
+            return len(due)
+        except Exception:
+            db_session.rollback()
+            raise
+        finally:
+            db_session.close()
+
+    def _deliver(self, db_session: Session, row: OutboxMessage, instance: Optional[InstanceConfig]) -> None:
+        payload = row.get_payload() or {}
+        send_payload = {
+            "recipient": row.recipient,
+            "text": payload.get("text", ""),
+            "has_quoted_message": payload.get("quoted_message") is not None,
+            "outbox_id": row.id,
+            "attempt": row.attempts + 1,
+        }
+
+        success = False
+        response_code = 500
+        error: Optional[str] = None
+
+        if instance is None:
+            error = f"Instance '{row.instance_name}' not found"
+        else:
+            try:
+                success = self._send(instance, row, payload)
+                response_code = 201 if success else 400
+                if not success:
+                    error = f"Evolution API returned {response_code}"
+            except Exception as e:
+                error = str(e)
+
+        row.attempts += 1
+        trace_context = self._trace_context(row, db_session, payload)
+
+        if success:
+            row.status = "delivered"
+            row.delivered_at = utcnow()
+            row.last_error = None
+            if trace_context:
+                trace_context.log_evolution_send(send_payload, response_code, True)
+            self._keep_deferred_payloads(row, payload, trace_context)
+            logger.info(f"Outbox message {row.id} delivered to {row.recipient} (attempt {row.attempts})")
+            return
+
+        row.last_error = error
+        if row.attempts >= config.outbox.max_attempts or instance is None:
+            row.status = "failed"
+            if trace_context:
+                trace_context.log_evolution_send(send_payload, response_code, False)
+            self._keep_deferred_payloads(row, payload, trace_context)
+            logger.error(f"Outbox message {row.id} failed permanently after {row.attempts} attempts: {error}")
+            return
+
+        delay = compute_backoff(row.attempts)
+        row.next_attempt_at = utcnow() + timedelta(seconds=delay)
+        if trace_context:
+            trace_context.log_stage(
+                "evolution_send",
+                send_payload,
+                "request",
+                response_code,
+                error_details=f"Attempt {row.attempts} failed, retrying in {delay:.1f}s: {error}",
+            )
+        self._keep_deferred_payloads(row, payload, trace_context)
+        logger.warning(f"Outbox message {row.id} attempt {row.attempts} failed ({error}); retrying in {delay:.1f}s")
+
+    @staticmethod
+    def _send(instance: InstanceConfig, row: OutboxMessage, payload: Dict[str, Any]) -> bool:
+        from src.channels.whatsapp.evolution_api_sender import EvolutionApiSender
+
+        sender = EvolutionApiSender(config_override=instance)
+        return sender.send_text_message(
+            recipient=row.recipient,
+            text=payload.get("text", ""),
+            quoted_message=payload.get("quoted_message"),
+        )
+
+    @staticmethod
+    def _trace_context(row: OutboxMessage, db_session: Session, payload: Dict[str, Any]):
+        if not row.trace_id:
+            return None
+        from src.services.trace_sampling import trace_sampler
+        from src.services.trace_service import TraceContext
+
+        # Same sampling and payload mode as the handler that created the trace
+        sampling = trace_sampler.decision_for(row.trace_id, row.instance_name, db_session)
+        trace_context = TraceContext(row.trace_id, db_session, sampling)
+        if payload.get("trace"):
+            trace_context.adopt_deferred_payloads(payload["trace"])
+        return trace_context
+
+    @staticmethod
+    def _keep_deferred_payloads(row: OutboxMessage, payload: Dict[str, Any], trace_context) -> None:
+        """Keep payloads still waiting for the tail decision on the row; drop them once it is made."""
+        handover = trace_context.take_deferred_payloads() if trace_context else None
+        if handover:
+            payload["trace"] = handover
+        elif payload.pop("trace", None) is None:
+            return
+        row.set_payload(payload)
+
+
+# Global outbox dispatcher instance
+outbox_dispatcher = OutboxDispatcher()
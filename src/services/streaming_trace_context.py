@@ -57,8 +57,8 @@ class StreamingTraceContext(TraceContext):
     - Streaming event metadata
     """
 
-    def __init__(self, trace_id: str, db_session):
-        super().__init__(trace_id, db_session)
+    def __init__(self, trace_id: str, db_session, sampling=None):
+        super().__init__(trace_id, db_session, sampling)
         self.streaming_metrics = StreamingMetrics()
         self._request_start_time = None
         self._agent_called_time = None
@@ -229,6 +229,8 @@ class StreamingTraceContext(TraceContext):
             error_stage=error_stage,
             agent_response_success=False,
         )
+        # "error" is not a terminal status, so write it now rather than waiting for the stream owner
+        self.flush()
 
         logger.error(f"Streaming error in {error_stage}: {error}")
 
@@ -0,0 +1,447 @@
+"""
+Cold archive for old trace payloads.
+
+Payloads are kept for audits but rarely read once they are a few days old.
+The retention worker moves ``trace_payloads`` rows older than
+``AUTOMAGIK_OMNI_TRACE_ARCHIVE_AFTER_DAYS`` into append-only segment files
+and deletes them from the database, so the hot table only holds recent
+payloads. ``TraceService.get_trace_payloads`` merges archived payloads back
+in, so callers do not need to know where a payload lives.
+
+Layout under the archive directory::
+
+    segment-<UTC time>.zst   one zstd frame per trace; each frame decompresses to a
+                             JSON line with the trace id and all of its payloads
+    segment-<UTC time>.idx   sidecar index: an 8-byte header, then fixed-width
+                             entries (8-byte trace id hash, offset, length)
+
+Every archival pass writes a new segment and sorts its index by hash when it
+finishes, so finding a trace is a binary search over each memory-mapped index
+and one seek into the segment. ``zstd -dc segment-*.zst`` yields plain NDJSON
+for audits.
+
+So that lookups do not slow down as passes accumulate, ``compact`` merges the
+segments of earlier days into one segment per day (``segment-<day>d<time>``)
+and those of earlier months into one per month (``segment-<month>m<time>``).
+Merging copies the compressed frames as they are and rewrites one sorted
+index. A lookup touches a segment per pass of today, per earlier day of this
+month and per earlier month. Only a bounded number of indexes stay mapped.
+
+Entries are appended and synced before the archived rows are deleted, so a
+crash can leave a payload in both the archive and the database (merged by
+payload id) but never in neither. An index left unsorted by a crash is sorted
+at the start of the next pass. A merged segment is published before its
+sources are removed, so a crash during compaction only leaves duplicates.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.config import config
+from src.db.trace_models import TracePayload
+from src.utils.datetime_utils import utcnow
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is a core dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".zst"
+INDEX_SUFFIX = ".idx"
+
+# Header: magic, flags; entries: trace id hash, segment offset, frame length
+INDEX_MAGIC = b"OTA1"
+INDEX_FLAG_SORTED = 1
+INDEX_HEADER = struct.Struct(">4sB3x")
+INDEX_ENTRY = struct.Struct(">8sQI")
+
+ARCHIVE_ZSTD_LEVEL = 9
+
+# Memory-mapped indexes kept open for lookups (least recently used are closed first)
+INDEX_CACHE_SIZE = 32
+
+# Segment name stamps: per pass (time), merged per day and merged per month
+SEGMENT_TIME_FORMAT = "%Y%m%dT%H%M%S%f"
+DAY_TAG = "d"
+MONTH_TAG = "m"
+
+PAYLOAD_FIELDS = (
+    "id",
+    "stage",
+    "payload_type",
+    "status_code",
+    "error_details",
+    "payload_size_original",
+    "contains_media",
+    "contains_base64",
+)
+
+
+def trace_key(trace_id: str) -> bytes:
+    """8-byte index key of a trace id."""
+    return hashlib.blake2b(trace_id.encode("utf-8"), digest_size=8).digest()
+
+
+def _read_index(path: Path) -> Tuple[bool, bytes]:
+    """(sorted flag, entry bytes) of an index file, ignoring a torn trailing entry."""
+    data = path.read_bytes()
+    if len(data) < INDEX_HEADER.size:
+        raise ValueError(f"{path.name} is not a trace archive index")
+    magic, flags = INDEX_HEADER.unpack_from(data)
+    if magic != INDEX_MAGIC:
+        raise ValueError(f"{path.name} is not a trace archive index")
+    entries = data[INDEX_HEADER.size :]
+    return bool(flags & INDEX_FLAG_SORTED), entries[: len(entries) - len(entries) % INDEX_ENTRY.size]
+
+
+class _SortedIndex:
+    """Memory-mapped finished index, searched by binary search."""
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = (len(self._map) - INDEX_HEADER.size) // INDEX_ENTRY.size
+
+    def find(self, key: bytes) -> List[Tuple[int, int]]:
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        matches = []
+        while low < self._count and self._key_at(low) == key:
+            _, offset, length = INDEX_ENTRY.unpack_from(self._map, INDEX_HEADER.size + low * INDEX_ENTRY.size)
+            matches.append((offset, length))
+            low += 1
+        return matches
+
+    def _key_at(self, position: int) -> bytes:
+        start = INDEX_HEADER.size + position * INDEX_ENTRY.size
+        return self._map[start : start + 8]
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+class SegmentWriter:
+    """Appends trace records to a new segment and its index; sorts the index on ``finish``."""
+
+    def __init__(self, segment_path: Path):
+        self.segment_path = segment_path
+        self.index_path = segment_path.with_suffix(INDEX_SUFFIX)
+        self._segment = open(segment_path, "xb")
+        self._index = open(self.index_path, "xb")
+        self._index.write(INDEX_HEADER.pack(INDEX_MAGIC, 0))
+        self._compressor = zstandard.ZstdCompressor(level=ARCHIVE_ZSTD_LEVEL)
+        self.records = 0
+
+    def append(self, trace_id: str, payloads: List[Dict[str, Any]]) -> None:
+        line = json.dumps({"trace_id": trace_id, "payloads": payloads}, ensure_ascii=False, separators=(",", ":"))
+        frame = self._compressor.compress(line.encode("utf-8") + b"\n")
+        offset = self._segment.tell()
+        self._segment.write(frame)
+        self._index.write(INDEX_ENTRY.pack(trace_key(trace_id), offset, len(frame)))
+        self.records += 1
+
+    def sync(self) -> None:
+        """Make appended records durable (before their rows are deleted)."""
+        for handle in (self._segment, self._index):
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def finish(self) -> None:
+        self.sync()
+        self._segment.close()
+        self._index.close()
+        if not self.records:
+            self.segment_path.unlink(missing_ok=True)
+            self.index_path.unlink(missing_ok=True)
+            return
+        sort_index(self.index_path)
+
+
+def _segment_stamp(segment_path: Path) -> str:
+    return segment_path.name[len("segment-") : -len(SEGMENT_SUFFIX)]
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def merge_segments(sources: List[Path], target: Path) -> None:
+    """
+    Write ``sources`` (oldest first) into one segment at ``target`` with a single sorted index.
+
+    Frames are copied unchanged; the target index is published last, so the
+    merged segment only becomes visible once it is complete.
+    """
+    target_index = target.with_suffix(INDEX_SUFFIX)
+    entries = []
+    with open(_tmp_path(target), "wb") as merged:
+        for source in sources:
+            _, source_entries = _read_index(source.with_suffix(INDEX_SUFFIX))
+            base = merged.tell()
+            with open(source, "rb") as handle:
+                shutil.copyfileobj(handle, merged)
+            entries.extend(
+                INDEX_ENTRY.pack(key, base + offset, length)
+                for key, offset, length in INDEX_ENTRY.iter_unpack(source_entries)
+            )
+        merged.flush()
+        os.fsync(merged.fileno())
+    with open(_tmp_path(target_index), "wb") as handle:
+        handle.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_FLAG_SORTED))
+        handle.write(b"".join(sorted(entries)))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(_tmp_path(target), target)
+    os.replace(_tmp_path(target_index), target_index)
+
+
+def sort_index(index_path: Path) -> None:
+    """Rewrite an index with its entries sorted by key and mark it finished."""
+    _, entries = _read_index(index_path)
+    size = INDEX_ENTRY.size
+    ordered = sorted(entries[i : i + size] for i in range(0, len(entries), size))
+    tmp_path = index_path.with_suffix(".idx.tmp")
+    with open(tmp_path, "wb") as handle:
+        handle.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_FLAG_SORTED))
+        handle.write(b"".join(ordered))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, index_path)
+
+
+def payload_record(payload: TracePayload) -> Dict[str, Any]:
+    """Archive record of a payload row (with its decompressed JSON)."""
+    record = {name: getattr(payload, name) for name in PAYLOAD_FIELDS}
+    record["timestamp"] = payload.timestamp.isoformat() if payload.timestamp else None
+    raw = payload.get_payload_bytes()
+    record["payload"] = json.loads(raw) if raw is not None else None
+    return record
+
+
+def payload_from_record(trace_id: str, record: Dict[str, Any]) -> TracePayload:
+    """Detached ``TracePayload`` rebuilt from an archive record."""
+    payload = TracePayload(trace_id=trace_id, **{name: record.get(name) for name in PAYLOAD_FIELDS})
+    payload.timestamp = datetime.fromisoformat(record["timestamp"]) if record.get("timestamp") else None
+    if record.get("payload") is not None:
+        raw = json.dumps(record["payload"], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        payload.set_payload_bytes(raw)
+        if record.get("payload_size_original") is not None:
+            payload.payload_size_original = record["payload_size_original"]
+    return payload
+
+
+def archive_batch(db_session: Session, writer: SegmentWriter, cutoff: datetime, batch_size: int) -> Dict[str, int]:
+    """
+    Archive every payload of up to ``batch_size`` traces with payloads older than ``cutoff``, then delete them.
+
+    Returns:
+        Dict with ``traces`` and ``payloads`` archived in this batch
+    """
+    trace_ids = {
+        trace_id
+        for (trace_id,) in db_session.query(TracePayload.trace_id)
+        .filter(TracePayload.timestamp < cutoff)
+        .order_by(TracePayload.timestamp, TracePayload.id)
+        .limit(batch_size)
+        .all()
+    }
+    if not trace_ids:
+        return {"traces": 0, "payloads": 0}
+
+    rows = (
+        db_session.query(TracePayload)
+        .filter(TracePayload.trace_id.in_(trace_ids))
+        .order_by(TracePayload.trace_id, TracePayload.timestamp, TracePayload.id)
+        .all()
+    )
+    by_trace: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_trace.setdefault(row.trace_id, []).append(payload_record(row))
+    for trace_id, records in by_trace.items():
+        writer.append(trace_id, records)
+    writer.sync()
+
+    payload_ids = [row.id for row in rows]
+    for row in rows:
+        db_session.expunge(row)
+    deleted = db_session.query(TracePayload).filter(TracePayload.id.in_(payload_ids)).delete(synchronize_session=False)
+    db_session.commit()
+    return {"traces": len(by_trace), "payloads": deleted}
+
+
+class TraceArchive:
+    """Segment files of archived payloads and lookups by trace id."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[Path, _SortedIndex]" = OrderedDict()
+        self._writing: Optional[Path] = None
+
+    @property
+    def root(self) -> Path:
+        return Path(self._directory or config.tracing.archive_directory)
+
+    def segments(self) -> List[Path]:
+        """Segment files with an index, newest first."""
+        if not self.root.is_dir():
+            return []
+        return sorted(
+            (path for path in self.root.glob(f"segment-*{SEGMENT_SUFFIX}") if path.with_suffix(INDEX_SUFFIX).exists()),
+            reverse=True,
+        )
+
+    def open_segment(self) -> SegmentWriter:
+        """Start a new segment (sorting indexes left unfinished by an interrupted pass first)."""
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; cannot archive trace payloads")
+        self.root.mkdir(parents=True, exist_ok=True)
+        for index_path in self.root.glob(f"segment-*{INDEX_SUFFIX}"):
+            if index_path.with_suffix(SEGMENT_SUFFIX) != self._writing and not _read_index(index_path)[0]:
+                logger.info(f"Sorting unfinished trace archive index {index_path.name}")
+                sort_index(index_path)
+        name = f"segment-{utcnow().strftime(SEGMENT_TIME_FORMAT)}{SEGMENT_SUFFIX}"
+        writer = SegmentWriter(self.root / name)
+        self._writing = writer.segment_path
+        return writer
+
+    def close_segment(self, writer: SegmentWriter) -> None:
+        try:
+            writer.finish()
+        finally:
+            self._writing = None
+
+    def compact(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Merge the segments of each earlier day, and of each earlier month, into one segment.
+
+        Returns:
+            Names of the merged segments written
+        """
+        if not self.root.is_dir():
+            return []
+        for leftover in self.root.glob("segment-*.tmp"):
+            leftover.unlink(missing_ok=True)
+        now = now or utcnow()
+        today, this_month = now.strftime("%Y%m%d"), now.strftime("%Y%m")
+        groups: Dict[str, List[Path]] = {}
+        for segment_path in sorted(self.segments()):
+            if segment_path == self._writing or not _read_index(segment_path.with_suffix(INDEX_SUFFIX))[0]:
+                continue
+            stamp = _segment_stamp(segment_path)
+            if stamp[:6] < this_month:
+                groups.setdefault(stamp[:6] + MONTH_TAG, []).append(segment_path)
+            elif stamp[6:8].isdigit() and stamp[:8] < today:
+                groups.setdefault(stamp[:8] + DAY_TAG, []).append(segment_path)
+
+        merged = []
+        for prefix, sources in groups.items():
+            if len(sources) < 2:
+                continue
+            target = self.root / f"segment-{prefix}{utcnow().strftime(SEGMENT_TIME_FORMAT)}{SEGMENT_SUFFIX}"
+            merge_segments(sources, target)
+            for source in sources:
+                self._forget(source)
+                source.with_suffix(INDEX_SUFFIX).unlink(missing_ok=True)
+                source.unlink(missing_ok=True)
+            logger.info(f"Merged {len(sources)} trace archive segments into {target.name}")
+            merged.append(target.name)
+        return merged
+
+    def _forget(self, segment_path: Path) -> None:
+        with self._lock:
+            index = self._indexes.pop(segment_path, None)
+            if index is not None:
+                index.close()
+
+    def _find(self, segment_path: Path, key: bytes) -> List[Tuple[int, int]]:
+        with self._lock:
+            index = self._indexes.get(segment_path)
+            if index is not None:
+                self._indexes.move_to_end(segment_path)
+                return index.find(key)
+
+        index_path = segment_path.with_suffix(INDEX_SUFFIX)
+        is_sorted, entries = _read_index(index_path)
+        if not is_sorted:
+            # Segment still being written: scan its entries
+            return [
+                (offset, length) for entry_key, offset, length in INDEX_ENTRY.iter_unpack(entries) if entry_key == key
+            ]
+        index = _SortedIndex(index_path)
+        with self._lock:
+            cached = self._indexes.setdefault(segment_path, index)
+            if cached is not index:
+                index.close()
+            self._indexes.move_to_end(segment_path)
+            while len(self._indexes) > INDEX_CACHE_SIZE:
+                _, evicted = self._indexes.popitem(last=False)
+                evicted.close()
+            # Searched under the lock so an eviction cannot unmap it mid-search
+            return cached.find(key)
+
+    def get_payloads(self, trace_id: str) -> List[TracePayload]:
+        """Archived payloads of a trace (detached ``TracePayload`` objects), oldest first."""
+        key = trace_key(trace_id)
+        payloads = []
+        seen_ids = set()
+        visited = set()
+        pending = self.segments()
+        while pending:
+            vanished = False
+            for segment_path in pending:
+                visited.add(segment_path)
+                try:
+                    locations = self._find(segment_path, key)
+                    if not locations:
+                        continue
+                    with open(segment_path, "rb") as segment:
+                        for offset, length in locations:
+                            segment.seek(offset)
+                            record = json.loads(zstandard.ZstdDecompressor().decompress(segment.read(length)))
+                            if record["trace_id"] != trace_id:
+                                continue
+                            for item in record["payloads"]:
+                                # An interrupted pass can archive a payload again in a later segment
+                                if item.get("id") not in seen_ids:
+                                    seen_ids.add(item.get("id"))
+                                    payloads.append(payload_from_record(trace_id, item))
+                except FileNotFoundError:
+                    # Merged away by a compaction since it was listed: its merged segment is listed next time
+                    self._forget(segment_path)
+                    vanished = True
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not read trace archive segment {segment_path.name}: {e}")
+            pending = [path for path in self.segments() if path not in visited] if vanished else []
+        return sorted(payloads, key=lambda payload: (payload.timestamp or datetime.min, payload.id or 0))
+
+    def reset(self) -> None:
+        """Close cached indexes (after segments were moved or removed)."""
+        with self._lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
+
+
+# Global trace archive
+trace_archive = TraceArchive()
@@ -0,0 +1,199 @@
+"""
+Out-of-line storage for media embedded in trace payloads.
+
+Webhook and agent payloads carry whole media files as base64 strings
+(``base64``, ``jpegThumbnail``, ``media_contents[].data``). Before a payload is
+stored in ``trace_payloads`` those values are written to a content-addressed
+store on disk and replaced with a ``blob:<sha256>`` reference, so the trace
+tables only hold the small JSON around them. The same media referenced by
+several stages (webhook, agent request, ...) is stored once.
+
+Layout under the blob directory::
+
+    <aa>/<sha256>   value bytes, named by the SHA-256 of the content
+
+Blobs have their own retention (``AUTOMAGIK_OMNI_TRACE_BLOB_RETENTION_DAYS``):
+storing a blob again refreshes its modification time, and ``cleanup`` removes
+blobs not referenced for longer than the retention period.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = "blob:"
+
+# Keys whose string values hold inline media
+MEDIA_KEYS = {"base64", "jpegThumbnail"}
+# List keys whose items keep their media in ``data``
+MEDIA_LIST_KEYS = {"media_contents": "data"}
+
+# Shorter values stay inline; a reference would not be much smaller
+MIN_BLOB_SIZE = 256
+
+# Characters kept from a payload that is still above the size cap after media is removed
+TRUNCATED_PREVIEW_SIZE = 4096
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class TraceBlobStore:
+    """Content-addressed blob files with mtime-based retention."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self.blobs_written = 0
+        self.blobs_deduplicated = 0
+
+    @property
+    def root(self) -> Path:
+        return Path(self._directory or config.tracing.blob_directory)
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self.root / content_hash[:2] / content_hash
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` (once per content) and return its SHA-256 hex digest."""
+        content_hash = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(content_hash)
+        if blob_path.exists():
+            # Refresh retention for content that is still being referenced
+            os.utime(blob_path)
+            self.blobs_deduplicated += 1
+            return content_hash
+
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=blob_path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_name, blob_path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        self.blobs_written += 1
+        return content_hash
+
+    def get(self, content_hash: str) -> Optional[bytes]:
+        """Blob contents, or None if unknown or already removed by retention."""
+        if not _HASH_RE.match(content_hash or ""):
+            return None
+        try:
+            return self._blob_path(content_hash).read_bytes()
+        except OSError:
+            return None
+
+    def cleanup(self, retention_days: Optional[int] = None) -> Dict[str, int]:
+        """
+        Delete blobs not stored or referenced within the retention period.
+
+        Returns:
+            Dict with ``blobs_deleted`` and ``bytes_freed``
+        """
+        days = config.tracing.blob_retention_days if retention_days is None else retention_days
+        cutoff = time.time() - days * 86400
+        result = {"blobs_deleted": 0, "bytes_freed": 0}
+        if not self.root.exists():
+            return result
+
+        for path in self.root.glob("*/*"):
+            try:
+                stat = path.stat()
+                if stat.st_mtime >= cutoff:
+                    continue
+                path.unlink()
+            except OSError:
+                continue
+            result["blobs_deleted"] += 1
+            result["bytes_freed"] += stat.st_size
+
+        if result["blobs_deleted"]:
+            logger.info(
+                f"Trace blob cleanup removed {result['blobs_deleted']} blobs ({result['bytes_freed']} bytes) "
+                f"older than {days} days"
+            )
+        return result
+
+    def _externalize_value(self, value: Any) -> Tuple[Any, int]:
+        if not isinstance(value, str) or len(value) < MIN_BLOB_SIZE or value.startswith(BLOB_PREFIX):
+            return value, 0
+        try:
+            return f"{BLOB_PREFIX}{self.put(value.encode('utf-8'))}", 1
+        except OSError as e:
+            # Never keep the media inline: drop it and record its size
+            logger.warning(f"Could not store trace blob ({len(value)} chars): {e}")
+            return f"<omitted {len(value)} chars>", 0
+
+    def externalize(self, value: Any) -> Tuple[Any, int]:
+        """
+        Replace inline media in a payload with blob references.
+
+        The payload is not modified; containers holding media are copied.
+
+        Returns:
+            Tuple of (payload to store, number of blobs referenced)
+        """
+        if isinstance(value, dict):
+            result = {}
+            count = 0
+            for key, item in value.items():
+                if key in MEDIA_KEYS:
+                    item, found = self._externalize_value(item)
+                elif key in MEDIA_LIST_KEYS and isinstance(item, list):
+                    item, found = self._externalize_list(item, MEDIA_LIST_KEYS[key])
+                else:
+                    item, found = self.externalize(item)
+                result[key] = item
+                count += found
+            return result, count
+        if isinstance(value, list):
+            items = [self.externalize(item) for item in value]
+            return [item for item, _ in items], sum(found for _, found in items)
+        return value, 0
+
+    def _externalize_list(self, items: list, data_key: str) -> Tuple[list, int]:
+        result = []
+        count = 0
+        for item in items:
+            if isinstance(item, dict) and data_key in item:
+                item = dict(item)
+                item[data_key], found = self._externalize_value(item[data_key])
+                count += found
+            item, found = self.externalize(item)
+            result.append(item)
+            count += found
+        return result, count
+
+    def get_stats(self) -> Dict[str, int]:
+        """Counters for monitoring."""
+        return {"blobs_written": self.blobs_written, "blobs_deduplicated": self.blobs_deduplicated}
+
+
+def cap_payload_json(json_str: str, max_size: int) -> str:
+    """Replace a serialized payload above ``max_size`` characters with a truncated preview."""
+    if max_size <= 0 or len(json_str) <= max_size:
+        return json_str
+    return json.dumps(
+        {
+            "_truncated": True,
+            "original_size": len(json_str),
+            "preview": json_str[: min(TRUNCATED_PREVIEW_SIZE, max_size // 2)],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+# Global trace blob store
+trace_blob_store = TraceBlobStore()
@@ -0,0 +1,299 @@
+"""
+Trace payload compression.
+
+Payloads are stored as raw bytes in ``trace_payloads.payload_data``, compressed
+with zstd. Webhook payloads of one stage are highly repetitive, so a zstd
+dictionary can be trained per stage from stored payloads. Every trained
+dictionary is kept as a new versioned row in ``trace_compression_dicts``. Each
+payload records the dictionary id it was compressed with, so rows written with
+older dictionaries stay readable after retraining.
+
+Codecs (``trace_payloads.payload_codec``):
+    zlib  raw zlib stream (rows migrated from the legacy base64 column, or zstd unavailable)
+    zstd  zstd frame, with a dictionary when ``payload_dict_id`` is set
+
+Rows written before the binary column existed keep ``payload_compressed``
+(base64 + zlib) until they are migrated.
+"""
+
+import base64
+import logging
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from src.config import config
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is a core dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+DEFAULT_DICT_SIZE = 64 * 1024
+DEFAULT_TRAINING_SAMPLES = 2000
+MIN_TRAINING_SAMPLES = 50
+
+
+def stage_scope(stage: Optional[str]) -> str:
+    """Dictionary scope for payloads of a stage."""
+    return f"stage:{stage or 'unknown'}"
+
+
+class PayloadCodec:
+    """Compresses payloads with the active dictionary of their stage and decompresses any stored version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dicts: Dict[int, Any] = {}  # dict id -> ZstdCompressionDict
+        self._active: Dict[str, int] = {}  # scope -> dict id used for new payloads
+
+    @property
+    def available(self) -> bool:
+        return zstandard is not None
+
+    def register(self, dict_id: int, scope: str, dict_data: bytes, active: bool = True) -> None:
+        """Make a stored dictionary usable; ``active`` dictionaries are used for new payloads of their scope."""
+        if not self.available:
+            return
+        zstd_dict = zstandard.ZstdCompressionDict(dict_data)
+        with self._lock:
+            self._dicts[dict_id] = zstd_dict
+            if active and dict_id >= self._active.get(scope, -1):
+                self._active[scope] = dict_id
+
+    def load(self, db_session: Session) -> int:
+        """Register the newest dictionary of every scope; returns how many were loaded."""
+        from src.db.trace_models import TraceCompressionDict
+
+        if not self.available:
+            return 0
+        latest = (
+            db_session.query(func.max(TraceCompressionDict.id)).group_by(TraceCompressionDict.scope).scalar_subquery()
+        )
+        rows = db_session.query(TraceCompressionDict).filter(TraceCompressionDict.id.in_(latest)).all()
+        for row in rows:
+            self.register(row.id, row.scope, row.dict_data)
+        return len(rows)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._dicts.clear()
+            self._active.clear()
+
+    def compress(self, raw: bytes, stage: Optional[str]) -> Tuple[bytes, str, Optional[int]]:
+        """
+        Compress a serialized payload.
+
+        Returns:
+            Tuple of (compressed bytes, codec, dictionary id or None)
+        """
+        if not self.available:
+            return zlib.compress(raw), CODEC_ZLIB, None
+
+        dict_id = self._active.get(stage_scope(stage))
+        zstd_dict = self._dicts.get(dict_id) if dict_id is not None else None
+        # Compressor objects are not thread-safe; they are cheap to create per payload
+        compressor = zstandard.ZstdCompressor(level=config.tracing.zstd_level, dict_data=zstd_dict)
+        return compressor.compress(raw), CODEC_ZSTD, dict_id if zstd_dict is not None else None
+
+    def decompress(
+        self, data: bytes, codec: Optional[str], dict_id: Optional[int] = None, db_session: Optional[Session] = None
+    ) -> bytes:
+        """Decompress bytes produced by ``compress`` with any codec/dictionary version."""
+        if codec == CODEC_ZLIB or codec is None:
+            return zlib.decompress(data)
+        if codec != CODEC_ZSTD:
+            raise ValueError(f"Unknown payload codec: {codec}")
+        if not self.available:
+            raise RuntimeError("zstandard is not installed; cannot read zstd trace payloads")
+
+        zstd_dict = None
+        if dict_id is not None:
+            zstd_dict = self._dicts.get(dict_id) or self._load_dict(dict_id, db_session)
+        return zstandard.ZstdDecompressor(dict_data=zstd_dict).decompress(data)
+
+    def _load_dict(self, dict_id: int, db_session: Optional[Session]) -> Any:
+        from src.db.trace_models import TraceCompressionDict
+
+        managed = db_session is None
+        if managed:
+            from src.db.database import SessionLocal
+
+            db_session = SessionLocal()
+        try:
+            row = db_session.get(TraceCompressionDict, dict_id)
+            if row is None:
+                raise LookupError(f"Compression dictionary {dict_id} not found")
+            # Older versions are registered for reading only
+            self.register(row.id, row.scope, row.dict_data, active=False)
+            return self._dicts[dict_id]
+        finally:
+            if managed:
+                db_session.close()
+
+
+# Global payload codec
+payload_codec = PayloadCodec()
+
+
+def train_stage_dictionaries(
+    db_session: Session,
+    stages: Optional[List[str]] = None,
+    samples_per_stage: int = DEFAULT_TRAINING_SAMPLES,
+    dict_size: int = DEFAULT_DICT_SIZE,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Train a new dictionary version per stage from the most recent stored payloads.
+
+    Args:
+        db_session: Database session
+        stages: Stages to train (default: every stage with enough payloads)
+        samples_per_stage: Maximum payloads sampled per stage
+        dict_size: Target dictionary size in bytes
+
+    Returns:
+        Mapping of stage to {"dict_id", "samples", "dict_size"} for every trained dictionary
+    """
+    from src.db.trace_models import TraceCompressionDict, TracePayload
+
+    if not payload_codec.available:
+        logger.warning("zstandard is not installed; skipping dictionary training")
+        return {}
+
+    if stages is None:
+        stages = [
+            stage
+            for (stage,) in db_session.query(TracePayload.stage)
+            .group_by(TracePayload.stage)
+            .having(func.count(TracePayload.id) >= MIN_TRAINING_SAMPLES)
+            .all()
+        ]
+
+    trained = {}
+    for stage in stages:
+        rows = (
+            db_session.query(TracePayload)
+            .filter(TracePayload.stage == stage)
+            .order_by(TracePayload.id.desc())
+            .limit(samples_per_stage)
+            .all()
+        )
+        samples = [raw for raw in (row.get_payload_bytes() for row in rows) if raw]
+        if len(samples) < MIN_TRAINING_SAMPLES:
+            continue
+
+        try:
+            zstd_dict = zstandard.train_dictionary(dict_size, samples)
+        except zstandard.ZstdError as e:
+            logger.warning(f"Could not train compression dictionary for stage {stage}: {e}")
+            continue
+
+        row = TraceCompressionDict(
+            scope=stage_scope(stage),
+            dict_data=zstd_dict.as_bytes(),
+            dict_size=len(zstd_dict.as_bytes()),
+            sample_count=len(samples),
+        )
+        db_session.add(row)
+        db_session.commit()
+        payload_codec.register(row.id, row.scope, row.dict_data)
+        trained[stage] = {"dict_id": row.id, "samples": len(samples), "dict_size": row.dict_size}
+        logger.info(f"Trained compression dictionary v{row.id} for stage {stage} from {len(samples)} payloads")
+
+    return trained
+
+
+def recompress_payloads(
+    db_session: Session,
+    batch_size: int = 500,
+    stages: Optional[List[str]] = None,
+    max_rows: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Rewrite stored payloads with the active dictionary of their stage, in batches.
+
+    Legacy base64 rows, zlib rows and rows compressed with an older dictionary
+    version are rewritten; rows already on the active dictionary are skipped.
+
+    Returns:
+        Report with rows rewritten and stored bytes before/after
+    """
+    from src.db.trace_models import TracePayload
+
+    report = {"rows": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = 0
+
+    while max_rows is None or report["rows"] < max_rows:
+        query = db_session.query(TracePayload).filter(TracePayload.id > last_id)
+        if stages:
+            query = query.filter(TracePayload.stage.in_(stages))
+        rows = query.order_by(TracePayload.id.asc()).limit(batch_size).all()
+        if not rows:
+            break
+
+        for row in rows:
+            last_id = row.id
+            active_dict = payload_codec._active.get(stage_scope(row.stage))
+            if row.payload_codec == CODEC_ZSTD and row.payload_dict_id == active_dict:
+                continue
+
+            before = row.stored_size
+            raw = row.get_payload_bytes()
+            if raw is None:
+                continue
+            row.set_payload_bytes(raw)
+            report["rows"] += 1
+            report["bytes_before"] += before
+            report["bytes_after"] += row.stored_size
+
+        # One commit per batch keeps transactions short on large tables
+        db_session.commit()
+        db_session.expunge_all()
+
+    return finalize_report(report)
+
+
+def finalize_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Add derived totals to a bytes-saved report."""
+    report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+    report["saved_percent"] = (
+        round(100.0 * report["bytes_saved"] / report["bytes_before"], 1) if report["bytes_before"] else 0.0
+    )
+    return report
+
+
+def storage_report(db_session: Session) -> Dict[str, Any]:
+    """Stored payload bytes per codec (legacy base64 rows are reported as ``legacy``)."""
+    from src.db.trace_models import TracePayload
+
+    codec = func.coalesce(TracePayload.payload_codec, "legacy")
+    rows = (
+        db_session.query(
+            codec,
+            func.count(TracePayload.id),
+            func.sum(TracePayload.payload_size_original),
+            func.sum(
+                func.coalesce(func.length(TracePayload.payload_data), func.length(TracePayload.payload_compressed))
+            ),
+        )
+        .filter(or_(TracePayload.payload_data.isnot(None), TracePayload.payload_compressed.isnot(None)))
+        .group_by(codec)
+        .all()
+    )
+    return {
+        name: {"rows": count, "bytes_original": int(original or 0), "bytes_stored": int(stored or 0)}
+        for name, count, original, stored in rows
+    }
+
+
+def decode_legacy_payload(payload_compressed: str) -> bytes:
+    """Raw JSON bytes of a legacy base64 + zlib payload."""
+    return zlib.decompress(base64.b64decode(payload_compressed.encode("ascii")))
@@ -0,0 +1,204 @@
+"""
+Live trace lifecycle events.
+
+Trace rows are watched at the ORM level (see ``src/services/trace_hooks.py``):
+inserts and status changes of ``MessageTrace`` are collected as they are flushed
+and published once their transaction commits, so every writer (request
+handlers, the background trace writer, channel threads) feeds the same stream
+without polling the database.
+
+The broker fans each event out to subscribers (``GET /traces/stream``), each
+with its own bounded buffer. A subscriber that falls behind loses its oldest
+buffered events and is told how many were dropped; publishers never block.
+With no subscribers nothing is collected or copied.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+# Session.info key holding events of the current transaction
+PENDING_EVENTS_KEY = "trace_events"
+
+
+class TraceSubscription:
+    """One subscriber: its filters, bounded buffer and wake-up event."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        buffer_size: int,
+        instance_name: Optional[str] = None,
+        phone: Optional[str] = None,
+        statuses: Optional[FrozenSet[str]] = None,
+    ):
+        self.instance_name = instance_name
+        self.phone = phone
+        self.statuses = statuses
+        self.dropped = 0
+        self._loop = loop
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return (
+            (self.instance_name is None or event["instance_name"] == self.instance_name)
+            and (self.phone is None or event["sender_phone"] == self.phone)
+            and (self.statuses is None or event["status"] in self.statuses)
+        )
+
+    def push(self, event: Dict[str, Any]) -> bool:
+        """Buffer an event from any thread; returns False when it displaced the oldest one."""
+        with self._lock:
+            was_empty = not self._buffer
+            kept = len(self._buffer) < self._buffer.maxlen
+            if not kept:
+                self.dropped += 1
+            self._buffer.append(event)
+        if was_empty:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                # The subscriber's event loop has closed
+                pass
+        return kept
+
+    async def next_batch(self, timeout: float) -> List[Dict[str, Any]]:
+        """
+        Wait up to ``timeout`` seconds for buffered events and take them all.
+
+        A ``{"event": "dropped", "count": n}`` entry leads the batch when events
+        were discarded since the last call.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            events.insert(0, {"event": "dropped", "count": dropped})
+        return events
+
+
+class TraceEventBroker:
+    """Fans trace events out to live subscribers."""
+
+    def __init__(self):
+        self._subscribers: List[TraceSubscription] = []
+        self._lock = threading.Lock()
+        self.events_published = 0
+        self.events_dropped = 0
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscribers)
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= config.tracing.stream_max_subscribers
+
+    def subscribe(
+        self,
+        instance_name: Optional[str] = None,
+        phone: Optional[str] = None,
+        statuses: Optional[FrozenSet[str]] = None,
+    ) -> Optional[TraceSubscription]:
+        """Register a subscriber on the running event loop (None when the subscriber limit is reached)."""
+        subscription = TraceSubscription(
+            asyncio.get_running_loop(), config.tracing.stream_buffer_size, instance_name, phone, statuses
+        )
+        with self._lock:
+            if self.full:
+                return None
+            # Copy on write so publishers iterate without the lock
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: TraceSubscription) -> None:
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscription]
+
+    def publish(self, events: List[Dict[str, Any]]) -> None:
+        """Deliver events to every subscriber whose filters match."""
+        subscribers = self._subscribers
+        for event in events:
+            self.events_published += 1
+            for subscription in subscribers:
+                if subscription.matches(event) and not subscription.push(event):
+                    self.events_dropped += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "events_published": self.events_published,
+            "events_dropped": self.events_dropped,
+        }
+
+
+trace_events = TraceEventBroker()
+
+
+def _isoformat(value: Any) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def trace_event(kind: str, trace: Any, previous_status: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "event": kind,
+        "trace_id": trace.trace_id,
+        "instance_name": trace.instance_name,
+        "sender_phone": trace.sender_phone,
+        "message_type": trace.message_type,
+        "status": trace.status,
+        "previous_status": previous_status,
+        "error_stage": trace.error_stage,
+        "error_message": trace.error_message,
+        "received_at": _isoformat(trace.received_at),
+        "completed_at": _isoformat(trace.completed_at),
+        "total_processing_time_ms": trace.total_processing_time_ms,
+    }
+
+
+def collect_trace_event(session: Session, trace: Any, inserted: bool) -> None:
+    """
+    Queue the event of a trace a flush inserts, or whose status it changes.
+
+    Called for every trace row of a flush (see ``src/services/trace_hooks.py``); the
+    events are published by ``publish_trace_events`` after the transaction commits
+    and discarded if it rolls back.
+    """
+    if not trace_events.active:
+        return
+
+    if inserted:
+        event = trace_event("created", trace)
+    else:
+        history = inspect(trace).attrs.status.history
+        if not history.has_changes():
+            return
+        event = trace_event("status", trace, history.deleted[0] if history.deleted else None)
+    session.info.setdefault(PENDING_EVENTS_KEY, []).append(event)
+
+
+def publish_trace_events(session: Session) -> None:
+    events = session.info.pop(PENDING_EVENTS_KEY, None)
+    if events:
+        trace_events.publish(events)
+
+
+def discard_trace_events(session: Session) -> None:
+    session.info.pop(PENDING_EVENTS_KEY, None)
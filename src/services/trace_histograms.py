@@ -0,0 +1,127 @@
+"""
+Mergeable latency histograms for trace analytics.
+
+Latencies are counted in logarithmic buckets (the DDSketch layout): bucket ``i``
+holds values in ``(GAMMA**(i-1), GAMMA**i]`` milliseconds, so any quantile read
+back from a histogram is within ``HISTOGRAM_RELATIVE_ACCURACY`` of the true
+value. The layout is fixed, so histograms from different instances and time
+buckets merge by adding counts per bucket index, which is what the rollup
+tables store (``trace_latency_minute`` / ``trace_latency_hour``).
+
+Stages measured per terminal trace:
+
+- ``queue``: received until the agent was called
+- ``agent``: agent processing time
+- ``send``: agent response until the reply was sent
+- ``total``: total processing time
+"""
+
+import math
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+HISTOGRAM_RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + HISTOGRAM_RELATIVE_ACCURACY) / (1 - HISTOGRAM_RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+LATENCY_STAGES = ("queue", "agent", "send", "total")
+REPORTED_QUANTILES = (("p50", 0.50), ("p90", 0.90), ("p99", 0.99))
+
+# Trace attributes the stage latencies are derived from
+LATENCY_ATTRIBUTES = (
+    "received_at",
+    "agent_request_at",
+    "agent_response_at",
+    "evolution_send_at",
+    "agent_processing_time_ms",
+    "total_processing_time_ms",
+)
+
+
+def histogram_bucket(ms: float) -> int:
+    """Bucket index of a latency (values up to 1 ms share bucket 0)."""
+    if ms <= 1:
+        return 0
+    return math.ceil(math.log(ms) / _LOG_GAMMA)
+
+
+def bucket_value(index: int) -> float:
+    """Representative latency of a bucket (within the relative accuracy of every value in it)."""
+    return 2 * GAMMA**index / (GAMMA + 1)
+
+
+def _elapsed_ms(start: Optional[datetime], end: Optional[datetime]) -> Optional[int]:
+    if start is None or end is None:
+        return None
+    # Stored timestamps are naive UTC; some in-flight values are aware
+    if start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    return round((end - start).total_seconds() * 1000)
+
+
+def stage_latencies(values: Dict[str, Any]) -> Tuple[Tuple[str, int], ...]:
+    """``(stage, ms)`` pairs for the stages a trace has timings for."""
+    agent = values.get("agent_processing_time_ms")
+    if agent is None:
+        agent = _elapsed_ms(values.get("agent_request_at"), values.get("agent_response_at"))
+    latencies = (
+        ("queue", _elapsed_ms(values.get("received_at"), values.get("agent_request_at"))),
+        ("agent", agent),
+        ("send", _elapsed_ms(values.get("agent_response_at"), values.get("evolution_send_at"))),
+        ("total", values.get("total_processing_time_ms")),
+    )
+    return tuple((stage, ms) for stage, ms in latencies if ms is not None and ms >= 0)
+
+
+class LatencyHistogram:
+    """Sparse bucket counts of one stage's latencies."""
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None):
+        self.counts: Counter = Counter(counts or {})
+
+    @property
+    def count(self) -> int:
+        return sum(count for count in self.counts.values() if count > 0)
+
+    def add(self, ms: float, count: int = 1) -> None:
+        self.counts[histogram_bucket(ms)] += count
+
+    def add_bucket(self, index: int, count: int) -> None:
+        self.counts[index] += count
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts.update(other.counts)
+
+    def _buckets(self) -> Iterable[Tuple[int, int]]:
+        return sorted((index, count) for index, count in self.counts.items() if count > 0)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Latency at quantile ``q`` (0..1, nearest-rank), None when empty."""
+        buckets = list(self._buckets())
+        total = sum(count for _, count in buckets)
+        if not total:
+            return None
+        rank = max(1, math.ceil(q * total))
+        seen = 0
+        for index, count in buckets:
+            seen += count
+            if seen >= rank:
+                return bucket_value(index)
+        return bucket_value(buckets[-1][0])
+
+    def max(self) -> Optional[float]:
+        buckets = list(self._buckets())
+        return bucket_value(buckets[-1][0]) if buckets else None
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, p50/p90/p99 and max in milliseconds (rounded to 0.1 ms)."""
+        result: Dict[str, Any] = {"count": self.count}
+        for name, q in REPORTED_QUANTILES:
+            value = self.quantile(q)
+            result[name] = round(value, 1) if value is not None else None
+        value = self.max()
+        result["max"] = round(value, 1) if value is not None else None
+        return result
@@ -0,0 +1,74 @@
+"""
+Database hooks of the trace tables.
+
+They live in the service layer so the models in ``src/db/trace_models.py``
+do not depend on it; importing ``src.services`` installs them.
+
+- The SQLite FTS5 table of ``message_traces`` is created and dropped with the
+  table (see ``trace_search``).
+- Every ``MessageTrace`` row a flush inserts or updates queues its rollup
+  change (``trace_rollups``) and live event (``trace_events``). Only sessions
+  that write traces get listeners: they apply the rollups once the flush has
+  run, publish the events after the commit and drop both on rollback. Sessions
+  that never touch a trace pay nothing.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from src.db.trace_models import MessageTrace
+from src.services.trace_events import collect_trace_event, discard_trace_events, publish_trace_events
+from src.services.trace_rollups import apply_trace_rollups, discard_trace_rollups, record_trace_change
+from src.services.trace_search import create_fts_table, drop_fts_table
+
+# Session.info flag of sessions that already have the trace listeners
+WATCHED_SESSION_KEY = "trace_hooks"
+
+
+@event.listens_for(MessageTrace.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    create_fts_table(connection)
+
+
+@event.listens_for(MessageTrace.__table__, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    drop_fts_table(connection)
+
+
+@event.listens_for(MessageTrace, "before_insert")
+def _trace_inserted(mapper, connection, target):
+    _record_trace(target, inserted=True)
+
+
+@event.listens_for(MessageTrace, "before_update")
+def _trace_updated(mapper, connection, target):
+    _record_trace(target, inserted=False)
+
+
+def _record_trace(trace: MessageTrace, inserted: bool) -> None:
+    session = object_session(trace)
+    if session is None:
+        return
+    _watch_session(session)
+    record_trace_change(session, trace, inserted)
+    collect_trace_event(session, trace, inserted)
+
+
+def _watch_session(session: Session) -> None:
+    """Attach the flush/commit/rollback listeners to a session writing traces (once)."""
+    if session.info.get(WATCHED_SESSION_KEY):
+        return
+    session.info[WATCHED_SESSION_KEY] = True
+    event.listen(session, "after_flush", _apply_rollups)
+    event.listen(session, "after_commit", publish_trace_events)
+    event.listen(session, "after_rollback", _discard_pending)
+
+
+def _apply_rollups(session: Session, flush_context) -> None:
+    """Keep trace rollups in the same transaction as trace status changes."""
+    apply_trace_rollups(session)
+
+
+def _discard_pending(session: Session) -> None:
+    discard_trace_rollups(session)
+    discard_trace_events(session)
@@ -0,0 +1,328 @@
+"""
+Time-based range partitioning of the trace tables on PostgreSQL.
+
+``automagik-omni traces partition`` (with ``AUTOMAGIK_OMNI_TRACE_PARTITIONING=daily|monthly``
+or ``--interval``) rebuilds ``message_traces`` (partitioned by ``received_at``)
+and ``trace_payloads`` (by ``timestamp``) as
+``PARTITION BY RANGE`` tables with one partition per day/month plus a
+DEFAULT partition for stray rows. Queries filtered by time (listing,
+analytics edges, retention) only touch the matching partitions, and the
+retention worker drops whole expired partitions instead of deleting rows.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary keys become ``(trace_id, received_at)`` / ``(id, timestamp)`` and the
+``trace_payloads.trace_id`` foreign key is dropped (the ORM relationship is
+unchanged). Everything still looks traces up by ``trace_id`` alone, so a
+trigger keeps it unique across partitions (see ``ensure_trace_id_guard``).
+Future partitions are created ahead of time by ``ensure_partitions``, which
+runs on startup and on every retention pass.
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from src.db.trace_models import MessageTrace, TracePayload
+from src.utils.datetime_utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = ("daily", "monthly")
+
+# Children before parents (conversion and partition drops run in this order)
+PARTITIONED_TABLES = ("trace_payloads", "message_traces")
+PARTITION_KEYS = {"message_traces": "received_at", "trace_payloads": "timestamp"}
+PRIMARY_KEYS = {"message_traces": "trace_id", "trace_payloads": "id"}
+MODEL_TABLES = {"message_traces": MessageTrace.__table__, "trace_payloads": TracePayload.__table__}
+
+_PARTITION_BOUNDS_SQL = text(
+    "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+    "FROM pg_inherits "
+    "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+    "WHERE parent.relname = :table AND parent.relnamespace = current_schema()::regnamespace "
+    "ORDER BY child.relname"
+)
+_IS_PARTITIONED_SQL = text(
+    "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+    "WHERE c.relname = :table AND c.relnamespace = current_schema()::regnamespace"
+)
+_TRACE_ID_GUARD = "message_traces_unique_trace_id"
+# Serializes inserts of the same trace id (an advisory lock held until commit), then rejects
+# the row if the id already exists in any partition, with the error a unique index would raise
+_TRACE_ID_GUARD_FUNCTION_SQL = text(
+    f"CREATE OR REPLACE FUNCTION {_TRACE_ID_GUARD}() RETURNS trigger AS $$\n"
+    "BEGIN\n"
+    "    PERFORM pg_advisory_xact_lock(hashtextextended(NEW.trace_id, 0));\n"
+    "    IF EXISTS (SELECT 1 FROM message_traces WHERE trace_id = NEW.trace_id) THEN\n"
+    "        RAISE EXCEPTION 'duplicate key value violates unique constraint on message_traces.trace_id: %', "
+    "NEW.trace_id USING ERRCODE = 'unique_violation';\n"
+    "    END IF;\n"
+    "    RETURN NEW;\n"
+    "END\n"
+    "$$ LANGUAGE plpgsql"
+)
+_RANGE_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    try:
+        # timestamptz bounds are rendered in the server's time zone
+        return _naive_utc(datetime.fromisoformat(value))
+    except ValueError:
+        return None
+
+
+def partition_bounds(bound_expr: Optional[str]) -> Optional[Tuple[datetime, datetime]]:
+    """``(lower, upper)`` of a range partition (``FOR VALUES FROM ('...') TO ('...')``), None for DEFAULT."""
+    match = _RANGE_BOUNDS.search(bound_expr or "")
+    if not match:
+        return None
+    lower, upper = _parse_bound(match.group(1)), _parse_bound(match.group(2))
+    if lower is None or upper is None:
+        return None
+    return lower, upper
+
+
+def partition_upper_bound(bound_expr: Optional[str]) -> Optional[datetime]:
+    """Exclusive upper bound of a range partition, None for DEFAULT."""
+    bounds = partition_bounds(bound_expr)
+    return bounds[1] if bounds else None
+
+
+def period_start(value: datetime, interval: str) -> datetime:
+    """Start of the day/month containing ``value`` (naive UTC)."""
+    value = _naive_utc(value)
+    if interval == "daily":
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    """Start of the period after the one starting at ``start``."""
+    if interval == "daily":
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(table: str, start: datetime, interval: str) -> str:
+    return f"{table}_p{start:%Y%m%d}" if interval == "daily" else f"{table}_p{start:%Y%m}"
+
+
+def is_partitioned(connection: Connection, table: str) -> bool:
+    """Whether ``table`` is a partitioned table (always False outside PostgreSQL)."""
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(_IS_PARTITIONED_SQL, {"table": table}).first() is not None
+
+
+def list_partitions(connection: Connection, table: str) -> List[Tuple[str, Optional[Tuple[datetime, datetime]]]]:
+    """Partitions of ``table`` as ``(name, (lower, upper))``; bounds are None for the DEFAULT partition."""
+    rows = connection.execute(_PARTITION_BOUNDS_SQL, {"table": table}).fetchall()
+    return [(name, partition_bounds(bound_expr)) for name, bound_expr in rows]
+
+
+def ensure_trace_id_guard(connection: Connection) -> bool:
+    """
+    Keep ``message_traces.trace_id`` unique while the table is partitioned.
+
+    PostgreSQL cannot enforce a unique index without the partition key, so a BEFORE
+    INSERT trigger checks the id across all partitions instead (one index probe per
+    partition). Created after the rows are copied by a conversion, and on startup for
+    tables partitioned before the guard existed. Returns True if the trigger was created.
+    """
+    if not is_partitioned(connection, "message_traces"):
+        return False
+    exists = connection.execute(
+        text("SELECT 1 FROM pg_trigger WHERE tgname = :name AND tgrelid = CAST('message_traces' AS regclass)"),
+        {"name": _TRACE_ID_GUARD},
+    ).first()
+    if exists:
+        return False
+    connection.execute(_TRACE_ID_GUARD_FUNCTION_SQL)
+    connection.execute(
+        text(
+            f'CREATE TRIGGER "{_TRACE_ID_GUARD}" BEFORE INSERT ON "message_traces" '
+            f"FOR EACH ROW EXECUTE FUNCTION {_TRACE_ID_GUARD}()"
+        )
+    )
+    return True
+
+
+def _create_partition(connection: Connection, table: str, start: datetime, end: datetime, interval: str) -> str:
+    name = partition_name(table, start, interval)
+    connection.execute(
+        text(
+            f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{end.isoformat(sep=' ')}')"
+        )
+    )
+    return name
+
+
+def ensure_partitions(
+    connection: Connection,
+    interval: str,
+    ahead: int,
+    now: Optional[datetime] = None,
+) -> List[str]:
+    """
+    Create partitions for the current period and ``ahead`` future periods where missing.
+
+    Periods overlapping an existing partition (e.g. after switching from monthly to
+    daily) are skipped. Returns the names of created partitions.
+    """
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(connection, table):
+            continue
+        existing = [bounds for _, bounds in list_partitions(connection, table) if bounds]
+        start = period_start(now or utcnow(), interval)
+        for _ in range(ahead + 1):
+            end = next_period(start, interval)
+            if not any(lower < end and start < upper for lower, upper in existing):
+                savepoint = connection.begin_nested()
+                try:
+                    created.append(_create_partition(connection, table, start, end, interval))
+                    savepoint.commit()
+                except Exception as e:
+                    # Typically rows for this period already sit in the DEFAULT partition
+                    savepoint.rollback()
+                    logger.warning(f"Could not create partition of {table} for {start.date()}: {e}")
+            start = end
+    if created:
+        logger.info(f"Created trace partitions: {', '.join(created)}")
+    return created
+
+
+def drop_expired_partitions(connection: Connection, cutoff: datetime) -> List[str]:
+    """
+    Detach and drop partitions of the trace tables whose upper bound is at or before ``cutoff``.
+
+    Only applies to partitioned PostgreSQL tables; returns the names of dropped partitions.
+    """
+    cutoff = _naive_utc(cutoff)
+    dropped = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(connection, table):
+            continue
+        for name, bounds in list_partitions(connection, table):
+            if bounds is None or bounds[1] > cutoff:
+                continue
+            connection.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            connection.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+            logger.info(f"Dropped expired trace partition {name} (upper bound {bounds[1].isoformat()})")
+    return dropped
+
+
+def _rebuild_table(connection: Connection, table: str, interval: Optional[str], ahead: int) -> None:
+    """Recreate ``table`` partitioned by ``interval`` (or unpartitioned when None), keeping rows and indexes."""
+    old = f"{table}_unpartitioned" if interval else f"{table}_partitioned"
+    key = PARTITION_KEYS[table]
+    pk = PRIMARY_KEYS[table]
+
+    connection.execute(text(f'ALTER TABLE "{table}" RENAME TO "{old}"'))
+    # Free the primary key name for the new table
+    pk_name = connection.execute(
+        text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'p'"),
+        {"table": old},
+    ).scalar()
+    if pk_name:
+        connection.execute(text(f'ALTER TABLE "{old}" RENAME CONSTRAINT "{pk_name}" TO "{old}_pkey"'))
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence(:table, :column)"), {"table": old, "column": pk})
+    sequence = sequence.scalar()
+
+    if interval:
+        connection.execute(text(f'UPDATE "{old}" SET "{key}" = now() AT TIME ZONE \'utc\' WHERE "{key}" IS NULL'))
+        connection.execute(
+            text(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS) PARTITION BY RANGE ("{key}")')
+        )
+        connection.execute(text(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY ("{pk}", "{key}")'))
+
+        oldest = connection.execute(text(f'SELECT min("{key}") FROM "{old}"')).scalar()
+        start = period_start(oldest or utcnow(), interval)
+        stop = next_period(period_start(utcnow(), interval), interval)
+        while start < stop:
+            end = next_period(start, interval)
+            _create_partition(connection, table, start, end, interval)
+            start = end
+        connection.execute(text(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT'))
+        ensure_partitions(connection, interval, ahead)
+    else:
+        connection.execute(text(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS)'))
+        connection.execute(text(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY ("{pk}")'))
+
+    connection.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{old}"'))
+    if sequence:
+        connection.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY "{table}"."{pk}"'))
+    connection.execute(text(f'DROP TABLE "{old}" CASCADE'))
+
+    # Partitioned indexes are created on every partition, present and future
+    for index in sorted(MODEL_TABLES[table].indexes, key=lambda index: index.name):
+        index.create(connection)
+    if table == "message_traces":
+        connection.execute(
+            text(
+                'ALTER TABLE "message_traces" ADD CONSTRAINT "message_traces_instance_name_fkey" '
+                'FOREIGN KEY ("instance_name") REFERENCES "instance_configs" ("name")'
+            )
+        )
+        if interval:
+            ensure_trace_id_guard(connection)
+        else:
+            connection.execute(text(f"DROP FUNCTION IF EXISTS {_TRACE_ID_GUARD}()"))
+
+
+def partition_tables(connection: Connection, interval: str, ahead: int = 3) -> List[str]:
+    """
+    Convert the unpartitioned trace tables to range partitioning by ``interval``.
+
+    Rows are copied with one ``INSERT ... SELECT`` per table, so run this in a
+    maintenance window on large databases. Returns the converted table names.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported partition interval {interval!r}; expected one of {INTERVALS}")
+    if connection.dialect.name != "postgresql":
+        raise ValueError("Trace table partitioning requires PostgreSQL")
+
+    converted = []
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(connection, table):
+            continue
+        _rebuild_table(connection, table, interval, ahead)
+        converted.append(table)
+        logger.info(f"Partitioned {table} by {interval} ranges")
+    return converted
+
+
+def unpartition_tables(connection: Connection) -> List[str]:
+    """
+    Convert partitioned trace tables back to plain tables.
+
+    The payload foreign key is restored as NOT VALID: payloads whose trace was
+    dropped with a partition are not checked, new rows are.
+    """
+    converted = []
+    for table in reversed(PARTITIONED_TABLES):
+        if not is_partitioned(connection, table):
+            continue
+        _rebuild_table(connection, table, None, 0)
+        converted.append(table)
+
+    if converted and not is_partitioned(connection, "message_traces"):
+        connection.execute(
+            text(
+                'ALTER TABLE "trace_payloads" ADD CONSTRAINT "trace_payloads_trace_id_fkey" '
+                'FOREIGN KEY ("trace_id") REFERENCES "message_traces" ("trace_id") NOT VALID'
+            )
+        )
+    return converted
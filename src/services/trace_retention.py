@@ -0,0 +1,355 @@
+"""
+Background retention for message traces.
+
+Expired traces are deleted in bounded batches instead of one large
+``DELETE ... WHERE received_at < cutoff``: each batch selects at most
+``retention_batch_size`` trace ids, deletes their ``trace_payloads`` rows
+first and then the traces, commits, and pauses before the next batch so
+locks are held briefly and the trace writer keeps up. Payload rows orphaned
+by earlier bulk deletes are swept the same way.
+
+On PostgreSQL with partitioned trace tables (see ``trace_partitions``), each
+pass also creates upcoming partitions, and with
+``AUTOMAGIK_OMNI_TRACE_RETENTION_DROP_PARTITIONS`` partitions that lie
+entirely before the cutoff are dropped first, which frees their space
+without deleting row by row. Rollups are never touched, so analytics keep
+history past the retention period.
+
+With ``AUTOMAGIK_OMNI_TRACE_ARCHIVE_AFTER_DAYS`` set, each pass first moves
+older payloads into the cold archive (see ``trace_archive``), in the same
+bounded batches.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from src.config import config
+from src.db.trace_models import MessageTrace, TracePayload
+from src.services.trace_archive import archive_batch, trace_archive
+from src.services.trace_partitions import INTERVALS, drop_expired_partitions, ensure_partitions
+from src.utils.datetime_utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+def delete_expired_batch(db_session: Session, cutoff: datetime, batch_size: int) -> Dict[str, int]:
+    """
+    Delete up to ``batch_size`` traces received before ``cutoff``, payloads first, and commit.
+
+    Returns:
+        Dict with ``traces`` and ``payloads`` deleted in this batch
+    """
+    trace_ids = [
+        trace_id
+        for (trace_id,) in db_session.query(MessageTrace.trace_id)
+        .filter(MessageTrace.received_at < cutoff)
+        .order_by(MessageTrace.received_at, MessageTrace.trace_id)
+        .limit(batch_size)
+        .all()
+    ]
+    if not trace_ids:
+        return {"traces": 0, "payloads": 0}
+
+    payloads = (
+        db_session.query(TracePayload).filter(TracePayload.trace_id.in_(trace_ids)).delete(synchronize_session=False)
+    )
+    traces = (
+        db_session.query(MessageTrace).filter(MessageTrace.trace_id.in_(trace_ids)).delete(synchronize_session=False)
+    )
+    db_session.commit()
+    return {"traces": traces, "payloads": payloads}
+
+
+def delete_orphaned_payloads_batch(db_session: Session, batch_size: int) -> int:
+    """Delete up to ``batch_size`` payload rows whose trace no longer exists, and commit."""
+    orphan_ids = [
+        payload_id
+        for (payload_id,) in db_session.query(TracePayload.id)
+        .filter(
+            ~db_session.query(MessageTrace.trace_id).filter(MessageTrace.trace_id == TracePayload.trace_id).exists()
+        )
+        .limit(batch_size)
+        .all()
+    ]
+    if not orphan_ids:
+        return 0
+    deleted = db_session.query(TracePayload).filter(TracePayload.id.in_(orphan_ids)).delete(synchronize_session=False)
+    db_session.commit()
+    return deleted
+
+
+class TraceRetentionWorker:
+    """Background thread that enforces ``config.tracing.retention_days``."""
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self._session_factory = session_factory
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._run_lock = threading.Lock()
+        self.is_running = False
+
+        # Progress metrics
+        self.runs = 0
+        self.traces_deleted = 0
+        self.payloads_deleted = 0
+        self.orphans_deleted = 0
+        self.batches = 0
+        self.partitions_dropped = 0
+        self.traces_archived = 0
+        self.payloads_archived = 0
+        self.current_run: Optional[Dict[str, Any]] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    def _new_session(self) -> Session:
+        if self._session_factory is None:
+            from src.db.database import SessionLocal
+
+            return SessionLocal()
+        return self._session_factory()
+
+    def start(self) -> None:
+        """Start the retention thread; the first pass runs immediately."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run_loop, name="trace-retention", daemon=True)
+        self._thread.start()
+        logger.info("Trace retention worker started")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the retention thread (an in-progress pass stops after its current batch)."""
+        self.is_running = False
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        logger.info("Trace retention worker stopped")
+
+    def _run_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Trace retention pass failed: {e}", exc_info=True)
+            self._stop_event.wait(timeout=config.tracing.retention_interval)
+
+    def run_once(
+        self,
+        retention_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        pause: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run one retention pass.
+
+        Args:
+            retention_days: Override ``config.tracing.retention_days`` (<= 0 disables deletion)
+            batch_size: Override ``config.tracing.retention_batch_size``
+            pause: Seconds to sleep between batches (default ``config.tracing.retention_batch_pause``)
+
+        Returns:
+            Summary of the pass
+        """
+        days = config.tracing.retention_days if retention_days is None else retention_days
+        batch_size = batch_size or config.tracing.retention_batch_size
+        pause = config.tracing.retention_batch_pause if pause is None else pause
+        partitions_created = self.maintain_partitions()
+
+        with self._run_lock:
+            archived = self.archive_payloads(batch_size=batch_size, pause=pause)
+            if days <= 0:
+                return {"status": "disabled", **archived}
+
+            cutoff = utcnow() - timedelta(days=days)
+            run = {
+                "status": "running",
+                "cutoff": cutoff.isoformat(),
+                "started_at": utcnow().isoformat(),
+                "traces_deleted": 0,
+                "payloads_deleted": 0,
+                "orphans_deleted": 0,
+                "batches": 0,
+                "partitions_created": partitions_created,
+                "partitions_dropped": [],
+                **archived,
+            }
+            self.current_run = run
+            started = time.monotonic()
+            db_session = self._new_session()
+            try:
+                if config.tracing.retention_drop_partitions:
+                    run["partitions_dropped"] = drop_expired_partitions(db_session.connection(), cutoff)
+                    db_session.commit()
+                    self.partitions_dropped += len(run["partitions_dropped"])
+
+                while not self._stop_event.is_set():
+                    deleted = delete_expired_batch(db_session, cutoff, batch_size)
+                    if not deleted["traces"]:
+                        break
+                    self._record_batch(run, traces=deleted["traces"], payloads=deleted["payloads"])
+                    logger.debug(
+                        f"Trace retention batch: {deleted['traces']} traces, {deleted['payloads']} payloads "
+                        f"({run['traces_deleted']} traces so far)"
+                    )
+                    if deleted["traces"] < batch_size:
+                        break
+                    self._stop_event.wait(timeout=pause)
+
+                while not self._stop_event.is_set():
+                    orphans = delete_orphaned_payloads_batch(db_session, batch_size)
+                    if not orphans:
+                        break
+                    self._record_batch(run, orphans=orphans)
+                    if orphans < batch_size:
+                        break
+                    self._stop_event.wait(timeout=pause)
+            except Exception:
+                db_session.rollback()
+                run["status"] = "failed"
+                raise
+            finally:
+                db_session.close()
+                if run["status"] == "running":
+                    run["status"] = "stopped" if self._stop_event.is_set() else "completed"
+                run["duration_seconds"] = round(time.monotonic() - started, 3)
+                self.runs += 1
+                self.current_run = None
+                self.last_run = run
+
+        # Blobs have their own retention period
+        blob_result = self._cleanup_blobs()
+        run.update(blob_result)
+
+        if run["traces_deleted"] or run["orphans_deleted"] or run["partitions_dropped"]:
+            logger.info(
+                f"Trace retention deleted {run['traces_deleted']} traces, {run['payloads_deleted']} payloads, "
+                f"{run['orphans_deleted']} orphaned payloads and {len(run['partitions_dropped'])} partitions "
+                f"older than {days} days in {run['batches']} batches ({run['duration_seconds']}s)"
+            )
+        return run
+
+    def archive_payloads(
+        self,
+        archive_after_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        pause: Optional[float] = None,
+    ) -> Dict[str, int]:
+        """
+        Move payloads older than ``archive_after_days`` into a new archive segment, in batches.
+
+        Afterwards the segments of earlier days and months are merged (see ``TraceArchive.compact``).
+
+        Returns:
+            Dict with ``traces_archived`` and ``payloads_archived`` (empty when archiving is disabled)
+        """
+        days = config.tracing.archive_after_days if archive_after_days is None else archive_after_days
+        if days <= 0:
+            return {}
+        batch_size = batch_size or config.tracing.retention_batch_size
+        pause = config.tracing.retention_batch_pause if pause is None else pause
+        cutoff = utcnow() - timedelta(days=days)
+        result = {"traces_archived": 0, "payloads_archived": 0}
+
+        db_session = self._new_session()
+        writer = None
+        try:
+            writer = trace_archive.open_segment()
+            while not self._stop_event.is_set():
+                archived = archive_batch(db_session, writer, cutoff, batch_size)
+                if not archived["traces"]:
+                    break
+                result["traces_archived"] += archived["traces"]
+                result["payloads_archived"] += archived["payloads"]
+                self.traces_archived += archived["traces"]
+                self.payloads_archived += archived["payloads"]
+                self._stop_event.wait(timeout=pause)
+        except Exception as e:
+            db_session.rollback()
+            self.last_error = str(e)
+            logger.error(f"Trace payload archiving failed: {e}", exc_info=True)
+        finally:
+            if writer is not None:
+                trace_archive.close_segment(writer)
+            db_session.close()
+
+        try:
+            trace_archive.compact()
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Trace archive compaction failed: {e}", exc_info=True)
+
+        if result["payloads_archived"]:
+            logger.info(
+                f"Trace archive moved {result['payloads_archived']} payloads of {result['traces_archived']} traces "
+                f"older than {days} days to {writer.segment_path.name}"
+            )
+        return result
+
+    def maintain_partitions(self) -> List[str]:
+        """Create upcoming partitions when the trace tables are partitioned (PostgreSQL only)."""
+        if config.tracing.partitioning not in INTERVALS:
+            return []
+        db_session = self._new_session()
+        try:
+            created = ensure_partitions(
+                db_session.connection(), config.tracing.partitioning, config.tracing.partitions_ahead
+            )
+            db_session.commit()
+            return created
+        except Exception as e:
+            db_session.rollback()
+            logger.error(f"Trace partition maintenance failed: {e}")
+            return []
+        finally:
+            db_session.close()
+
+    def _record_batch(self, run: Dict[str, Any], traces: int = 0, payloads: int = 0, orphans: int = 0) -> None:
+        run["traces_deleted"] += traces
+        run["payloads_deleted"] += payloads
+        run["orphans_deleted"] += orphans
+        run["batches"] += 1
+        self.traces_deleted += traces
+        self.payloads_deleted += payloads
+        self.orphans_deleted += orphans
+        self.batches += 1
+
+    @staticmethod
+    def _cleanup_blobs() -> Dict[str, int]:
+        from src.services.trace_blob_store import trace_blob_store
+
+        try:
+            result = trace_blob_store.cleanup()
+            return {"blobs_deleted": result["blobs_deleted"], "blob_bytes_freed": result["bytes_freed"]}
+        except Exception as e:
+            logger.error(f"Trace blob cleanup failed: {e}")
+            return {"blobs_deleted": 0, "blob_bytes_freed": 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters and the current/last pass for monitoring."""
+        return {
+            "running": self.is_running,
+            "retention_days": config.tracing.retention_days,
+            "runs": self.runs,
+            "traces_deleted": self.traces_deleted,
+            "payloads_deleted": self.payloads_deleted,
+            "orphans_deleted": self.orphans_deleted,
+            "batches": self.batches,
+            "partitions_dropped": self.partitions_dropped,
+            "traces_archived": self.traces_archived,
+            "payloads_archived": self.payloads_archived,
+            "current_run": dict(self.current_run) if self.current_run else None,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+
+# Global retention worker instance
+trace_retention = TraceRetentionWorker()
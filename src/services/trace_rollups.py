@@ -0,0 +1,646 @@
+"""
+Incrementally maintained trace rollups.
+
+``trace_rollups_minute`` and ``trace_rollups_hour`` hold, per bucket of
+``received_at`` and per (instance, message type, status, error stage), the
+count, processing-time sums and a latency histogram of terminal traces.
+``trace_latency_minute`` and ``trace_latency_hour`` hold, per bucket and
+instance, mergeable per-stage latency histograms (see ``trace_histograms``)
+from which analytics reads p50/p90/p99/max.
+
+Rollups are updated in the same flush that moves a trace into or out of a
+terminal status (the trace writer's batch commit, or the inline fallback), so
+they are always consistent with the raw rows: a change to a terminal trace
+subtracts its previous contribution and adds the new one. Trace retention does
+not remove rollups, so dashboards keep history after raw rows are deleted.
+
+Analytics over a range read hour rollups for the full hours inside it, minute
+rollups for the full minutes around them, and raw rows only for the partial
+minutes at the edges plus the (few) traces in the range that are not terminal
+yet.
+"""
+
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, case, func, inspect as sa_inspect, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.config import config
+from src.db.trace_models import (
+    ROLLUP_LATENCY_BOUNDS_MS,
+    ROLLUP_LATENCY_COLUMNS,
+    MessageTrace,
+    TraceLatencyHour,
+    TraceLatencyMinute,
+    TraceRollupHour,
+    TraceRollupMinute,
+)
+from src.services.trace_histograms import (
+    LATENCY_ATTRIBUTES,
+    LATENCY_STAGES,
+    LatencyHistogram,
+    histogram_bucket,
+    stage_latencies,
+)
+from src.utils.datetime_utils import utcnow
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Session.info key holding rollup changes of the current flush
+PENDING_ROLLUPS_KEY = "trace_rollups"
+
+KEY_COLUMNS = ("bucket_start", "instance_name", "message_type", "status", "error_stage")
+VALUE_COLUMNS = (
+    "trace_count",
+    "processing_time_sum",
+    "processing_time_count",
+    "agent_time_sum",
+    "agent_time_count",
+    *ROLLUP_LATENCY_COLUMNS,
+)
+
+ROLLUP_MODELS = (
+    (TraceRollupMinute, lambda dt: dt.replace(second=0, microsecond=0)),
+    (TraceRollupHour, lambda dt: dt.replace(minute=0, second=0, microsecond=0)),
+)
+
+# Latency histograms share the rollup buckets
+LATENCY_MODELS = {TraceRollupMinute: TraceLatencyMinute, TraceRollupHour: TraceLatencyHour}
+LATENCY_KEY_COLUMNS = ("bucket_start", "instance_name", "stage", "bucket")
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    """Rollup buckets are naive UTC, like the stored ``received_at`` values."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(utcnow().tzinfo).replace(tzinfo=None)
+    return dt
+
+
+def _label(value: Optional[str]) -> str:
+    return value or "unknown"
+
+
+def latency_bucket(ms: int) -> int:
+    """Index of the histogram bucket for a processing time."""
+    for index, bound in enumerate(ROLLUP_LATENCY_BOUNDS_MS):
+        if ms <= bound:
+            return index
+    return len(ROLLUP_LATENCY_BOUNDS_MS)
+
+
+class RollupEntry(NamedTuple):
+    """What one terminal trace contributes to the rollups."""
+
+    received_at: datetime
+    instance_name: str
+    message_type: str
+    status: str
+    error_stage: str
+    processing_time_ms: Optional[int]
+    agent_time_ms: Optional[int]
+    latencies: Tuple[Tuple[str, int], ...] = ()
+
+
+def rollup_entry(values: Dict[str, Any]) -> Optional[RollupEntry]:
+    """Rollup contribution of a trace given its attribute values (None unless terminal)."""
+    if values.get("status") not in TERMINAL_STATUSES or values.get("received_at") is None:
+        return None
+    return RollupEntry(
+        received_at=_naive_utc(values["received_at"]),
+        instance_name=_label(values.get("instance_name")),
+        message_type=_label(values.get("message_type")),
+        status=values["status"],
+        error_stage=values.get("error_stage") or "",
+        processing_time_ms=values.get("total_processing_time_ms"),
+        agent_time_ms=values.get("agent_processing_time_ms"),
+        latencies=stage_latencies(values),
+    )
+
+
+_ENTRY_ATTRIBUTES = (
+    "received_at",
+    "instance_name",
+    "message_type",
+    "status",
+    "error_stage",
+    "total_processing_time_ms",
+    "agent_processing_time_ms",
+    "agent_request_at",
+    "agent_response_at",
+    "evolution_send_at",
+)
+
+
+def _trace_values(trace: MessageTrace, previous: bool) -> Dict[str, Any]:
+    """Current attribute values of a trace, or the values it had when loaded (``previous``)."""
+    state = sa_inspect(trace)
+    values = {}
+    for name in _ENTRY_ATTRIBUTES:
+        attr = state.attrs[name]
+        history = attr.history
+        if previous and history.deleted:
+            values[name] = history.deleted[0]
+        elif previous and history.added:
+            # Attribute was unset when loaded
+            values[name] = None
+        else:
+            values[name] = attr.value
+    return values
+
+
+class RollupDelta:
+    """Accumulates rollup and latency histogram increments and applies them as one upsert per bucket key."""
+
+    def __init__(self):
+        self._rows: Dict[Tuple[Any, ...], List[int]] = {}
+        self._latency: Dict[Tuple[Any, ...], int] = {}
+
+    def __bool__(self) -> bool:
+        return any(any(values) for values in self._rows.values()) or any(self._latency.values())
+
+    def add(self, entry: RollupEntry, sign: int = 1) -> None:
+        increments = [0] * len(VALUE_COLUMNS)
+        increments[0] = sign
+        if entry.processing_time_ms is not None:
+            increments[1] = sign * entry.processing_time_ms
+            increments[2] = sign
+            increments[5 + latency_bucket(entry.processing_time_ms)] = sign
+        if entry.agent_time_ms is not None:
+            increments[3] = sign * entry.agent_time_ms
+            increments[4] = sign
+
+        for model, floor in ROLLUP_MODELS:
+            key = (
+                model,
+                floor(entry.received_at),
+                entry.instance_name,
+                entry.message_type,
+                entry.status,
+                entry.error_stage,
+            )
+            values = self._rows.setdefault(key, [0] * len(VALUE_COLUMNS))
+            for index, increment in enumerate(increments):
+                values[index] += increment
+
+            for stage, ms in entry.latencies:
+                latency_key = (LATENCY_MODELS[model], key[1], entry.instance_name, stage, histogram_bucket(ms))
+                self._latency[latency_key] = self._latency.get(latency_key, 0) + sign
+
+    def apply(self, connection) -> None:
+        """Add the accumulated increments to the rollup tables (one batched upsert per table)."""
+        per_table: Dict[Any, List[Dict[str, Any]]] = {}
+        # Sorted keys keep row lock order stable between concurrent writers
+        for (model, *key), values in sorted(self._rows.items(), key=lambda item: _sort_key(item[0])):
+            if any(values):
+                per_table.setdefault(model.__table__, []).append(
+                    {**dict(zip(KEY_COLUMNS, key)), **dict(zip(VALUE_COLUMNS, values))}
+                )
+        self._rows.clear()
+        for table, rows in per_table.items():
+            _upsert_increments(connection, table, rows, KEY_COLUMNS, VALUE_COLUMNS)
+
+        per_table = {}
+        for (model, *key), count in sorted(self._latency.items(), key=lambda item: _sort_key(item[0])):
+            if count:
+                per_table.setdefault(model.__table__, []).append(
+                    {**dict(zip(LATENCY_KEY_COLUMNS, key)), "count": count}
+                )
+        self._latency.clear()
+        for table, rows in per_table.items():
+            _upsert_increments(connection, table, rows, LATENCY_KEY_COLUMNS, ("count",))
+
+
+def _upsert_increments(connection, table, rows: List[Dict[str, Any]], key_columns, value_columns) -> None:
+    """Add ``value_columns`` of ``rows`` to the rows with the same key, inserting missing ones."""
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else pg_insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={name: table.c[name] + stmt.excluded[name] for name in value_columns},
+        )
+        connection.execute(stmt, rows)
+        return
+
+    for row in rows:
+        where = and_(*(table.c[name] == row[name] for name in key_columns))
+        updated = connection.execute(
+            table.update().where(where).values({name: table.c[name] + row[name] for name in value_columns})
+        )
+        if updated.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+def _sort_key(key: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    model, *rest = key
+    return (model.__tablename__, *rest)
+
+
+def record_trace_change(session: Session, trace: MessageTrace, inserted: bool) -> None:
+    """
+    Queue the rollup change of a trace that entered, left or changed in a terminal status.
+
+    Called for every trace row a flush inserts or updates (see ``src/services/trace_hooks.py``);
+    ``apply_trace_rollups`` writes the queued changes after the flush, in the same
+    transaction as the trace rows.
+    """
+    if not config.tracing.rollups_enabled:
+        return
+
+    if inserted:
+        if trace.received_at is None:
+            # Set the column default now so the rollup bucket matches the stored value
+            trace.received_at = utcnow()
+        before = None
+    else:
+        before = rollup_entry(_trace_values(trace, previous=True))
+    after = rollup_entry(_trace_values(trace, previous=False))
+    if before == after:
+        return
+
+    delta = session.info.get(PENDING_ROLLUPS_KEY)
+    if delta is None:
+        delta = session.info[PENDING_ROLLUPS_KEY] = RollupDelta()
+    if before:
+        delta.add(before, -1)
+    if after:
+        delta.add(after)
+
+
+def apply_trace_rollups(session: Session) -> None:
+    """Write the rollup changes queued by the flush that just ran."""
+    delta = session.info.pop(PENDING_ROLLUPS_KEY, None)
+    if delta:
+        delta.apply(session.connection())
+
+
+def discard_trace_rollups(session: Session) -> None:
+    session.info.pop(PENDING_ROLLUPS_KEY, None)
+
+
+def rebuild_rollups(
+    db_session: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk: timedelta = timedelta(hours=1),
+) -> int:
+    """
+    Recompute rollups from raw traces, one hour-aligned chunk per transaction.
+
+    Used to backfill traces stored before rollups existed (or while they were
+    disabled). Only hours that still have raw traces are rebuilt. Traces changing
+    status inside a chunk while it is rebuilt may be counted from either state.
+
+    Returns:
+        Number of terminal traces rolled up
+    """
+    received = MessageTrace.received_at
+    bounds = db_session.query(func.min(received), func.max(received)).one()
+    if bounds[0] is None:
+        return 0
+    floor_hour = ROLLUP_MODELS[1][1]
+    cursor = floor_hour(_naive_utc(start or bounds[0]))
+    stop = _naive_utc(end or bounds[1])
+
+    total = 0
+    while cursor is not None and cursor <= stop:
+        chunk_end = cursor + chunk
+        for rollup_model, _ in ROLLUP_MODELS:
+            for model in (rollup_model, LATENCY_MODELS[rollup_model]):
+                db_session.query(model).filter(model.bucket_start >= cursor, model.bucket_start < chunk_end).delete(
+                    synchronize_session=False
+                )
+
+        delta = RollupDelta()
+        rows = (
+            db_session.query(*(getattr(MessageTrace, name) for name in _ENTRY_ATTRIBUTES))
+            .filter(received >= cursor, received < chunk_end, MessageTrace.status.in_(TERMINAL_STATUSES))
+            .yield_per(5000)
+        )
+        for row in rows:
+            delta.add(rollup_entry(dict(zip(_ENTRY_ATTRIBUTES, row))))
+            total += 1
+        delta.apply(db_session.connection())
+        db_session.commit()
+
+        # Skip hours without raw traces; their rollups (history past retention) are kept
+        next_received = db_session.query(func.min(received)).filter(received >= chunk_end).scalar()
+        cursor = floor_hour(_naive_utc(next_received)) if next_received is not None else None
+
+    logger.info(f"Rebuilt trace rollups from {total} terminal traces")
+    return total
+
+
+def backfill_if_empty(session_factory) -> None:
+    """Rebuild rollups when rollup or latency tables are empty but terminal traces exist (first start after upgrade)."""
+    db_session = session_factory()
+    try:
+        if (
+            db_session.query(TraceRollupHour.id).first() is not None
+            and db_session.query(TraceLatencyHour.id).first() is not None
+        ):
+            return
+        if db_session.query(MessageTrace.trace_id).filter(MessageTrace.status.in_(TERMINAL_STATUSES)).first() is None:
+            return
+        logger.info("Trace rollups are empty; backfilling from existing traces")
+        rebuild_rollups(db_session)
+    except Exception as e:
+        logger.error(f"Trace rollup backfill failed: {e}", exc_info=True)
+    finally:
+        db_session.close()
+
+
+def start_backfill(session_factory) -> threading.Thread:
+    """Run ``backfill_if_empty`` in a background thread."""
+    thread = threading.Thread(
+        target=backfill_if_empty, args=(session_factory,), name="trace-rollup-backfill", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+@dataclass
+class AnalyticsTotals:
+    """Mergeable partial analytics (from raw rows or rollups)."""
+
+    total: int = 0
+    successful: int = 0
+    failed: int = 0
+    processing_time_sum: float = 0
+    processing_time_count: int = 0
+    agent_time_sum: float = 0
+    agent_time_count: int = 0
+    message_types: Counter = field(default_factory=Counter)
+    error_stages: Counter = field(default_factory=Counter)
+    instances: Counter = field(default_factory=Counter)
+    latency: Dict[str, LatencyHistogram] = field(default_factory=dict)
+
+    def merge(self, other: "AnalyticsTotals") -> None:
+        for name in (
+            "total",
+            "successful",
+            "failed",
+            "processing_time_sum",
+            "processing_time_count",
+            "agent_time_sum",
+            "agent_time_count",
+        ):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.message_types.update(other.message_types)
+        self.error_stages.update(other.error_stages)
+        self.instances.update(other.instances)
+        for stage, histogram in other.latency.items():
+            self.latency.setdefault(stage, LatencyHistogram()).merge(histogram)
+
+    def to_response(self) -> Dict[str, Any]:
+        """Fields of the ``TraceAnalytics`` API model."""
+        success_rate = (self.successful / self.total * 100) if self.total > 0 else 0
+        avg_processing_time = (
+            self.processing_time_sum / self.processing_time_count if self.processing_time_count else None
+        )
+        avg_agent_time = self.agent_time_sum / self.agent_time_count if self.agent_time_count else None
+        return {
+            "total_messages": self.total,
+            "successful_messages": self.successful,
+            "failed_messages": self.failed,
+            "success_rate": round(success_rate, 2),
+            "avg_processing_time_ms": round(avg_processing_time, 2) if avg_processing_time else None,
+            "avg_agent_time_ms": round(avg_agent_time, 2) if avg_agent_time else None,
+            "message_types": {key: count for key, count in self.message_types.items() if count},
+            "error_stages": {key: count for key, count in self.error_stages.items() if count},
+            "instances": {key: count for key, count in self.instances.items() if count},
+            "latency_percentiles": {
+                stage: self.latency.get(stage, LatencyHistogram()).summary() for stage in LATENCY_STAGES
+            },
+        }
+
+
+def raw_totals(db_session: Session, filters: List[Any]) -> AnalyticsTotals:
+    """Aggregate raw trace rows matching ``filters`` with SQL aggregates."""
+    (total, successful, failed, processing_sum, processing_count, agent_sum, agent_count) = (
+        db_session.query(
+            func.count(MessageTrace.trace_id),
+            func.sum(case((MessageTrace.status == "completed", 1), else_=0)),
+            func.sum(case((MessageTrace.status == "failed", 1), else_=0)),
+            func.sum(MessageTrace.total_processing_time_ms),
+            func.count(MessageTrace.total_processing_time_ms),
+            func.sum(MessageTrace.agent_processing_time_ms),
+            func.count(MessageTrace.agent_processing_time_ms),
+        )
+        .filter(*filters)
+        .one()
+    )
+
+    def grouped(column, *extra_filters) -> Counter:
+        rows = (
+            db_session.query(column, func.count(MessageTrace.trace_id))
+            .filter(*filters, *extra_filters)
+            .group_by(column)
+            .all()
+        )
+        return Counter({key: count for key, count in rows})
+
+    return AnalyticsTotals(
+        total=total or 0,
+        successful=successful or 0,
+        failed=failed or 0,
+        # SUM returns NUMERIC on PostgreSQL
+        processing_time_sum=float(processing_sum or 0),
+        processing_time_count=processing_count or 0,
+        agent_time_sum=float(agent_sum or 0),
+        agent_time_count=agent_count or 0,
+        message_types=grouped(func.coalesce(func.nullif(MessageTrace.message_type, ""), "unknown")),
+        error_stages=grouped(MessageTrace.error_stage, func.coalesce(MessageTrace.error_stage, "") != ""),
+        instances=grouped(func.coalesce(func.nullif(MessageTrace.instance_name, ""), "unknown")),
+        latency=raw_latency(db_session, filters),
+    )
+
+
+def _elapsed_ms_sql(dialect: str, start, end):
+    """SQL expression for the milliseconds between two timestamp columns (None if the dialect is not supported)."""
+    if dialect == "sqlite":
+        return func.round((func.julianday(end) - func.julianday(start)) * 86400000)
+    if dialect == "postgresql":
+        return func.round(func.extract("epoch", end - start) * 1000)
+    return None
+
+
+def _stage_latency_sql(dialect: str) -> Optional[Dict[str, Any]]:
+    """Per-stage latency expressions matching ``trace_histograms.stage_latencies``."""
+    queue = _elapsed_ms_sql(dialect, MessageTrace.received_at, MessageTrace.agent_request_at)
+    if queue is None:
+        return None
+    agent = func.coalesce(
+        MessageTrace.agent_processing_time_ms,
+        _elapsed_ms_sql(dialect, MessageTrace.agent_request_at, MessageTrace.agent_response_at),
+    )
+    send = _elapsed_ms_sql(dialect, MessageTrace.agent_response_at, MessageTrace.evolution_send_at)
+    return {"queue": queue, "agent": agent, "send": send, "total": MessageTrace.total_processing_time_ms}
+
+
+def raw_latency(db_session: Session, filters: List[Any]) -> Dict[str, LatencyHistogram]:
+    """
+    Per-stage latency histograms of the terminal traces matching ``filters``.
+
+    Durations are computed and grouped by millisecond value in SQL, so only the
+    distinct durations are transferred; other dialects stream the timestamps.
+    """
+    filters = [*filters, MessageTrace.status.in_(TERMINAL_STATUSES)]
+    histograms: Dict[str, LatencyHistogram] = {}
+    expressions = _stage_latency_sql(db_session.get_bind().dialect.name)
+    if expressions is not None:
+        for stage, expression in expressions.items():
+            rows = (
+                db_session.query(expression, func.count())
+                .filter(*filters, expression.isnot(None), expression >= 0)
+                .group_by(expression)
+            )
+            for ms, count in rows:
+                histograms.setdefault(stage, LatencyHistogram()).add(float(ms), count)
+        return histograms
+
+    rows = db_session.query(*(getattr(MessageTrace, name) for name in LATENCY_ATTRIBUTES)).filter(*filters)
+    for row in rows.yield_per(5000):
+        for stage, ms in stage_latencies(dict(zip(LATENCY_ATTRIBUTES, row))):
+            histograms.setdefault(stage, LatencyHistogram()).add(ms)
+    return histograms
+
+
+def rollup_totals(
+    db_session: Session,
+    model,
+    start: Optional[datetime],
+    end: datetime,
+    instance_name: Optional[str] = None,
+) -> AnalyticsTotals:
+    """Aggregate rollup rows with ``start <= bucket_start < end`` (no lower bound when ``start`` is None)."""
+    filters = [model.bucket_start < end]
+    if start is not None:
+        filters.append(model.bucket_start >= start)
+    if instance_name:
+        filters.append(model.instance_name == instance_name)
+
+    rows = (
+        db_session.query(
+            model.instance_name,
+            model.message_type,
+            model.status,
+            model.error_stage,
+            func.sum(model.trace_count),
+            func.sum(model.processing_time_sum),
+            func.sum(model.processing_time_count),
+            func.sum(model.agent_time_sum),
+            func.sum(model.agent_time_count),
+        )
+        .filter(*filters)
+        .group_by(model.instance_name, model.message_type, model.status, model.error_stage)
+        .all()
+    )
+
+    totals = AnalyticsTotals()
+    for instance, message_type, status, error_stage, count, p_sum, p_count, a_sum, a_count in rows:
+        count = int(count or 0)
+        totals.total += count
+        if status == "completed":
+            totals.successful += count
+        elif status == "failed":
+            totals.failed += count
+        totals.processing_time_sum += float(p_sum or 0)
+        totals.processing_time_count += int(p_count or 0)
+        totals.agent_time_sum += float(a_sum or 0)
+        totals.agent_time_count += int(a_count or 0)
+        totals.message_types[message_type] += count
+        totals.instances[instance] += count
+        if error_stage:
+            totals.error_stages[error_stage] += count
+
+    latency_model = LATENCY_MODELS[model]
+    latency_filters = [latency_model.bucket_start < end]
+    if start is not None:
+        latency_filters.append(latency_model.bucket_start >= start)
+    if instance_name:
+        latency_filters.append(latency_model.instance_name == instance_name)
+    for stage, bucket, count in (
+        db_session.query(latency_model.stage, latency_model.bucket, func.sum(latency_model.count))
+        .filter(*latency_filters)
+        .group_by(latency_model.stage, latency_model.bucket)
+    ):
+        totals.latency.setdefault(stage, LatencyHistogram()).add_bucket(bucket, int(count or 0))
+    return totals
+
+
+def _ceil(dt: datetime, floor) -> datetime:
+    floored = floor(dt)
+    if floored == dt:
+        return dt
+    return floored + (timedelta(minutes=1) if floor is ROLLUP_MODELS[0][1] else timedelta(hours=1))
+
+
+def rollup_analytics(
+    db_session: Session,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    instance_name: Optional[str] = None,
+) -> AnalyticsTotals:
+    """
+    Analytics for ``start <= received_at <= end`` from rollups plus raw edge rows.
+
+    Either bound may be None (unbounded).
+    """
+    floor_minute, floor_hour = ROLLUP_MODELS[0][1], ROLLUP_MODELS[1][1]
+    start = _naive_utc(start) if start is not None else None
+    end = _naive_utc(end) if end is not None else None
+
+    minute_lo = _ceil(start, floor_minute) if start is not None else None
+    minute_hi = floor_minute(end if end is not None else _naive_utc(utcnow()))
+    if minute_lo is not None and minute_lo >= minute_hi:
+        # Less than one full minute: raw rows only
+        filters = [MessageTrace.received_at >= start]
+        if end is not None:
+            filters.append(MessageTrace.received_at <= end)
+        if instance_name:
+            filters.append(MessageTrace.instance_name == instance_name)
+        return raw_totals(db_session, filters)
+
+    hour_lo = _ceil(minute_lo, floor_hour) if minute_lo is not None else None
+    hour_hi = floor_hour(minute_hi)
+    totals = AnalyticsTotals()
+
+    if hour_lo is None or hour_lo < hour_hi:
+        totals.merge(rollup_totals(db_session, TraceRollupHour, hour_lo, hour_hi, instance_name))
+        if minute_lo is not None:
+            totals.merge(rollup_totals(db_session, TraceRollupMinute, minute_lo, hour_lo, instance_name))
+        totals.merge(rollup_totals(db_session, TraceRollupMinute, hour_hi, minute_hi, instance_name))
+    else:
+        totals.merge(rollup_totals(db_session, TraceRollupMinute, minute_lo, minute_hi, instance_name))
+
+    instance_filter = [MessageTrace.instance_name == instance_name] if instance_name else []
+
+    # Partial minutes at the edges
+    edges = [MessageTrace.received_at >= minute_hi]
+    if end is not None:
+        edges.append(MessageTrace.received_at <= end)
+    edge_filter = and_(*edges)
+    if start is not None:
+        edge_filter = or_(and_(MessageTrace.received_at >= start, MessageTrace.received_at < minute_lo), edge_filter)
+    totals.merge(raw_totals(db_session, [edge_filter, *instance_filter]))
+
+    # Traces inside the rolled-up span that are not terminal yet (received, processing, sending, error, ...)
+    middle = [
+        MessageTrace.received_at < minute_hi,
+        or_(MessageTrace.status.is_(None), MessageTrace.status.notin_(TERMINAL_STATUSES)),
+    ]
+    if minute_lo is not None:
+        middle.append(MessageTrace.received_at >= minute_lo)
+    totals.merge(raw_totals(db_session, [*middle, *instance_filter]))
+    return totals
@@ -0,0 +1,172 @@
+"""
+Trace sampling policies.
+
+Every traced message keeps its ``MessageTrace`` row; sampling only decides
+whether its stage payloads (the bulk of trace writes) are stored:
+
+- ``payload_mode="metadata"`` never stores payloads.
+- ``payload_mode="full"`` stores payloads for a ``sample_rate`` fraction of
+  traces, chosen at creation (head sampling, deterministic per trace id).
+- Payloads of traces that were not sampled are held in the trace context until
+  the trace completes, then written if it failed (``keep_failed``) or took at
+  least ``slow_threshold_ms`` (tail sampling), and dropped otherwise.
+
+The global policy comes from ``config.tracing``; instances override the rate
+and mode with ``trace_sample_rate`` / ``trace_payload_mode``. Instance policies
+are cached for ``POLICY_CACHE_TTL`` seconds.
+"""
+
+import logging
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_MODES = ("full", "metadata")
+POLICY_CACHE_TTL = 30.0
+
+# Upper bound on payloads held per unsampled trace (long streaming responses log many chunks)
+MAX_DEFERRED_PAYLOADS = 50
+
+
+@dataclass(frozen=True)
+class SamplingPolicy:
+    """How the payloads of an instance's traces are sampled."""
+
+    sample_rate: float = 1.0
+    payload_mode: str = "full"
+    keep_failed: bool = True
+    slow_threshold_ms: int = 0
+
+    @classmethod
+    def from_config(cls, instance: Any = None) -> "SamplingPolicy":
+        """Global policy from ``config.tracing``, with the instance's overrides applied."""
+        sample_rate = config.tracing.sample_rate
+        payload_mode = config.tracing.payload_mode
+        if instance is not None:
+            if getattr(instance, "trace_sample_rate", None) is not None:
+                sample_rate = instance.trace_sample_rate
+            if getattr(instance, "trace_payload_mode", None):
+                payload_mode = instance.trace_payload_mode
+        if payload_mode not in PAYLOAD_MODES:
+            logger.warning(f"Unknown trace payload mode {payload_mode!r}; storing full payloads")
+            payload_mode = "full"
+        return cls(
+            sample_rate=min(max(float(sample_rate), 0.0), 1.0),
+            payload_mode=payload_mode,
+            keep_failed=config.tracing.keep_failed,
+            slow_threshold_ms=config.tracing.slow_threshold_ms,
+        )
+
+
+def head_sample(trace_id: str, rate: float) -> bool:
+    """Deterministic head decision: the same trace id is always in or out for a given rate."""
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    return zlib.crc32(trace_id.encode("utf-8")) / 2**32 < rate
+
+
+@dataclass(frozen=True)
+class SamplingDecision:
+    """Sampling outcome for one trace, made when the trace is created."""
+
+    policy: SamplingPolicy
+    head_sampled: bool
+
+    @property
+    def stores_payloads(self) -> bool:
+        return self.policy.payload_mode != "metadata"
+
+    def keep_at_completion(self, status: str, elapsed_ms: float) -> bool:
+        """Tail decision for a trace that was not head-sampled."""
+        if not self.stores_payloads:
+            return False
+        if status == "failed" and self.policy.keep_failed:
+            return True
+        return 0 < self.policy.slow_threshold_ms <= elapsed_ms
+
+
+class TraceSampler:
+    """Resolves per-instance sampling policies and counts sampling outcomes."""
+
+    def __init__(self):
+        self._policies: Dict[str, Tuple[float, SamplingPolicy]] = {}
+        self._lock = threading.Lock()
+
+        self.traces_sampled = 0
+        self.traces_unsampled = 0
+        self.traces_tail_kept = 0
+        self.payloads_dropped = 0
+
+    def policy_for(self, instance_name: Optional[str], db_session: Optional[Session]) -> SamplingPolicy:
+        """Sampling policy of ``instance_name`` (global policy if the instance cannot be loaded)."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._policies.get(instance_name or "")
+        if cached and cached[0] > now:
+            return cached[1]
+
+        instance = None
+        if instance_name and db_session is not None:
+            from src.db.models import InstanceConfig
+
+            try:
+                instance = db_session.query(InstanceConfig).filter(InstanceConfig.name == instance_name).first()
+            except Exception as e:
+                logger.warning(f"Could not load trace sampling settings for {instance_name}: {e}")
+        policy = SamplingPolicy.from_config(instance)
+        with self._lock:
+            self._policies[instance_name or ""] = (now + POLICY_CACHE_TTL, policy)
+        return policy
+
+    def decide(self, trace_id: str, instance_name: Optional[str], db_session: Optional[Session]) -> SamplingDecision:
+        decision = self.decision_for(trace_id, instance_name, db_session)
+        if decision.head_sampled:
+            self.traces_sampled += 1
+        else:
+            self.traces_unsampled += 1
+        return decision
+
+    def decision_for(
+        self, trace_id: str, instance_name: Optional[str], db_session: Optional[Session]
+    ) -> SamplingDecision:
+        """
+        Sampling decision of a trace without counting it.
+
+        Head sampling is deterministic per trace id, so code that picks up an
+        existing trace later (the outbox dispatcher) gets the decision it was created with.
+        """
+        policy = self.policy_for(instance_name, db_session)
+        sampled = policy.payload_mode != "metadata" and head_sample(trace_id, policy.sample_rate)
+        return SamplingDecision(policy=policy, head_sampled=sampled)
+
+    def invalidate(self, instance_name: Optional[str] = None) -> None:
+        """Forget cached policies (all of them, or one instance's after its settings change)."""
+        with self._lock:
+            if instance_name is None:
+                self._policies.clear()
+            else:
+                self._policies.pop(instance_name, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": config.tracing.sample_rate,
+            "payload_mode": config.tracing.payload_mode,
+            "traces_sampled": self.traces_sampled,
+            "traces_unsampled": self.traces_unsampled,
+            "traces_tail_kept": self.traces_tail_kept,
+            "payloads_dropped": self.payloads_dropped,
+        }
+
+
+# Global sampler instance
+trace_sampler = TraceSampler()
@@ -0,0 +1,225 @@
+"""
+Full-text search over traced message content.
+
+The text of a message (WhatsApp text and captions, Discord content, outbound
+message text) is extracted once when its trace is created and stored in
+``message_traces.search_text``; instances with ``payload_mode="metadata"``
+store none. The column is indexed per backend:
+
+- PostgreSQL: a GIN index on ``to_tsvector('simple', search_text)``, queried
+  with ``websearch_to_tsquery`` and ranked by ``ts_rank``.
+- SQLite: the FTS5 external-content table ``message_traces_fts`` (on the
+  ``message_traces`` rowid), kept in sync by triggers and ranked by ``bm25``.
+
+Neither backend stems words, so queries behave the same for every language
+customers write in. Traces created before the column existed are indexed by
+``automagik-omni traces reindex-search``, which also rebuilds the SQLite
+index (needed after a ``VACUUM``, which may renumber rowids).
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+import sqlalchemy.dialects.postgresql  # noqa: F401 - registers the typed to_tsvector()/ts_rank() functions
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from src.db.trace_models import TS_CONFIG, MessageTrace, TracePayload, tsvector
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TEXT_MAX_CHARS = 4000
+FTS_TABLE = "message_traces_fts"
+# PostgreSQL ranks at most this many of the newest matches of a query
+RANK_CANDIDATES = 1000
+
+# WhatsApp message keys whose ``caption`` is searchable
+CAPTION_MESSAGE_KEYS = ("imageMessage", "videoMessage", "documentMessage", "documentWithCaptionMessage")
+
+SQLITE_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "search_text, content='message_traces', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON message_traces
+    WHEN new.search_text IS NOT NULL BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, search_text) VALUES (new.rowid, new.search_text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON message_traces
+    WHEN old.search_text IS NOT NULL BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text) VALUES ('delete', old.rowid, old.search_text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_text ON message_traces BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_text)
+            SELECT 'delete', old.rowid, old.search_text WHERE old.search_text IS NOT NULL;
+        INSERT INTO {FTS_TABLE}(rowid, search_text) SELECT new.rowid, new.search_text WHERE new.search_text IS NOT NULL;
+    END""",
+)
+
+
+def clip_search_text(value: Optional[str]) -> Optional[str]:
+    """Trimmed text capped at ``SEARCH_TEXT_MAX_CHARS`` (None when empty)."""
+    value = value.strip() if isinstance(value, str) else ""
+    return value[:SEARCH_TEXT_MAX_CHARS] or None
+
+
+def extract_message_text(message_obj: Dict[str, Any]) -> Optional[str]:
+    """Searchable text of a WhatsApp ``data.message`` object (text or media captions)."""
+    if not isinstance(message_obj, dict):
+        return None
+    parts = [message_obj.get("conversation"), (message_obj.get("extendedTextMessage") or {}).get("text")]
+    for key in CAPTION_MESSAGE_KEYS:
+        media = message_obj.get(key) or {}
+        if key == "documentWithCaptionMessage":
+            media = ((media.get("message") or {}).get("documentMessage")) or {}
+        parts.append(media.get("caption"))
+    return clip_search_text(" ".join(part for part in parts if isinstance(part, str) and part))
+
+
+def extract_payload_text(payload: Dict[str, Any]) -> Optional[str]:
+    """Searchable text of a stored ``webhook_received`` / ``*_send`` payload (used for backfills)."""
+    if not isinstance(payload, dict):
+        return None
+    if isinstance(payload.get("data"), dict):
+        return extract_message_text(payload["data"].get("message") or {})
+    if isinstance(payload.get("event"), dict):
+        return clip_search_text(payload["event"].get("content"))
+    return clip_search_text(payload.get("message_text") or payload.get("text"))
+
+
+def create_fts_table(connection: Connection) -> None:
+    """Create the SQLite FTS5 table and its sync triggers (no-op on other backends)."""
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in SQLITE_FTS_DDL:
+        connection.execute(text(statement))
+
+
+def drop_fts_table(connection: Connection) -> None:
+    if connection.dialect.name != "sqlite":
+        return
+    for suffix in ("ai", "ad", "au"):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+def rebuild_fts(connection: Connection) -> None:
+    """Re-read every ``search_text`` into the SQLite FTS5 index."""
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def fts5_query(query: str) -> str:
+    """FTS5 MATCH expression requiring every word of ``query`` (quoted, so input is never parsed as syntax)."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+def search_traces(
+    db_session: Session, query: str, limit: int = 50, instance_name: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Traces whose message text matches ``query``, most relevant first.
+
+    Returns:
+        Dicts with trace_id, score (higher is more relevant), instance_name,
+        sender_phone, status, received_at and text
+    """
+    if not query.strip():
+        return []
+
+    columns = (
+        MessageTrace.trace_id,
+        MessageTrace.instance_name,
+        MessageTrace.sender_phone,
+        MessageTrace.status,
+        MessageTrace.received_at,
+        MessageTrace.search_text,
+    )
+    dialect = db_session.get_bind().dialect.name
+    if dialect == "postgresql":
+        tsquery = func.websearch_to_tsquery(literal_column(f"'{TS_CONFIG}'"), query)
+        # ts_rank() re-parses each row's text, so only the newest matches are ranked
+        candidates = db_session.query(*columns).filter(tsvector(MessageTrace.search_text).op("@@")(tsquery))
+        if instance_name:
+            candidates = candidates.filter(MessageTrace.instance_name == instance_name)
+        matches = candidates.order_by(MessageTrace.received_at.desc()).limit(RANK_CANDIDATES).subquery()
+        score = func.ts_rank(tsvector(matches.c.search_text), tsquery)
+        rows = db_session.query(matches, score.label("score")).order_by(score.desc(), matches.c.received_at.desc())
+        return [_search_result(row) for row in rows.limit(limit).all()]
+    if dialect == "sqlite":
+        fts = table(FTS_TABLE, column("rowid"))
+        # bm25() is lower for better matches
+        score = -func.bm25(literal_column(FTS_TABLE))
+        statement = (
+            db_session.query(*columns, score.label("score"))
+            .join(fts, fts.c.rowid == literal_column("message_traces.rowid"))
+            .filter(literal_column(FTS_TABLE).op("MATCH")(fts5_query(query)))
+        )
+    else:
+        score = literal_column("1.0")
+        statement = db_session.query(*columns, score.label("score")).filter(
+            MessageTrace.search_text.ilike(f"%{query}%")
+        )
+
+    if instance_name:
+        statement = statement.filter(MessageTrace.instance_name == instance_name)
+    rows = statement.order_by(score.desc(), MessageTrace.received_at.desc()).limit(limit).all()
+    return [_search_result(row) for row in rows]
+
+
+def _search_result(row: Any) -> Dict[str, Any]:
+    return {
+        "trace_id": row.trace_id,
+        "score": round(float(row.score), 6),
+        "instance_name": row.instance_name,
+        "sender_phone": row.sender_phone,
+        "status": row.status,
+        "received_at": row.received_at.isoformat() if row.received_at else None,
+        "text": row.search_text,
+    }
+
+
+def backfill_search_text(db_session: Session, batch_size: int = 500) -> int:
+    """
+    Fill ``search_text`` of traces created before it existed, from their first stored payload.
+
+    Traces without extractable text get an empty string so they are not revisited.
+
+    Returns:
+        Number of traces that received searchable text
+    """
+    indexed = 0
+    after = ""
+    while True:
+        trace_ids = [
+            trace_id
+            for (trace_id,) in db_session.query(MessageTrace.trace_id)
+            .filter(MessageTrace.search_text.is_(None), MessageTrace.trace_id > after)
+            .order_by(MessageTrace.trace_id)
+            .limit(batch_size)
+            .all()
+        ]
+        if not trace_ids:
+            return indexed
+        after = trace_ids[-1]
+
+        found: Dict[str, Optional[str]] = {}
+        for payload in (
+            db_session.query(TracePayload)
+            .filter(TracePayload.trace_id.in_(trace_ids))
+            .order_by(TracePayload.trace_id, TracePayload.timestamp, TracePayload.id)
+        ):
+            if found.get(payload.trace_id):
+                continue
+            raw = payload.get_payload_bytes()
+            try:
+                found[payload.trace_id] = extract_payload_text(json.loads(raw)) if raw else None
+            except ValueError:
+                found[payload.trace_id] = None
+        for trace_id in trace_ids:
+            value = found.get(trace_id) or ""
+            db_session.query(MessageTrace).filter(MessageTrace.trace_id == trace_id).update(
+                {MessageTrace.search_text: value}, synchronize_session=False
+            )
+            indexed += bool(value)
+        db_session.commit()
@@ -3,19 +3,29 @@ Message Trace Service
 Manages the lifecycle of message traces through the Omni-Hub system.
 """
 
+import base64
+import threading
 import time
 import logging
-import uuid
 import json
 from functools import wraps
-from typing import Dict, Any, Optional, List, TYPE_CHECKING
+from typing import Dict, Any, Iterator, Optional, List, Tuple, TYPE_CHECKING
 from contextlib import contextmanager
-from sqlalchemy.orm import Session
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query, Session
 from sqlalchemy.exc import OperationalError
 
 from src.config import config
 from src.db.trace_models import MessageTrace, TracePayload
+from src.services.trace_archive import trace_archive
+from src.services.trace_retention import delete_expired_batch
+from src.services.trace_rollups import TERMINAL_STATUSES, raw_totals, rollup_analytics
+from src.services.trace_sampling import MAX_DEFERRED_PAYLOADS, SamplingDecision, trace_sampler
+from src.services.trace_search import clip_search_text, extract_message_text
+from src.services.trace_writer import PayloadEvent, StatusEvent, apply_status_update, trace_writer
 from src.utils.datetime_utils import utcnow
+from src.utils.uuid_utils import uuid7
 
 if TYPE_CHECKING:
     from src.services.streaming_trace_context import StreamingTraceContext
@@ -50,17 +60,64 @@ def retry_on_db_error(max_attempts: int = 3, backoff_factor: int = 2):
     return decorator
 
 
+class _PendingTraceState:
+    """Trace field changes not yet written, merged the way ``apply_status_update`` applies them."""
+
+    __slots__ = ("status", "error_message", "error_stage", "fields", "since")
+
+    def __init__(self):
+        self.status: Optional[str] = None
+        self.error_message: Optional[str] = None
+        self.error_stage: Optional[str] = None
+        self.fields: Dict[str, Any] = {}
+        self.since: Optional[float] = None
+
+    def __bool__(self) -> bool:
+        return self.since is not None
+
+    def merge(
+        self,
+        status: Optional[str],
+        error_message: Optional[str],
+        error_stage: Optional[str],
+        fields: Dict[str, Any],
+    ) -> None:
+        if status:
+            self.status = status
+        if error_message:
+            self.error_message = error_message
+        if error_stage:
+            self.error_stage = error_stage
+        self.fields.update(fields)
+        if self.since is None:
+            self.since = time.monotonic()
+
+    def is_stale(self) -> bool:
+        """Whether the oldest pending change has waited longer than the state flush interval."""
+        return self.since is not None and time.monotonic() - self.since >= config.tracing.state_flush_interval
+
+
 class TraceContext:
     """
     Context object that follows a message through its complete lifecycle.
     Provides methods to log each stage and update trace status.
+
+    Status and field updates are held in memory and written with a single
+    update when the trace reaches a terminal status (or ``flush()`` is
+    called); long-running traces are also flushed once their pending changes
+    are older than ``config.tracing.state_flush_interval``.
     """
 
-    def __init__(self, trace_id: str, db_session: Session):
+    def __init__(self, trace_id: str, db_session: Session, sampling: Optional[SamplingDecision] = None):
         self.trace_id = trace_id
         self.db_session = db_session
         self.start_time = time.time()
         self._stage_start_times = {}
+        # None keeps every payload; otherwise payloads of unsampled traces wait for the tail decision
+        self.sampling = sampling
+        self._deferred_payloads: List[Tuple[str, Dict[str, Any], str, Optional[int], Optional[str]]] = []
+        self._pending = _PendingTraceState()
+        self._pending_lock = threading.Lock()
 
     def log_stage(
         self,
@@ -83,6 +140,40 @@ class TraceContext:
         if not config.tracing.enabled:
             return
 
+        # Long streams log many stages before completing; keep the trace row reasonably current
+        if self._pending.is_stale():
+            self.flush()
+
+        if self.sampling is not None and not self.sampling.head_sampled:
+            if self.sampling.stores_payloads and len(self._deferred_payloads) < MAX_DEFERRED_PAYLOADS:
+                self._deferred_payloads.append((stage, payload, payload_type, status_code, error_details))
+            else:
+                trace_sampler.payloads_dropped += 1
+            return
+
+        self._write_payload(stage, payload, payload_type, status_code, error_details)
+
+    def _write_payload(
+        self,
+        stage: str,
+        payload: Dict[str, Any],
+        payload_type: str,
+        status_code: Optional[int],
+        error_details: Optional[str],
+    ) -> None:
+        # Hand off to the background writer when it runs; otherwise write inline
+        if trace_writer.submit(
+            PayloadEvent(
+                trace_id=self.trace_id,
+                stage=stage,
+                payload=payload,
+                payload_type=payload_type,
+                status_code=status_code,
+                error_details=error_details,
+            )
+        ):
+            return
+
         try:
             trace_payload = TracePayload(
                 trace_id=self.trace_id,
@@ -107,6 +198,33 @@ class TraceContext:
             logger.error(f"Failed to log trace payload for {stage}: {e}")
             # Don't let tracing failures break message processing
 
+    def _resolve_deferred_payloads(self, status: str) -> None:
+        """Tail decision at a terminal status: write the held payloads of failed/slow traces, drop the rest."""
+        deferred, self._deferred_payloads = self._deferred_payloads, []
+        elapsed_ms = (time.time() - self.start_time) * 1000
+        if not self.sampling.keep_at_completion(status, elapsed_ms):
+            trace_sampler.payloads_dropped += len(deferred)
+            return
+        trace_sampler.traces_tail_kept += 1
+        for stage, payload, payload_type, status_code, error_details in deferred:
+            self._write_payload(stage, payload, payload_type, status_code, error_details)
+
+    def take_deferred_payloads(self) -> Optional[Dict[str, Any]]:
+        """
+        Detach the payloads waiting for the tail decision, for the component that finishes the trace.
+
+        Returns a JSON-serializable hand-over for ``adopt_deferred_payloads``, or None if nothing is held.
+        """
+        if not self._deferred_payloads:
+            return None
+        deferred, self._deferred_payloads = self._deferred_payloads, []
+        return {"started_at": self.start_time, "payloads": [list(entry) for entry in deferred]}
+
+    def adopt_deferred_payloads(self, handover: Dict[str, Any]) -> None:
+        """Take over payloads detached with ``take_deferred_payloads``; the tail decision times the whole trace."""
+        self._deferred_payloads.extend(tuple(entry) for entry in handover.get("payloads", []))
+        self.start_time = min(self.start_time, handover.get("started_at", self.start_time))
+
     def update_trace_status(
         self,
         status: str,
@@ -126,45 +244,66 @@ class TraceContext:
         if not config.tracing.enabled:
             return
 
+        if self._deferred_payloads and status in TERMINAL_STATUSES:
+            self._resolve_deferred_payloads(status)
+
+        with self._pending_lock:
+            self._pending.merge(status, error_message, error_stage, kwargs)
+        if status in TERMINAL_STATUSES or self._pending.is_stale():
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the pending status and field changes to the trace row with a single update."""
+        with self._pending_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, _PendingTraceState()
+
+        if trace_writer.submit(
+            StatusEvent(
+                trace_id=self.trace_id,
+                status=pending.status,
+                error_message=pending.error_message,
+                error_stage=pending.error_stage,
+                fields=pending.fields,
+            )
+        ):
+            return
+
         try:
             trace = self.db_session.query(MessageTrace).filter(MessageTrace.trace_id == self.trace_id).first()
 
             if trace:
-                trace.status = status
-                if error_message:
-                    trace.error_message = error_message
-                if error_stage:
-                    trace.error_stage = error_stage
-
-                # Update any additional fields passed as kwargs
-                for key, value in kwargs.items():
-                    if hasattr(trace, key):
-                        setattr(trace, key, value)
-
-                # Update total processing time if completing
-                if status in ["completed", "failed"]:
-                    trace.completed_at = utcnow()
-                    if trace.received_at:
-                        # Ensure both datetimes are timezone-aware for subtraction
-                        from src.utils.datetime_utils import to_utc
-
-                        completed_utc = (
-                            to_utc(trace.completed_at) if trace.completed_at.tzinfo is None else trace.completed_at
-                        )
-                        received_utc = (
-                            to_utc(trace.received_at) if trace.received_at.tzinfo is None else trace.received_at
-                        )
-                        delta = completed_utc - received_utc
-                        trace.total_processing_time_ms = int(delta.total_seconds() * 1000)
-
+                apply_status_update(trace, pending.status, pending.error_message, pending.error_stage, pending.fields)
                 self.db_session.commit()
-                logger.debug(f"Updated trace {self.trace_id} status to {status}")
+                logger.debug(f"Updated trace {self.trace_id} status to {pending.status}")
             else:
                 logger.warning(f"Trace {self.trace_id} not found for status update")
 
         except Exception as e:
             logger.error(f"Failed to update trace status: {e}")
 
+    def take_pending(self) -> Optional[_PendingTraceState]:
+        """
+        Detach the pending status and field changes so the caller can write them in its own transaction.
+
+        Used when another component (the outbox dispatcher) finishes the trace: the changes are
+        written together with the hand-over instead of being lost. Give them back with
+        ``restore_pending`` if that write fails.
+        """
+        with self._pending_lock:
+            if not self._pending:
+                return None
+            pending, self._pending = self._pending, _PendingTraceState()
+        return pending
+
+    def restore_pending(self, pending: _PendingTraceState) -> None:
+        """Put back changes taken with ``take_pending``; changes made since then take precedence."""
+        with self._pending_lock:
+            newer, self._pending = self._pending, pending
+            if newer:
+                pending.merge(newer.status, newer.error_message, newer.error_stage, newer.fields)
+
     def log_agent_request(self, agent_payload: Dict[str, Any]) -> None:
         """Log agent API request payload."""
         self.log_stage("agent_request", agent_payload, "request")
@@ -215,26 +354,15 @@ class TraceContext:
 
     def update_session_info(self, session_name: str, agent_session_id: str = None) -> None:
         """Update trace with session information after agent processing."""
-        try:
-            trace = self.db_session.query(MessageTrace).filter(MessageTrace.trace_id == self.trace_id).first()
+        fields = {"session_name": session_name}
+        if agent_session_id:
+            fields["agent_session_id"] = agent_session_id
 
-            if trace:
-                trace.session_name = session_name
-                if agent_session_id:
-                    trace.agent_session_id = agent_session_id
-
-                self.db_session.commit()
-                logger.info(
-                    f"✅ Updated trace {self.trace_id} with session: {session_name}, agent_session: {agent_session_id}"
-                )
-            else:
-                logger.error(
-                    f"❌ Trace {self.trace_id} not found for session update - this indicates trace creation failed"
-                )
-
-        except Exception as e:
-            logger.error(f"❌ Failed to update trace session info: {e}", exc_info=True)
-            # Don't let tracing failures break message processing
+        with self._pending_lock:
+            self._pending.merge(None, None, None, fields)
+        if self._pending.is_stale():
+            self.flush()
+        logger.debug(f"Trace {self.trace_id} session: {session_name}, agent_session: {agent_session_id}")
 
 
 class TraceService:
@@ -280,7 +408,8 @@ class TraceService:
             key = data.get("key", {})
             message_obj = data.get("message", {})
 
-            trace_id = str(uuid.uuid4())
+            trace_id = str(uuid7())
+            sampling = trace_sampler.decide(trace_id, instance_name, db_session)
 
             message_type = TraceService._determine_message_type(message_obj)
             has_media = TraceService._has_media(message_obj)
@@ -308,13 +437,14 @@ class TraceService:
                 has_media=has_media,
                 has_quoted_message=has_quoted,
                 message_length=message_length,
+                search_text=extract_message_text(message_obj) if sampling.stores_payloads else None,
                 status="received",
             )
 
             db_session.add(trace)
             db_session.commit()
 
-            context = TraceContext(trace_id, db_session)
+            context = TraceContext(trace_id, db_session, sampling)
             # Enrich context with commonly accessed attributes for downstream helpers
             context.instance_name = instance_name
             context.whatsapp_message_id = trace.whatsapp_message_id
@@ -351,7 +481,8 @@ class TraceService:
             event_payload = message_data.get("event", {}) if isinstance(message_data, dict) else {}
             metadata = message_data.get("metadata", {}) if isinstance(message_data, dict) else {}
 
-            trace_id = str(uuid.uuid4())
+            trace_id = str(uuid7())
+            sampling = trace_sampler.decide(trace_id, instance_name, db_session)
             discord_message_id = str(event_payload.get("id")) if event_payload.get("id") is not None else None
             author = event_payload.get("author", {})
             content = event_payload.get("content") or ""
@@ -375,6 +506,7 @@ class TraceService:
                 has_media=has_media,
                 has_quoted_message=event_payload.get("has_quoted_message", False),
                 message_length=len(content),
+                search_text=clip_search_text(content) if sampling.stores_payloads else None,
                 session_name=session_name,
                 status="received",
             )
@@ -382,7 +514,7 @@ class TraceService:
             db_session.add(trace)
             db_session.commit()
 
-            context = TraceContext(trace_id, db_session)
+            context = TraceContext(trace_id, db_session, sampling)
             context.instance_name = instance_name
             context.session_name = session_name
             context.sender_name = trace.sender_name
@@ -449,7 +581,8 @@ class TraceService:
             message_obj = data.get("message", {})
 
             # Generate trace ID
-            trace_id = str(uuid.uuid4())
+            trace_id = str(uuid7())
+            sampling = trace_sampler.decide(trace_id, instance_name, db_session)
 
             # Determine message type and metadata
             message_type = TraceService._determine_message_type(message_obj)
@@ -480,6 +613,7 @@ class TraceService:
                 has_media=has_media,
                 has_quoted_message=has_quoted,
                 message_length=message_length,
+                search_text=extract_message_text(message_obj) if sampling.stores_payloads else None,
                 status="received",
             )
 
@@ -488,7 +622,7 @@ class TraceService:
             db_session.commit()
 
             # Create streaming context object
-            context = StreamingTraceContext(trace_id, db_session)
+            context = StreamingTraceContext(trace_id, db_session, sampling)
 
             # Log the initial webhook payload
             context.log_stage("webhook_received", message_data, "webhook")
@@ -510,6 +644,89 @@ class TraceService:
             logger.error(f"Failed to get trace {trace_id}: {e}")
             return None
 
+    @staticmethod
+    def encode_cursor(trace: MessageTrace) -> str:
+        """Opaque keyset cursor pointing just after ``trace`` in (received_at, trace_id) descending order."""
+        position = json.dumps([trace.received_at.isoformat(), trace.trace_id])
+        return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        """
+        Decode a cursor produced by ``encode_cursor``.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            received_at, trace_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            return datetime.fromisoformat(received_at), str(trace_id)
+        except Exception as e:
+            raise ValueError(f"Invalid trace cursor: {cursor!r}") from e
+
+    @staticmethod
+    def paginate_traces(
+        query: Query,
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[Tuple[datetime, str]] = None,
+    ) -> Tuple[List[MessageTrace], Optional[str]]:
+        """
+        Fetch one page of ``query`` newest first, using keyset pagination when a cursor is given.
+
+        The cursor seeks directly to ``(received_at, trace_id) < cursor`` on the composite
+        indexes, so page cost does not grow with depth like ``offset`` does. ``offset`` is
+        kept for existing clients and ignored when a cursor is given.
+
+        Returns:
+            The page of traces and the cursor for the next page (None on the last page)
+        """
+        if cursor is not None:
+            query = query.filter(tuple_(MessageTrace.received_at, MessageTrace.trace_id) < tuple_(*cursor))
+        query = query.order_by(MessageTrace.received_at.desc(), MessageTrace.trace_id.desc())
+        if cursor is None:
+            query = query.offset(offset)
+
+        # One extra row tells whether another page exists
+        traces = query.limit(limit + 1).all()
+        if len(traces) <= limit:
+            return traces, None
+        traces = traces[:limit]
+        return traces, TraceService.encode_cursor(traces[-1])
+
+    @staticmethod
+    def iter_trace_batches(
+        query: Query,
+        batch_size: int,
+        after: Optional[Tuple[datetime, str]] = None,
+    ) -> Iterator[List[MessageTrace]]:
+        """
+        Yield all traces of ``query`` oldest first, in keyset batches of ``batch_size``.
+
+        Each batch is its own short query seeking past the last trace of the previous
+        one, so memory stays bounded by the batch size and no transaction is held open
+        between batches. ``after`` (a decoded cursor) resumes just after that trace.
+        """
+        position = after
+        while True:
+            batch_query = query
+            if position is not None:
+                batch_query = batch_query.filter(
+                    tuple_(MessageTrace.received_at, MessageTrace.trace_id) > tuple_(*position)
+                )
+            traces = (
+                batch_query.order_by(MessageTrace.received_at.asc(), MessageTrace.trace_id.asc())
+                .limit(batch_size)
+                .all()
+            )
+            if not traces:
+                return
+            yield traces
+            if len(traces) < batch_size:
+                return
+            position = (traces[-1].received_at, traces[-1].trace_id)
+
     @staticmethod
     def get_traces_by_phone(phone: str, db_session: Session, limit: int = 50) -> List[MessageTrace]:
         """Get recent traces for a phone number."""
@@ -518,7 +735,7 @@ class TraceService:
             return (
                 db_session.query(MessageTrace)
                 .filter(MessageTrace.sender_phone == phone)
-                .order_by(MessageTrace.received_at.desc())
+                .order_by(MessageTrace.received_at.desc(), MessageTrace.trace_id.desc())
                 .limit(limit)
                 .all()
             )
@@ -528,9 +745,9 @@ class TraceService:
 
     @staticmethod
     def get_trace_payloads(trace_id: str, db_session: Session) -> List[TracePayload]:
-        """Get all payloads for a trace."""
+        """Get all payloads for a trace, including payloads moved to the cold archive."""
         try:
-            return (
+            payloads = (
                 db_session.query(TracePayload)
                 .filter(TracePayload.trace_id == trace_id)
                 .order_by(TracePayload.timestamp.asc())
@@ -540,11 +757,63 @@ class TraceService:
             logger.error(f"Failed to get payloads for trace {trace_id}: {e}")
             return []
 
+        return TraceService.merge_archived_payloads(trace_id, payloads)
+
+    @staticmethod
+    def merge_archived_payloads(trace_id: str, payloads: List[TracePayload]) -> List[TracePayload]:
+        """Add a trace's payloads from the cold archive to its database ``payloads``, oldest first."""
+        archived = trace_archive.get_payloads(trace_id)
+        if not archived:
+            return payloads
+        # An archive pass interrupted before its delete committed leaves payloads in both places
+        hot_ids = {payload.id for payload in payloads}
+        payloads = payloads + [payload for payload in archived if payload.id not in hot_ids]
+        return sorted(payloads, key=lambda payload: (payload.timestamp or datetime.min, payload.id or 0))
+
+    @staticmethod
+    def get_trace_analytics(
+        db_session: Session,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        instance_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Aggregate trace metrics in the database.
+
+        With rollups enabled, full hours/minutes of the range are read from the
+        rollup tables and only the partial minutes at the edges (plus traces not
+        yet completed) from raw rows. Otherwise the raw rows are aggregated with
+        SQL aggregates. Either way no trace rows are loaded into memory.
+
+        Args:
+            db_session: Database session
+            start_date: Only traces received at or after this time (None for no lower bound)
+            end_date: Only traces received at or before this time (None for no upper bound)
+            instance_name: Only traces of this instance
+
+        Returns:
+            Dict with the fields of the ``TraceAnalytics`` API model
+        """
+        if config.tracing.rollups_enabled:
+            return rollup_analytics(db_session, start_date, end_date, instance_name).to_response()
+
+        filters = []
+        if start_date is not None:
+            filters.append(MessageTrace.received_at >= start_date)
+        if end_date is not None:
+            filters.append(MessageTrace.received_at <= end_date)
+        if instance_name:
+            filters.append(MessageTrace.instance_name == instance_name)
+        return raw_totals(db_session, filters).to_response()
+
     @staticmethod
     def cleanup_old_traces(db_session: Session, days_old: int = 30) -> int:
         """
         Clean up traces older than specified days.
 
+        Deletes in batches of ``config.tracing.retention_batch_size`` (payloads first,
+        one commit per batch) so the trace tables are never locked by one large delete.
+
         Args:
             db_session: Database session
             days_old: Delete traces older than this many days
@@ -559,15 +828,20 @@ class TraceService:
             from datetime import timedelta
 
             cutoff_date = utcnow() - timedelta(days=days_old)
+            batch_size = config.tracing.retention_batch_size
 
-            # Delete old traces (payloads will be deleted via cascade)
-            deleted_count = db_session.query(MessageTrace).filter(MessageTrace.received_at < cutoff_date).delete()
+            deleted_count = 0
+            while True:
+                deleted = delete_expired_batch(db_session, cutoff_date, batch_size)
+                deleted_count += deleted["traces"]
+                if deleted["traces"] < batch_size:
+                    break
 
-            db_session.commit()
             logger.info(f"Cleaned up {deleted_count} traces older than {days_old} days")
             return deleted_count
 
         except Exception as e:
+            db_session.rollback()
             logger.error(f"Failed to cleanup old traces: {e}")
             return 0
 
@@ -654,7 +928,8 @@ class TraceService:
 
                 db_session = SessionLocal()
                 managed_session = True
-                trace_id = str(uuid.uuid4())
+                trace_id = str(uuid7())
+                sampling = trace_sampler.decide(trace_id, instance_name, db_session)
 
                 trace = MessageTrace(
                     trace_id=trace_id,
@@ -667,6 +942,7 @@ class TraceService:
                     has_media=payload.get("has_media", False),
                     has_quoted_message=payload.get("has_quoted_message", False),
                     message_length=len(payload.get("message_text", "") or ""),
+                    search_text=clip_search_text(payload.get("message_text")) if sampling.stores_payloads else None,
                     session_name=session_name,
                     status="processing",
                 )
@@ -674,7 +950,7 @@ class TraceService:
                 db_session.add(trace)
                 db_session.commit()
 
-                context = TraceContext(trace_id, db_session)
+                context = TraceContext(trace_id, db_session, sampling)
                 context.instance_name = instance_name
                 context.session_name = session_name
                 context.channel_type = channel_type
@@ -762,5 +1038,7 @@ def get_trace_context(message_data: Dict[str, Any], instance_name: str, db_sessi
         logger.error(f"Error in trace context: {e}")
         yield trace_context
     finally:
+        # Write whatever the message left pending (a terminal status has already been flushed).
         # The request-scoped session lifecycle is managed by FastAPI; do not close here.
-        pass
+        if trace_context:
+            trace_context.flush()
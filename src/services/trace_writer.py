@@ -0,0 +1,315 @@
+"""
+Asynchronous batched writer for message traces.
+
+``TraceContext.log_stage`` / ``update_trace_status`` enqueue events here instead of
+committing on the request's session. A background thread drains the bounded queue,
+bulk-inserts the payload rows, applies all status updates of a trace to a single
+row update, and commits once per batch (or once per flush interval when traffic
+is low). Enqueueing never blocks: when the queue is full the event is dropped and
+counted, because tracing must not slow down message handling.
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from src.config import config
+from src.db.trace_models import MessageTrace, TracePayload
+from src.services.trace_rollups import TERMINAL_STATUSES
+from src.utils.datetime_utils import to_utc, utcnow
+
+logger = logging.getLogger(__name__)
+
+
+def apply_status_update(
+    trace: MessageTrace,
+    status: Optional[str],
+    error_message: Optional[str] = None,
+    error_stage: Optional[str] = None,
+    fields: Optional[Dict[str, Any]] = None,
+    at: Optional[datetime] = None,
+) -> None:
+    """
+    Apply a status update to a trace row (shared by the synchronous and batched paths).
+
+    Args:
+        trace: Trace row to update
+        status: New status, or None to only set fields
+        error_message: Error message if status is failed
+        error_stage: Stage where error occurred
+        fields: Additional trace attributes to set
+        at: When the update happened (completion time for terminal statuses)
+    """
+    if status:
+        trace.status = status
+    if error_message:
+        trace.error_message = error_message
+    if error_stage:
+        trace.error_stage = error_stage
+
+    for key, value in (fields or {}).items():
+        if hasattr(trace, key):
+            setattr(trace, key, value)
+
+    # Update total processing time if completing
+    if status in TERMINAL_STATUSES:
+        trace.completed_at = at or utcnow()
+        if trace.received_at:
+            # Ensure both datetimes are timezone-aware for subtraction
+            completed_utc = to_utc(trace.completed_at) if trace.completed_at.tzinfo is None else trace.completed_at
+            received_utc = to_utc(trace.received_at) if trace.received_at.tzinfo is None else trace.received_at
+            delta = completed_utc - received_utc
+            trace.total_processing_time_ms = int(delta.total_seconds() * 1000)
+
+
+# Seconds a status event waits for room in a full queue before the caller writes it inline
+STATUS_EVENT_PUT_TIMEOUT = 0.5
+
+
+@dataclass
+class PayloadEvent:
+    """A stage payload to insert into ``trace_payloads``."""
+
+    trace_id: str
+    stage: str
+    payload: Dict[str, Any]
+    payload_type: str
+    status_code: Optional[int] = None
+    error_details: Optional[str] = None
+    timestamp: datetime = field(default_factory=utcnow)
+
+
+@dataclass
+class StatusEvent:
+    """A status/field update for a ``message_traces`` row."""
+
+    trace_id: str
+    status: Optional[str]
+    error_message: Optional[str] = None
+    error_stage: Optional[str] = None
+    fields: Dict[str, Any] = field(default_factory=dict)
+    timestamp: datetime = field(default_factory=utcnow)
+
+
+class TraceWriter:
+    """Background thread that persists trace events in batches."""
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self._session_factory = session_factory
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.is_running = False
+
+        self.events_enqueued = 0
+        self.events_dropped = 0
+        self.status_events_inline = 0
+        self.events_failed = 0
+        self.payloads_written = 0
+        self.traces_updated = 0
+        self.batches_committed = 0
+
+    def _new_session(self) -> Session:
+        if self._session_factory is None:
+            from src.db.database import SessionLocal
+
+            return SessionLocal()
+        return self._session_factory()
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._queue = queue.Queue(maxsize=config.tracing.writer_queue_size)
+        self._stop_event.clear()
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run_loop, name="trace-writer", daemon=True)
+        self._thread.start()
+        logger.info("Trace writer started")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting events, write what is queued and stop the thread."""
+        self.is_running = False
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        logger.info("Trace writer stopped")
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Wait until every event enqueued so far has been written.
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        if self._queue is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def submit(self, event) -> bool:
+        """
+        Enqueue an event.
+
+        Payload events never block: they are dropped when the queue is full. Status events
+        must not be lost (a dropped completion leaves the trace stuck and out of the rollups),
+        so they wait up to ``STATUS_EVENT_PUT_TIMEOUT`` for room and are otherwise handed back.
+
+        Returns:
+            bool: False if the caller should write synchronously (the writer is not running, or
+            a status event found no room). Payload events dropped because the queue is full
+            still return True.
+        """
+        if not self.is_running or self._queue is None:
+            return False
+        is_status = isinstance(event, StatusEvent)
+        try:
+            if is_status:
+                self._queue.put(event, timeout=STATUS_EVENT_PUT_TIMEOUT)
+            else:
+                self._queue.put_nowait(event)
+            self.events_enqueued += 1
+        except queue.Full:
+            if is_status:
+                self.status_events_inline += 1
+                return False
+            self.events_dropped += 1
+            if self.events_dropped == 1 or self.events_dropped % 1000 == 0:
+                logger.warning(f"Trace writer queue full; {self.events_dropped} trace events dropped so far")
+        return True
+
+    def _next_batch(self) -> List[Any]:
+        interval = config.tracing.writer_flush_interval
+        try:
+            first = self._queue.get(timeout=interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + interval
+        while len(batch) < config.tracing.writer_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if self._stop_event.is_set() or remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._stop_event.is_set():
+                    return
+                continue
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                self.events_failed += len(batch)
+                logger.error(f"Trace writer failed to persist {len(batch)} events: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def write_batch(self, events: List[Any]) -> None:
+        """
+        Persist a batch of events in one transaction.
+
+        If the transaction fails, the events are retried one by one so that a bad event
+        (e.g. a payload for a trace that no longer exists) only loses itself; the events
+        that still fail are dropped and counted in ``events_failed``.
+        """
+        try:
+            self._write(events)
+            return
+        except Exception as e:
+            if len(events) == 1:
+                raise
+            logger.warning(f"Trace writer batch of {len(events)} events failed ({e}); retrying events one by one")
+
+        for event in events:
+            try:
+                self._write([event])
+            except Exception as e:
+                self.events_failed += 1
+                logger.error(f"Trace writer dropped {type(event).__name__} for trace {event.trace_id}: {e}")
+
+    def _write(self, events: List[Any]) -> None:
+        payloads: List[TracePayload] = []
+        status_events: Dict[str, List[StatusEvent]] = {}
+
+        for event in events:
+            if isinstance(event, PayloadEvent):
+                trace_payload = TracePayload(
+                    trace_id=event.trace_id,
+                    stage=event.stage,
+                    payload_type=event.payload_type,
+                    status_code=event.status_code,
+                    error_details=event.error_details,
+                    timestamp=event.timestamp,
+                )
+                trace_payload.set_payload(event.payload)
+                payloads.append(trace_payload)
+            elif isinstance(event, StatusEvent):
+                status_events.setdefault(event.trace_id, []).append(event)
+
+        db_session = self._new_session()
+        try:
+            if payloads:
+                db_session.bulk_save_objects(payloads)
+
+            if status_events:
+                traces = (
+                    db_session.query(MessageTrace).filter(MessageTrace.trace_id.in_(list(status_events.keys()))).all()
+                )
+                for trace in traces:
+                    # Updates are applied in order to the loaded row, so the flush issues one UPDATE per trace
+                    for event in status_events[trace.trace_id]:
+                        apply_status_update(
+                            trace, event.status, event.error_message, event.error_stage, event.fields, event.timestamp
+                        )
+                missing = len(status_events) - len(traces)
+                if missing:
+                    logger.warning(f"Trace writer: {missing} traces not found for status update")
+                self.traces_updated += len(traces)
+
+            db_session.commit()
+            self.payloads_written += len(payloads)
+            self.batches_committed += 1
+        except Exception:
+            db_session.rollback()
+            raise
+        finally:
+            db_session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        return {
+            "running": self.is_running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "events_enqueued": self.events_enqueued,
+            "events_dropped": self.events_dropped,
+            "status_events_inline": self.status_events_inline,
+            "events_failed": self.events_failed,
+            "payloads_written": self.payloads_written,
+            "traces_updated": self.traces_updated,
+            "batches_committed": self.batches_committed,
+        }
+
+
+# Global trace writer instance
+trace_writer = TraceWriter()
@@ -7,10 +7,15 @@ agents, and interactions while tracking their most recent session info.
 
 import logging
 from typing import Optional, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy import DateTime, case, func, literal, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, aliased
 
 from src.db.models import User, UserExternalId
 from src.utils.datetime_utils import utcnow
+from src.utils.uuid_utils import uuid7
 
 logger = logging.getLogger(__name__)
 
@@ -57,7 +62,10 @@ class UserService:
         Get or create a user by phone number and instance.
 
         This is the primary method for incoming messages to ensure we have
-        a stable user identity.
+        a stable user identity. The user row and its WhatsApp external ID link
+        are written with ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING``:
+        one statement on PostgreSQL, two in the same transaction on SQLite,
+        and a single commit either way.
 
         Args:
             phone_number: WhatsApp phone number
@@ -74,60 +82,122 @@ class UserService:
 
         # Format phone to JID
         whatsapp_jid = self._format_phone_to_jid(phone_number)
+        now = utcnow()
+        dialect = db.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
 
-        # Try to find existing user by phone + instance
-        user = db.query(User).filter_by(phone_number=phone_number, instance_name=instance_name).first()
-
-        if user:
-            # Update existing user
-            user.last_seen_at = utcnow()
-            user.message_count += 1
-
-            if display_name:
-                user.display_name = display_name
-
-            if session_name:
-                user.last_session_name_interaction = session_name
-
-            # Update whatsapp_jid in case formatting changed
-            user.whatsapp_jid = whatsapp_jid
-            user.updated_at = utcnow()
-
-            db.commit()
-            db.refresh(user)
-
-            # Ensure WhatsApp external ID link exists
-            try:
-                self.link_external_id(user.id, "whatsapp", whatsapp_jid, instance_name, db)
-            except Exception:
-                logger.exception("Failed to ensure WhatsApp external ID link for existing user")
-
-            logger.info(f"Updated existing user {user.id} for phone {phone_number}")
-            return user
-
-        # Create new user
-        user = User(
+        user_stmt = insert(User).values(
+            id=str(uuid7()),
             phone_number=phone_number,
             whatsapp_jid=whatsapp_jid,
             instance_name=instance_name,
             display_name=display_name,
             last_session_name_interaction=session_name,
+            last_seen_at=now,
             message_count=1,
+            created_at=now,
+            updated_at=now,
+        )
+        excluded = user_stmt.excluded
+        user_stmt = user_stmt.on_conflict_do_update(
+            index_elements=[User.instance_name, User.phone_number],
+            set_={
+                # Keep the stored name and session when the message doesn't carry one
+                "display_name": func.coalesce(excluded.display_name, User.display_name),
+                "last_session_name_interaction": func.coalesce(
+                    excluded.last_session_name_interaction, User.last_session_name_interaction
+                ),
+                # Update whatsapp_jid in case formatting changed
+                "whatsapp_jid": excluded.whatsapp_jid,
+                "last_seen_at": excluded.last_seen_at,
+                "message_count": func.coalesce(User.message_count, 0) + 1,
+                "updated_at": excluded.updated_at,
+            },
         )
 
-        db.add(user)
+        try:
+            user = self._upsert_user_with_link(db, dialect, insert, user_stmt, whatsapp_jid, instance_name, now)
+        except SQLAlchemyError:
+            # A broken link must not lose the user: store it alone, as before links were upserted with it
+            db.rollback()
+            logger.exception(f"Failed to upsert the WhatsApp link of {whatsapp_jid}; storing the user without it")
+            user = db.scalars(user_stmt.returning(User), execution_options={"populate_existing": True}).one()
+
+        # Detach before committing so the returned attributes stay loaded without a refresh query
+        db.expunge(user)
         db.commit()
-        db.refresh(user)
 
-        # Create WhatsApp external ID link
-        try:
-            self.link_external_id(user.id, "whatsapp", whatsapp_jid, instance_name, db)
-        except Exception:
-            logger.exception("Failed to create WhatsApp external ID link for new user")
+        if user.message_count == 1:
+            logger.info(f"Created new user {user.id} for phone {phone_number} in instance {instance_name}")
+        else:
+            logger.info(f"Updated existing user {user.id} for phone {phone_number}")
+        return user
 
-        logger.info(f"Created new user {user.id} for phone {phone_number} in instance {instance_name}")
+    def _upsert_user_with_link(
+        self, db: Session, dialect: str, insert, user_stmt, whatsapp_jid: str, instance_name: str, now
+    ) -> User:
+        """Run the user upsert together with the upsert of its WhatsApp link; returns the user."""
+        if dialect == "postgresql":
+            # User and WhatsApp link in one round trip: the link insert reads the upserted row from a CTE
+            user_cte = user_stmt.returning(*User.__table__.c).cte("upserted_user")
+            link_stmt = self._whatsapp_link_upsert(
+                insert(UserExternalId).from_select(
+                    ["user_id", "provider", "external_id", "instance_name", "created_at", "updated_at"],
+                    select(
+                        user_cte.c.id,
+                        literal("whatsapp"),
+                        literal(whatsapp_jid),
+                        literal(instance_name),
+                        literal(now, DateTime),
+                        literal(now, DateTime),
+                    ),
+                )
+            )
+            stmt = select(aliased(User, user_cte)).add_cte(link_stmt.cte("upserted_link"))
+            user = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+        else:
+            # SQLite has no data-modifying CTEs, so the link is a second upsert in the same transaction
+            user = db.scalars(user_stmt.returning(User), execution_options={"populate_existing": True}).one()
+            db.execute(
+                self._whatsapp_link_upsert(
+                    insert(UserExternalId).values(
+                        user_id=user.id,
+                        provider="whatsapp",
+                        external_id=whatsapp_jid,
+                        instance_name=instance_name,
+                        created_at=now,
+                        updated_at=now,
+                    )
+                )
+            )
         return user
 
+    @staticmethod
+    def _whatsapp_link_upsert(link_stmt):
+        """Point the instance's link for the JID at the upserted user, writing only when it changed."""
+        return link_stmt.on_conflict_do_update(
+            index_elements=[UserExternalId.provider, UserExternalId.external_id, UserExternalId.instance_name],
+            set_={"user_id": link_stmt.excluded.user_id, "updated_at": link_stmt.excluded.updated_at},
+            where=UserExternalId.user_id != link_stmt.excluded.user_id,
+        )
+
+    @staticmethod
+    def _find_link(
+        provider: str, external_id: str, db: Session, instance_name: Optional[str] = None
+    ) -> Optional[UserExternalId]:
+        """
+        The link of an external ID.
+
+        Links are unique per instance, so an ID can have several: the one of
+        ``instance_name`` wins, then the most recently updated.
+        """
+        query = db.query(UserExternalId).filter(
+            UserExternalId.provider == provider, UserExternalId.external_id == external_id
+        )
+        if instance_name is not None:
+            query = query.order_by(case((UserExternalId.instance_name == instance_name, 0), else_=1))
+        return query.order_by(UserExternalId.updated_at.desc(), UserExternalId.id.desc()).first()
+
     def link_external_id(
         self,
         user_id: str,
@@ -144,11 +214,7 @@ class UserService:
         if not (user_id and provider and external_id):
             raise ValueError("user_id, provider and external_id are required")
 
-        link = (
-            db.query(UserExternalId)
-            .filter(UserExternalId.provider == provider, UserExternalId.external_id == external_id)
-            .first()
-        )
+        link = self._find_link(provider, external_id, db, instance_name)
 
         if link:
             if link.user_id != user_id:
@@ -170,15 +236,13 @@ class UserService:
         db.commit()
         return True
 
-    def resolve_user_by_external(self, provider: str, external_id: str, db: Session) -> Optional[User]:
-        """Resolve a User by provider/external_id mapping."""
+    def resolve_user_by_external(
+        self, provider: str, external_id: str, db: Session, instance_name: Optional[str] = None
+    ) -> Optional[User]:
+        """Resolve a User by provider/external_id mapping (preferring the link of ``instance_name``)."""
         if not (provider and external_id):
             return None
-        link = (
-            db.query(UserExternalId)
-            .filter(UserExternalId.provider == provider, UserExternalId.external_id == external_id)
-            .first()
-        )
+        link = self._find_link(provider, external_id, db, instance_name)
         if not link:
             return None
         return db.query(User).filter_by(id=link.user_id).first()
@@ -241,15 +305,19 @@ class UserService:
         Returns:
             bool: Success status
         """
-        user = db.query(User).filter_by(id=user_id).first()
-        if not user:
+        now = utcnow()
+        updated = (
+            db.query(User)
+            .filter_by(id=user_id)
+            .update(
+                {"last_agent_user_id": agent_user_id, "last_seen_at": now, "updated_at": now},
+                synchronize_session=False,
+            )
+        )
+        if not updated:
             logger.warning(f"Cannot update agent ID - user {user_id} not found")
             return False
 
-        user.last_agent_user_id = agent_user_id
-        user.last_seen_at = utcnow()
-        user.updated_at = utcnow()
-
         db.commit()
         logger.info(f"Updated agent user ID for user {user_id} to {agent_user_id}")
         return True
@@ -313,5 +381,44 @@ class UserService:
         return None
 
 
+def reconcile_whatsapp_links(connection: Connection) -> int:
+    """
+    Key legacy WhatsApp links by their user's instance, so the inbound upsert finds them.
+
+    Links written before the upsert may carry no ``instance_name`` or another
+    instance's. Each is moved to its user's instance, unless that instance
+    already has a link for the JID (kept, preferring one that was already
+    correct, then the most recently updated); the leftovers are deleted.
+
+    Returns:
+        Number of links moved or deleted
+    """
+    rows = connection.execute(
+        text(
+            "SELECT l.id, l.external_id, l.instance_name, u.instance_name FROM user_external_ids l "
+            "JOIN users u ON u.id = l.user_id WHERE l.provider = 'whatsapp' "
+            "ORDER BY CASE WHEN l.instance_name = u.instance_name THEN 0 ELSE 1 END, l.updated_at DESC, l.id DESC"
+        )
+    ).fetchall()
+    kept = set()
+    deleted, moved = [], []
+    for link_id, external_id, link_instance, user_instance in rows:
+        key = (external_id, user_instance)
+        if key in kept:
+            deleted.append({"id": link_id})
+            continue
+        kept.add(key)
+        if link_instance != user_instance:
+            moved.append({"id": link_id, "instance": user_instance})
+
+    if deleted:
+        connection.execute(text("DELETE FROM user_external_ids WHERE id = :id"), deleted)
+    if moved:
+        # Clear first: a link may move onto a key another moving link still holds (NULLs never conflict)
+        connection.execute(text("UPDATE user_external_ids SET instance_name = NULL WHERE id = :id"), moved)
+        connection.execute(text("UPDATE user_external_ids SET instance_name = :instance WHERE id = :id"), moved)
+    return len(deleted) + len(moved)
+
+
 # Singleton instance
 user_service = UserService()
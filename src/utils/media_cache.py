@@ -0,0 +1,284 @@
+"""
+Content-addressed on-disk cache for downloaded media.
+
+Media fetched by the WhatsApp client, the audio transcriber and the media decryptor
+goes through a single cache, so a file referenced by several code paths (e.g. an
+audio message that is transcribed and then forwarded) is downloaded once.
+
+Layout under the cache directory::
+
+    blobs/<aa>/<sha256>   file contents, named by the SHA-256 of the content
+    urls/<sha256(url)>    the content hash a URL resolved to
+    tmp/                  in-progress downloads, renamed into ``blobs`` when complete
+
+Downloads are streamed to disk in chunks, identical content reached through different
+URLs is stored once, and the least recently used blobs are evicted, together with the
+URL entries pointing at them, when the total size exceeds the configured limit.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+class _UrlLock:
+    """Per-URL download lock with the number of threads holding or waiting for it."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+class MediaCache:
+    """Thread-safe, size-bounded LRU cache of downloaded media keyed by URL and content hash."""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, _UrlLock] = {}
+        # content hash -> size in bytes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        # content hash -> keys of the URL entries resolving to it (removed with the blob)
+        self._url_keys: Dict[str, Set[str]] = {}
+        self._total_bytes = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def root(self) -> Path:
+        return Path(self._directory or config.media_cache.directory)
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else config.media_cache.max_bytes
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self.root / "blobs" / content_hash[:2] / content_hash
+
+    def _url_path(self, url: str) -> Path:
+        return self.root / "urls" / _url_key(url)
+
+    def _load(self) -> None:
+        """Rebuild the LRU order from files left by a previous run (oldest access first)."""
+        if self._loaded:
+            return
+        for sub in ("blobs", "urls", "tmp"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+        found = []
+        for path in (self.root / "blobs").glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime, path.name, stat.st_size))
+        for _, content_hash, size in sorted(found):
+            self._entries[content_hash] = size
+            self._total_bytes += size
+
+        # Index URL entries by blob; drop those whose blob is gone (and interrupted writes)
+        for url_path in (self.root / "urls").iterdir():
+            try:
+                content_hash = url_path.read_text().strip() if url_path.suffix != ".tmp" else None
+            except OSError:
+                continue
+            if content_hash in self._entries:
+                self._url_keys.setdefault(content_hash, set()).add(url_path.name)
+            else:
+                url_path.unlink(missing_ok=True)
+        self._loaded = True
+
+    @contextmanager
+    def _url_lock(self, url: str) -> Iterator[None]:
+        """Hold the lock of ``url``; the entry is dropped once its last user releases it."""
+        key = _url_key(url)
+        with self._lock:
+            url_lock = self._url_locks.get(key)
+            if url_lock is None:
+                url_lock = self._url_locks[key] = _UrlLock()
+            url_lock.users += 1
+        try:
+            with url_lock.lock:
+                yield
+        finally:
+            with self._lock:
+                url_lock.users -= 1
+                if url_lock.users == 0:
+                    del self._url_locks[key]
+
+    def _lookup(self, url: str) -> Optional[Path]:
+        url_path = self._url_path(url)
+        try:
+            content_hash = url_path.read_text().strip()
+        except OSError:
+            return None
+
+        with self._lock:
+            blob_path = self._blob_path(content_hash)
+            if content_hash not in self._entries or not blob_path.exists():
+                # Blob was evicted; the URL entry is stale
+                url_path.unlink(missing_ok=True)
+                return None
+            self._entries.move_to_end(content_hash)
+        try:
+            os.utime(blob_path)
+        except OSError:
+            pass
+        return blob_path
+
+    def _download(self, url: str, timeout: float, headers: Optional[Dict[str, str]]) -> Tuple[str, bytes]:
+        """Download ``url`` into the cache; returns the content hash and the content."""
+        tmp_dir = self.root / "tmp"
+        hasher = hashlib.sha256()
+        chunks: List[bytes] = []
+        size = 0
+
+        fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                with requests.get(url, stream=True, timeout=timeout, headers=headers) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        tmp_file.write(chunk)
+                        chunks.append(chunk)
+                        hasher.update(chunk)
+                        size += len(chunk)
+
+            content_hash = hasher.hexdigest()
+            blob_path = self._blob_path(content_hash)
+            with self._lock:
+                if content_hash in self._entries and blob_path.exists():
+                    # Same content already cached under another URL
+                    os.unlink(tmp_name)
+                    self._entries.move_to_end(content_hash)
+                else:
+                    blob_path.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(tmp_name, blob_path)
+                    self._entries[content_hash] = size
+                    self._total_bytes += size
+
+                # Under the cache lock so an eviction never leaves this URL entry behind
+                url_path = self._url_path(url)
+                url_tmp = url_path.with_suffix(".tmp")
+                url_tmp.write_text(content_hash)
+                os.replace(url_tmp, url_path)
+                self._url_keys.setdefault(content_hash, set()).add(url_path.name)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+        logger.debug(f"Cached media {content_hash[:12]} ({size} bytes)")
+        # The downloaded content is returned as is: the blob may be evicted before it could be read back
+        return content_hash, b"".join(chunks)
+
+    def _evict(self, keep: str) -> None:
+        with self._lock:
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                content_hash, size = next(iter(self._entries.items()))
+                if content_hash == keep:
+                    self._entries.move_to_end(content_hash)
+                    continue
+                del self._entries[content_hash]
+                self._total_bytes -= size
+                self._blob_path(content_hash).unlink(missing_ok=True)
+                self._remove_url_entries(content_hash)
+                logger.debug(f"Evicted cached media {content_hash[:12]} ({size} bytes)")
+
+    def _remove_url_entries(self, content_hash: str) -> None:
+        """Delete the URL entries of an evicted blob (called with ``self._lock`` held)."""
+        for key in self._url_keys.pop(content_hash, ()):
+            url_path = self.root / "urls" / key
+            try:
+                # The URL may have been downloaded again since and now resolve to other content
+                if url_path.read_text().strip() == content_hash:
+                    url_path.unlink(missing_ok=True)
+            except OSError:
+                continue
+
+    def get_bytes(self, url: str, timeout: float = 30, headers: Optional[Dict[str, str]] = None) -> bytes:
+        """
+        Return the content at ``url``, downloading it only on a cache miss.
+
+        Args:
+            url: Media URL
+            timeout: Request timeout in seconds for a miss
+            headers: Optional request headers for a miss
+
+        Returns:
+            bytes: The media content
+
+        Raises:
+            requests.exceptions.RequestException: If the download fails
+        """
+        if not config.media_cache.enabled:
+            response = requests.get(url, timeout=timeout, headers=headers)
+            response.raise_for_status()
+            return response.content
+
+        with self._lock:
+            self._load()
+
+        # Serialize per URL so concurrent callers wait for a single download
+        with self._url_lock(url):
+            blob_path = self._lookup(url)
+            content = None
+            if blob_path is not None:
+                try:
+                    content = blob_path.read_bytes()
+                    content_hash = blob_path.name
+                except FileNotFoundError:
+                    # Evicted by another thread after the lookup; treat as a miss
+                    content = None
+            if content is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                content_hash, content = self._download(url, timeout, headers)
+
+        self._evict(keep=content_hash)
+        return content
+
+    def clear(self) -> None:
+        """Remove every cached file."""
+        with self._lock:
+            self._load()
+            for content_hash in list(self._entries):
+                self._blob_path(content_hash).unlink(missing_ok=True)
+            for url_path in (self.root / "urls").iterdir():
+                url_path.unlink(missing_ok=True)
+            self._entries.clear()
+            self._url_keys.clear()
+            self._total_bytes = 0
+
+
+# Global media cache instance
+media_cache = MediaCache()
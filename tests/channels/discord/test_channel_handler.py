@@ -94,3 +94,31 @@ async def test_handler_sends_fallback_on_route_error(monkeypatch):
     fallback_text = message.channel.send.await_args.args[0]
     assert "encountered an error" in fallback_text
     route_mock.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_handler_sends_through_the_bot_managers_dispatcher(monkeypatch):
+    from src.services.discord_service import discord_service
+
+    bot_manager = discord_service.bot_manager
+    monkeypatch.setattr(bot_manager, "outbound_dispatchers", {})
+    handler = DiscordChannelHandler()
+    instance = SimpleNamespace(name="qa-instance")
+    client_user = MagicMock()
+    client_user.id = 333444555
+    client_user.mentioned_in.return_value = True
+    client = SimpleNamespace(user=client_user)
+    message = _build_message(f"<@{client_user.id}> hello", client_user)
+    message.channel.send.return_value = SimpleNamespace(id=777888999)
+    route_mock = MagicMock(return_value={"message": "hi there"})
+    monkeypatch.setattr(channel_handler.message_router, "route_message", route_mock)
+    record_outbound = MagicMock()
+    monkeypatch.setattr(channel_handler.MessageStore, "record_outbound", record_outbound)
+
+    await handler._handle_message(message, instance, client)
+
+    message.channel.send.assert_awaited_once_with("hi there")
+    assert record_outbound.call_args.kwargs["channel_message_id"] == "777888999"
+    dispatcher = bot_manager.outbound_dispatchers["qa-instance"]
+    assert handler._get_dispatcher("qa-instance") is dispatcher
+    await dispatcher.close()
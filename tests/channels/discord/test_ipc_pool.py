@@ -0,0 +1,150 @@
+"""
+Tests for pooled Discord IPC sends.
+"""
+
+import asyncio
+import base64
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import discord
+import pytest
+import pytest_asyncio
+
+import src.channels.message_sender as message_sender
+from src.channels.discord.bot_manager import DiscordBotManager
+from src.channels.message_sender import OmniChannelMessageSender
+from src.ipc_client import (
+    DEFAULT_TIMEOUT_SECONDS,
+    MEDIA_DOWNLOAD_TIMEOUT_SECONDS,
+    IPCClientPool,
+    send_timeout,
+)
+
+
+# Above 2**53, so it only survives the JSON round trip as a string
+SENT_MESSAGE_ID = 1234567890123456789
+
+
+@pytest.fixture
+def ipc_pool(tmp_path, monkeypatch):
+    monkeypatch.setenv("AUTOMAGIK_SOCKET_DIR", str(tmp_path))
+    pool = IPCClientPool()
+    monkeypatch.setattr(message_sender, "ipc_client_pool", pool)
+    return pool
+
+
+@pytest_asyncio.fixture
+async def bot_manager(ipc_pool):
+    manager = DiscordBotManager.__new__(DiscordBotManager)
+    manager.send_message = AsyncMock(return_value=SimpleNamespace(id=SENT_MESSAGE_ID))
+    await manager._start_unix_socket_server("ipc-test")
+    yield manager
+    await ipc_pool.close()
+
+
+def _sender(name="ipc-test"):
+    return OmniChannelMessageSender(SimpleNamespace(channel_type="discord", name=name, discord_default_channel_id=None))
+
+
+@pytest.mark.asyncio
+async def test_text_sends_reuse_one_pooled_connection(bot_manager, ipc_pool):
+    sender = _sender()
+
+    for i in range(3):
+        result = await sender._send_discord_text("1234", f"hello {i}")
+        assert result["success"] is True
+        assert result["channel_id"] == 1234
+        assert result["message_id"] == str(SENT_MESSAGE_ID)
+
+    assert bot_manager.send_message.await_count == 3
+    metrics = ipc_pool.get_metrics()["discord-ipc-test"]
+    assert metrics["connections_opened"] == 1
+    assert metrics["requests"] == 3
+    assert metrics["errors"] == 0
+    assert metrics["p50_ms"] is not None
+
+
+@pytest.mark.asyncio
+async def test_media_larger_than_the_aiohttp_default_body_limit_is_accepted(bot_manager):
+    # 2 MiB of media is ~2.7 MiB once base64-encoded, well above aiohttp's 1 MiB default
+    result = await _sender()._send_discord_media(
+        "1234", None, base64.b64encode(b"x" * (2 * 1024 * 1024)).decode(), "big", "image"
+    )
+
+    assert result["success"] is True
+    assert bot_manager.send_message.await_count == 1
+
+
+def test_media_sends_get_a_longer_timeout():
+    assert send_timeout({"channel_id": "1", "text": "hi"}) is None
+    assert send_timeout({"channel_id": "1", "media_url": "https://cdn.example/a.png"}) == (
+        DEFAULT_TIMEOUT_SECONDS + MEDIA_DOWNLOAD_TIMEOUT_SECONDS
+    )
+
+
+@pytest.mark.asyncio
+async def test_media_send_outlives_the_pool_default_timeout(bot_manager, tmp_path, monkeypatch):
+    # A bot that takes longer than the pooled default (e.g. downloading the attachment)
+    pool = IPCClientPool(timeout=0.05)
+    monkeypatch.setattr(message_sender, "ipc_client_pool", pool)
+
+    async def slow_send(**kwargs):
+        await asyncio.sleep(0.2)
+        return SimpleNamespace(id=SENT_MESSAGE_ID)
+
+    bot_manager.send_message.side_effect = slow_send
+    try:
+        assert (await _sender()._send_discord_text("1234", "hello"))["error"] == "Bot not responding (timeout)"
+        result = await _sender()._send_discord_media(
+            "1234", None, base64.b64encode(b"png-bytes").decode(), "a caption", "image"
+        )
+        assert result["success"] is True
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_media_is_sent_as_discord_file(bot_manager):
+    sender = _sender()
+
+    result = await sender._send_discord_media(
+        "1234", None, base64.b64encode(b"png-bytes").decode(), "a caption", "image"
+    )
+
+    assert result["success"] is True
+    assert result["message_id"] == str(SENT_MESSAGE_ID)
+    kwargs = bot_manager.send_message.await_args.kwargs
+    assert kwargs["content"] == "a caption"
+    assert isinstance(kwargs["attachments"][0], discord.File)
+    assert kwargs["attachments"][0].filename == "media.image"
+
+
+@pytest.mark.asyncio
+async def test_missing_socket_reports_bot_not_running(ipc_pool):
+    result = await _sender("not-running")._send_discord_text("1234", "hello")
+
+    assert result == {"success": False, "error": "Discord bot not running", "channel": "discord"}
+    assert ipc_pool.get_metrics() == {}
+
+
+@pytest.mark.asyncio
+async def test_unsent_message_reports_failure_without_id(bot_manager):
+    bot_manager.send_message.return_value = None
+
+    result = await _sender()._send_discord_text("1234", "hello")
+
+    assert result["success"] is False
+    assert result["message_id"] is None
+
+
+@pytest.mark.asyncio
+async def test_sent_message_id_is_stored_with_the_outbound_message(bot_manager, monkeypatch):
+    record_outbound = MagicMock()
+    monkeypatch.setattr(message_sender.MessageStore, "record_outbound", record_outbound)
+    monkeypatch.setattr(message_sender.TraceService, "record_outbound_message", MagicMock())
+
+    result = await _sender().send_text_message("1234", "hello")
+
+    assert result["message_id"] == str(SENT_MESSAGE_ID)
+    assert record_outbound.call_args.kwargs["channel_message_id"] == str(SENT_MESSAGE_ID)
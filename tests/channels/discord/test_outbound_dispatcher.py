@@ -0,0 +1,115 @@
+"""
+Tests for the per-channel Discord outbound dispatcher.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import discord
+import pytest
+
+from src.channels.discord.outbound_dispatcher import DiscordOutboundDispatcher, RateLimitBucket
+
+
+def _channel(channel_id=1, side_effect=None):
+    channel = MagicMock()
+    channel.id = channel_id
+    channel.send = AsyncMock(side_effect=side_effect)
+    return channel
+
+
+@pytest.mark.asyncio
+async def test_small_chunks_are_coalesced_in_order():
+    dispatcher = DiscordOutboundDispatcher("qa")
+    channel = _channel()
+
+    chunks_sent, reply_sent = await asyncio.gather(
+        dispatcher.send_chunks(channel, ["Hello ", "world."]),
+        dispatcher.send(channel, "Second reply"),
+    )
+
+    channel.send.assert_awaited_once_with("Hello world.\nSecond reply")
+    # Every coalesced item resolves to the merged message
+    assert chunks_sent == [channel.send.return_value] * 2
+    assert reply_sent is channel.send.return_value
+    assert dispatcher.get_stats()["chunks_coalesced"] == 2
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_coalescing_respects_discord_limit_and_attachments():
+    dispatcher = DiscordOutboundDispatcher("qa")
+    channel = _channel()
+    attachment = object()
+
+    await asyncio.gather(
+        dispatcher.send_chunks(channel, ["a" * 1500, "b" * 1500]),
+        dispatcher.send(channel, "with file", files=[attachment]),
+    )
+
+    sent = [call.args for call in channel.send.await_args_list]
+    assert sent == [("a" * 1500,), ("b" * 1500,), ("with file",)]
+    assert channel.send.await_args_list[2].kwargs == {"files": [attachment]}
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_sends_are_paced_by_channel_bucket():
+    dispatcher = DiscordOutboundDispatcher("qa")
+    channel = _channel()
+    dispatcher._queue_for(channel).bucket = RateLimitBucket(limit=2, period=0.2, remaining=2)
+
+    started = time.monotonic()
+    await asyncio.gather(*(dispatcher.send(channel, None, embed=i) for i in range(3)))
+
+    assert channel.send.await_count == 3
+    # The third send has to wait for the bucket to reset
+    assert time.monotonic() - started >= 0.15
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_channel_does_not_block_other_channels():
+    dispatcher = DiscordOutboundDispatcher("qa")
+    busy = _channel(1, side_effect=[discord.RateLimited(0.2), None])
+    quiet = _channel(2)
+
+    busy_send = asyncio.ensure_future(dispatcher.send(busy, "retry me"))
+    await asyncio.sleep(0.01)
+    started = time.monotonic()
+    await dispatcher.send(quiet, "not blocked")
+    assert time.monotonic() - started < 0.1
+
+    await busy_send
+    assert busy.send.await_count == 2
+    assert dispatcher.get_stats()["rate_limited"] == 1
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_http_429_updates_bucket_from_headers():
+    response = SimpleNamespace(
+        status=429,
+        reason="Too Many Requests",
+        headers={"Retry-After": "0.05", "X-RateLimit-Remaining": "0", "X-RateLimit-Bucket": "abc123"},
+    )
+    dispatcher = DiscordOutboundDispatcher("qa")
+    channel = _channel(side_effect=[discord.HTTPException(response, "slow down"), None])
+
+    await dispatcher.send(channel, "hello")
+
+    assert channel.send.await_count == 2
+    assert dispatcher._channels[channel.id].bucket.bucket_id == "abc123"
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_send_errors_propagate_to_caller():
+    dispatcher = DiscordOutboundDispatcher("qa")
+    channel = _channel(side_effect=RuntimeError("forbidden"))
+
+    with pytest.raises(RuntimeError, match="forbidden"):
+        await dispatcher.send_chunks(channel, ["one", "two"])
+    await dispatcher.close()
@@ -9,6 +9,7 @@ warnings.filterwarnings("ignore", category=DeprecationWarning, module="discord.p
 
 import pytest
 import os
+import tempfile
 from typing import Dict, Any, Generator
 from unittest.mock import patch, AsyncMock, Mock
 from sqlalchemy import create_engine, text
@@ -27,6 +28,9 @@ os.environ["AUTOMAGIK_OMNI_API_KEY"] = ""  # Disable API key for tests
 os.environ["EVOLUTION_API_URL"] = "http://test-evolution-api"
 os.environ["EVOLUTION_API_KEY"] = "test-evolution-key"
 os.environ["SKIP_EVOLUTION_STATUS"] = "true"
+os.environ["AUTOMAGIK_OMNI_TRACE_BLOB_DIR"] = tempfile.mkdtemp(
+    prefix="omni-trace-blobs-"
+)  # Keep trace media out of ./data
 
 # Override config for tests
 import sys
@@ -204,6 +208,55 @@ def test_db() -> Generator[Session, None, None]:
         engine.dispose()
 
 
+def async_database_override(engine):
+    """Build an override for ``get_async_database`` that opens async sessions on the database of ``engine``."""
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.pool import NullPool
+
+    from src.db.database import create_async_database_engine
+
+    url = engine.url.render_as_string(hide_password=False)
+    # NullPool: TestClient runs each request on its own event loop, so connections must not be reused
+    async_engine = create_async_database_engine(url, poolclass=NullPool)
+
+    async def _override_get_async_db():
+        async with AsyncSession(async_engine, autoflush=False, expire_on_commit=False) as db:
+            yield db
+
+    return _override_get_async_db
+
+
+class RunSyncSession:
+    """Stands in for an ``AsyncSession`` whose ``run_sync`` callables receive a (mocked) sync session."""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.session, *args, **kwargs)
+
+
+def mock_async_database_override(session):
+    """Build an override for ``get_async_database`` around a mocked sync session."""
+
+    async def _override_get_async_db():
+        yield RunSyncSession(session)
+
+    return _override_get_async_db
+
+
+@pytest.fixture
+def async_db_override():
+    """Factory for ``get_async_database`` overrides bound to a test engine."""
+    return async_database_override
+
+
+@pytest.fixture
+def mock_async_db_override():
+    """Factory for ``get_async_database`` overrides around a mocked sync session."""
+    return mock_async_database_override
+
+
 @pytest.fixture(scope="function")
 def override_get_db(test_db: Session):
     """Override the database dependency for testing."""
@@ -221,7 +274,7 @@ def override_get_db(test_db: Session):
 def test_client(test_db):
     """Create FastAPI test client with overridden database."""
     # Import after environment is set and before app is created
-    from src.api.deps import verify_api_key, get_database
+    from src.api.deps import verify_api_key, get_async_database, get_database
 
     # Import app AFTER setting up the test environment
     from src.api.app import app
@@ -241,6 +294,7 @@ def test_client(test_db):
 
     app.dependency_overrides[verify_api_key] = mock_verify_api_key
     app.dependency_overrides[get_database] = override_db_dependency
+    app.dependency_overrides[get_async_database] = async_database_override(test_db.get_bind())
 
     # Import and override the base database dependency too
     from src.db.database import get_db
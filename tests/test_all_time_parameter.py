@@ -9,13 +9,41 @@ from unittest.mock import Mock
 from sqlalchemy.orm import Session
 from fastapi.testclient import TestClient
 from src.api.app import app
+from src.config import config
 from src.db.trace_models import MessageTrace
 from src.utils.datetime_utils import utcnow
 
 
+def _mock_analytics(mock_query, traces):
+    """Configure a mocked query to return the SQL aggregates of ``traces``."""
+    times = [t.total_processing_time_ms for t in traces if t.total_processing_time_ms is not None]
+    agent_times = [t.agent_processing_time_ms for t in traces if t.agent_processing_time_ms is not None]
+    mock_query.one.return_value = (
+        len(traces),
+        sum(1 for t in traces if t.status == "completed"),
+        sum(1 for t in traces if t.status == "failed"),
+        sum(times),
+        len(times),
+        sum(agent_times),
+        len(agent_times),
+    )
+    mock_query.group_by.return_value.all.return_value = [("text", len(traces))] if traces else []
+    # Rows streamed for the latency histograms
+    mock_query.yield_per.return_value = [
+        (None, None, None, None, t.agent_processing_time_ms, t.total_processing_time_ms)
+        for t in traces
+        if t.status in ("completed", "failed")
+    ]
+
+
 class TestAllTimeParameter:
     """Test the new all_time parameter functionality."""
 
+    @pytest.fixture(autouse=True)
+    def raw_analytics(self, monkeypatch):
+        """The mocked sessions return raw-row aggregates; rollups are covered in test_trace_rollups.py."""
+        monkeypatch.setattr(config.tracing, "rollups_enabled", False)
+
     @pytest.fixture
     def client(self):
         """Create test client."""
@@ -73,9 +101,9 @@ class TestAllTimeParameter:
         ]
 
     # Tests for GET /traces endpoint
-    def test_traces_all_time_true(self, client, auth_headers, sample_traces):
+    def test_traces_all_time_true(self, client, auth_headers, sample_traces, mock_async_db_override):
         """Test GET /traces with all_time=true returns all data without date filters."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         mock_session = Mock(spec=Session)
         mock_query = Mock()
@@ -94,6 +122,7 @@ class TestAllTimeParameter:
 
         # Override the dependency on the app
         app.dependency_overrides[get_database] = mock_db_generator
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
 
         try:
             response = client.get("/api/v1/traces?all_time=true", headers=auth_headers)
@@ -106,9 +135,9 @@ class TestAllTimeParameter:
             # Clean up dependency override
             app.dependency_overrides.clear()
 
-    def test_traces_all_time_false_no_dates(self, client, auth_headers, sample_traces):
+    def test_traces_all_time_false_no_dates(self, client, auth_headers, sample_traces, mock_async_db_override):
         """Test GET /traces with all_time=false and no dates defaults to last 24 hours."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         mock_session = Mock(spec=Session)
         mock_query = Mock()
@@ -126,6 +155,8 @@ class TestAllTimeParameter:
 
         app.dependency_overrides[get_database] = mock_db_generator
 
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
+
         try:
             response = client.get("/api/v1/traces?all_time=false", headers=auth_headers)
 
@@ -134,9 +165,11 @@ class TestAllTimeParameter:
         finally:
             app.dependency_overrides.clear()
 
-    def test_traces_no_all_time_param_defaults_to_24_hours(self, client, auth_headers, sample_traces):
+    def test_traces_no_all_time_param_defaults_to_24_hours(
+        self, client, auth_headers, sample_traces, mock_async_db_override
+    ):
         """Test GET /traces without all_time parameter defaults to last 24 hours."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         mock_session = Mock(spec=Session)
         mock_query = Mock()
@@ -154,6 +187,8 @@ class TestAllTimeParameter:
 
         app.dependency_overrides[get_database] = mock_db_generator
 
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
+
         try:
             # Request without all_time parameter
             response = client.get("/api/v1/traces", headers=auth_headers)
@@ -163,9 +198,9 @@ class TestAllTimeParameter:
         finally:
             app.dependency_overrides.clear()
 
-    def test_traces_all_time_overrides_date_params(self, client, auth_headers, sample_traces):
+    def test_traces_all_time_overrides_date_params(self, client, auth_headers, sample_traces, mock_async_db_override):
         """Test that all_time=true overrides explicit start_date/end_date parameters."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         mock_session = Mock(spec=Session)
         mock_query = Mock()
@@ -183,6 +218,8 @@ class TestAllTimeParameter:
 
         app.dependency_overrides[get_database] = mock_db_generator
 
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
+
         try:
             # Test with explicit dates but all_time=true (all_time should override)
             from urllib.parse import quote
@@ -200,9 +237,11 @@ class TestAllTimeParameter:
         finally:
             app.dependency_overrides.clear()
 
-    def test_traces_respects_date_filters_when_all_time_false(self, client, auth_headers, sample_traces):
+    def test_traces_respects_date_filters_when_all_time_false(
+        self, client, auth_headers, sample_traces, mock_async_db_override
+    ):
         """Test that date filtering works normally when all_time=false."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         mock_session = Mock(spec=Session)
         mock_query = Mock()
@@ -220,6 +259,8 @@ class TestAllTimeParameter:
 
         app.dependency_overrides[get_database] = mock_db_generator
 
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
+
         try:
             # Test with explicit dates and all_time=false
             from urllib.parse import quote
@@ -249,6 +290,7 @@ class TestAllTimeParameter:
         mock_query.filter.return_value = mock_query
         mock_query.all.return_value = sample_traces
         mock_query.count.return_value = len(sample_traces)
+        _mock_analytics(mock_query, sample_traces)
 
         def mock_db_generator():
             yield mock_session
@@ -277,6 +319,7 @@ class TestAllTimeParameter:
         mock_query.filter.return_value = mock_query
         mock_query.all.return_value = [sample_traces[1]]  # Only recent trace
         mock_query.count.return_value = 1
+        _mock_analytics(mock_query, [sample_traces[1]])
 
         def mock_db_generator():
             yield mock_session
@@ -305,6 +348,7 @@ class TestAllTimeParameter:
         mock_query.filter.return_value = mock_query
         mock_query.all.return_value = [sample_traces[1]]  # Only recent trace
         mock_query.count.return_value = 1
+        _mock_analytics(mock_query, [sample_traces[1]])
 
         def mock_db_generator():
             yield mock_session
@@ -334,6 +378,7 @@ class TestAllTimeParameter:
         mock_query.filter.return_value = mock_query
         mock_query.all.return_value = sample_traces  # All traces
         mock_query.count.return_value = len(sample_traces)
+        _mock_analytics(mock_query, sample_traces)
 
         def mock_db_generator():
             yield mock_session
@@ -361,9 +406,9 @@ class TestAllTimeParameter:
             app.dependency_overrides.clear()
 
     # Edge case and validation tests
-    def test_all_time_parameter_type_validation(self, client, auth_headers):
+    def test_all_time_parameter_type_validation(self, client, auth_headers, mock_async_db_override):
         """Test validation of all_time parameter type."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         mock_session = Mock(spec=Session)
         mock_query = Mock()
@@ -375,12 +420,15 @@ class TestAllTimeParameter:
         mock_query.limit.return_value = mock_query
         mock_query.all.return_value = []
         mock_query.count.return_value = 0
+        _mock_analytics(mock_query, [])
 
         def mock_db_generator():
             yield mock_session
 
         app.dependency_overrides[get_database] = mock_db_generator
 
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
+
         try:
             # Test with invalid boolean values
             invalid_values = ["invalid", "1", "0", "yes", "no"]
@@ -401,9 +449,9 @@ class TestAllTimeParameter:
         finally:
             app.dependency_overrides.clear()
 
-    def test_all_time_with_other_filters(self, client, auth_headers, sample_traces):
+    def test_all_time_with_other_filters(self, client, auth_headers, sample_traces, mock_async_db_override):
         """Test all_time parameter works correctly with other filters."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         mock_session = Mock(spec=Session)
         mock_query = Mock()
@@ -421,6 +469,8 @@ class TestAllTimeParameter:
 
         app.dependency_overrides[get_database] = mock_db_generator
 
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
+
         try:
             # Test all_time with other filters (phone, has_media, session)
             response = client.get(
@@ -433,9 +483,11 @@ class TestAllTimeParameter:
         finally:
             app.dependency_overrides.clear()
 
-    def test_backward_compatibility_existing_behavior(self, client, auth_headers, sample_traces):
+    def test_backward_compatibility_existing_behavior(
+        self, client, auth_headers, sample_traces, mock_async_db_override
+    ):
         """Test that existing behavior is preserved when all_time parameter is not used."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         mock_session = Mock(spec=Session)
         mock_query = Mock()
@@ -447,12 +499,15 @@ class TestAllTimeParameter:
         mock_query.limit.return_value = mock_query
         mock_query.all.return_value = [sample_traces[1]]  # Only recent trace
         mock_query.count.return_value = 1
+        _mock_analytics(mock_query, [sample_traces[1]])
 
         def mock_db_generator():
             yield mock_session
 
         app.dependency_overrides[get_database] = mock_db_generator
 
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
+
         try:
             # Test that existing endpoints work without any changes
             response1 = client.get("/api/v1/traces", headers=auth_headers)
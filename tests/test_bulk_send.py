@@ -0,0 +1,165 @@
+"""
+Tests for the bulk broadcast send service and API endpoints.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import src.services.bulk_send_service as bulk_module
+from src.services.bulk_send_service import BulkRecipient, BulkSendService, render_template
+from src.utils.rate_limiter import RateLimiter
+
+
+class FakeSender:
+    """Records sends and tracks the maximum number of concurrent sends."""
+
+    in_flight = 0
+    max_in_flight = 0
+    sent = []
+
+    def __init__(self, instance_config):
+        self.instance_config = instance_config
+
+    async def send_text_message(self, recipient, text, **kwargs):
+        FakeSender.in_flight += 1
+        FakeSender.max_in_flight = max(FakeSender.max_in_flight, FakeSender.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if recipient.startswith("fail"):
+                return {"success": False, "error": "evolution returned 500"}
+            FakeSender.sent.append((recipient, text, kwargs))
+            return {"success": True}
+        finally:
+            FakeSender.in_flight -= 1
+
+
+@pytest.fixture
+def fake_sender(monkeypatch):
+    FakeSender.in_flight = 0
+    FakeSender.max_in_flight = 0
+    FakeSender.sent = []
+    monkeypatch.setattr(bulk_module, "OmniChannelMessageSender", FakeSender)
+    return FakeSender
+
+
+async def _wait_for_job(service: BulkSendService, job_id: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = service.get_job(job_id)
+        if job.is_finished:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("bulk send job did not finish in time")
+
+
+def test_render_template_keeps_unknown_placeholders():
+    assert render_template("Hi {name}, code {code}", {"name": "Ana"}) == "Hi Ana, code {code}"
+    assert render_template("No variables", None) == "No variables"
+
+
+@pytest.mark.asyncio
+async def test_bulk_job_respects_concurrency_and_counts(fake_sender):
+    service = BulkSendService()
+    recipients = [BulkRecipient(recipient=f"55119{i:08d}@s.whatsapp.net", variables={"n": i}) for i in range(20)]
+    recipients.append(BulkRecipient(recipient="fail-1@s.whatsapp.net"))
+
+    job = service.start_job(SimpleNamespace(name="bulk-test"), recipients, "Message {n}", max_concurrency=3)
+    job = await _wait_for_job(service, job.job_id)
+
+    assert job.status == "completed"
+    assert job.total == 21
+    assert job.sent == 20
+    assert job.failed == 1
+    assert job.pending == 0
+    assert job.errors == [{"recipient": "fail-1@s.whatsapp.net", "error": "evolution returned 500"}]
+    assert fake_sender.max_in_flight <= 3
+    assert ("5511900000007@s.whatsapp.net", "Message 7", {}) in fake_sender.sent
+    assert job.to_dict()["throughput_per_second"] > 0
+
+
+@pytest.mark.asyncio
+async def test_bulk_job_counts_unresolved_recipients_as_failed(fake_sender):
+    service = BulkSendService()
+    job = service.start_job(
+        SimpleNamespace(name="bulk-test"),
+        [BulkRecipient(recipient="5511999999999@s.whatsapp.net")],
+        "Hello",
+        initial_errors=[{"recipient": "missing-user", "error": "User with ID missing-user not found"}],
+    )
+    job = await _wait_for_job(service, job.job_id)
+
+    assert job.total == 2
+    assert job.sent == 1
+    assert job.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_jobs_share_instance_rate_limit(fake_sender):
+    service = BulkSendService()
+    service._rate_limiters["bulk-test"] = RateLimiter(max_requests=2, time_window=0.3)
+    recipients = [BulkRecipient(recipient=f"55119{i:08d}@s.whatsapp.net") for i in range(4)]
+
+    started = time.monotonic()
+    job = service.start_job(SimpleNamespace(name="bulk-test"), recipients, "Hello", max_concurrency=4)
+    job = await _wait_for_job(service, job.job_id)
+
+    assert job.sent == 4
+    # Two sends fit in the first window, the remaining two have to wait for it to expire
+    assert time.monotonic() - started >= 0.25
+
+
+@pytest.mark.asyncio
+async def test_cancel_bulk_job(fake_sender):
+    service = BulkSendService()
+    service._rate_limiters["bulk-test"] = RateLimiter(max_requests=1, time_window=60)
+    recipients = [BulkRecipient(recipient=f"55119{i:08d}@s.whatsapp.net") for i in range(5)]
+
+    job = service.start_job(SimpleNamespace(name="bulk-test"), recipients, "Hello", max_concurrency=2)
+    await asyncio.sleep(0.05)
+    assert service.cancel_job(job.job_id) is True
+    job = await _wait_for_job(service, job.job_id)
+
+    assert job.status == "cancelled"
+    assert job.sent == 1
+    assert job.pending == 4
+
+
+def test_send_bulk_endpoint_runs_job(test_client, fake_sender):
+    payload = {
+        "recipients": [
+            {"phone_number": "+5511999999999", "variables": {"name": "Ana"}},
+            {"phone_number": "+5511888888888", "variables": {"name": "Bia"}},
+            {"user_id": "00000000-0000-0000-0000-000000000000"},
+        ],
+        "template": "Hi {name}",
+        "max_concurrency": 2,
+    }
+
+    with test_client as client:
+        response = client.post("/api/v1/instance/test-instance/send-bulk", json=payload)
+        assert response.status_code == 202
+        data = response.json()
+        assert data["total"] == 3
+        assert data["failed"] == 1
+        assert data["errors"][0]["recipient"] == "00000000-0000-0000-0000-000000000000"
+
+        status_url = f"/api/v1/instance/test-instance/send-bulk/{data['job_id']}"
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            status_data = client.get(status_url).json()
+            if status_data["status"] == "completed":
+                break
+            time.sleep(0.02)
+
+    assert status_data["status"] == "completed"
+    assert status_data["sent"] == 2
+    assert status_data["pending"] == 0
+    assert sorted(text for _, text, _ in fake_sender.sent) == ["Hi Ana", "Hi Bia"]
+
+
+def test_bulk_status_unknown_job_returns_404(test_client):
+    response = test_client.get("/api/v1/instance/test-instance/send-bulk/does-not-exist")
+    assert response.status_code == 404
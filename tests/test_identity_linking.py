@@ -2,10 +2,11 @@
 Identity linking tests for cross-channel user resolution.
 """
 
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
-from src.db.models import InstanceConfig, UserExternalId
-from src.services.user_service import user_service
+from src.db.models import InstanceConfig, User, UserExternalId
+from src.services.user_service import UserService, reconcile_whatsapp_links, user_service
 
 
 def test_whatsapp_user_creation_creates_external_link(test_db: Session):
@@ -107,3 +108,94 @@ def test_link_reassignment_unifies_to_single_user(test_db: Session):
     resolved = user_service.resolve_user_by_external("discord", discord_id, test_db)
     assert resolved is not None
     assert resolved.id == user2.id
+
+
+def test_repeated_messages_upsert_the_same_user(test_db: Session):
+    inst = InstanceConfig(
+        name="inst_d",
+        channel_type="whatsapp",
+        whatsapp_instance="inst_d",
+        agent_api_url="http://test-agent-api",
+        agent_api_key="test-key",
+    )
+    test_db.add(inst)
+    test_db.commit()
+
+    first = user_service.get_or_create_user_by_phone(
+        phone_number="+5511988887777",
+        instance_name="inst_d",
+        display_name="Dana",
+        session_name="inst_d_+5511988887777",
+        db=test_db,
+    )
+    # A later message without pushName or session keeps the stored values
+    second = user_service.get_or_create_user_by_phone(phone_number="+5511988887777", instance_name="inst_d", db=test_db)
+
+    assert second.id == first.id
+    assert (first.message_count, second.message_count) == (1, 2)
+    assert (second.display_name, second.last_session_name_interaction) == ("Dana", "inst_d_+5511988887777")
+    assert test_db.query(User).filter_by(instance_name="inst_d").count() == 1
+    links = test_db.query(UserExternalId).filter_by(provider="whatsapp", instance_name="inst_d").all()
+    assert [(link.user_id, link.external_id) for link in links] == [(first.id, "5511988887777@s.whatsapp.net")]
+
+    assert user_service.update_user_agent_id(first.id, "agent-user-1", test_db)
+    assert test_db.query(User).filter_by(id=first.id).one().last_agent_user_id == "agent-user-1"
+    assert not user_service.update_user_agent_id("missing", "agent-user-1", test_db)
+
+
+def _instance(db: Session, name: str) -> None:
+    db.add(
+        InstanceConfig(
+            name=name,
+            channel_type="whatsapp",
+            whatsapp_instance=name,
+            agent_api_url="http://test-agent-api",
+            agent_api_key="test-key",
+        )
+    )
+    db.commit()
+
+
+def test_existing_instance_less_link_is_reconciled_and_reused(test_db: Session):
+    _instance(test_db, "inst_e")
+    _instance(test_db, "inst_f")
+    jid = "5511977776666@s.whatsapp.net"
+    user_e = User(phone_number="+5511977776666", whatsapp_jid=jid, instance_name="inst_e", message_count=3)
+    user_f = User(phone_number="+5511977776666", whatsapp_jid=jid, instance_name="inst_f", message_count=1)
+    test_db.add_all([user_e, user_f])
+    test_db.flush()
+    # Legacy links: one without an instance, one under the instance of the other user
+    test_db.add_all(
+        [
+            UserExternalId(user_id=user_e.id, provider="whatsapp", external_id=jid, instance_name="inst_f"),
+            UserExternalId(user_id=user_f.id, provider="whatsapp", external_id=jid, instance_name=None),
+        ]
+    )
+    test_db.commit()
+
+    assert reconcile_whatsapp_links(test_db.connection()) == 2
+    test_db.commit()
+    user = user_service.get_or_create_user_by_phone(phone_number="+5511977776666", instance_name="inst_e", db=test_db)
+
+    assert user.id == user_e.id
+    assert user.message_count == 4
+    links = test_db.query(UserExternalId).filter_by(provider="whatsapp", external_id=jid).all()
+    assert sorted((link.instance_name, link.user_id) for link in links) == sorted(
+        [("inst_e", user_e.id), ("inst_f", user_f.id)]
+    )
+    assert user_service.resolve_user_by_external("whatsapp", jid, test_db, instance_name="inst_e").id == user_e.id
+    assert user_service.resolve_user_by_external("whatsapp", jid, test_db, instance_name="inst_f").id == user_f.id
+
+
+def test_link_failure_does_not_lose_the_user(test_db: Session, monkeypatch):
+    _instance(test_db, "inst_g")
+
+    def broken_link_upsert(link_stmt):
+        raise OperationalError("INSERT INTO user_external_ids", {}, Exception("link table locked"))
+
+    monkeypatch.setattr(UserService, "_whatsapp_link_upsert", staticmethod(broken_link_upsert))
+
+    user = user_service.get_or_create_user_by_phone(phone_number="+5511966665555", instance_name="inst_g", db=test_db)
+
+    assert test_db.query(User).filter_by(id=user.id).one().message_count == 1
+    assert test_db.query(UserExternalId).filter_by(user_id=user.id).count() == 0
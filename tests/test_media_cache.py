@@ -0,0 +1,208 @@
+"""
+Tests for the content-addressed media download cache.
+"""
+
+import hashlib
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+import src.utils.media_cache as media_cache_module
+from src.utils.media_cache import MediaCache
+
+
+class FakeResponse:
+    def __init__(self, content: bytes, status_code: int = 200):
+        self.content = content
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fake_get(monkeypatch):
+    bodies = {}
+    get = MagicMock(side_effect=lambda url, **kwargs: FakeResponse(*bodies[url]))
+    monkeypatch.setattr(media_cache_module.requests, "get", get)
+    get.bodies = bodies
+    return get
+
+
+def test_repeated_url_is_downloaded_once(tmp_path, fake_get):
+    fake_get.bodies["https://mmg.whatsapp.net/a.enc"] = (b"x" * 200_000,)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=10_000_000)
+
+    assert cache.get_bytes("https://mmg.whatsapp.net/a.enc") == b"x" * 200_000
+    assert cache.get_bytes("https://mmg.whatsapp.net/a.enc") == b"x" * 200_000
+
+    assert fake_get.call_count == 1
+    assert fake_get.call_args.kwargs["stream"] is True
+    assert (cache.hits, cache.misses) == (1, 1)
+    content_hash = hashlib.sha256(b"x" * 200_000).hexdigest()
+    assert (tmp_path / "blobs" / content_hash[:2] / content_hash).exists()
+
+
+def test_identical_content_is_stored_once(tmp_path, fake_get):
+    fake_get.bodies["https://a.example/1"] = (b"same",)
+    fake_get.bodies["https://b.example/2"] = (b"same",)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=1000)
+
+    cache.get_bytes("https://a.example/1")
+    cache.get_bytes("https://b.example/2")
+
+    assert cache.total_bytes == 4
+    assert len(list((tmp_path / "blobs").glob("*/*"))) == 1
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_least_recently_used_blob_is_evicted(tmp_path, fake_get):
+    for name in ("a", "b", "c"):
+        fake_get.bodies[f"https://x.example/{name}"] = (name.encode() * 40,)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=100)
+
+    cache.get_bytes("https://x.example/a")
+    cache.get_bytes("https://x.example/b")
+    cache.get_bytes("https://x.example/a")  # a is now more recent than b
+    cache.get_bytes("https://x.example/c")
+
+    assert cache.total_bytes == 80
+    assert fake_get.call_count == 3
+
+    cache.get_bytes("https://x.example/a")
+    assert fake_get.call_count == 3
+    cache.get_bytes("https://x.example/b")
+    assert fake_get.call_count == 4
+
+
+def test_failed_download_is_not_cached(tmp_path, fake_get):
+    fake_get.bodies["https://x.example/gone"] = (b"", 404)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=1000)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        cache.get_bytes("https://x.example/gone")
+
+    assert cache.total_bytes == 0
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_cache_survives_restart(tmp_path, fake_get):
+    fake_get.bodies["https://x.example/a"] = (b"persisted",)
+    MediaCache(directory=str(tmp_path), max_bytes=1000).get_bytes("https://x.example/a")
+
+    reopened = MediaCache(directory=str(tmp_path), max_bytes=1000)
+    assert reopened.get_bytes("https://x.example/a") == b"persisted"
+    assert fake_get.call_count == 1
+
+
+def test_concurrent_requests_share_one_download(tmp_path, fake_get):
+    fake_get.bodies["https://x.example/a"] = (b"shared" * 1000,)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=1_000_000)
+    results = []
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_bytes("https://x.example/a"))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [b"shared" * 1000] * 8
+    assert fake_get.call_count == 1
+
+
+def test_decryptor_and_transcriber_share_the_cache(tmp_path, fake_get, monkeypatch):
+    from src.channels.whatsapp.audio_transcriber import AudioTranscriptionService
+    from src.channels.whatsapp.whatsapp_media_decrypt import WhatsAppMediaDecryptor
+
+    url = "https://mmg.whatsapp.net/v/audio.enc"
+    fake_get.bodies[url] = (b"opus-bytes",)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=1000)
+    monkeypatch.setattr("src.channels.whatsapp.whatsapp_media_decrypt.media_cache", cache)
+    monkeypatch.setattr("src.channels.whatsapp.audio_transcriber.media_cache", cache)
+
+    assert WhatsAppMediaDecryptor()._download_encrypted_file(url) == b"opus-bytes"
+    transcriber = AudioTranscriptionService.__new__(AudioTranscriptionService)
+    assert transcriber.download_and_encode_audio(url) == "b3B1cy1ieXRlcw=="
+
+    assert fake_get.call_count == 1
+
+
+def test_url_locks_are_released_after_download(tmp_path, fake_get):
+    fake_get.bodies["https://x.example/a"] = (b"a",)
+    fake_get.bodies["https://x.example/b"] = (None, 500)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=1000)
+
+    cache.get_bytes("https://x.example/a")
+    with pytest.raises(requests.exceptions.HTTPError):
+        cache.get_bytes("https://x.example/b")
+
+    assert cache._url_locks == {}
+
+
+def test_blob_evicted_after_lookup_is_downloaded_again(tmp_path, fake_get, monkeypatch):
+    fake_get.bodies["https://x.example/a"] = (b"content",)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=1000)
+    cache.get_bytes("https://x.example/a")
+
+    lookup = cache._lookup
+
+    def lookup_then_evict(url):
+        blob_path = lookup(url)
+        blob_path.unlink()
+        return blob_path
+
+    monkeypatch.setattr(cache, "_lookup", lookup_then_evict)
+
+    assert cache.get_bytes("https://x.example/a") == b"content"
+    assert fake_get.call_count == 2
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_download_evicted_before_it_is_read_back_still_returns_content(tmp_path, fake_get, monkeypatch):
+    fake_get.bodies["https://x.example/a"] = (b"content",)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=1000)
+    download = cache._download
+
+    def download_then_evict(url, timeout, headers):
+        content_hash, content = download(url, timeout, headers)
+        cache._blob_path(content_hash).unlink()
+        return content_hash, content
+
+    monkeypatch.setattr(cache, "_download", download_then_evict)
+
+    assert cache.get_bytes("https://x.example/a") == b"content"
+
+
+def test_eviction_removes_the_url_entries_of_the_blob(tmp_path, fake_get):
+    for name in ("a", "b", "c"):
+        fake_get.bodies[f"https://x.example/{name}"] = (name.encode() * 40,)
+    cache = MediaCache(directory=str(tmp_path), max_bytes=100)
+
+    for name in ("a", "b", "c"):
+        cache.get_bytes(f"https://x.example/{name}")
+
+    # Only the URLs of the two blobs still cached keep an entry
+    assert sorted(path.name for path in (tmp_path / "urls").iterdir()) == sorted(
+        hashlib.sha256(f"https://x.example/{name}".encode()).hexdigest() for name in ("b", "c")
+    )
+
+    # Entries left behind by an older version are swept on startup
+    orphan = tmp_path / "urls" / hashlib.sha256(b"https://x.example/old").hexdigest()
+    orphan.write_text("0" * 64)
+    MediaCache(directory=str(tmp_path), max_bytes=100).get_bytes("https://x.example/b")
+    assert not orphan.exists()
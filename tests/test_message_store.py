@@ -0,0 +1,109 @@
+"""
+Tests for the unified message store and conversation timelines.
+"""
+
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.channels.whatsapp.evolution_api_sender import EvolutionApiSender
+from src.db.message_models import Message
+from src.services.message_store import MessageStore
+
+JID = "5511999999999@s.whatsapp.net"
+
+
+def _webhook(message_id, message, from_me=False, timestamp=1760000000):
+    return {
+        "event": "messages.upsert",
+        "sender": "5511000000000@s.whatsapp.net",
+        "data": {
+            "key": {"id": message_id, "remoteJid": JID, "fromMe": from_me},
+            "pushName": "Customer",
+            "message": message,
+            "messageTimestamp": timestamp,
+        },
+    }
+
+
+@pytest.fixture
+def store_session_factory(test_db, monkeypatch):
+    factory = sessionmaker(bind=test_db.get_bind())
+    monkeypatch.setattr("src.db.database.SessionLocal", factory)
+    return factory
+
+
+def test_whatsapp_webhook_messages_are_stored_once(test_db):
+    stored = MessageStore.record_whatsapp_webhook(test_db, "default", _webhook("w1", {"conversation": "hello"}), "t1")
+
+    assert stored.direction == "inbound"
+    assert (stored.conversation_id, stored.sender_id, stored.sender_name) == (JID, JID, "Customer")
+    assert (stored.text_content, stored.message_type, stored.trace_id) == ("hello", "text", "t1")
+    assert stored.created_at == datetime(2025, 10, 9, 8, 53, 20)
+    # Redelivered webhook
+    assert MessageStore.record_whatsapp_webhook(test_db, "default", _webhook("w1", {"conversation": "hello"})) is None
+
+    image = {"imageMessage": {"caption": "receipt", "mimetype": "image/jpeg", "contextInfo": {"stanzaId": "w1"}}}
+    stored = MessageStore.record_whatsapp_webhook(test_db, "default", _webhook("w2", image, from_me=True))
+    assert (stored.direction, stored.sender_id, stored.message_type) == (
+        "outbound",
+        "5511000000000@s.whatsapp.net",
+        "image",
+    )
+    assert (stored.text_content, stored.media_mime_type, stored.quoted_message_id) == ("receipt", "image/jpeg", "w1")
+
+    reaction = {"reactionMessage": {"text": "👍", "key": {"id": "w1"}}}
+    stored = MessageStore.record_whatsapp_webhook(test_db, "default", _webhook("w3", reaction))
+    assert (stored.message_type, stored.text_content, stored.reaction_to_message_id) == ("reaction", "👍", "w1")
+
+    assert MessageStore.record_whatsapp_webhook(test_db, "default", {"event": "connection.update", "data": {}}) is None
+    assert test_db.query(Message).count() == 3
+
+
+def test_conversation_endpoint_pages_newest_first(test_client, test_db):
+    for i in range(5):
+        # Pairs of messages share a timestamp; the UUIDv7 id keeps their insertion order
+        MessageStore.record_whatsapp_webhook(
+            test_db, "default", _webhook(f"m{i}", {"conversation": str(i)}, timestamp=1760000000 + i // 2)
+        )
+    MessageStore.record_whatsapp_webhook(test_db, "other", _webhook("m-other", {"conversation": "x"}))
+
+    url = f"/api/v1/conversations/{JID}/messages?instance_name=default&limit=2"
+    texts, cursor = [], None
+    while True:
+        response = test_client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        texts.extend(message["text_content"] for message in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert texts == ["4", "3", "2", "1", "0"]
+    assert test_client.get(url + "&cursor=bogus").status_code == 400
+    assert test_client.get(f"/api/v1/conversations/{JID}/messages").status_code == 422
+
+
+def test_sent_messages_are_stored_and_echoes_deduplicated(test_db, default_instance_config, store_session_factory):
+    response = Mock(status_code=201)
+    response.json.return_value = {"key": {"id": "sent-1", "remoteJid": JID, "fromMe": True}}
+    with patch("requests.post", return_value=response):
+        assert EvolutionApiSender(config_override=default_instance_config).send_text_message("+5511999999999", "on it")
+
+    # Evolution echoes our own send back through the webhook
+    echo = _webhook("sent-1", {"conversation": "on it"}, from_me=True)
+    assert MessageStore.record_whatsapp_webhook(test_db, "default", echo) is None
+
+    stored = test_db.query(Message).one()
+    assert (stored.direction, stored.conversation_id, stored.channel_message_id) == ("outbound", JID, "sent-1")
+    assert stored.text_content == "on it"
+
+    MessageStore.record_discord_message(
+        test_db,
+        "discord-bot",
+        {"id": 42, "content": "hi bot", "author": {"id": 7, "username": "ana"}, "channel": {"id": 99}},
+    )
+    MessageStore.record_outbound("discord-bot", "discord", "99", "hello ana", trace_id="t2")
+    page, _ = MessageStore.conversation_page(test_db, "discord-bot", "99", limit=10)
+    assert [(m.direction, m.text_content) for m in page] == [("outbound", "hello ana"), ("inbound", "hi bot")]
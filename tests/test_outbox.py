@@ -0,0 +1,335 @@
+"""
+Tests for the transactional outbox and its dispatcher.
+"""
+
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import src.services.outbox_service as outbox_module
+from src.config import config
+from src.db.outbox_models import OutboxMessage
+from src.db.trace_models import MessageTrace, TracePayload
+from src.services.outbox_service import OutboxDispatcher, OutboxService, compute_backoff
+from src.utils.datetime_utils import utcnow
+
+
+@pytest.fixture
+def dispatcher(test_db):
+    session_factory = sessionmaker(bind=test_db.get_bind(), autocommit=False, autoflush=False)
+    return OutboxDispatcher(session_factory=session_factory)
+
+
+@pytest.fixture
+def trace(test_db, default_instance_config):
+    trace = MessageTrace(trace_id="trace-outbox-1", instance_name=default_instance_config.name, status="processing")
+    test_db.add(trace)
+    test_db.commit()
+    return trace
+
+
+def _enqueue(test_db, trace_id="trace-outbox-1"):
+    return OutboxService.enqueue_whatsapp_text(
+        test_db,
+        instance_name="default",
+        recipient="5511999999999@s.whatsapp.net",
+        text="Hello from the agent",
+        quoted_message={"data": {"key": {"id": "abc"}, "message": {"imageMessage": {}, "base64": "AAAA"}}},
+        trace_id=trace_id,
+    )
+
+
+def test_enqueue_writes_outbox_row_and_trace_update_together(test_db, trace):
+    message = _enqueue(test_db)
+
+    test_db.expire_all()
+    stored = test_db.query(OutboxMessage).filter_by(id=message.id).one()
+    assert stored.status == "pending"
+    assert stored.attempts == 0
+    assert stored.get_payload()["text"] == "Hello from the agent"
+    # Inline media is stripped from the quoted message before persisting
+    assert "base64" not in stored.get_payload()["quoted_message"]["data"]["message"]
+    assert test_db.query(MessageTrace).filter_by(trace_id="trace-outbox-1").one().status == "sending"
+
+
+def test_enqueue_rolls_back_on_failure(test_db):
+    broken_session = MagicMock(wraps=test_db)
+    broken_session.commit.side_effect = RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        _enqueue(broken_session, trace_id=None)
+
+    assert test_db.query(OutboxMessage).count() == 0
+
+
+def test_dispatch_marks_delivered_and_completes_trace(test_db, trace, dispatcher, monkeypatch):
+    _enqueue(test_db)
+    send_mock = MagicMock(return_value=True)
+    monkeypatch.setattr(OutboxDispatcher, "_send", staticmethod(send_mock))
+
+    assert dispatcher.dispatch_once() == 1
+
+    test_db.expire_all()
+    row = test_db.query(OutboxMessage).one()
+    assert row.status == "delivered"
+    assert row.attempts == 1
+    assert row.delivered_at is not None
+    assert send_mock.call_count == 1
+
+    stored_trace = test_db.query(MessageTrace).filter_by(trace_id="trace-outbox-1").one()
+    assert stored_trace.status == "completed"
+    assert stored_trace.evolution_success is True
+    assert test_db.query(TracePayload).filter_by(trace_id="trace-outbox-1", stage="evolution_send").count() == 1
+
+    # Delivered rows are never sent again
+    assert dispatcher.dispatch_once() == 0
+    assert send_mock.call_count == 1
+
+
+def test_dispatch_retries_with_backoff_then_fails(test_db, trace, dispatcher, monkeypatch):
+    _enqueue(test_db)
+    monkeypatch.setattr(OutboxDispatcher, "_send", staticmethod(MagicMock(return_value=False)))
+    monkeypatch.setattr(config.outbox, "max_attempts", 2)
+    monkeypatch.setattr(outbox_module, "compute_backoff", lambda attempts: 60.0)
+
+    assert dispatcher.dispatch_once() == 1
+    test_db.expire_all()
+    row = test_db.query(OutboxMessage).one()
+    assert row.status == "pending"
+    assert row.attempts == 1
+    assert row.next_attempt_at > utcnow().replace(tzinfo=None) + timedelta(seconds=30)
+    assert test_db.query(MessageTrace).filter_by(trace_id="trace-outbox-1").one().status == "sending"
+
+    # Not due yet
+    assert dispatcher.dispatch_once() == 0
+
+    row.next_attempt_at = utcnow() - timedelta(seconds=1)
+    test_db.commit()
+    assert dispatcher.dispatch_once() == 1
+
+    test_db.expire_all()
+    row = test_db.query(OutboxMessage).one()
+    assert row.status == "failed"
+    assert row.attempts == 2
+    assert row.last_error == "Evolution API returned 400"
+    assert test_db.query(MessageTrace).filter_by(trace_id="trace-outbox-1").one().status == "failed"
+
+
+def test_dispatch_fails_rows_for_unknown_instance(test_db, dispatcher):
+    OutboxService.enqueue_whatsapp_text(test_db, "missing-instance", "5511@s.whatsapp.net", "hi")
+
+    assert dispatcher.dispatch_once() == 1
+    test_db.expire_all()
+    row = test_db.query(OutboxMessage).one()
+    assert row.status == "failed"
+    assert "not found" in row.last_error
+
+
+def test_compute_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(config.outbox, "backoff_base", 2.0)
+    monkeypatch.setattr(config.outbox, "backoff_max", 10.0)
+
+    delays = [compute_backoff(attempt) for attempt in range(1, 20) for _ in range(20)]
+    assert all(0 <= delay <= 10.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_handler_sends_directly_when_dispatcher_not_running(monkeypatch):
+    from src.channels.whatsapp.handlers import WhatsAppMessageHandler
+
+    callback = MagicMock(return_value=True)
+    handler = WhatsAppMessageHandler(send_response_callback=callback)
+    monkeypatch.setattr(outbox_module.outbox_dispatcher, "is_running", False)
+
+    handler._send_whatsapp_response("5511@s.whatsapp.net", "hi", instance_config=MagicMock())
+
+    callback.assert_called_once_with("5511@s.whatsapp.net", "hi", None)
+
+
+def test_handler_queues_reply_when_dispatcher_running(test_db, trace, monkeypatch):
+    from src.channels.whatsapp.handlers import WhatsAppMessageHandler
+    from src.services.trace_service import TraceContext
+
+    callback = MagicMock(return_value=True)
+    handler = WhatsAppMessageHandler(send_response_callback=callback)
+    monkeypatch.setattr(outbox_module.outbox_dispatcher, "is_running", True)
+    instance = MagicMock()
+    instance.name = "default"
+
+    handler._send_whatsapp_response(
+        "5511999999999@s.whatsapp.net",
+        "queued reply",
+        trace_context=TraceContext("trace-outbox-1", test_db),
+        instance_config=instance,
+    )
+
+    callback.assert_not_called()
+    assert test_db.query(OutboxMessage).one().get_payload()["text"] == "queued reply"
+
+
+def test_queued_reply_keeps_the_handler_trace_fields(test_db, trace, dispatcher, monkeypatch):
+    from src.channels.whatsapp.handlers import WhatsAppMessageHandler
+    from src.services.trace_service import TraceContext
+
+    handler = WhatsAppMessageHandler(send_response_callback=MagicMock())
+    monkeypatch.setattr(outbox_module.outbox_dispatcher, "is_running", True)
+    monkeypatch.setattr(OutboxDispatcher, "_send", staticmethod(MagicMock(return_value=True)))
+    instance = MagicMock()
+    instance.name = "default"
+
+    trace_context = TraceContext("trace-outbox-1", test_db)
+    trace_context.log_agent_request({"message": "hi"})
+    trace_context.log_agent_response({"message": "hello", "session_id": "agent-session"}, processing_time_ms=420)
+    trace_context.update_session_info("session-1", "agent-session")
+    handler._send_whatsapp_response(
+        "5511999999999@s.whatsapp.net", "hello", trace_context=trace_context, instance_config=instance
+    )
+
+    # The dispatcher thread usually finishes before the handler's trace context is closed
+    assert dispatcher.dispatch_once() == 1
+    trace_context.flush()
+
+    test_db.expire_all()
+    stored_trace = test_db.query(MessageTrace).filter_by(trace_id="trace-outbox-1").one()
+    assert stored_trace.status == "completed"
+    assert stored_trace.agent_processing_time_ms == 420
+    assert stored_trace.agent_request_at is not None
+    assert stored_trace.agent_response_at is not None
+    assert stored_trace.session_name == "session-1"
+    assert stored_trace.agent_session_id == "agent-session"
+
+
+def test_failed_enqueue_gives_the_pending_trace_changes_back(test_db, trace):
+    from src.services.trace_service import TraceContext
+
+    trace_context = TraceContext("trace-outbox-1", test_db)
+    trace_context.update_session_info("session-1")
+    broken_session = MagicMock(wraps=test_db)
+    broken_session.commit.side_effect = RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        OutboxService.enqueue_whatsapp_text(
+            broken_session, "default", "5511999999999@s.whatsapp.net", "hi", trace_context=trace_context
+        )
+    trace_context.flush()
+
+    test_db.expire_all()
+    assert test_db.query(MessageTrace).filter_by(trace_id="trace-outbox-1").one().session_name == "session-1"
+
+
+@pytest.mark.parametrize("outcome", ["failed", "completed"])
+def test_unsampled_trace_payloads_follow_the_reply_to_the_tail_decision(
+    test_db, trace, dispatcher, default_instance_config, monkeypatch, outcome
+):
+    from src.channels.whatsapp.handlers import WhatsAppMessageHandler
+    from src.services.trace_sampling import trace_sampler
+    from src.services.trace_service import TraceContext
+
+    default_instance_config.trace_sample_rate = 0.0
+    test_db.commit()
+    trace_sampler.invalidate()
+    handler = WhatsAppMessageHandler(send_response_callback=MagicMock())
+    monkeypatch.setattr(outbox_module.outbox_dispatcher, "is_running", True)
+    monkeypatch.setattr(OutboxDispatcher, "_send", staticmethod(MagicMock(return_value=outcome == "completed")))
+    monkeypatch.setattr(config.outbox, "max_attempts", 2)
+    monkeypatch.setattr(outbox_module, "compute_backoff", lambda attempts: 60.0)
+    instance = MagicMock()
+    instance.name = "default"
+
+    try:
+        trace_context = TraceContext(
+            "trace-outbox-1", test_db, trace_sampler.decide("trace-outbox-1", "default", test_db)
+        )
+        assert not trace_context.sampling.head_sampled
+        trace_context.log_agent_request({"message": "hi"})
+        trace_context.log_agent_response({"message": "hello"}, processing_time_ms=420)
+        handler._send_whatsapp_response(
+            "5511999999999@s.whatsapp.net", "hello", trace_context=trace_context, instance_config=instance
+        )
+        trace_context.flush()
+
+        # Held on the outbox row, not written yet, and kept across a retry
+        assert dispatcher.dispatch_once() == 1
+        test_db.expire_all()
+        if outcome == "failed":
+            assert test_db.query(TracePayload).filter_by(trace_id="trace-outbox-1").count() == 0
+            assert len(test_db.query(OutboxMessage).one().get_payload()["trace"]["payloads"]) == 3
+            test_db.query(OutboxMessage).update({"next_attempt_at": utcnow() - timedelta(seconds=1)})
+            test_db.commit()
+            assert dispatcher.dispatch_once() == 1
+    finally:
+        trace_sampler.invalidate()
+
+    test_db.expire_all()
+    assert test_db.query(MessageTrace).filter_by(trace_id="trace-outbox-1").one().status == outcome
+    assert "trace" not in test_db.query(OutboxMessage).one().get_payload()
+    stages = sorted(stage for (stage,) in test_db.query(TracePayload.stage).filter_by(trace_id="trace-outbox-1"))
+    if outcome == "failed":
+        # A failed trace keeps everything, including the handler's payloads
+        assert stages == ["agent_request", "agent_response", "evolution_send", "evolution_send"]
+    else:
+        assert stages == []
+
+
+def test_later_chunks_wait_for_an_earlier_chunk_retry(test_db, trace, dispatcher, monkeypatch):
+    first, second = _enqueue(test_db), _enqueue(test_db)
+    other = OutboxService.enqueue_whatsapp_text(test_db, "default", "5511888888888@s.whatsapp.net", "other chat")
+    sent = []
+
+    def send(instance, row, payload):
+        sent.append(row.id)
+        return row.id != first.id or len(sent) > 2
+
+    monkeypatch.setattr(OutboxDispatcher, "_send", staticmethod(send))
+    monkeypatch.setattr(outbox_module, "compute_backoff", lambda attempts: 60.0)
+
+    # The first chunk fails, so the second is held back in the same pass; other recipients are unaffected
+    dispatcher.dispatch_once()
+    assert sent == [first.id, other.id]
+
+    # Still held back while the first chunk waits for its retry
+    assert dispatcher.dispatch_once() == 0
+
+    test_db.query(OutboxMessage).filter_by(id=first.id).update({"next_attempt_at": utcnow() - timedelta(seconds=1)})
+    test_db.commit()
+    assert dispatcher.dispatch_once() == 2
+    assert sent[2:] == [first.id, second.id]
+
+
+def test_busy_recipient_does_not_starve_older_rows(test_db, dispatcher, default_instance_config, monkeypatch):
+    older = OutboxService.enqueue_whatsapp_text(test_db, "default", "5599@s.whatsapp.net", "waiting")
+    for i in range(3):
+        OutboxService.enqueue_whatsapp_text(test_db, "default", "5511@g.us", f"busy {i}")
+    sent = []
+
+    def send(instance, row, payload):
+        sent.append(row.id)
+        return True
+
+    monkeypatch.setattr(OutboxDispatcher, "_send", staticmethod(send))
+    monkeypatch.setattr(config.outbox, "batch_size", 2)
+
+    # The recipient that sorts first does not fill the batch ahead of an older row
+    assert dispatcher.dispatch_once() == 2
+    assert sent[0] == older.id
+
+
+def test_dispatcher_applies_the_instance_payload_mode(test_db, trace, dispatcher, default_instance_config, monkeypatch):
+    from src.services.trace_sampling import trace_sampler
+
+    default_instance_config.trace_payload_mode = "metadata"
+    test_db.commit()
+    trace_sampler.invalidate()
+    _enqueue(test_db)
+    monkeypatch.setattr(OutboxDispatcher, "_send", staticmethod(MagicMock(return_value=True)))
+
+    try:
+        assert dispatcher.dispatch_once() == 1
+    finally:
+        trace_sampler.invalidate()
+
+    test_db.expire_all()
+    assert test_db.query(MessageTrace).filter_by(trace_id="trace-outbox-1").one().status == "completed"
+    assert test_db.query(TracePayload).filter_by(trace_id="trace-outbox-1").count() == 0
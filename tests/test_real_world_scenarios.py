@@ -20,7 +20,7 @@ class TestRealWorldScenarios:
     """Test realistic user scenarios and integration workflows."""
 
     @pytest.fixture(autouse=True)
-    def setup_realistic_environment(self):
+    def setup_realistic_environment(self, async_db_override):
         """Set up environment that mimics real deployment."""
         # Create temporary database
         self.temp_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
@@ -46,9 +46,10 @@ class TestRealWorldScenarios:
         Base.metadata.create_all(bind=self.test_engine)
 
         # Override FastAPI dependency using built-in dependency_overrides
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         app.dependency_overrides[get_database] = get_test_db
+        app.dependency_overrides[get_async_database] = async_db_override(self.test_engine)
 
         # Mock external services to prevent real API calls
         with (
@@ -122,13 +122,14 @@ class TestSessionFilteringAPI:
             ),
         ]
 
-    def test_filter_by_agent_session_id(self, client, sample_traces, mock_db_session):
+    def test_filter_by_agent_session_id(self, client, sample_traces, mock_db_session, mock_async_db_override):
         """Test filtering traces by agent session ID."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
         from unittest.mock import Mock
 
         # Mock the database dependency
         client.app.dependency_overrides[get_database] = lambda: mock_db_session
+        client.app.dependency_overrides[get_async_database] = mock_async_db_override(mock_db_session)
 
         # Configure mock to return only traces with the specific agent session ID
         target_agent_session = "agent_session_abc123"
@@ -179,13 +180,14 @@ class TestSessionFilteringAPI:
         for trace in data:
             assert trace["agent_session_id"] == target_agent_session
 
-    def test_filter_by_session_name(self, client, sample_traces, mock_db_session):
+    def test_filter_by_session_name(self, client, sample_traces, mock_db_session, mock_async_db_override):
         """Test filtering traces by session name."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
         from unittest.mock import Mock
 
         # Mock the database dependency
         client.app.dependency_overrides[get_database] = lambda: mock_db_session
+        client.app.dependency_overrides[get_async_database] = mock_async_db_override(mock_db_session)
 
         # Configure mock to return only traces with the specific session name
         target_session_name = "user_john_session"
@@ -236,13 +238,14 @@ class TestSessionFilteringAPI:
         for trace in data:
             assert trace["session_name"] == target_session_name
 
-    def test_filter_by_has_media(self, client, sample_traces, mock_db_session):
+    def test_filter_by_has_media(self, client, sample_traces, mock_db_session, mock_async_db_override):
         """Test filtering traces by media presence."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
         from unittest.mock import Mock
 
         # Mock the database dependency
         client.app.dependency_overrides[get_database] = lambda: mock_db_session
+        client.app.dependency_overrides[get_async_database] = mock_async_db_override(mock_db_session)
 
         # Configure mock to return only traces with media
         expected_traces = [trace for trace in sample_traces if trace.has_media]
@@ -292,13 +295,14 @@ class TestSessionFilteringAPI:
         for trace in data:
             assert trace["has_media"]
 
-    def test_combined_session_filters(self, client, sample_traces, mock_db_session):
+    def test_combined_session_filters(self, client, sample_traces, mock_db_session, mock_async_db_override):
         """Test combining session_name and instance_name filters."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
         from unittest.mock import Mock
 
         # Mock the database dependency
         client.app.dependency_overrides[get_database] = lambda: mock_db_session
+        client.app.dependency_overrides[get_async_database] = mock_async_db_override(mock_db_session)
 
         # Configure mock to return only traces matching both filters
         target_session_name = "user_john_session"
@@ -355,13 +359,14 @@ class TestSessionFilteringAPI:
             assert trace["session_name"] == target_session_name
             assert trace["instance_name"] == target_instance_name
 
-    def test_session_isolation_between_instances(self, client, sample_traces, mock_db_session):
+    def test_session_isolation_between_instances(self, client, sample_traces, mock_db_session, mock_async_db_override):
         """Test that sessions are isolated between instances."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
         from unittest.mock import Mock
 
         # Mock the database dependency
         client.app.dependency_overrides[get_database] = lambda: mock_db_session
+        client.app.dependency_overrides[get_async_database] = mock_async_db_override(mock_db_session)
 
         # Configure mock to return only traces from instance_a
         target_instance = "instance_a"
@@ -416,9 +421,9 @@ class TestSessionFilteringAPI:
         instance_b_traces = [trace for trace in data if trace["instance_name"] == "instance_b"]
         assert len(instance_b_traces) == 0
 
-    def test_null_agent_session_id_handling(self, client, sample_traces):
+    def test_null_agent_session_id_handling(self, client, sample_traces, mock_async_db_override):
         """Test handling of traces with null agent_session_id."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         mock_session = Mock(spec=Session)
         mock_query = Mock()
@@ -435,6 +440,7 @@ class TestSessionFilteringAPI:
 
         # Override the dependency on the app
         app.dependency_overrides[get_database] = mock_db_generator
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
 
         try:
             # Filter should handle null values gracefully
@@ -452,9 +458,9 @@ class TestSessionFilteringAPI:
             # Clean up
             app.dependency_overrides.clear()
 
-    def test_phone_alias_parameter(self, client, sample_traces):
+    def test_phone_alias_parameter(self, client, sample_traces, mock_async_db_override):
         """Test that both 'phone' and 'sender_phone' parameters work."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         target_phone = "+5511999999999"
 
@@ -500,6 +506,7 @@ class TestSessionFilteringAPI:
 
         # Override the dependency on the app
         app.dependency_overrides[get_database] = mock_db_generator
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
 
         try:
             # Test with 'phone' parameter
@@ -520,13 +527,14 @@ class TestSessionFilteringAPI:
             # Clean up
             app.dependency_overrides.clear()
 
-    def test_session_filtering_with_pagination(self, client, sample_traces, mock_db_session):
+    def test_session_filtering_with_pagination(self, client, sample_traces, mock_db_session, mock_async_db_override):
         """Test session filtering works with pagination."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
         from unittest.mock import Mock
 
         # Mock the database dependency
         client.app.dependency_overrides[get_database] = lambda: mock_db_session
+        client.app.dependency_overrides[get_async_database] = mock_async_db_override(mock_db_session)
 
         # Configure mock to return traces with pagination
         target_session_name = "user_john_session"
@@ -652,9 +660,9 @@ class TestSessionFilteringAPI:
 class TestSessionFilteringEdgeCases:
     """Test edge cases for session filtering functionality."""
 
-    def test_empty_session_parameters(self):
+    def test_empty_session_parameters(self, mock_async_db_override):
         """Test behavior with empty session parameters."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         client = TestClient(app)
 
@@ -673,6 +681,7 @@ class TestSessionFilteringEdgeCases:
 
         # Override the dependency on the app
         app.dependency_overrides[get_database] = mock_db_generator
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
 
         try:
             # Empty session_name parameter should be ignored
@@ -686,9 +695,9 @@ class TestSessionFilteringEdgeCases:
             # Clean up
             app.dependency_overrides.clear()
 
-    def test_unicode_session_names(self):
+    def test_unicode_session_names(self, mock_async_db_override):
         """Test handling of unicode characters in session names."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         client = TestClient(app)
 
@@ -707,6 +716,7 @@ class TestSessionFilteringEdgeCases:
 
         # Override the dependency on the app
         app.dependency_overrides[get_database] = mock_db_generator
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
 
         try:
             # Unicode session name
@@ -721,9 +731,9 @@ class TestSessionFilteringEdgeCases:
             # Clean up
             app.dependency_overrides.clear()
 
-    def test_very_long_session_ids(self):
+    def test_very_long_session_ids(self, mock_async_db_override):
         """Test handling of very long session identifiers."""
-        from src.api.deps import get_database
+        from src.api.deps import get_async_database, get_database
 
         client = TestClient(app)
 
@@ -742,6 +752,7 @@ class TestSessionFilteringEdgeCases:
 
         # Override the dependency on the app
         app.dependency_overrides[get_database] = mock_db_generator
+        app.dependency_overrides[get_async_database] = mock_async_db_override(mock_session)
 
         try:
             # Very long session ID (1000 characters)
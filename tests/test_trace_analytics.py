@@ -0,0 +1,96 @@
+"""
+Tests for SQL-side trace analytics.
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from src.db.models import InstanceConfig
+from src.db.trace_models import MessageTrace
+from src.services.trace_service import TraceService
+from src.utils.datetime_utils import utcnow
+
+
+def _add_instances(db, *names):
+    for name in names:
+        db.add(InstanceConfig(name=name, channel_type="whatsapp", agent_api_url="", agent_api_key=""))
+    db.commit()
+
+
+def _add_traces(db):
+    _add_instances(db, "a", "b")
+    now = utcnow()
+    rows = [
+        ("a", "completed", "text", None, 1000, 400, now - timedelta(hours=1)),
+        ("a", "completed", "image", None, 2000, None, now - timedelta(hours=2)),
+        ("a", "failed", "text", "agent_request", None, None, now - timedelta(hours=3)),
+        ("b", "failed", None, "evolution_send", 500, 200, now - timedelta(hours=4)),
+        ("b", "received", "", None, None, None, now - timedelta(days=3)),
+    ]
+    for i, (instance, status, message_type, error_stage, total_ms, agent_ms, received_at) in enumerate(rows):
+        db.add(
+            MessageTrace(
+                trace_id=f"analytics-{i}",
+                instance_name=instance,
+                status=status,
+                message_type=message_type,
+                error_stage=error_stage,
+                total_processing_time_ms=total_ms,
+                agent_processing_time_ms=agent_ms,
+                received_at=received_at,
+            )
+        )
+    db.commit()
+    return now
+
+
+def test_analytics_aggregates_in_database(test_db):
+    now = _add_traces(test_db)
+
+    analytics = TraceService.get_trace_analytics(test_db, now - timedelta(hours=24), now)
+    latency = analytics.pop("latency_percentiles")
+
+    assert analytics == {
+        "total_messages": 4,
+        "successful_messages": 2,
+        "failed_messages": 2,
+        "success_rate": 50.0,
+        "avg_processing_time_ms": round((1000 + 2000 + 500) / 3, 2),
+        "avg_agent_time_ms": 300.0,
+        "message_types": {"text": 2, "image": 1, "unknown": 1},
+        "error_stages": {"agent_request": 1, "evolution_send": 1},
+        "instances": {"a": 3, "b": 1},
+    }
+    assert latency["total"]["count"] == 3
+    assert latency["total"]["p50"] == pytest.approx(1000, rel=0.02)
+    assert latency["total"]["max"] == pytest.approx(2000, rel=0.02)
+    assert latency["agent"]["p99"] == pytest.approx(400, rel=0.02)
+    assert latency["queue"] == {"count": 0, "p50": None, "p90": None, "p99": None, "max": None}
+
+
+def test_analytics_all_time_and_instance_filter(test_db):
+    _add_traces(test_db)
+
+    all_time = TraceService.get_trace_analytics(test_db)
+    instance_b = TraceService.get_trace_analytics(test_db, instance_name="b")
+    empty = TraceService.get_trace_analytics(test_db, instance_name="missing")
+
+    assert all_time["total_messages"] == 5
+    assert all_time["message_types"]["unknown"] == 2
+    assert instance_b["total_messages"] == 2
+    assert instance_b["success_rate"] == 0
+    assert empty["total_messages"] == 0
+    assert empty["avg_processing_time_ms"] is None
+    assert empty["instances"] == {}
+
+
+def test_analytics_endpoint_uses_sql_aggregates(test_client, test_db):
+    _add_traces(test_db)
+
+    response = test_client.get("/api/v1/traces/analytics/summary?all_time=true&instance_name=a")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_messages"] == 3
+    assert data["error_stages"] == {"agent_request": 1}
@@ -0,0 +1,190 @@
+"""
+Tests for the cold archive of old trace payloads.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.config import config
+from src.db.trace_models import MessageTrace, TracePayload
+import src.services.trace_archive as trace_archive_module
+from src.services.trace_archive import SegmentWriter, TraceArchive, trace_archive
+from src.services.trace_retention import TraceRetentionWorker
+from src.services.trace_service import TraceService
+from src.utils.datetime_utils import utcnow
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.tracing, "archive_directory", str(tmp_path))
+    trace_archive.reset()
+    yield tmp_path
+    trace_archive.reset()
+
+
+@pytest.fixture
+def worker(test_db, default_instance_config):
+    return TraceRetentionWorker(session_factory=sessionmaker(bind=test_db.get_bind()))
+
+
+def _add_trace(db, trace_id, age):
+    timestamp = utcnow().replace(tzinfo=None) - age
+    db.add(MessageTrace(trace_id=trace_id, instance_name="default", status="completed", received_at=timestamp))
+    for offset, stage in enumerate(("webhook_received", "agent_request", "agent_response")):
+        payload = TracePayload(
+            trace_id=trace_id,
+            stage=stage,
+            payload_type="request",
+            status_code=200,
+            timestamp=timestamp + timedelta(seconds=offset),
+        )
+        payload.set_payload({"trace": trace_id, "stage": stage})
+        db.add(payload)
+    db.commit()
+
+
+def _hot_trace_ids(db):
+    db.expire_all()
+    return {trace_id for (trace_id,) in db.query(TracePayload.trace_id).distinct()}
+
+
+def test_old_payloads_move_to_archive_and_are_read_back(test_db, worker, archive_dir):
+    for i in range(5):
+        _add_trace(test_db, f"archive-old-{i}", timedelta(days=10, minutes=i))
+    _add_trace(test_db, "archive-recent", timedelta(hours=1))
+
+    result = worker.archive_payloads(archive_after_days=7, batch_size=2, pause=0)
+
+    assert result == {"traces_archived": 5, "payloads_archived": 15}
+    assert _hot_trace_ids(test_db) == {"archive-recent"}
+    assert [path.suffix for path in sorted(archive_dir.iterdir())] == [".idx", ".zst"]
+
+    payloads = TraceService.get_trace_payloads("archive-old-3", test_db)
+    assert [p.stage for p in payloads] == ["webhook_received", "agent_request", "agent_response"]
+    assert payloads[1].to_dict(include_payload=True)["payload"] == {"trace": "archive-old-3", "stage": "agent_request"}
+    assert payloads[1].status_code == 200
+    assert len(TraceService.get_trace_payloads("archive-recent", test_db)) == 3
+    assert TraceService.get_trace_payloads("missing", test_db) == []
+
+
+def test_api_serves_archived_payloads(test_client, test_db, worker, archive_dir):
+    _add_trace(test_db, "archive-api", timedelta(days=10))
+    worker.archive_payloads(archive_after_days=7, pause=0)
+
+    response = test_client.get("/api/v1/traces/archive-api/payloads?include_payload=true")
+
+    assert response.status_code == 200
+    assert [p["payload"]["stage"] for p in response.json()] == ["webhook_received", "agent_request", "agent_response"]
+
+
+def test_passes_append_segments_and_recover_unfinished_indexes(test_db, worker, archive_dir):
+    _add_trace(test_db, "archive-first", timedelta(days=20))
+    worker.archive_payloads(archive_after_days=7, pause=0)
+
+    # A pass that stopped before sorting its index leaves it readable and gets sorted by the next pass
+    archive = TraceArchive(str(archive_dir))
+    writer = archive.open_segment()
+    _add_trace(test_db, "archive-interrupted", timedelta(days=9))
+    payload = test_db.query(TracePayload).filter_by(trace_id="archive-interrupted").first()
+    writer.append("archive-interrupted", [{"id": payload.id, "stage": "webhook_received", "payload": {"a": 1}}])
+    writer.sync()
+    assert [p.stage for p in archive.get_payloads("archive-interrupted")] == ["webhook_received"]
+
+    result = worker.archive_payloads(archive_after_days=7, pause=0)
+
+    assert result["traces_archived"] == 1
+    assert len(list(archive_dir.glob("*.zst"))) == 3
+    # The duplicate of the row that was still in the database is merged by payload id
+    assert len(TraceService.get_trace_payloads("archive-interrupted", test_db)) == 3
+    assert len(TraceService.get_trace_payloads("archive-first", test_db)) == 3
+
+
+def test_archiving_is_disabled_by_default(test_db, worker, archive_dir):
+    _add_trace(test_db, "archive-disabled", timedelta(days=400))
+
+    assert worker.archive_payloads() == {}
+    assert worker.run_once(retention_days=0)["status"] == "disabled"
+    assert _hot_trace_ids(test_db) == {"archive-disabled"}
+
+
+def _write_segment(archive_dir, stamp, trace_id, payload_id):
+    writer = SegmentWriter(archive_dir / f"segment-{stamp}.zst")
+    writer.append(trace_id, [{"id": payload_id, "stage": "webhook_received", "payload": {"id": payload_id}}])
+    writer.finish()
+
+
+def test_compaction_merges_earlier_days_and_months(archive_dir):
+    _write_segment(archive_dir, "20260105T010000000000", "compact-a", 1)
+    _write_segment(archive_dir, "20260120T010000000000", "compact-b", 2)
+    _write_segment(archive_dir, "20260120T020000000000", "compact-a", 3)
+    _write_segment(archive_dir, "20260210T010000000000", "compact-a", 4)
+    _write_segment(archive_dir, "20260210T020000000000", "compact-c", 5)
+    _write_segment(archive_dir, "20260211T010000000000", "compact-c", 6)
+    _write_segment(archive_dir, "20260212T010000000000", "compact-c", 7)
+    _write_segment(archive_dir, "20260212T020000000000", "compact-c", 8)
+    archive = TraceArchive(str(archive_dir))
+    assert [p.id for p in archive.get_payloads("compact-a")] == [1, 3, 4]
+
+    merged = archive.compact(now=datetime(2026, 2, 12, 12))
+
+    stamps = [path.name[len("segment-") : -len(".zst")] for path in sorted(archive.segments())]
+    # January in one segment, February 10 in one, the 11th untouched (single pass) and today's passes kept
+    assert [stamp[:9] for stamp in stamps] == ["202601m20", "20260210d", "20260211T", "20260212T", "20260212T"]
+    assert [name[8:17] for name in merged] == ["202601m20", "20260210d"]
+    assert len(list(archive_dir.iterdir())) == 10
+    assert [p.id for p in archive.get_payloads("compact-a")] == [1, 3, 4]
+    assert [p.id for p in archive.get_payloads("compact-b")] == [2]
+    assert [p.id for p in archive.get_payloads("compact-c")] == [5, 6, 7, 8]
+
+    # The following month folds February's daily and per-pass segments into one
+    archive.compact(now=datetime(2026, 3, 1))
+
+    assert len(archive.segments()) == 2
+    assert [p.id for p in archive.get_payloads("compact-c")] == [5, 6, 7, 8]
+
+
+def test_lookups_keep_a_bounded_number_of_indexes_mapped(archive_dir, monkeypatch):
+    monkeypatch.setattr(trace_archive_module, "INDEX_CACHE_SIZE", 2)
+    for i in range(5):
+        _write_segment(archive_dir, f"2026010{i + 1}T010000000000", "bounded", i)
+    archive = TraceArchive(str(archive_dir))
+
+    assert [p.id for p in archive.get_payloads("bounded")] == [0, 1, 2, 3, 4]
+    assert [p.id for p in archive.get_payloads("bounded")] == [0, 1, 2, 3, 4]
+    assert len(archive._indexes) == 2
+
+
+def test_lookup_follows_segments_merged_while_reading(archive_dir):
+    _write_segment(archive_dir, "20260105T010000000000", "racing", 1)
+    _write_segment(archive_dir, "20260106T010000000000", "racing", 2)
+    reader = TraceArchive(str(archive_dir))
+    listed = reader.segments()
+    # Another process merges the segments after this reader listed them
+    TraceArchive(str(archive_dir)).compact(now=datetime(2026, 2, 1))
+    calls = []
+
+    def stale_then_fresh():
+        calls.append(1)
+        return listed if len(calls) == 1 else TraceArchive.segments(reader)
+
+    reader.segments = stale_then_fresh
+
+    assert [p.id for p in reader.get_payloads("racing")] == [1, 2]
+    assert len(calls) == 2
+
+
+def test_export_includes_archived_payloads(test_client, test_db, worker, archive_dir):
+    _add_trace(test_db, "archive-export", timedelta(days=10))
+    worker.archive_payloads(archive_after_days=7, pause=0)
+
+    response = test_client.get("/api/v1/traces/export?all_time=true&include_payloads=true")
+
+    [record] = [json.loads(line) for line in response.text.splitlines()]
+    assert [p["payload"]["stage"] for p in record["payloads"]] == [
+        "webhook_received",
+        "agent_request",
+        "agent_response",
+    ]
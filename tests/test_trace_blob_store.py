@@ -0,0 +1,93 @@
+"""
+Tests for out-of-line trace media storage and the payload size cap.
+"""
+
+import os
+import time
+
+import pytest
+
+from src.config import config
+from src.db.trace_models import TracePayload
+from src.services.trace_blob_store import BLOB_PREFIX, TraceBlobStore
+
+
+@pytest.fixture
+def blob_store(tmp_path, monkeypatch):
+    store = TraceBlobStore(directory=str(tmp_path / "blobs"))
+    monkeypatch.setattr("src.services.trace_blob_store.trace_blob_store", store)
+    monkeypatch.setattr("src.api.routes.traces.trace_blob_store", store)
+    return store
+
+
+MEDIA = "iVBORw0KGgo" + "A" * 5000
+
+
+def test_media_fields_are_replaced_with_deduplicated_blobs(blob_store):
+    payload = {
+        "data": {
+            "message": {"imageMessage": {"jpegThumbnail": MEDIA, "caption": "look"}, "base64": MEDIA},
+        },
+        "media_contents": [{"mime_type": "image/png", "data": MEDIA}, {"mime_type": "text/plain", "data": "short"}],
+    }
+
+    stored, count = blob_store.externalize(payload)
+
+    reference = stored["data"]["message"]["base64"]
+    assert count == 3
+    assert reference.startswith(BLOB_PREFIX)
+    assert stored["data"]["message"]["imageMessage"] == {"jpegThumbnail": reference, "caption": "look"}
+    assert stored["media_contents"] == [
+        {"mime_type": "image/png", "data": reference},
+        {"mime_type": "text/plain", "data": "short"},
+    ]
+    # Identical media is stored once, and the caller's payload is untouched
+    assert len(list(blob_store.root.glob("*/*"))) == 1
+    assert blob_store.get(reference[len(BLOB_PREFIX) :]) == MEDIA.encode()
+    assert payload["data"]["message"]["base64"] == MEDIA
+
+
+def test_set_payload_keeps_media_out_of_trace_row(blob_store):
+    trace_payload = TracePayload(stage="webhook_received")
+    trace_payload.set_payload({"message": {"base64": MEDIA}})
+
+    stored = trace_payload.get_payload()
+    assert stored["message"]["base64"].startswith(BLOB_PREFIX)
+    assert trace_payload.payload_size_original < 200
+    assert trace_payload.contains_base64 is True
+
+
+def test_payload_above_max_size_is_truncated(blob_store, monkeypatch):
+    monkeypatch.setattr(config.tracing, "max_payload_size", 1000)
+    trace_payload = TracePayload(stage="agent_response")
+
+    trace_payload.set_payload({"message": "x" * 5000})
+
+    stored = trace_payload.get_payload()
+    assert stored["_truncated"] is True
+    assert stored["original_size"] == trace_payload.payload_size_original > 5000
+    assert len(stored["preview"]) == 500
+
+
+def test_cleanup_removes_only_expired_blobs(blob_store):
+    old_hash = blob_store.put(b"old" * 100)
+    new_hash = blob_store.put(b"new" * 100)
+    expired = time.time() - 10 * 86400
+    os.utime(blob_store.root / old_hash[:2] / old_hash, (expired, expired))
+
+    result = blob_store.cleanup(retention_days=7)
+
+    assert result == {"blobs_deleted": 1, "bytes_freed": 300}
+    assert blob_store.get(old_hash) is None
+    assert blob_store.get(new_hash) == b"new" * 100
+
+
+def test_blob_endpoint(test_client, blob_store):
+    content_hash = blob_store.put(MEDIA.encode())
+
+    response = test_client.get(f"/api/v1/traces/blobs/{content_hash}")
+    assert response.status_code == 200
+    assert response.text == MEDIA
+
+    assert test_client.get(f"/api/v1/traces/blobs/{'0' * 64}").status_code == 404
+    assert test_client.get("/api/v1/traces/blobs/..%2F..%2Fetc").status_code == 404
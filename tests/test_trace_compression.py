@@ -0,0 +1,130 @@
+"""
+Tests for binary trace payload storage with zstd dictionaries.
+"""
+
+import base64
+import json
+import zlib
+
+import pytest
+import zstandard
+
+from src.db.trace_models import MessageTrace, TraceCompressionDict, TracePayload
+from src.services.trace_compression import (
+    CODEC_ZLIB,
+    CODEC_ZSTD,
+    payload_codec,
+    recompress_payloads,
+    storage_report,
+    train_stage_dictionaries,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_codec():
+    payload_codec.reset()
+    yield
+    payload_codec.reset()
+
+
+def _webhook(i):
+    return {
+        "event": "messages.upsert",
+        "instance": "default",
+        "data": {
+            "key": {"remoteJid": f"55119{i:08d}@s.whatsapp.net", "fromMe": False, "id": f"3EB0{i:016X}"},
+            "pushName": f"Contact {i}",
+            "message": {"conversation": f"hello number {i}"},
+            "messageType": "conversation",
+            "messageTimestamp": 1700000000 + i,
+        },
+    }
+
+
+@pytest.fixture
+def stored_payloads(test_db, default_instance_config):
+    test_db.add(MessageTrace(trace_id="compression-trace", instance_name="default", status="completed"))
+    for i in range(200):
+        payload = TracePayload(trace_id="compression-trace", stage="webhook_received", payload_type="webhook")
+        payload.set_payload(_webhook(i))
+        test_db.add(payload)
+    test_db.commit()
+    return test_db
+
+
+def test_payload_is_stored_as_zstd_bytes(test_db):
+    payload = TracePayload(trace_id="t", stage="webhook_received", payload_type="webhook")
+    payload.set_payload({"text": "olá", "media": {"type": "image"}})
+
+    assert payload.payload_codec == CODEC_ZSTD
+    assert payload.payload_dict_id is None
+    assert payload.payload_compressed is None
+    assert isinstance(payload.payload_data, bytes)
+    assert payload.payload_size_compressed == len(payload.payload_data)
+    assert payload.contains_media is True
+    assert payload.get_payload() == {"text": "olá", "media": {"type": "image"}}
+
+
+def test_legacy_base64_payload_still_readable():
+    raw = json.dumps({"legacy": True}).encode("utf-8")
+    payload = TracePayload(payload_compressed=base64.b64encode(zlib.compress(raw)).decode("ascii"))
+
+    assert payload.get_payload() == {"legacy": True}
+
+
+def test_dictionary_training_recompression_and_old_versions(stored_payloads):
+    db = stored_payloads
+    before = {row.id: row.get_payload() for row in db.query(TracePayload).all()}
+
+    trained = train_stage_dictionaries(db, dict_size=4096)
+    first_version = trained["webhook_received"]["dict_id"]
+    report = recompress_payloads(db, batch_size=50)
+
+    assert report["rows"] == 200
+    assert report["bytes_after"] < report["bytes_before"]
+    rows = db.query(TracePayload).all()
+    assert {row.payload_dict_id for row in rows} == {first_version}
+    assert {row.id: row.get_payload() for row in rows} == before
+
+    # Retraining adds a version; rows on the old one are decoded with their own dictionary
+    second_version = train_stage_dictionaries(db, dict_size=4096)["webhook_received"]["dict_id"]
+    assert second_version > first_version
+    assert db.query(TraceCompressionDict).count() == 2
+    payload_codec.reset()
+    payload_codec.load(db)
+    assert payload_codec._active == {"stage:webhook_received": second_version}
+    assert {row.id: row.get_payload() for row in db.query(TracePayload).all()} == before
+
+    new_payload = TracePayload(trace_id="compression-trace", stage="webhook_received", payload_type="webhook")
+    new_payload.set_payload(_webhook(999))
+    assert new_payload.payload_dict_id == second_version
+
+
+def test_recompress_converts_legacy_and_zlib_rows(test_db):
+    raw = json.dumps(_webhook(1)).encode("utf-8")
+    test_db.add_all(
+        [
+            TracePayload(stage="webhook_received", payload_compressed=base64.b64encode(zlib.compress(raw)).decode()),
+            TracePayload(stage="webhook_received", payload_data=zlib.compress(raw), payload_codec=CODEC_ZLIB),
+        ]
+    )
+    test_db.commit()
+    assert set(storage_report(test_db)) == {"legacy", CODEC_ZLIB}
+
+    report = recompress_payloads(test_db)
+
+    assert report["rows"] == 2
+    assert set(storage_report(test_db)) == {CODEC_ZSTD}
+    assert all(row.get_payload() == _webhook(1) for row in test_db.query(TracePayload).all())
+
+
+def test_unknown_dictionary_version_reports_error(test_db):
+    samples = [json.dumps(_webhook(i)).encode() for i in range(200)]
+    compressor = zstandard.ZstdCompressor(dict_data=zstandard.train_dictionary(2048, samples))
+    payload = TracePayload(payload_data=compressor.compress(b"{}"), payload_codec=CODEC_ZSTD, payload_dict_id=424242)
+    test_db.add(payload)
+    test_db.commit()
+
+    result = payload.get_payload()
+
+    assert "Payload decompression failed" in result["error"]
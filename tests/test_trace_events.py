@@ -0,0 +1,159 @@
+"""
+Tests for the live trace event stream.
+"""
+
+import json
+import threading
+
+import pytest
+
+from src.api.routes.traces import _sse_events
+from src.config import config
+from src.db.trace_models import MessageTrace
+from src.services.trace_events import PENDING_EVENTS_KEY, trace_events
+from src.services.trace_hooks import WATCHED_SESSION_KEY
+from src.services.trace_service import TraceService
+
+
+@pytest.fixture
+def subscriptions():
+    created = []
+
+    def subscribe(**filters):
+        subscription = trace_events.subscribe(**filters)
+        created.append(subscription)
+        return subscription
+
+    yield subscribe
+    for subscription in created:
+        if subscription is not None:
+            trace_events.unsubscribe(subscription)
+
+
+def _webhook(message_id, phone="5511999999999"):
+    return {
+        "data": {
+            "key": {"id": message_id, "remoteJid": f"{phone}@s.whatsapp.net"},
+            "message": {"conversation": "hi"},
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_committed_lifecycle_events_reach_matching_subscribers(test_db, default_instance_config, subscriptions):
+    everything = subscriptions()
+    failures = subscriptions(statuses=frozenset({"failed"}))
+    other_phone = subscriptions(phone="5500000000000")
+
+    context = TraceService.create_trace(_webhook("e1"), "default", test_db)
+    context.update_trace_status("failed", error_message="boom", error_stage="agent_request")
+
+    events = await everything.next_batch(timeout=1)
+    assert [(e["event"], e["status"], e["previous_status"]) for e in events] == [
+        ("created", "received", None),
+        ("status", "failed", "received"),
+    ]
+    assert events[0]["trace_id"] == context.trace_id
+    assert events[0]["sender_phone"] == "5511999999999"
+    assert events[1]["error_stage"] == "agent_request"
+
+    assert [e["event"] for e in await failures.next_batch(timeout=1)] == ["status"]
+    assert await other_phone.next_batch(timeout=0.01) == []
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_changes_are_not_published(test_db, default_instance_config, subscriptions):
+    subscription = subscriptions()
+    test_db.add(MessageTrace(trace_id="rolled-back", instance_name="default", status="received"))
+    test_db.flush()
+    test_db.rollback()
+
+    assert await subscription.next_batch(timeout=0.01) == []
+    assert PENDING_EVENTS_KEY not in test_db.info
+
+
+def test_nothing_is_collected_without_subscribers(test_db, default_instance_config):
+    TraceService.create_trace(_webhook("e2"), "default", test_db)
+    test_db.add(MessageTrace(trace_id="unwatched", instance_name="default", status="received"))
+    test_db.flush()
+
+    assert PENDING_EVENTS_KEY not in test_db.info
+    test_db.rollback()
+
+
+def test_only_sessions_writing_traces_get_listeners(test_db, default_instance_config):
+    test_db.query(MessageTrace).count()
+    test_db.commit()
+    assert WATCHED_SESSION_KEY not in test_db.info
+
+    test_db.add(MessageTrace(trace_id="watched", instance_name="default", status="received"))
+    test_db.commit()
+
+    assert test_db.info[WATCHED_SESSION_KEY] is True
+
+
+@pytest.mark.asyncio
+async def test_slow_subscribers_drop_oldest_events(test_db, default_instance_config, subscriptions, monkeypatch):
+    monkeypatch.setattr(config.tracing, "stream_buffer_size", 2)
+    subscription = subscriptions()
+    dropped_before = trace_events.events_dropped
+
+    trace_ids = [TraceService.create_trace(_webhook(f"slow-{i}"), "default", test_db).trace_id for i in range(5)]
+
+    events = await subscription.next_batch(timeout=1)
+    assert events[0] == {"event": "dropped", "count": 3}
+    assert [e["trace_id"] for e in events[1:]] == trace_ids[-2:]
+    assert trace_events.events_dropped - dropped_before == 3
+
+
+@pytest.mark.asyncio
+async def test_events_published_from_other_threads_wake_subscribers(subscriptions):
+    subscription = subscriptions()
+    event = {"event": "status", "instance_name": "default", "sender_phone": None, "status": "completed"}
+    threading.Timer(0.05, trace_events.publish, args=([event],)).start()
+
+    assert await subscription.next_batch(timeout=2) == [event]
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_format(test_db, default_instance_config):
+    stream = _sse_events(instance_name="default")
+    assert await stream.__anext__() == ": connected\n\n"
+    assert trace_events.get_stats()["subscribers"] == 1
+
+    trace_id = TraceService.create_trace(_webhook("sse"), "default", test_db).trace_id
+
+    chunk = await stream.__anext__()
+    await stream.aclose()
+    event_line, data_line, _, _ = chunk.split("\n")
+    assert event_line == "event: created"
+    assert json.loads(data_line.removeprefix("data: "))["trace_id"] == trace_id
+    assert trace_events.get_stats()["subscribers"] == 0
+
+
+def test_stream_rejects_subscribers_over_the_limit(test_client, monkeypatch):
+    monkeypatch.setattr(config.tracing, "stream_max_subscribers", 0)
+
+    response = test_client.get("/api/v1/traces/stream")
+
+    assert response.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_stream_closed_before_its_first_chunk_holds_no_subscription():
+    stream = _sse_events()
+    await stream.aclose()
+
+    assert trace_events.get_stats()["subscribers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_a_full_broker_in_band(monkeypatch):
+    monkeypatch.setattr(config.tracing, "stream_max_subscribers", 0)
+    stream = _sse_events()
+
+    chunk = await stream.__anext__()
+
+    assert chunk.startswith("event: error\n")
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
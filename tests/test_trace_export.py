@@ -0,0 +1,74 @@
+"""
+Tests for streaming trace export.
+"""
+
+import csv
+import io
+import json
+from datetime import timedelta
+
+from src.db.trace_models import MessageTrace, TracePayload
+from src.utils.datetime_utils import utcnow
+
+
+def _add_traces(db, count=5):
+    now = utcnow().replace(tzinfo=None, microsecond=0)
+    for i in range(count):
+        trace_id = f"export-{i}"
+        db.add(
+            MessageTrace(
+                trace_id=trace_id,
+                instance_name="default",
+                sender_phone="+5511999" if i % 2 else "+5511888",
+                status="completed",
+                received_at=now - timedelta(minutes=count - i),
+            )
+        )
+        payload = TracePayload(trace_id=trace_id, stage="webhook_received", payload_type="webhook")
+        payload.set_payload({"message": f"hello {i}"})
+        db.add(payload)
+    db.commit()
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_export_streams_all_traces_oldest_first_with_payloads(test_client, test_db, default_instance_config):
+    _add_traces(test_db)
+
+    response = test_client.get("/api/v1/traces/export?all_time=true&include_payloads=true&batch_size=2")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = _ndjson(response)
+    assert [r["trace_id"] for r in records] == [f"export-{i}" for i in range(5)]
+    assert records[3]["payloads"][0]["payload"] == {"message": "hello 3"}
+    assert all(r["cursor"] for r in records)
+
+
+def test_export_resumes_from_cursor_and_applies_filters(test_client, test_db, default_instance_config):
+    _add_traces(test_db)
+    records = _ndjson(test_client.get("/api/v1/traces/export?all_time=true&batch_size=2"))
+
+    resumed = _ndjson(test_client.get(f"/api/v1/traces/export?all_time=true&cursor={records[1]['cursor']}"))
+    filtered = _ndjson(test_client.get("/api/v1/traces/export?all_time=true&phone=%2B5511999"))
+
+    assert [r["trace_id"] for r in resumed] == ["export-2", "export-3", "export-4"]
+    assert "payloads" not in resumed[0]
+    assert [r["trace_id"] for r in filtered] == ["export-1", "export-3"]
+    assert test_client.get("/api/v1/traces/export?cursor=garbage").status_code == 400
+
+
+def test_csv_export(test_client, test_db, default_instance_config):
+    _add_traces(test_db, count=3)
+
+    response = test_client.get("/api/v1/traces/export?all_time=true&format=csv&include_payloads=true&batch_size=2")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+
+    assert response.headers["content-type"].startswith("text/csv")
+    assert [row["trace_id"] for row in rows] == ["export-0", "export-1", "export-2"]
+    assert json.loads(rows[2]["payloads"])[0]["payload"] == {"message": "hello 2"}
+
+    empty = test_client.get("/api/v1/traces/export?instance_name=missing&format=csv")
+    assert empty.text.strip().split(",")[0] == "trace_id"
@@ -0,0 +1,64 @@
+"""
+Tests for mergeable per-stage latency histograms.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.services.trace_histograms import HISTOGRAM_RELATIVE_ACCURACY, LatencyHistogram, stage_latencies
+
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[math.ceil(q * len(ordered)) - 1]
+
+
+def test_quantiles_are_within_relative_accuracy():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(6, 1.2) for _ in range(5000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.add(value)
+
+    for q in (0.5, 0.9, 0.99):
+        assert histogram.quantile(q) == pytest.approx(_exact_quantile(values, q), rel=HISTOGRAM_RELATIVE_ACCURACY)
+    assert histogram.max() == pytest.approx(max(values), rel=HISTOGRAM_RELATIVE_ACCURACY)
+    assert histogram.count == 5000
+
+
+def test_merged_histograms_equal_one_histogram_of_all_values():
+    rng = random.Random(5)
+    values = [rng.randrange(1, 60000) for _ in range(1000)]
+    whole, parts = LatencyHistogram(), [LatencyHistogram() for _ in range(4)]
+    for i, value in enumerate(values):
+        whole.add(value)
+        parts[i % 4].add(value)
+
+    merged = LatencyHistogram()
+    for part in parts:
+        merged.merge(part)
+
+    assert merged.summary() == whole.summary()
+    assert LatencyHistogram().summary() == {"count": 0, "p50": None, "p90": None, "p99": None, "max": None}
+
+
+def test_stage_latencies_from_trace_timestamps():
+    received = datetime(2026, 1, 1, 12, 0, 0)
+    values = {
+        "received_at": received,
+        "agent_request_at": received + timedelta(milliseconds=150),
+        "agent_response_at": received + timedelta(milliseconds=2150),
+        "evolution_send_at": received + timedelta(milliseconds=2400),
+        "agent_processing_time_ms": None,
+        "total_processing_time_ms": 2500,
+    }
+
+    assert dict(stage_latencies(values)) == {"queue": 150, "agent": 2000, "send": 250, "total": 2500}
+    assert dict(stage_latencies({**values, "agent_processing_time_ms": 1900, "evolution_send_at": None})) == {
+        "queue": 150,
+        "agent": 1900,
+        "total": 2500,
+    }
@@ -0,0 +1,113 @@
+"""
+Tests for keyset pagination of trace listing and the indexes it relies on.
+"""
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import event
+
+from src.db.models import InstanceConfig
+from src.db.trace_models import MessageTrace
+from src.services.trace_service import TraceService
+from src.utils.datetime_utils import utcnow
+
+
+def _add_instances(db, *names):
+    for name in names:
+        db.add(InstanceConfig(name=name, channel_type="whatsapp", agent_api_url="", agent_api_key=""))
+    db.commit()
+
+
+def _add_traces(db, count=7):
+    _add_instances(db, "a", "b")
+    now = utcnow().replace(tzinfo=None, microsecond=0)
+    for i in range(count):
+        db.add(
+            MessageTrace(
+                trace_id=f"listing-{i}",
+                instance_name="a" if i % 2 else "b",
+                sender_phone="+5511999",
+                status="completed",
+                # Pairs of traces share a timestamp so the trace_id tie-break matters
+                received_at=now - timedelta(minutes=i // 2),
+            )
+        )
+    db.commit()
+
+
+def test_cursor_pages_cover_all_traces_once(test_client, test_db):
+    _add_traces(test_db)
+    expected = [t.trace_id for t in TraceService.paginate_traces(test_db.query(MessageTrace), 100)[0]]
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/v1/traces?all_time=true&limit=3" + (f"&cursor={cursor}" if cursor else "")
+        response = test_client.get(url)
+        assert response.status_code == 200
+        seen += [trace["trace_id"] for trace in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == expected
+    assert len(set(seen)) == 7
+
+
+def test_cursor_combines_with_filters_and_rejects_garbage(test_client, test_db):
+    _add_traces(test_db)
+
+    first = test_client.get("/api/v1/traces?all_time=true&instance_name=a&limit=2")
+    second = test_client.get(f"/api/v1/traces?all_time=true&instance_name=a&cursor={first.headers['X-Next-Cursor']}")
+
+    assert [t["trace_id"] for t in first.json()] == ["listing-1", "listing-3"]
+    assert [t["trace_id"] for t in second.json()] == ["listing-5"]
+    assert "X-Next-Cursor" not in second.headers
+    assert test_client.get("/api/v1/traces?cursor=not-a-cursor").status_code == 400
+
+
+def _query_plan(db, query, cursor):
+    statements = []
+
+    def capture(conn, cursor_, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        TraceService.paginate_traces(query, 50, cursor=cursor)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    statement, parameters = statements[-1]
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    "column, value, index",
+    [
+        (None, None, "ix_message_traces_received_at_trace_id"),
+        ("instance_name", "a", "ix_message_traces_instance_received_at"),
+        ("sender_phone", "+5511999", "ix_message_traces_sender_phone_received_at"),
+        ("status", "completed", "ix_message_traces_status_received_at"),
+        ("session_name", "s", "ix_message_traces_session_received_at"),
+    ],
+)
+def test_listing_query_plans_use_composite_indexes(test_db, column, value, index):
+    if test_db.get_bind().dialect.name != "sqlite":
+        pytest.skip("Query plan assertions are written against SQLite's EXPLAIN QUERY PLAN")
+    _add_traces(test_db)
+    first_page, next_cursor = TraceService.paginate_traces(test_db.query(MessageTrace), 3)
+    cursor = TraceService.decode_cursor(next_cursor)
+
+    query = test_db.query(MessageTrace)
+    if column:
+        query = query.filter(getattr(MessageTrace, column) == value)
+    query = query.filter(MessageTrace.received_at >= first_page[-1].received_at - timedelta(days=1))
+
+    for position in (None, cursor):
+        plan = _query_plan(test_db, query, position)
+        # The index serves both the filter and the sort: no full scan and no sort step
+        assert index in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
@@ -0,0 +1,103 @@
+"""
+Tests for time-based partitioning of the trace tables.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from src.db.trace_models import MessageTrace, TracePayload
+from src.services.trace_partitions import (
+    drop_expired_partitions,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    next_period,
+    partition_bounds,
+    partition_name,
+    partition_tables,
+    period_start,
+    unpartition_tables,
+)
+from src.utils.datetime_utils import utcnow
+
+
+def test_periods_and_partition_names():
+    value = datetime(2026, 12, 31, 23, 59)
+
+    assert period_start(value, "monthly") == datetime(2026, 12, 1)
+    assert next_period(datetime(2026, 12, 1), "monthly") == datetime(2027, 1, 1)
+    assert next_period(datetime(2026, 1, 1), "monthly") == datetime(2026, 2, 1)
+    assert period_start(value, "daily") == datetime(2026, 12, 31)
+    assert next_period(datetime(2026, 12, 31), "daily") == datetime(2027, 1, 1)
+    assert partition_name("message_traces", datetime(2026, 3, 1), "monthly") == "message_traces_p202603"
+    assert partition_name("trace_payloads", datetime(2026, 3, 9), "daily") == "trace_payloads_p20260309"
+    assert partition_bounds("FOR VALUES FROM ('2026-03-01 00:00:00') TO ('2026-04-01 00:00:00')") == (
+        datetime(2026, 3, 1),
+        datetime(2026, 4, 1),
+    )
+    assert partition_bounds("DEFAULT") is None
+
+
+def test_partitioning_is_postgres_only(test_db):
+    connection = test_db.connection()
+    if connection.dialect.name == "postgresql":
+        pytest.skip("Covered by the PostgreSQL round trip")
+
+    assert not is_partitioned(connection, "message_traces")
+    assert ensure_partitions(connection, "monthly", 3) == []
+    with pytest.raises(ValueError):
+        partition_tables(connection, "monthly")
+
+
+def test_partition_round_trip_on_postgres(test_db, default_instance_config):
+    connection = test_db.connection()
+    if connection.dialect.name != "postgresql":
+        pytest.skip("Range partitioning requires PostgreSQL")
+    now = utcnow().replace(tzinfo=None)
+    old, recent = now - timedelta(days=100), now - timedelta(hours=1)
+    for trace_id, received_at in (("old", old), ("recent", recent)):
+        test_db.add(
+            MessageTrace(trace_id=trace_id, instance_name="default", status="completed", received_at=received_at)
+        )
+        test_db.add(
+            TracePayload(trace_id=trace_id, stage="webhook_received", payload_type="webhook", timestamp=received_at)
+        )
+    test_db.commit()
+    connection = test_db.connection()
+
+    assert partition_tables(connection, "monthly", ahead=2) == ["trace_payloads", "message_traces"]
+    names = [name for name, _ in list_partitions(connection, "message_traces")]
+    assert partition_name("message_traces", period_start(old, "monthly"), "monthly") in names
+    assert partition_name("message_traces", next_period(period_start(now, "monthly"), "monthly"), "monthly") in names
+    assert "message_traces_default" in names
+    assert ensure_partitions(connection, "monthly", 2) == []
+    test_db.commit()
+
+    # trace_id stays unique even though the primary key now includes received_at
+    test_db.add(MessageTrace(trace_id="old", instance_name="default", status="received", received_at=now))
+    with pytest.raises(IntegrityError):
+        test_db.commit()
+    test_db.rollback()
+
+    # Rows, the ORM relationship and time pruning survive the conversion
+    assert {t.trace_id: len(t.payloads) for t in test_db.query(MessageTrace).all()} == {"old": 1, "recent": 1}
+    plan = "\n".join(
+        row[0]
+        for row in test_db.connection().exec_driver_sql(
+            "EXPLAIN SELECT * FROM message_traces WHERE received_at >= %(since)s", {"since": recent}
+        )
+    )
+    assert partition_name("message_traces", period_start(old, "monthly"), "monthly") not in plan
+
+    dropped = drop_expired_partitions(test_db.connection(), now - timedelta(days=30))
+    test_db.commit()
+    assert partition_name("message_traces", period_start(old, "monthly"), "monthly") in dropped
+    assert [t.trace_id for t in test_db.query(MessageTrace).all()] == ["recent"]
+    assert [p.trace_id for p in test_db.query(TracePayload).all()] == ["recent"]
+
+    assert unpartition_tables(test_db.connection()) == ["message_traces", "trace_payloads"]
+    test_db.commit()
+    assert not is_partitioned(test_db.connection(), "message_traces")
+    assert test_db.query(TracePayload).count() == 1
@@ -0,0 +1,96 @@
+"""
+Tests for batched trace retention.
+"""
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.db.trace_models import MessageTrace, TracePayload, TraceRollupHour
+from src.services.trace_partitions import partition_upper_bound
+from src.services.trace_retention import TraceRetentionWorker
+from src.services.trace_service import TraceService
+from src.utils.datetime_utils import utcnow
+
+
+@pytest.fixture
+def worker(test_db, default_instance_config):
+    return TraceRetentionWorker(session_factory=sessionmaker(bind=test_db.get_bind()))
+
+
+def _add_traces(db, expired=5, recent=2):
+    now = utcnow()
+    for i in range(expired + recent):
+        trace_id = f"retention-{i}"
+        age = timedelta(days=40, minutes=i) if i < expired else timedelta(days=1)
+        db.add(
+            MessageTrace(
+                trace_id=trace_id,
+                instance_name="default",
+                status="completed",
+                total_processing_time_ms=100,
+                received_at=now - age,
+            )
+        )
+        db.add(TracePayload(trace_id=trace_id, stage="webhook_received", payload_type="webhook"))
+    db.commit()
+
+
+def test_run_once_deletes_expired_traces_in_batches_children_first(test_db, worker):
+    _add_traces(test_db)
+    rollups_before = test_db.query(TraceRollupHour).count()
+
+    result = worker.run_once(retention_days=30, batch_size=2, pause=0)
+
+    assert result["status"] == "completed"
+    assert result["traces_deleted"] == 5
+    assert result["payloads_deleted"] == 5
+    assert result["batches"] == 3
+    test_db.expire_all()
+    assert sorted(t.trace_id for t in test_db.query(MessageTrace).all()) == ["retention-5", "retention-6"]
+    assert {p.trace_id for p in test_db.query(TracePayload).all()} == {"retention-5", "retention-6"}
+    # Rollups keep analytics history past the retention period
+    assert test_db.query(TraceRollupHour).count() == rollups_before
+
+    stats = worker.get_stats()
+    assert stats["traces_deleted"] == 5
+    assert stats["last_run"]["cutoff"] == result["cutoff"]
+    assert stats["current_run"] is None
+
+
+def test_run_once_sweeps_orphaned_payloads(test_db, worker):
+    if test_db.get_bind().dialect.name != "sqlite":
+        pytest.skip("Orphans can only be created where foreign keys are not enforced")
+    _add_traces(test_db, expired=0, recent=1)
+    test_db.add(TracePayload(trace_id="deleted-by-bulk-delete", stage="webhook_received", payload_type="webhook"))
+    test_db.commit()
+
+    result = worker.run_once(retention_days=30, pause=0)
+
+    assert result["orphans_deleted"] == 1
+    assert test_db.query(TracePayload).count() == 1
+
+
+def test_retention_disabled_with_zero_days(test_db, worker):
+    _add_traces(test_db)
+
+    assert worker.run_once(retention_days=0) == {"status": "disabled"}
+    assert test_db.query(MessageTrace).count() == 7
+
+
+def test_cleanup_old_traces_deletes_payloads_too(test_db, default_instance_config):
+    _add_traces(test_db)
+
+    assert TraceService.cleanup_old_traces(test_db, days_old=30) == 5
+    assert test_db.query(TracePayload).count() == 2
+
+
+def test_partition_upper_bound_parsing():
+    bound = "FOR VALUES FROM ('2026-01-01 00:00:00') TO ('2026-02-01 00:00:00')"
+
+    assert partition_upper_bound(bound).isoformat() == "2026-02-01T00:00:00"
+    assert partition_upper_bound("FOR VALUES FROM ('2026-01-01 02:00:00+02') TO ('2026-02-01 02:00:00+02')") == (
+        partition_upper_bound(bound)
+    )
+    assert partition_upper_bound("DEFAULT") is None
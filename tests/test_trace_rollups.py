@@ -0,0 +1,167 @@
+"""
+Tests for incrementally maintained trace rollups.
+"""
+
+import random
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.config import config
+from src.db.models import InstanceConfig
+from src.db.trace_models import (
+    MessageTrace,
+    TraceLatencyHour,
+    TraceLatencyMinute,
+    TraceRollupHour,
+    TraceRollupMinute,
+)
+from src.services.trace_rollups import rebuild_rollups
+from src.services.trace_service import TraceService
+from src.services.trace_writer import StatusEvent, TraceWriter
+from src.utils.datetime_utils import utcnow
+
+
+def _add_instances(db, *names):
+    for name in names:
+        db.add(InstanceConfig(name=name, channel_type="whatsapp", agent_api_url="", agent_api_key=""))
+    db.commit()
+
+
+def _rollup_rows(db, model, with_bucket=False):
+    return {
+        (row.instance_name, row.message_type, row.status, row.error_stage)
+        + ((row.bucket_start,) if with_bucket else ()): (
+            row.trace_count,
+            row.processing_time_sum,
+            row.latency_bucket_3,
+        )
+        for row in db.query(model).all()
+        if row.trace_count
+    }
+
+
+def test_writer_status_updates_maintain_rollups(test_db, default_instance_config):
+    received_at = (utcnow() - timedelta(hours=2)).replace(tzinfo=None)
+    test_db.add(
+        MessageTrace(trace_id="rollup-1", instance_name="default", message_type="text", received_at=received_at)
+    )
+    test_db.commit()
+    session_factory = sessionmaker(bind=test_db.get_bind(), autocommit=False, autoflush=False)
+    writer = TraceWriter(session_factory=session_factory)
+
+    # Not terminal yet: nothing rolled up
+    writer.write_batch([StatusEvent("rollup-1", "processing")])
+    assert test_db.query(TraceRollupMinute).count() == 0
+
+    done_at = received_at + timedelta(milliseconds=900)
+    writer.write_batch([StatusEvent("rollup-1", "completed", timestamp=done_at)])
+    test_db.expire_all()
+    minute = test_db.query(TraceRollupMinute).one()
+    assert minute.bucket_start == received_at.replace(second=0, microsecond=0)
+    assert _rollup_rows(test_db, TraceRollupHour) == {("default", "text", "completed", ""): (1, 900, 1)}
+
+    # A later failure moves the trace to another key instead of counting it twice
+    writer.write_batch([StatusEvent("rollup-1", "failed", error_stage="evolution_send", timestamp=done_at)])
+    test_db.expire_all()
+    for model in (TraceRollupMinute, TraceRollupHour):
+        assert _rollup_rows(test_db, model) == {("default", "text", "failed", "evolution_send"): (1, 900, 1)}
+
+
+def _random_traces(db, count=300):
+    _add_instances(db, "a", "b")
+    rng = random.Random(7)
+    now = utcnow().replace(tzinfo=None)
+    for i in range(count):
+        status = rng.choice(["completed", "completed", "failed", "processing", "received", "sending", "error"])
+        received_at = now - timedelta(seconds=rng.randrange(6 * 3600))
+        agent_request_at = received_at + timedelta(milliseconds=rng.randrange(1, 3000))
+        agent_response_at = agent_request_at + timedelta(milliseconds=rng.randrange(10, 20000))
+        db.add(
+            MessageTrace(
+                trace_id=f"rollup-random-{i}",
+                instance_name=rng.choice(["a", "b", None]),
+                message_type=rng.choice(["text", "image", None, ""]),
+                status=status,
+                error_stage=rng.choice(["agent_request", None]) if status == "failed" else None,
+                received_at=received_at,
+                agent_request_at=rng.choice([None, agent_request_at]),
+                agent_response_at=agent_response_at,
+                evolution_send_at=agent_response_at + timedelta(milliseconds=rng.randrange(5, 900)),
+                total_processing_time_ms=rng.choice([None, rng.randrange(50, 70000)]),
+                agent_processing_time_ms=rng.choice([None, rng.randrange(10, 5000)]),
+            )
+        )
+    db.commit()
+    return now
+
+
+def _both_ways(db, monkeypatch, *args):
+    with_rollups = TraceService.get_trace_analytics(db, *args)
+    monkeypatch.setattr(config.tracing, "rollups_enabled", False)
+    raw = TraceService.get_trace_analytics(db, *args)
+    monkeypatch.setattr(config.tracing, "rollups_enabled", True)
+    return with_rollups, raw
+
+
+def test_rollup_analytics_match_raw_aggregation(test_db, monkeypatch):
+    now = _random_traces(test_db)
+    ranges = [
+        (None, None, None),
+        (now - timedelta(hours=5, minutes=17, seconds=9), now - timedelta(minutes=3, seconds=2), None),
+        (now - timedelta(hours=3), now - timedelta(hours=1), "a"),
+        (now - timedelta(minutes=30, seconds=5), now - timedelta(minutes=29, seconds=55), None),
+        (now - timedelta(hours=2, seconds=30), None, "b"),
+    ]
+
+    for start, end, instance in ranges:
+        with_rollups, raw = _both_ways(test_db, monkeypatch, start, end, instance)
+        assert with_rollups == raw, (start, end, instance)
+    assert test_db.query(TraceRollupHour).count() > 0
+    assert with_rollups["latency_percentiles"]["send"]["count"] > 0
+
+
+@pytest.mark.parametrize("status", ["received", "processing", "agent_called", "sending", "error", None])
+def test_rollup_analytics_count_non_terminal_traces(test_db, monkeypatch, status):
+    _add_instances(test_db, "a")
+    now = utcnow().replace(tzinfo=None)
+    for trace_id, trace_status in (("rollup-done", "completed"), ("rollup-open", status)):
+        test_db.add(
+            MessageTrace(
+                trace_id=trace_id,
+                instance_name="a",
+                message_type="text",
+                status=trace_status,
+                received_at=now - timedelta(hours=3),
+            )
+        )
+    test_db.commit()
+
+    with_rollups, raw = _both_ways(test_db, monkeypatch, now - timedelta(hours=4), now, None)
+
+    assert with_rollups == raw
+    assert with_rollups["total_messages"] == 2
+
+
+def test_rebuild_reproduces_incremental_rollups(test_db):
+    _random_traces(test_db, count=100)
+    incremental = _rollup_rows(test_db, TraceRollupHour, with_bucket=True)
+    incremental_latency = _latency_rows(test_db)
+    for model in (TraceRollupHour, TraceRollupMinute, TraceLatencyHour, TraceLatencyMinute):
+        test_db.query(model).delete()
+    test_db.commit()
+
+    rolled_up = rebuild_rollups(test_db)
+
+    assert rolled_up == sum(count for count, _, _ in incremental.values())
+    assert _rollup_rows(test_db, TraceRollupHour, with_bucket=True) == incremental
+    assert _latency_rows(test_db) == incremental_latency
+
+
+def _latency_rows(db):
+    return {
+        (row.bucket_start, row.instance_name, row.stage, row.bucket): row.count
+        for row in db.query(TraceLatencyHour).all()
+        if row.count
+    }
@@ -0,0 +1,104 @@
+"""
+Tests for trace payload sampling.
+"""
+
+import uuid
+
+import pytest
+
+from src.config import config
+from src.db.trace_models import MessageTrace, TracePayload
+from src.services.trace_sampling import SamplingDecision, SamplingPolicy, head_sample, trace_sampler
+from src.services.trace_service import TraceContext, TraceService
+
+
+@pytest.fixture(autouse=True)
+def fresh_policies():
+    trace_sampler.invalidate()
+    yield
+    trace_sampler.invalidate()
+
+
+def _webhook():
+    return {
+        "data": {
+            "key": {"id": "sampling-msg", "remoteJid": "5511999999999@s.whatsapp.net"},
+            "message": {"conversation": "hello"},
+            "pushName": "Tester",
+        }
+    }
+
+
+def _unsampled_trace(db, trace_id, **policy):
+    db.add(MessageTrace(trace_id=trace_id, instance_name="default", status="processing"))
+    db.commit()
+    decision = SamplingDecision(policy=SamplingPolicy(sample_rate=0.0, **policy), head_sampled=False)
+    context = TraceContext(trace_id, db, decision)
+    context.log_stage("webhook_received", {"text": "hi"}, "webhook")
+    context.log_stage("agent_request", {"prompt": "hi"}, "request")
+    return context
+
+
+def _payload_count(db, trace_id):
+    return db.query(TracePayload).filter(TracePayload.trace_id == trace_id).count()
+
+
+def test_head_sampling_is_deterministic_and_matches_rate():
+    trace_ids = [str(uuid.uuid4()) for _ in range(20000)]
+
+    kept = sum(head_sample(trace_id, 0.1) for trace_id in trace_ids)
+
+    assert 1700 < kept < 2300
+    assert [head_sample(t, 0.1) for t in trace_ids[:100]] == [head_sample(t, 0.1) for t in trace_ids[:100]]
+    assert all(head_sample(t, 1.0) for t in trace_ids[:100])
+    assert not any(head_sample(t, 0.0) for t in trace_ids[:100])
+
+
+def test_unsampled_payloads_are_dropped_when_trace_completes_normally(test_db, default_instance_config):
+    context = _unsampled_trace(test_db, "sampling-ok", keep_failed=True, slow_threshold_ms=60000)
+
+    assert _payload_count(test_db, "sampling-ok") == 0
+    context.update_trace_status("completed")
+
+    assert _payload_count(test_db, "sampling-ok") == 0
+    assert test_db.query(MessageTrace).filter_by(trace_id="sampling-ok").one().status == "completed"
+
+
+def test_failed_and_slow_traces_keep_payloads(test_db, default_instance_config):
+    failed = _unsampled_trace(test_db, "sampling-failed", keep_failed=True)
+    failed.update_trace_status("failed", error_message="boom", error_stage="agent_request")
+
+    slow = _unsampled_trace(test_db, "sampling-slow", slow_threshold_ms=500)
+    slow.start_time -= 1
+    slow.update_trace_status("completed")
+
+    not_kept = _unsampled_trace(test_db, "sampling-failed-ignored", keep_failed=False)
+    not_kept.update_trace_status("failed")
+
+    assert _payload_count(test_db, "sampling-failed") == 2
+    assert _payload_count(test_db, "sampling-slow") == 2
+    assert _payload_count(test_db, "sampling-failed-ignored") == 0
+
+
+def test_instance_metadata_mode_keeps_trace_rows_only(test_db, default_instance_config):
+    default_instance_config.trace_payload_mode = "metadata"
+    test_db.commit()
+
+    context = TraceService.create_trace(_webhook(), "default", test_db)
+    context.update_trace_status("failed", error_message="boom")
+
+    trace = test_db.query(MessageTrace).filter_by(trace_id=context.trace_id).one()
+    assert trace.error_message == "boom"
+    assert _payload_count(test_db, context.trace_id) == 0
+
+
+def test_instance_rate_overrides_global_rate(test_db, default_instance_config, monkeypatch):
+    monkeypatch.setattr(config.tracing, "sample_rate", 0.0)
+    assert SamplingPolicy.from_config(default_instance_config).sample_rate == 0.0
+
+    default_instance_config.trace_sample_rate = 1.0
+    test_db.commit()
+
+    context = TraceService.create_trace(_webhook(), "default", test_db)
+    assert context.sampling.head_sampled
+    assert _payload_count(test_db, context.trace_id) == 1
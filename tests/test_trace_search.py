@@ -0,0 +1,94 @@
+"""
+Tests for full-text search over traced message content.
+"""
+
+import pytest
+
+from src.db.trace_models import MessageTrace, TracePayload
+from src.services.trace_sampling import trace_sampler
+from src.services.trace_search import backfill_search_text, extract_message_text, rebuild_fts, search_traces
+from src.services.trace_service import TraceService
+
+
+@pytest.fixture(autouse=True)
+def fresh_policies():
+    trace_sampler.invalidate()
+    yield
+    trace_sampler.invalidate()
+
+
+def _webhook(message, message_id="search-msg"):
+    return {
+        "data": {
+            "key": {"id": message_id, "remoteJid": "5511999999999@s.whatsapp.net"},
+            "message": message,
+            "pushName": "Customer",
+        }
+    }
+
+
+def _create(db, text, message_id):
+    return TraceService.create_trace(_webhook({"conversation": text}, message_id), "default", db).trace_id
+
+
+def test_extract_message_text():
+    assert extract_message_text({"conversation": " hello "}) == "hello"
+    assert extract_message_text({"extendedTextMessage": {"text": "a link"}}) == "a link"
+    assert extract_message_text({"imageMessage": {"caption": "my invoice"}}) == "my invoice"
+    assert (
+        extract_message_text({"documentWithCaptionMessage": {"message": {"documentMessage": {"caption": "contract"}}}})
+        == "contract"
+    )
+    assert extract_message_text({"audioMessage": {"seconds": 3}}) is None
+
+
+def test_search_endpoint_ranks_matching_traces(test_client, test_db, default_instance_config):
+    best = _create(test_db, "my order never arrived, order 4512 is late", "m1")
+    other = _create(test_db, "where is my order?", "m2")
+    _create(test_db, "thanks, bye", "m3")
+    accented = _create(test_db, "Não recebi a cobrança", "m4")
+
+    response = test_client.get("/api/v1/traces/search?q=order")
+
+    assert response.status_code == 200
+    results = response.json()
+    assert {r["trace_id"] for r in results} == {best, other}
+    assert results[0]["score"] >= results[1]["score"]
+    assert results[0]["instance_name"] == "default"
+
+    assert [r["trace_id"] for r in search_traces(test_db, "order late")] == [best]
+    assert [r["trace_id"] for r in search_traces(test_db, "recebi cobrança")] == [accented]
+    assert search_traces(test_db, "order", instance_name="other") == []
+    # Query syntax characters are treated as text
+    assert search_traces(test_db, 'order" OR "thanks') == []
+    assert test_client.get("/api/v1/traces/search?q=").status_code == 422
+
+
+def test_deleted_and_metadata_only_traces_are_not_found(test_db, default_instance_config):
+    deleted = _create(test_db, "refund request", "m1")
+    test_db.query(TracePayload).filter_by(trace_id=deleted).delete()
+    test_db.query(MessageTrace).filter_by(trace_id=deleted).delete()
+    test_db.commit()
+
+    default_instance_config.trace_payload_mode = "metadata"
+    test_db.commit()
+    trace_sampler.invalidate("default")
+    private = _create(test_db, "refund please", "m2")
+
+    assert search_traces(test_db, "refund") == []
+    assert test_db.query(MessageTrace).filter_by(trace_id=private).one().search_text is None
+
+
+def test_backfill_indexes_traces_created_before_search(test_db, default_instance_config):
+    test_db.add(MessageTrace(trace_id="legacy", instance_name="default", status="completed"))
+    payload = TracePayload(trace_id="legacy", stage="webhook_received", payload_type="webhook")
+    payload.set_payload(_webhook({"conversation": "legacy complaint about billing"}))
+    test_db.add_all([payload, MessageTrace(trace_id="legacy-empty", instance_name="default", status="completed")])
+    test_db.commit()
+
+    assert backfill_search_text(test_db, batch_size=1) == 1
+    rebuild_fts(test_db.connection())
+    test_db.commit()
+
+    assert [r["trace_id"] for r in search_traces(test_db, "billing")] == ["legacy"]
+    assert test_db.query(MessageTrace).filter_by(trace_id="legacy-empty").one().search_text == ""
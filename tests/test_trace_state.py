@@ -0,0 +1,82 @@
+"""
+Tests for in-memory trace state written with a single update.
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from src.config import config
+from src.db.trace_models import MessageTrace
+from src.services.trace_service import TraceContext
+from src.utils.datetime_utils import utcnow
+
+
+@contextmanager
+def _trace_statements(db):
+    statements = []
+    engine = db.get_bind()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "message_traces" in statement:
+            statements.append(statement.split()[0].upper())
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def _context(db, trace_id):
+    db.add(MessageTrace(trace_id=trace_id, instance_name="default", status="received", received_at=utcnow()))
+    db.commit()
+    return TraceContext(trace_id, db)
+
+
+def _trace(db, trace_id):
+    db.expire_all()
+    return db.query(MessageTrace).filter_by(trace_id=trace_id).one()
+
+
+def test_lifecycle_is_written_with_one_update(test_db, default_instance_config):
+    context = _context(test_db, "state-lifecycle")
+
+    with _trace_statements(test_db) as statements:
+        context.update_trace_status("processing", processing_started_at=utcnow())
+        context.log_agent_request({"prompt": "hi"})
+        context.update_session_info("session-1", "agent-session-1")
+        context.log_agent_response({"message": "hello", "session_id": "agent-session-1"}, 120)
+        context.log_evolution_send({"text": "hello"}, 201, True)
+
+    assert statements.count("UPDATE") == 1
+    assert statements.count("SELECT") == 1
+    trace = _trace(test_db, "state-lifecycle")
+    assert trace.status == "completed"
+    assert trace.session_name == "session-1"
+    assert trace.agent_processing_time_ms == 120
+    assert trace.evolution_response_code == 201
+    assert trace.total_processing_time_ms is not None
+
+
+def test_failure_keeps_error_from_earlier_update(test_db, default_instance_config):
+    context = _context(test_db, "state-failed")
+
+    context.update_trace_status("processing", error_stage="agent_request", error_message="timeout")
+    context.update_trace_status("failed")
+
+    trace = _trace(test_db, "state-failed")
+    assert (trace.status, trace.error_message, trace.error_stage) == ("failed", "timeout", "agent_request")
+
+
+def test_pending_state_is_written_on_flush_or_when_stale(test_db, default_instance_config, monkeypatch):
+    context = _context(test_db, "state-pending")
+
+    context.update_trace_status("processing")
+    assert _trace(test_db, "state-pending").status == "received"
+    context.flush()
+    assert _trace(test_db, "state-pending").status == "processing"
+
+    monkeypatch.setattr(config.tracing, "state_flush_interval", 0)
+    context.update_trace_status("agent_called")
+    assert _trace(test_db, "state-pending").status == "agent_called"
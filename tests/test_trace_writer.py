@@ -0,0 +1,154 @@
+"""
+Tests for the asynchronous batched trace writer.
+"""
+
+import queue
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import src.services.trace_service as trace_service_module
+import src.services.trace_writer as trace_writer_module
+from src.config import config
+from src.db.trace_models import MessageTrace, TracePayload
+from src.services.trace_service import TraceContext
+from src.services.trace_writer import PayloadEvent, StatusEvent, TraceWriter
+
+
+@pytest.fixture
+def writer(test_db, monkeypatch):
+    session_factory = sessionmaker(bind=test_db.get_bind(), autocommit=False, autoflush=False)
+    writer = TraceWriter(session_factory=session_factory)
+    monkeypatch.setattr(config.tracing, "writer_flush_interval", 0.05)
+    monkeypatch.setattr(trace_service_module, "trace_writer", writer)
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+@pytest.fixture
+def trace(test_db, default_instance_config):
+    trace = MessageTrace(trace_id="trace-writer-1", instance_name="default", status="received")
+    test_db.add(trace)
+    test_db.commit()
+    return trace
+
+
+def test_trace_context_writes_through_writer_without_committing(test_db, trace, writer):
+    request_session = MagicMock()
+    context = TraceContext("trace-writer-1", request_session)
+
+    context.log_stage("webhook_received", {"text": "hi"}, "webhook")
+    context.update_trace_status("processing")
+    context.log_agent_response({"message": "hello", "session_id": "s-1"}, processing_time_ms=42)
+    context.update_session_info("session-a", agent_session_id="agent-s-1")
+    context.log_evolution_send({"recipient": "5511"}, 201, True)
+
+    assert writer.flush(timeout=5)
+    # The request's session is never used to write traces
+    request_session.commit.assert_not_called()
+    request_session.add.assert_not_called()
+
+    test_db.expire_all()
+    stored = test_db.query(MessageTrace).filter_by(trace_id="trace-writer-1").one()
+    assert stored.status == "completed"
+    assert stored.agent_processing_time_ms == 42
+    assert stored.agent_session_id == "agent-s-1"
+    assert stored.session_name == "session-a"
+    assert stored.evolution_success is True
+    assert stored.completed_at is not None
+    stages = [p.stage for p in test_db.query(TracePayload).order_by(TracePayload.id).all()]
+    assert stages == ["webhook_received", "agent_response", "evolution_send"]
+    assert test_db.query(TracePayload).first().get_payload() == {"text": "hi"}
+
+
+def test_batch_commits_once_and_merges_status_updates(test_db, trace):
+    session = test_db
+    session_factory = MagicMock(return_value=session)
+    commit_spy = MagicMock(wraps=session.commit)
+    session.commit = commit_spy
+    session.close = MagicMock()
+    writer = TraceWriter(session_factory=session_factory)
+
+    writer.write_batch(
+        [PayloadEvent("trace-writer-1", f"stage-{i}", {"i": i}, "request") for i in range(5)]
+        + [
+            StatusEvent("trace-writer-1", "processing"),
+            StatusEvent("trace-writer-1", None, fields={"session_name": "merged"}),
+            StatusEvent("trace-writer-1", "failed", error_message="boom", error_stage="agent_request"),
+        ]
+    )
+
+    assert commit_spy.call_count == 1
+    stored = test_db.query(MessageTrace).filter_by(trace_id="trace-writer-1").one()
+    assert (stored.status, stored.session_name, stored.error_stage) == ("failed", "merged", "agent_request")
+    assert test_db.query(TracePayload).count() == 5
+    assert writer.get_stats()["batches_committed"] == 1
+
+
+def test_full_queue_drops_payload_events_instead_of_blocking():
+    writer = TraceWriter(session_factory=MagicMock())
+    # Accepting events with nothing draining the queue
+    writer._queue = queue.Queue(maxsize=2)
+    writer.is_running = True
+
+    results = [writer.submit(PayloadEvent("t", "webhook_received", {}, "webhook")) for _ in range(5)]
+
+    assert results == [True] * 5
+    stats = writer.get_stats()
+    assert stats["events_enqueued"] == 2
+    assert stats["events_dropped"] == 3
+
+
+def test_full_queue_hands_status_events_back(test_db, trace, monkeypatch):
+    writer = TraceWriter(session_factory=MagicMock())
+    writer._queue = queue.Queue(maxsize=1)
+    writer.is_running = True
+    writer.submit(PayloadEvent("trace-writer-1", "webhook_received", {}, "webhook"))
+    monkeypatch.setattr(trace_writer_module, "STATUS_EVENT_PUT_TIMEOUT", 0.01)
+    monkeypatch.setattr(trace_service_module, "trace_writer", writer)
+
+    # The completion is written inline instead of being dropped
+    TraceContext("trace-writer-1", test_db).update_trace_status("completed")
+
+    assert writer.get_stats()["status_events_inline"] == 1
+    assert writer.get_stats()["events_dropped"] == 0
+    test_db.expire_all()
+    stored = test_db.query(MessageTrace).filter_by(trace_id="trace-writer-1").one()
+    assert stored.status == "completed"
+    assert stored.completed_at is not None
+
+
+def test_trace_context_writes_inline_when_writer_not_running(test_db, trace):
+    context = TraceContext("trace-writer-1", test_db)
+
+    context.log_stage("webhook_received", {"text": "inline"}, "webhook")
+    context.update_trace_status("completed")
+
+    assert test_db.query(TracePayload).count() == 1
+    assert test_db.query(MessageTrace).filter_by(trace_id="trace-writer-1").one().status == "completed"
+
+
+def test_failing_event_does_not_discard_the_rest_of_the_batch(test_db, trace):
+    writer = TraceWriter(session_factory=sessionmaker(bind=test_db.get_bind(), autocommit=False, autoflush=False))
+
+    writer.write_batch(
+        [
+            PayloadEvent("trace-writer-1", "webhook_received", {"text": "hi"}, "webhook"),
+            # Poison event: the value cannot be bound to an integer column
+            StatusEvent("trace-writer-1", None, fields={"agent_processing_time_ms": {"not": "a number"}}),
+            StatusEvent("trace-writer-1", "processing", fields={"session_name": "kept"}),
+            PayloadEvent("trace-writer-1", "agent_request", {"prompt": "hi"}, "request"),
+        ]
+    )
+
+    test_db.expire_all()
+    stored = test_db.query(MessageTrace).filter_by(trace_id="trace-writer-1").one()
+    assert (stored.status, stored.session_name, stored.agent_processing_time_ms) == ("processing", "kept", None)
+    assert [p.stage for p in test_db.query(TracePayload).order_by(TracePayload.id)] == [
+        "webhook_received",
+        "agent_request",
+    ]
+    stats = writer.get_stats()
+    assert (stats["events_failed"], stats["payloads_written"]) == (1, 2)
@@ -0,0 +1,44 @@
+"""
+Tests for time-ordered UUIDv7 identifiers.
+"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from src.db.models import User
+from src.db.trace_models import MessageTrace
+from src.utils.datetime_utils import utcnow
+from src.utils.uuid_utils import uuid7, uuid7_datetime
+
+
+def test_uuid7_layout_and_timestamp():
+    before = utcnow()
+    value = uuid7()
+
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    assert abs(uuid7_datetime(value) - before) < timedelta(seconds=1)
+    assert uuid7_datetime(str(value)) == uuid7_datetime(value)
+    with pytest.raises(ValueError):
+        uuid7_datetime(uuid.uuid4())
+
+
+def test_uuid7_is_strictly_increasing_as_uuid_and_string():
+    values = [uuid7() for _ in range(20000)]
+
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    strings = [str(value) for value in values]
+    assert strings == sorted(strings)
+
+
+def test_new_traces_and_users_get_uuid7_ids(test_db, default_instance_config):
+    trace = MessageTrace(instance_name="default", status="received")
+    user = User(phone_number="+5511999999999", whatsapp_jid="5511999999999@s.whatsapp.net", instance_name="default")
+    test_db.add_all([trace, user])
+    test_db.commit()
+
+    assert uuid.UUID(trace.trace_id).version == 7
+    assert uuid.UUID(user.id).version == 7